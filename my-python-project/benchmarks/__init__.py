@@ -0,0 +1,14 @@
+"""
+Micro benchmarks for the nsedata package.
+
+Run a benchmark from the project root, eg: python -m benchmarks.bench_option_chain
+The full suite of hot paths, replayed from recorded fixtures: python -m benchmarks.suite --output results.json
+The nsedata modules import each other flatly, so src/nsedata is put on sys.path here.
+"""
+
+import sys
+from pathlib import Path
+
+NSEDATA_DIR = Path(__file__).resolve().parent.parent / 'src' / 'nsedata'
+if str(NSEDATA_DIR) not in sys.path:
+    sys.path.insert(0, str(NSEDATA_DIR))
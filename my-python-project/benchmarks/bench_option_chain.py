@@ -0,0 +1,57 @@
+"""
+Option chain parse: columnar parser vs the previous row-by-row pd.concat parser.
+
+    python -m benchmarks.bench_option_chain [--payload recorded.json] [--repeat 5]
+
+Without --payload a synthetic 10 expiry x 150 strike NIFTY chain is used.
+"""
+
+import argparse
+import time
+from benchmarks import payloads
+from benchmarks.legacy import legacy_live_option_chain
+from option_chain import parse_option_chain
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(payload, repeat=5, symbol='NIFTY'):
+    """
+    Time both parsers on one payload
+    :return: dict of case -> seconds
+    """
+    rows = len(payload['records']['data'])
+    results = {'rows': rows}
+    for oi_mode in ('full', 'compact'):
+        results[f'legacy_{oi_mode}'] = best_of(lambda: legacy_live_option_chain(payload, symbol, oi_mode=oi_mode),
+                                               max(1, repeat // 5))
+        results[f'columnar_{oi_mode}'] = best_of(lambda: parse_option_chain(payload, symbol, oi_mode=oi_mode), repeat)
+    results['columnar_array'] = best_of(lambda: parse_option_chain(payload, symbol, as_array=True), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--payload', help='recorded option chain json')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payload = payloads.load_payload(args.payload) if args.payload else payloads.option_chain_payload()
+    results = run(payload, args.repeat)
+    print(f"rows: {results['rows']}")
+    for oi_mode in ('full', 'compact'):
+        legacy, columnar = results[f'legacy_{oi_mode}'], results[f'columnar_{oi_mode}']
+        print(f"{oi_mode:8s} legacy {legacy * 1000:9.1f} ms   columnar {columnar * 1000:7.2f} ms   "
+              f"speedup {legacy / columnar:6.1f}x")
+    print(f"{'array':8s} columnar {results['columnar_array'] * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""
+Fixtures of the benchmark suite.
+
+record_fixtures runs the same client calls the benchmarks replay (symbol master, daily and intraday
+history, bhav copies, option chain, index history) through a nse_replay.RecordingAdapter, so every
+request the suite makes later has a recorded answer. By default the answers come from
+SyntheticNseAdapter, a seeded generator of NSE shaped responses over a universe of N symbols. Pass
+--live to record from NSE itself instead (the universe is then the first N equities of the master).
+
+    python -m benchmarks.fixtures <folder> [--symbols 2000] [--live]
+
+The scenario (dates, universe size) is written to <folder>/scenario.json and read back by the suite.
+History requests are keyed on the POST body, which holds epoch seconds of naive datetimes, so fixtures
+replay on machines in the same timezone as the one that recorded them.
+"""
+
+import argparse
+import io
+import json
+import zipfile
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from requests.adapters import BaseAdapter
+from benchmarks import payloads
+from NSEMasterData import NSEMasterData
+from NseUtility import NseUtils
+from nse_replay import FixtureStore, RecordingAdapter, build_response
+from nse_schemas import BHAV_SCHEMAS
+
+# Scenario of the synthetic fixtures. A bhav copy / session end on a Friday
+SYNTHETIC_END = datetime(2024, 6, 28, 15, 30)
+DAILY_DAYS = 400            # calendar days of daily history, > 252 sessions for the 52 week tests
+INTRADAY_DAYS = 90          # calendar days of 1m / 5m / 15m history
+INDEX_HISTORY_DAYS = 1275   # calendar days of index history, enough for 36 monthly candles
+FNO_UNDERLYINGS = 200
+HISTORY_SYMBOL_INDEX = 0    # position of the intraday history symbol in the universe
+INDEX_NAME = 'NIFTY 50'
+
+_HTML = b'<html><body>NSE</body></html>'
+_STEP_MINUTES = {'1': 1, '3': 3, '5': 5, '15': 15}
+
+
+def scenario(end=SYNTHETIC_END, symbols=2000):
+    """Dates and sizes of a fixture set, as stored in scenario.json"""
+    end = pd.Timestamp(end).to_pydatetime()
+    return {
+        'end': end.isoformat(),
+        'daily_start': (end - timedelta(days=DAILY_DAYS)).replace(hour=0, minute=0).isoformat(),
+        'intraday_start': (end - timedelta(days=INTRADAY_DAYS)).replace(hour=0, minute=0).isoformat(),
+        'index_from': (end - timedelta(days=INDEX_HISTORY_DAYS)).strftime('%d-%m-%Y'),
+        'index_to': end.strftime('%d-%m-%Y'),
+        'bhav_date': end.strftime('%d-%m-%Y'),
+        'symbols': symbols,
+    }
+
+
+def load_scenario(folder):
+    with open(f"{folder}/scenario.json") as f:
+        return json.load(f)
+
+
+def universe(master, symbols):
+    """The first `symbols` equities of a downloaded symbol master"""
+    df = master.nse_data
+    return df.loc[df['Type'] == 'EQ', 'Symbol'].head(symbols).tolist()
+
+
+class SyntheticNseAdapter(BaseAdapter):
+    """
+    Transport adapter answering NSE requests with seeded synthetic data of the same shape as the live
+    responses. Every symbol gets its own random walk, so repeated requests return identical data.
+    """
+
+    def __init__(self, symbols=2000, seed=7):
+        super().__init__()
+        self.symbols = [f"SYM{number:04d}" for number in range(symbols)]
+        self.seed = seed
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        path, query = parts.path, parse_qs(parts.query)
+        if 'symbolhistoricaldata' in path:
+            return self._json(request, self._history(json.loads(request.body)))
+        if path.endswith('/GetEQMasters'):
+            return self._text(request, self._eq_master())
+        if path.endswith('/GetFOMasters'):
+            return self._text(request, self._fo_master())
+        if '/BhavCopy_NSE_CM_' in path:
+            return self._zip(request, path, self._equity_bhav(path))
+        if '/BhavCopy_NSE_FO_' in path:
+            return self._zip(request, path, self._fno_bhav(path))
+        if path.startswith('/api/option-chain'):
+            return self._json(request, payloads.option_chain_payload(query['symbol'][0]))
+        if path == '/api/historical/indicesHistory':
+            return self._json(request, self._index_history(query))
+        if not path.startswith('/api/'):
+            return build_response(request, 200, {'Content-Type': 'text/html'}, _HTML)
+        return build_response(request, 404, {'Content-Type': 'text/plain'}, b'Not generated')
+
+    def close(self):
+        pass
+
+    # ------------------------------------------------------------------ #
+    #  Responses
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _json(request, data):
+        return build_response(request, 200, {'Content-Type': 'application/json'}, json.dumps(data).encode())
+
+    @staticmethod
+    def _text(request, text):
+        return build_response(request, 200, {'Content-Type': 'text/plain'}, text.encode())
+
+    @staticmethod
+    def _zip(request, path, df):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr(path.rsplit('/', 1)[-1][:-len('.zip')], df.to_csv(index=False))
+        return build_response(request, 200, {'Content-Type': 'application/zip'}, buffer.getvalue())
+
+    def _eq_master(self):
+        lines = [f"{1000 + number}|{symbol}|{symbol} LIMITED|EQ" for number, symbol in enumerate(self.symbols)]
+        lines.append(f"26000|{INDEX_NAME}|{INDEX_NAME}|Index")
+        return '\n'.join(lines)
+
+    def _fo_master(self):
+        return '\n'.join(f"{50000 + number}|{symbol}24JULFUT|{symbol} FUT|FUTSTK"
+                         for number, symbol in enumerate(self.symbols[:FNO_UNDERLYINGS]))
+
+    # ------------------------------------------------------------------ #
+    #  Data
+    # ------------------------------------------------------------------ #
+
+    def _walk(self, key, count, start_price=None):
+        """Seeded OHLCV random walk of `count` bars"""
+        rng = np.random.default_rng([self.seed, key])
+        price = start_price or rng.uniform(50, 3000)
+        close = price * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+        open_ = np.concatenate([[price], close[:-1]]) * np.exp(rng.normal(0, 0.002, count))
+        spread = np.abs(rng.normal(0, 0.006, count)) * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        volume = rng.integers(1_000, 2_000_000, count)
+        return np.round(open_, 2), np.round(high, 2), np.round(low, 2), np.round(close, 2), volume
+
+    def _history(self, payload):
+        """TradingView style {'s', 't', 'o', 'h', 'l', 'c', 'v'} bars of the charting historical api"""
+        start = pd.Timestamp(payload['fromDate'], unit='s').normalize()
+        end = pd.Timestamp(payload['toDate'], unit='s')
+        days = pd.bdate_range(start, end.normalize())
+        if payload['chartPeriod'] == 'I':
+            step = _STEP_MINUTES.get(str(payload['timeInterval']), 1)
+            # NSE labels a bar with its end time, in IST written as if it were UTC
+            ends = pd.timedelta_range(timedelta(hours=9, minutes=15 + step), timedelta(hours=15, minutes=30),
+                                      freq=f"{step}min")
+            stamps = (days.values[:, None] + ends.values[None, :]).ravel()
+        else:
+            stamps = days.values
+        stamps = stamps[stamps <= end.to_datetime64()]
+        seconds = stamps.astype('datetime64[s]').astype('int64')
+        open_, high, low, close, volume = self._walk(int(payload['ScripCode']), len(seconds))
+        return {'s': 'Ok', 't': seconds.tolist(), 'o': open_.tolist(), 'h': high.tolist(), 'l': low.tolist(),
+                'c': close.tolist(), 'v': volume.tolist()}
+
+    def _udiff_frame(self, rows, trade_date):
+        df = pd.DataFrame(rows)
+        for column in BHAV_SCHEMAS['equity']:
+            if column not in df:
+                df[column] = ''
+        df['TradDt'] = df['BizDt'] = trade_date.strftime('%Y-%m-%d')
+        df['Sgmt'] = df['Sgmt'].where(df['Sgmt'] != '', 'CM')
+        df['Src'] = 'NSE'
+        df['SsnId'] = 'F1'
+        return df[list(BHAV_SCHEMAS['equity'])]
+
+    @staticmethod
+    def _trade_date(path):
+        return datetime.strptime(path.rsplit('/', 1)[-1].split('_')[6], '%Y%m%d')
+
+    def _equity_bhav(self, path):
+        trade_date = self._trade_date(path)
+        rng = np.random.default_rng([self.seed, trade_date.toordinal()])
+        count = len(self.symbols)
+        close = np.round(rng.uniform(50, 3000, count), 2)
+        rows = {
+            'FinInstrmTp': 'STK', 'FinInstrmId': np.arange(1000, 1000 + count), 'TckrSymb': self.symbols,
+            'ISIN': [f"INE{number:06d}01" for number in range(count)], 'SctySrs': 'EQ',
+            'FinInstrmNm': [f"{symbol} LIMITED" for symbol in self.symbols],
+            'OpnPric': np.round(close * rng.uniform(0.97, 1.03, count), 2),
+            'HghPric': np.round(close * 1.04, 2), 'LwPric': np.round(close * 0.96, 2), 'ClsPric': close,
+            'LastPric': close, 'PrvsClsgPric': np.round(close * rng.uniform(0.97, 1.03, count), 2),
+            'SttlmPric': close, 'TtlTradgVol': rng.integers(1_000, 5_000_000, count),
+            'TtlNbOfTxsExctd': rng.integers(10, 50_000, count), 'NewBrdLotQty': 1,
+        }
+        rows['TtlTrfVal'] = np.round(rows['TtlTradgVol'] * close, 2)
+        return self._udiff_frame(rows, trade_date)
+
+    def _fno_bhav(self, path):
+        """Futures of 3 expiries plus 40 CE / PE strikes per expiry for every underlying"""
+        trade_date = self._trade_date(path)
+        rng = np.random.default_rng([self.seed, trade_date.toordinal(), 1])
+        expiries = [(trade_date + timedelta(weeks=4 * month)).strftime('%Y-%m-%d') for month in range(1, 4)]
+        underlyings = self.symbols[:FNO_UNDERLYINGS]
+        spot = dict(zip(underlyings, np.round(rng.uniform(100, 3000, len(underlyings)), 2)))
+        records = []
+        for symbol in underlyings:
+            step = max(1.0, round(spot[symbol] * 0.01))
+            strikes = np.round(spot[symbol] / step) * step + step * np.arange(-20, 20)
+            for expiry in expiries:
+                records.append((symbol, 'STF', expiry, np.nan, '', spot[symbol]))
+                for strike in strikes:
+                    records.append((symbol, 'STO', expiry, strike, 'CE', max(spot[symbol] - strike, 0) + 5))
+                    records.append((symbol, 'STO', expiry, strike, 'PE', max(strike - spot[symbol], 0) + 5))
+        df = pd.DataFrame(records, columns=['TckrSymb', 'FinInstrmTp', 'XpryDt', 'StrkPric', 'OptnTp', 'ClsPric'])
+        count = len(df)
+        close = np.round(df['ClsPric'].to_numpy() * rng.uniform(0.9, 1.1, count), 2)
+        rows = {column: df[column].to_numpy() for column in df.columns}
+        rows.update({
+            'Sgmt': 'FO', 'FinInstrmId': np.arange(100000, 100000 + count), 'FininstrmActlXpryDt': rows['XpryDt'],
+            'FinInstrmNm': [f"{s}{e}{k}{o}" for s, e, k, o in zip(df['TckrSymb'], df['XpryDt'], df['StrkPric'],
+                                                                    df['OptnTp'])],
+            'OpnPric': close, 'HghPric': np.round(close * 1.1, 2), 'LwPric': np.round(close * 0.9, 2),
+            'ClsPric': close, 'LastPric': close, 'PrvsClsgPric': close,
+            'UndrlygPric': df['TckrSymb'].map(spot).to_numpy(), 'SttlmPric': close,
+            'OpnIntrst': rng.integers(0, 5_000_000, count), 'ChngInOpnIntrst': rng.integers(-100_000, 100_000, count),
+            'TtlTradgVol': rng.integers(0, 1_000_000, count), 'TtlNbOfTxsExctd': rng.integers(0, 10_000, count),
+            'NewBrdLotQty': 250,
+        })
+        rows['TtlTrfVal'] = np.round(rows['TtlTradgVol'] * close, 2)
+        return self._udiff_frame(rows, trade_date)
+
+    def _index_history(self, query):
+        """indicesHistory payload of the requested window, business days only"""
+        start = datetime.strptime(query['from'][0], '%d-%m-%Y')
+        end = datetime.strptime(query['to'][0], '%d-%m-%Y')
+        days = pd.bdate_range(start, end)
+        # One walk from a fixed origin, so overlapping windows agree
+        offset = len(pd.bdate_range(datetime(2015, 1, 1), start)) - 1
+        open_, high, low, close, volume = self._walk(26000, offset + len(days), start_price=8000.0)
+        close_records, turnover_records = [], []
+        for number, day in enumerate(days):
+            i = offset + number
+            timestamp = day.strftime('%d-%b-%Y')
+            close_records.append({
+                '_id': f"c{i}", 'EOD_TIMESTAMP': timestamp, 'TIMESTAMP': day.isoformat(),
+                'EOD_INDEX_NAME': query['indexType'][0], 'EOD_OPEN_INDEX_VAL': float(open_[i]),
+                'EOD_HIGH_INDEX_VAL': float(high[i]), 'EOD_CLOSE_INDEX_VAL': float(close[i]),
+                'EOD_LOW_INDEX_VAL': float(low[i]),
+            })
+            turnover_records.append({
+                '_id': f"t{i}", 'HIT_INDEX_NAME_UPPER': query['indexType'][0], 'TIMESTAMP': day.isoformat(),
+                'HIT_TIMESTAMP': timestamp, 'HIT_TRADED_QTY': int(volume[i]) * 100,
+                'HIT_TURN_OVER': round(float(volume[i]) * close[i] / 1e5, 2),
+            })
+        return {'data': {'indexCloseOnlineRecords': close_records, 'indexTurnoverRecords': turnover_records}}
+
+
+def record_fixtures(folder, symbols=2000, adapter=None, end=SYNTHETIC_END):
+    """
+    Record every request of the benchmark suite to a FixtureStore
+    :param folder: fixture folder
+    :param symbols: size of the screener / backtester universe
+    :param adapter: Optional. Transport adapter to record from, defaults to a SyntheticNseAdapter.
+    Pass a nse_rate_limit.RateLimitedAdapter to record from NSE
+    :return: the scenario dict
+    """
+    store = FixtureStore(folder, autoflush=False)
+    recorder = RecordingAdapter(store, adapter or SyntheticNseAdapter(symbols))
+    plan = scenario(end, symbols)
+    end = datetime.fromisoformat(plan['end'])
+    daily_start = datetime.fromisoformat(plan['daily_start'])
+    intraday_start = datetime.fromisoformat(plan['intraday_start'])
+
+    master = NSEMasterData(adapter=recorder, master_cache=False, history_store=False)
+    master.download_symbol_master()
+    stocks = universe(master, symbols)
+    for stock in stocks:
+        master.get_history(stock, 'NSE', daily_start, end, '1d')
+    for interval in ('1m', '10m', '30m'):       # 5m and 15m source bars, 1h shares the 15m request of 30m
+        master.get_history(stocks[HISTORY_SYMBOL_INDEX], 'NSE', intraday_start, end, interval)
+
+    nse = NseUtils(bhav_archive=False, index_store=False, filings_store=False, high_low_store=False,
+                   index_membership=False, adapter=recorder)
+    nse.get_live_option_chain('NIFTY', indices=True)
+    nse.equity_bhav_copy(plan['bhav_date'])
+    nse.fno_bhav_copy(plan['bhav_date'])
+    nse.get_index_historic_data(INDEX_NAME, plan['index_from'], plan['index_to'])
+
+    store.flush()
+    with open(store.folder / 'scenario.json', 'w') as f:
+        json.dump(plan, f, indent=1)
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record the fixtures of the benchmark suite')
+    parser.add_argument('folder')
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--live', action='store_true', help='record from NSE instead of synthetic data')
+    args = parser.parse_args()
+
+    if args.live:
+        from nse_rate_limit import RateLimitedAdapter
+        plan = record_fixtures(args.folder, args.symbols, RateLimitedAdapter(pool_maxsize=20), datetime.now())
+    else:
+        plan = record_fixtures(args.folder, args.symbols)
+    print(f"Recorded {len(FixtureStore(args.folder))} fixtures to {args.folder}: {plan}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Previous implementations of code paths that have since been optimised.
+
+They are kept verbatim (apart from de-duplicated indexing) so benchmarks and equivalence tests can
+compare the current code against what it replaced.
+"""
+
+import re
+import zipfile
+from datetime import timedelta
+from io import BytesIO
+import pandas as pd
+from nse_schemas import DATE_FORMATS
+
+
+def legacy_live_option_chain(payload, symbol, expiry_date=None, oi_mode="full"):
+    """NseUtils._parse_live_option_chain before the columnar parser: one pd.concat per strike."""
+    if expiry_date:
+        exp_date = pd.to_datetime(expiry_date, format='%d-%m-%Y')
+        expiry_date = exp_date.strftime('%d-%b-%Y')
+
+    if oi_mode == 'compact':
+        col_names = ['Fetch_Time', 'Symbol', 'Expiry_Date', 'CALLS_OI', 'CALLS_Chng_in_OI', 'CALLS_Volume',
+                     'CALLS_IV', 'CALLS_LTP', 'CALLS_Net_Chng', 'Strike_Price', 'PUTS_OI', 'PUTS_Chng_in_OI',
+                     'PUTS_Volume', 'PUTS_IV', 'PUTS_LTP', 'PUTS_Net_Chng']
+    else:
+        col_names = ['Fetch_Time', 'Symbol', 'Expiry_Date', 'CALLS_OI', 'CALLS_Chng_in_OI', 'CALLS_Volume',
+                     'CALLS_IV', 'CALLS_LTP', 'CALLS_Net_Chng', 'CALLS_Bid_Qty', 'CALLS_Bid_Price', 'CALLS_Ask_Price',
+                     'CALLS_Ask_Qty', 'Strike_Price', 'PUTS_Bid_Qty', 'PUTS_Bid_Price', 'PUTS_Ask_Price',
+                     'PUTS_Ask_Qty', 'PUTS_Net_Chng', 'PUTS_LTP', 'PUTS_IV', 'PUTS_Volume', 'PUTS_Chng_in_OI',
+                     'PUTS_OI']
+
+    oi_data = pd.DataFrame(columns=col_names)
+
+    oi_row = {'Fetch_Time': None, 'Symbol': None, 'Expiry_Date': None, 'CALLS_OI': 0, 'CALLS_Chng_in_OI': 0,
+              'CALLS_Volume': 0, 'CALLS_IV': 0, 'CALLS_LTP': 0, 'CALLS_Net_Chng': 0, 'CALLS_Bid_Qty': 0,
+              'CALLS_Bid_Price': 0, 'CALLS_Ask_Price': 0, 'CALLS_Ask_Qty': 0, 'Strike_Price': 0, 'PUTS_OI': 0,
+              'PUTS_Chng_in_OI': 0, 'PUTS_Volume': 0, 'PUTS_IV': 0, 'PUTS_LTP': 0, 'PUTS_Net_Chng': 0,
+              'PUTS_Bid_Qty': 0, 'PUTS_Bid_Price': 0, 'PUTS_Ask_Price': 0, 'PUTS_Ask_Qty': 0}
+
+    for record in payload['records']['data']:
+        if not expiry_date or (record['expiryDate'] == expiry_date):
+            try:
+                oi_row['Expiry_Date'] = record['expiryDate']
+                oi_row['CALLS_OI'] = record['CE']['openInterest']
+                oi_row['CALLS_Chng_in_OI'] = record['CE']['changeinOpenInterest']
+                oi_row['CALLS_Volume'] = record['CE']['totalTradedVolume']
+                oi_row['CALLS_IV'] = record['CE']['impliedVolatility']
+                oi_row['CALLS_LTP'] = record['CE']['lastPrice']
+                oi_row['CALLS_Net_Chng'] = record['CE']['change']
+                if oi_mode == 'full':
+                    oi_row['CALLS_Bid_Qty'] = record['CE']['bidQty']
+                    oi_row['CALLS_Bid_Price'] = record['CE']['bidprice']
+                    oi_row['CALLS_Ask_Price'] = record['CE']['askPrice']
+                    oi_row['CALLS_Ask_Qty'] = record['CE']['askQty']
+            except KeyError:
+                oi_row['CALLS_OI'], oi_row['CALLS_Chng_in_OI'], oi_row['CALLS_Volume'], oi_row['CALLS_IV'], oi_row[
+                    'CALLS_LTP'], oi_row['CALLS_Net_Chng'] = 0, 0, 0, 0, 0, 0
+                if oi_mode == 'full':
+                    oi_row['CALLS_Bid_Qty'], oi_row['CALLS_Bid_Price'], oi_row['CALLS_Ask_Price'], oi_row[
+                        'CALLS_Ask_Qty'] = 0, 0, 0, 0
+
+            oi_row['Strike_Price'] = record['strikePrice']
+
+            try:
+                oi_row['PUTS_OI'] = record['PE']['openInterest']
+                oi_row['PUTS_Chng_in_OI'] = record['PE']['changeinOpenInterest']
+                oi_row['PUTS_Volume'] = record['PE']['totalTradedVolume']
+                oi_row['PUTS_IV'] = record['PE']['impliedVolatility']
+                oi_row['PUTS_LTP'] = record['PE']['lastPrice']
+                oi_row['PUTS_Net_Chng'] = record['PE']['change']
+                if oi_mode == 'full':
+                    oi_row['PUTS_Bid_Qty'] = record['PE']['bidQty']
+                    oi_row['PUTS_Bid_Price'] = record['PE']['bidprice']
+                    oi_row['PUTS_Ask_Price'] = record['PE']['askPrice']
+                    oi_row['PUTS_Ask_Qty'] = record['PE']['askQty']
+            except KeyError:
+                oi_row['PUTS_OI'], oi_row['PUTS_Chng_in_OI'], oi_row['PUTS_Volume'], oi_row['PUTS_IV'], oi_row[
+                    'PUTS_LTP'], oi_row['PUTS_Net_Chng'] = 0, 0, 0, 0, 0, 0
+                if oi_mode == 'full':
+                    oi_row['PUTS_Bid_Qty'], oi_row['PUTS_Bid_Price'], oi_row['PUTS_Ask_Price'], oi_row[
+                        'PUTS_Ask_Qty'] = 0, 0, 0, 0
+
+            if oi_data.empty:
+                oi_data = pd.DataFrame([oi_row]).copy()
+            else:
+                oi_data = pd.concat([oi_data, pd.DataFrame([oi_row])], ignore_index=True)
+            oi_data['Symbol'] = symbol
+            oi_data['Fetch_Time'] = payload['records']['timestamp']
+    return oi_data
+
+
+# Kinds of the current bhav schemas as they were typed before categorical and float32 price columns
+_LEGACY_KINDS = {'category': 'str', 'price': 'float'}
+
+
+def legacy_apply_schema(df, schema):
+    """nse_schemas.apply_schema before categorical / float32 columns: every row's date is parsed."""
+    df = df.copy()
+    for column in df.columns:
+        kind = schema.get(column, 'str')
+        kind = _LEGACY_KINDS.get(kind, kind)
+        values = df[column]
+        if kind == 'float':
+            df[column] = pd.to_numeric(values, errors='coerce').astype('float64')
+        elif kind == 'int':
+            df[column] = pd.to_numeric(values, errors='coerce').astype('Int64')
+        elif kind == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = values.astype('string').str.strip()
+                values = pd.to_datetime(values, format=DATE_FORMATS.get(column), errors='coerce')
+            df[column] = values.astype('datetime64[ns]')
+        else:
+            df[column] = values.astype('string')
+    return df
+
+
+def legacy_zipped_bhav_copy(content, schema):
+    """NseUtils equity / fno bhav download before streaming: whole body in memory, inferred csv dtypes."""
+    bhav_df = pd.DataFrame()
+    zip_bhav = zipfile.ZipFile(BytesIO(content), 'r')
+    for file_name in zip_bhav.filelist:
+        if file_name:
+            bhav_df = pd.read_csv(zip_bhav.open(file_name))
+    return legacy_apply_schema(bhav_df, schema)
+
+
+def legacy_history_bars(df, interval):
+    """NSEMasterData.get_history post processing before the vectorized alignment: a regex and a Timestamp.round
+    per bar, then a resample from the first bar. df holds the raw bars (ohlcv_store.BAR_COLUMNS)."""
+
+    def adjust_timestamp(ts):
+        if interval in ['30m', '1h']:
+            num = 15
+        elif interval in ['10m']:
+            num = 5
+        else:
+            num = int(re.match(r'\d+', interval).group())
+        if num == 0:
+            return (ts - timedelta(minutes=num)).round('min')
+        else:
+            return (ts - timedelta(minutes=num)).round((str(num) + 'min'))
+
+    df = df.copy()
+    # Apply cutoff time only for intraday intervals
+    intraday_intervals = ['1m', '3m', '5m', '15m']
+    intraday_consolidate_intervals = ['10m','30m', '1h']
+    if interval in intraday_intervals:
+        cutoff_time = pd.Timestamp('15:30:00').time()
+        df = df[df['TS'].dt.time <= cutoff_time]
+        df['Timestamp'] = df['TS'].apply(adjust_timestamp)
+        df.drop(columns=['TS'], inplace=True)
+        df.set_index('Timestamp', inplace=True, drop=True)
+        return df
+    if interval in intraday_consolidate_intervals:
+        cutoff_time = pd.Timestamp('15:30:00').time()
+        df = df[df['TS'].dt.time <= cutoff_time]
+        df['Timestamp'] = df['TS'].apply(adjust_timestamp)
+        df.drop(columns=['TS'], inplace=True)
+        df.set_index('Timestamp', inplace=True, drop=True)
+        agg_parm = ''
+        if interval == '30m':
+            agg_parm = '30min'
+        elif interval == '10m':
+            agg_parm = '10min'
+        else:
+            agg_parm = '60min'
+        # Get the first timestamp to use as custom origin
+        first_ts = df.index.min()
+        offset_td = pd.to_timedelta(first_ts.time().strftime('%H:%M:%S'))
+        df_aggregated = df.resample(agg_parm, origin='start_day', offset=offset_td).agg({
+            'Open': 'first',
+            'High': 'max',
+            'Low': 'min',
+            'Close': 'last',
+            'Volume': 'sum'
+        })
+        df_aggregated.dropna(inplace=True)
+        return df_aggregated
+
+    df.rename(columns={'TS': 'Timestamp'}, inplace=True)
+    df.set_index('Timestamp', inplace=True, drop=True)
+    return df
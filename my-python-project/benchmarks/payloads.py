@@ -0,0 +1,59 @@
+"""
+Synthetic NSE payloads with the same shape as the live api responses.
+
+Used when no recorded payload is passed to a benchmark. The generators are seeded so every run
+parses exactly the same data.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+
+
+def _side(rng, strike, expiry, underlying, option_type):
+    return {
+        'strikePrice': strike, 'expiryDate': expiry, 'underlying': underlying,
+        'identifier': f'OPTIDX{underlying}{expiry}{option_type}{strike:.2f}',
+        'openInterest': rng.randint(0, 200000), 'changeinOpenInterest': rng.randint(-20000, 20000),
+        'pchangeinOpenInterest': round(rng.uniform(-50, 50), 2), 'totalTradedVolume': rng.randint(0, 5000000),
+        'impliedVolatility': round(rng.uniform(5, 60), 2), 'lastPrice': round(rng.uniform(0.05, 2000), 2),
+        'change': round(rng.uniform(-300, 300), 2), 'pChange': round(rng.uniform(-90, 300), 2),
+        'totalBuyQuantity': rng.randint(0, 500000), 'totalSellQuantity': rng.randint(0, 500000),
+        'bidQty': rng.randint(0, 5000), 'bidprice': round(rng.uniform(0.05, 2000), 2),
+        'askQty': rng.randint(0, 5000), 'askPrice': round(rng.uniform(0.05, 2000), 2),
+        'underlyingValue': 19500.0,
+    }
+
+
+def option_chain_payload(symbol='NIFTY', expiries=10, strikes_per_expiry=150, missing_ratio=0.05, seed=7):
+    """
+    Build an api/option-chain-indices style payload.
+    :param expiries: number of expiry dates
+    :param strikes_per_expiry: number of strikes of every expiry
+    :param missing_ratio: share of strikes without a CE or PE quote
+    :return: dict
+    """
+    rng = random.Random(seed)
+    first_expiry = datetime(2023, 6, 29)
+    expiry_dates = [(first_expiry + timedelta(weeks=week)).strftime('%d-%b-%Y') for week in range(expiries)]
+    data = []
+    for expiry in expiry_dates:
+        for step in range(strikes_per_expiry):
+            strike = 15000 + 50 * step
+            record = {'strikePrice': strike, 'expiryDate': expiry}
+            if rng.random() >= missing_ratio:
+                record['CE'] = _side(rng, strike, expiry, symbol, 'CE')
+            if rng.random() >= missing_ratio:
+                record['PE'] = _side(rng, strike, expiry, symbol, 'PE')
+            data.append(record)
+    return {
+        'records': {'expiryDates': expiry_dates, 'data': data, 'timestamp': '23-Jun-2023 15:30:00',
+                    'underlyingValue': 19500.0, 'strikePrices': sorted({r['strikePrice'] for r in data})},
+        'filtered': {'data': [], 'CE': {}, 'PE': {}},
+    }
+
+
+def load_payload(path):
+    """Load a recorded json payload."""
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,375 @@
+"""
+Benchmark suite of the nsedata hot paths, replayed from recorded fixtures.
+
+    python -m benchmarks.suite [--fixtures DIR] [--symbols 2000] [--output results.json]
+                               [--baseline previous.json] [--tolerance 0.2] [--only history]
+
+Cases:
+    option_chain_parse     get_live_option_chain parsing of the recorded NIFTY chain
+    bhav_equity / bhav_fno bhav copy unzip, parse and typing (equity_bhav_copy / fno_bhav_copy)
+    bhav_<report>_legacy   the same bhav copy through the previous in memory, inferred dtype parser
+    history_<interval>     NSEMasterData.get_history post processing of 1m bars and the 10m / 30m / 1h resampling
+    history_<interval>_legacy  the same history through the previous per bar alignment and resample
+    positional_<interval>  nsepostionaldata.get_positional_index_data candle building for 1d / 1w / 1m
+    screener / backtester  stock_screener.process_stock / backtester.process_stock_for_backtest over the universe
+    symbol_index_build     symbol_index.SymbolIndex of a synthetic NFO sized master, with its n-gram postings
+    symbol_exact / _search exact and substring symbol lookups on that index (symbol_*_legacy: pandas scans)
+
+Requests are answered by a nse_replay.ReplayAdapter, so the timings cover the client code only (no network,
+no rate limiting). Without --fixtures, synthetic fixtures are recorded once to ~/.nsedata/benchmarks.
+
+Every case reports the best wall time of --repeat runs, the throughput in items per second and the peak
+memory traced (tracemalloc) during one extra run. Results are written as json. With --baseline, a case whose
+throughput dropped or whose peak memory grew by more than --tolerance is reported and the exit code is 1.
+Cases that have a <case>_legacy counterpart also report the speedup and peak memory saved against it.
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from benchmarks import fixtures
+from benchmarks.legacy import legacy_history_bars, legacy_zipped_bhav_copy
+import backtester
+import nsepostionaldata
+import stock_screener
+from NSEMasterData import NSEMasterData
+from NseUtility import NseUtils
+from nse_replay import FixtureStore, ReplayAdapter
+from nse_schemas import BHAV_SCHEMAS
+from nse_storage import data_dir
+from symbol_index import SymbolIndex
+
+
+class StoredIndexHistory:
+    """Serves get_index_historic_data from one recorded frame, in place of the NseUtils of nsepostionaldata."""
+
+    def __init__(self, df):
+        self.df = df
+        self._dates = pd.to_datetime(df['TIMESTAMP'], format='%d-%b-%Y')
+
+    def get_index_historic_data(self, index, from_date=None, to_date=None, max_workers=8):
+        keep = (self._dates >= datetime.strptime(from_date, '%d-%m-%Y')) & \
+               (self._dates <= datetime.strptime(to_date, '%d-%m-%Y'))
+        return self.df[keep.to_numpy()].reset_index(drop=True)
+
+
+class Context:
+    """Clients and scenario shared by the cases, built once per run"""
+
+    def __init__(self, folder):
+        self.store = FixtureStore(folder)
+        self.plan = fixtures.load_scenario(folder)
+        self.end = datetime.fromisoformat(self.plan['end'])
+        self.daily_start = datetime.fromisoformat(self.plan['daily_start'])
+        self.intraday_start = datetime.fromisoformat(self.plan['intraday_start'])
+        # No local store: every case reads the recorded responses, and nothing is written to ~/.nsedata
+        self.master = NSEMasterData(adapter=ReplayAdapter(self.store), master_cache=False, history_store=False)
+        self.master.download_symbol_master()
+        self.universe = fixtures.universe(self.master, self.plan['symbols'])
+        self.nse = NseUtils(bhav_archive=False, index_store=False, filings_store=False, high_low_store=False,
+                            index_membership=False, adapter=ReplayAdapter(self.store))
+        # Replayed pages set no cookies, so the session stays primed from this recorded home page on
+        self.nse.nse_session.prime()
+
+
+# ---------------------------------------------------------------------- #
+#  Cases: case(ctx) -> (function to time, number of items, unit)
+# ---------------------------------------------------------------------- #
+
+def case_option_chain_parse(ctx):
+    key = FixtureStore.key('GET', NseUtils._option_chain_url('NIFTY', True))
+    payload = json.loads(ctx.store.load(key)[2])
+    return (lambda: NseUtils._parse_live_option_chain(payload, 'NIFTY'), len(payload['records']['data']), 'rows')
+
+
+def _bhav_case(report):
+    def case(ctx):
+        fetch = getattr(ctx.nse, f"{report}_bhav_copy")
+        return lambda: fetch(ctx.plan['bhav_date']), len(fetch(ctx.plan['bhav_date'])), 'rows'
+    return case
+
+
+ARCHIVES = 'https://nsearchives.nseindia.com'
+
+
+def _legacy_bhav_case(report, url):
+    def case(ctx):
+        trade_date = datetime.strptime(ctx.plan['bhav_date'], '%d-%m-%Y')
+        content = ctx.store.load(FixtureStore.key('GET', url + f"{trade_date:%Y%m%d}_F_0000.csv.zip"))[2]
+        run = lambda: legacy_zipped_bhav_copy(content, BHAV_SCHEMAS[report])
+        return run, len(run()), 'rows'
+    return case
+
+
+def _history_case(interval, legacy=False):
+    def case(ctx):
+        symbol = ctx.universe[fixtures.HISTORY_SYMBOL_INDEX]
+        master = ctx.master
+        if legacy:
+            # Same client and requests, only the post processing of the bars differs
+            master = copy.copy(ctx.master)
+            master._shape_history = legacy_history_bars
+        run = lambda: master.get_history(symbol, 'NSE', ctx.intraday_start, ctx.end, interval)
+        return run, len(run()), 'bars'
+    return case
+
+
+def _positional_case(interval, limit):
+    def case(ctx):
+        history = ctx.nse.get_index_historic_data(fixtures.INDEX_NAME, ctx.plan['index_from'], ctx.plan['index_to'])
+        stored = StoredIndexHistory(history)
+        day_before = (datetime.today() - ctx.end).days
+
+        def run():
+            nse, nsepostionaldata.nse = nsepostionaldata.nse, stored
+            try:
+                return nsepostionaldata.get_positional_index_data(fixtures.INDEX_NAME, interval, limit, day_before)
+            finally:
+                nsepostionaldata.nse = nse
+        return run, len(run()), 'candles'
+    return case
+
+
+def case_screener(ctx):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [stock_screener.process_stock(stock, ctx.master, ctx.daily_start, ctx.end)
+                    for stock in ctx.universe]
+    return run, len(ctx.universe), 'symbols'
+
+
+def case_backtester(ctx):
+    sessions = pd.bdate_range(ctx.end - timedelta(days=10), ctx.end.date())[-5:][::-1]
+    backtest_days = [day.to_pydatetime() for day in sessions]
+
+    def run():
+        return [backtester.process_stock_for_backtest(stock, ctx.master, ctx.daily_start, ctx.end, backtest_days)
+                for stock in ctx.universe]
+    return run, len(ctx.universe), 'symbols'
+
+
+# Contracts of the synthetic master of the symbol cases, about the size of the NSE FO master
+MASTER_SIZE = 80_000
+SYMBOL_QUERIES = 50
+
+
+def symbol_master(size=MASTER_SIZE, seed=7):
+    """Seeded master of futures and options symbols in the GetFOMasters layout, eg: 'ABC24JUL1200CE'"""
+    rng = np.random.default_rng(seed)
+    underlyings = np.array([''.join(rng.choice(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'), rng.integers(3, 11)))
+                            for _ in range(200)], dtype=object)
+    symbols = underlyings[rng.integers(0, len(underlyings), size)] + \
+        np.array(['24JUL', '24AUG', '24SEP'], dtype=object)[rng.integers(0, 3, size)] + \
+        (rng.integers(10, 3000, size) * 10).astype(str).astype(object) + \
+        np.array(['CE', 'PE'], dtype=object)[rng.integers(0, 2, size)]
+    return pd.DataFrame({'ScripCode': np.arange(size).astype(str), 'Symbol': symbols, 'Name': symbols,
+                         'Type': 'OPTSTK'})
+
+
+def _symbol_queries(master, exact):
+    """Seeded queries: full symbols, or fragments of 3 to 12 characters of them"""
+    rng = np.random.default_rng(11)
+    symbols = master['Symbol'].to_numpy()[rng.integers(0, len(master), SYMBOL_QUERIES)]
+    if exact:
+        return [symbol.lower() for symbol in symbols]
+    return [symbol[:int(size)] if number % 2 else symbol[-int(size):]
+            for number, (symbol, size) in enumerate(zip(symbols, rng.integers(3, 13, SYMBOL_QUERIES)))]
+
+
+def case_symbol_index_build(ctx):
+    master = symbol_master()
+
+    def run():
+        index = SymbolIndex(master)
+        index.search('ABC')
+        return index
+    return run, len(master), 'symbols'
+
+
+def _symbol_case(exact, legacy=False):
+    def case(ctx):
+        master = symbol_master()
+        index = SymbolIndex(master)
+        index.search('ABC')
+        queries = _symbol_queries(master, exact)
+        if legacy:
+            # The scans NSEMasterData.search ran before the index
+            symbols = master['Symbol']
+            if exact:
+                run = lambda: [np.flatnonzero(symbols.str.upper() == query.upper()) for query in queries]
+            else:
+                run = lambda: [np.flatnonzero(symbols.str.contains(query, case=False, na=False)) for query in queries]
+        else:
+            # Row positions on both sides, the frame of the rows (master.iloc) costs the same either way
+            run = lambda: [index.exact(query) if exact else index.search(query) for query in queries]
+        return run, len(queries), 'queries'
+    return case
+
+
+CASES = {
+    'option_chain_parse': case_option_chain_parse,
+    'bhav_equity': _bhav_case('equity'),
+    'bhav_fno': _bhav_case('fno'),
+    'bhav_equity_legacy': _legacy_bhav_case('equity', ARCHIVES + '/content/cm/BhavCopy_NSE_CM_0_0_0_'),
+    'bhav_fno_legacy': _legacy_bhav_case('fno', ARCHIVES + '/content/fo/BhavCopy_NSE_FO_0_0_0_'),
+    'history_1m': _history_case('1m'),
+    'history_10m': _history_case('10m'),
+    'history_30m': _history_case('30m'),
+    'history_1h': _history_case('1h'),
+    'history_1m_legacy': _history_case('1m', legacy=True),
+    'history_10m_legacy': _history_case('10m', legacy=True),
+    'history_30m_legacy': _history_case('30m', legacy=True),
+    'history_1h_legacy': _history_case('1h', legacy=True),
+    'positional_1d': _positional_case('1d', 500),
+    'positional_1w': _positional_case('1w', 100),
+    'positional_1m': _positional_case('1m', 36),
+    'screener': case_screener,
+    'backtester': case_backtester,
+    'symbol_index_build': case_symbol_index_build,
+    'symbol_exact': _symbol_case(True),
+    'symbol_exact_legacy': _symbol_case(True, legacy=True),
+    'symbol_search': _symbol_case(False),
+    'symbol_search_legacy': _symbol_case(False, legacy=True),
+}
+
+# Cases that take seconds per run are timed fewer times
+HEAVY_CASES = ('screener', 'backtester')
+
+
+def measure(func, items, unit, repeat=5, memory=True):
+    """
+    Time a function and trace its peak memory
+    :return: dict with items, unit, seconds (best), median_seconds, throughput (items / second) and peak_mb
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    result = {
+        'items': items, 'unit': unit, 'seconds': min(timings), 'median_seconds': statistics.median(timings),
+        'throughput': items / min(timings) if min(timings) else None, 'peak_mb': None,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_suite(folder, names=None, repeat=5, memory=True):
+    """
+    Run the cases on a fixture folder
+    :param names: Optional. case names (or name prefixes) to run, defaults to all
+    :return: results dict as written to json
+    """
+    ctx = Context(folder)
+    selected = [name for name in CASES if not names or any(name.startswith(prefix) for prefix in names)]
+    results = {}
+    for name in selected:
+        func, items, unit = CASES[name](ctx)
+        results[name] = measure(func, items, unit, 1 if name in HEAVY_CASES else repeat, memory)
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'platform': platform.platform(), 'fixtures': str(folder), 'scenario': ctx.plan,
+        },
+        'results': results,
+        'comparisons': comparisons(results),
+    }
+
+
+def comparisons(results):
+    """
+    Current cases against their <case>_legacy counterpart run in the same suite
+    :return: dict of case -> speedup (legacy seconds / seconds), peak_mb_saved and peak_ratio (legacy / current)
+    """
+    compared = {}
+    for name, result in results.items():
+        legacy = results.get(f"{name}_legacy")
+        if not legacy:
+            continue
+        entry = {'speedup': legacy['seconds'] / result['seconds'] if result['seconds'] else None,
+                 'peak_mb_saved': None, 'peak_ratio': None}
+        if result['peak_mb'] is not None and legacy['peak_mb'] is not None:
+            entry['peak_mb_saved'] = legacy['peak_mb'] - result['peak_mb']
+            entry['peak_ratio'] = legacy['peak_mb'] / result['peak_mb'] if result['peak_mb'] else None
+        compared[name] = entry
+    return compared
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Regressions of current against a baseline result file
+    :return: list of messages, empty when nothing regressed
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        if previous.get('throughput') and result['throughput'] is not None and \
+                result['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:,.0f} < {previous['throughput']:,.0f} "
+                               f"{result['unit']}/s")
+        if previous.get('peak_mb') and result['peak_mb'] is not None and \
+                result['peak_mb'] > previous['peak_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {result['peak_mb']:.1f} > {previous['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the nsedata hot paths on recorded fixtures')
+    parser.add_argument('--fixtures', help='fixture folder, synthetic fixtures are recorded when it has none')
+    parser.add_argument('--symbols', type=int, default=2000, help='universe size of new synthetic fixtures')
+    parser.add_argument('--only', nargs='*', help='case names or prefixes, eg: history bhav_fno')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--output', help='write the results json here')
+    parser.add_argument('--baseline', help='results json to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    folder = args.fixtures or data_dir('benchmarks') / f"synthetic_{args.symbols}"
+    if not (FixtureStore(folder).folder / 'scenario.json').exists():
+        print(f"Recording synthetic fixtures for {args.symbols} symbols to {folder} ...")
+        fixtures.record_fixtures(folder, args.symbols)
+
+    results = run_suite(folder, args.only, args.repeat, not args.no_memory)
+    for name, result in results['results'].items():
+        peak = f"{result['peak_mb']:8.1f} MB" if result['peak_mb'] is not None else ''
+        print(f"{name:20s} {result['seconds'] * 1000:10.2f} ms {result['throughput']:14,.0f} {result['unit']}/s "
+              f"{peak}")
+    for name, entry in results['comparisons'].items():
+        saved = f", peak memory {entry['peak_mb_saved']:.1f} MB lower ({entry['peak_ratio']:.1f}x)" \
+            if entry['peak_mb_saved'] is not None else ''
+        print(f"{name:20s} {entry['speedup']:.1f}x faster than legacy{saved}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,538 @@
+"""
+    * ASYNC NSE UTILITY *
+
+    Description: asyncio counterpart of NseUtility.NseUtils built on httpx.AsyncClient. It exposes the same
+    method surface (as coroutines) plus batch helpers that fan out over many symbols / indices concurrently
+    under a configurable concurrency limit, e.g.
+
+        async with AsyncNseUtils(max_concurrency=10) as nse:
+            frames = await nse.get_index_details_many(NseUtils.equity_market_list)
+
+    Parsing is shared with NseUtils, so both clients return identical frames for the same payload.
+    Bhav copies and the local stores (filings, 52 week high / low, index membership) are served by a blocking
+    NseUtils in a worker thread.
+
+    Disclaimer : This utility is meant for educational purposes only. Downloading data from NSE
+    website requires explicit approval from the exchange. Hence, the usage of this utility is for
+    limited purposes only under proper/explicit approvals.
+
+    Requirements : Following packages are to be installed (using pip) prior to using this utility
+    - pandas
+    - httpx
+    - python 3.8 and above
+
+"""
+
+import asyncio
+import time
+import httpx
+import pandas as pd
+from urllib.parse import urlsplit
+from NseUtility import IndexSnapshot, NseUtils
+from nse_metrics import default_metrics, endpoint_of
+from nse_rate_limit import default_limiter, retry_after
+from nse_replay import rebase_url
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """httpx transport that sends every request through a nse_rate_limit.RateLimiter."""
+
+    def __init__(self, limiter=None, transport=None, metrics=None):
+        """
+        :param limiter: Optional. RateLimiter, defaults to the limiter shared by all NSE clients
+        :param transport: Optional. Transport doing the actual I/O
+        :param metrics: Optional. nse_metrics.Metrics recording every request, defaults to the shared one
+        """
+        self.limiter = limiter or default_limiter()
+        self.metrics = metrics or default_metrics()
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def _send(self, request, endpoint):
+        """One attempt, timed until the body is downloaded"""
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+            content = await response.aread()
+        except (httpx.ConnectError, httpx.TimeoutException):
+            self.metrics.observe_request(endpoint, 'error', time.perf_counter() - start, 0)
+            raise
+        self.metrics.observe_request(endpoint, response.status_code, time.perf_counter() - start, len(content))
+        return response
+
+    async def handle_async_request(self, request):
+        host = request.url.host
+        endpoint = endpoint_of(str(request.url))
+        attempt = 0
+        while True:
+            delay = self.limiter.reserve(host)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                response = await self._send(request, endpoint)
+            except (httpx.ConnectError, httpx.TimeoutException):
+                if attempt >= self.limiter.max_retries:
+                    self.limiter.record_failure(host)
+                    raise
+                self.limiter.backoff(host, attempt)
+                self.metrics.observe_retry(endpoint)
+                attempt += 1
+                continue
+
+            if not self.limiter.should_retry(response.status_code, attempt):
+                if response.status_code in self.limiter.retry_status_codes:
+                    self.limiter.record_failure(host)
+                return response
+            self.limiter.backoff(host, attempt, retry_after(response))
+            self.metrics.observe_retry(endpoint)
+            await response.aclose()
+            attempt += 1
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class AsyncNseUtils:
+    equity_market_list = NseUtils.equity_market_list
+    pre_market_list = NseUtils.pre_market_list
+    most_active_endpoints = NseUtils.most_active_endpoints
+
+    home_url = 'https://www.nseindia.com'
+    cookie_host = 'www.nseindia.com'
+    refresh_status_codes = (401, 403)
+
+    def __init__(self, max_concurrency=10, timeout=15, index_snapshot_ttl=30, limiter=None, base_url=None):
+        """
+        :param max_concurrency: Maximum number of requests in flight at any time
+        :param timeout: Per request timeout in seconds
+        :param limiter: Optional. nse_rate_limit.RateLimiter, defaults to the limiter shared by all NSE clients
+        :param index_snapshot_ttl: Seconds the allIndices payload behind the index ratio views is reused for
+        :param base_url: Optional. Send every request to this server instead of NSE, eg: a nse_standin.NseStandIn
+        """
+        self.base_url = base_url
+        self.headers = dict(NseUtils.default_headers)
+        self.max_concurrency = max_concurrency
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        self.transport = AsyncRateLimitedTransport(limiter, httpx.AsyncHTTPTransport(limits=limits))
+        self.metrics = self.transport.metrics
+        self.client = httpx.AsyncClient(headers=self.headers, timeout=timeout, follow_redirects=True,
+                                        transport=self.transport)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._prime_lock = asyncio.Lock()
+        self._primed = False
+        self._cookie_expiry = None
+        self._sync = None
+        self._index_snapshot = IndexSnapshot(ttl=index_snapshot_ttl)
+        self._index_snapshot_lock = asyncio.Lock()
+        self.metrics.register_cache('index_snapshot', self._index_snapshot.stats, misses='fetches')
+        self.metrics.register_cache('cookies', self.session_stats, 'priming_saved', 'priming_requests')
+
+        self.priming_requests = 0
+        self.priming_saved = 0
+        self.cookie_refreshes = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    # ------------------------------------------------------------------ #
+    #  HTTP plumbing
+    # ------------------------------------------------------------------ #
+
+    async def prime(self, ref_url=None):
+        """
+        Harvest fresh NSE cookies by visiting a web page
+        :param ref_url: Optional. Page to visit, defaults to the NSE home page
+        :return: None
+        """
+        await self.client.get(rebase_url(ref_url or self.home_url, self.base_url))
+        expiries = [c.expires for c in self.client.cookies.jar if c.expires and 'nseindia.com' in c.domain]
+        self._cookie_expiry = min(expiries) if expiries else None
+        self._primed = True
+        self.priming_requests += 1
+
+    async def _ensure_primed(self, ref_url):
+        async with self._prime_lock:
+            if not self._primed:
+                await self.prime(ref_url)
+            elif self._cookie_expiry is not None and time.time() >= self._cookie_expiry:
+                self.cookie_refreshes += 1
+                await self.prime(ref_url)
+            elif ref_url:
+                self.priming_saved += 1
+
+    async def _get(self, url, ref_url=None):
+        """
+        GET a NSE url, priming / refreshing cookies only when required. At most max_concurrency
+        requests are in flight at any time.
+        :return: httpx.Response
+        """
+        async with self._semaphore:
+            needs_cookies = urlsplit(url).hostname == self.cookie_host
+            url = rebase_url(url, self.base_url)
+            if not needs_cookies:
+                return await self.client.get(url)
+
+            await self._ensure_primed(ref_url)
+            response = await self.client.get(url)
+            if response.status_code in self.refresh_status_codes:
+                async with self._prime_lock:
+                    self.cookie_refreshes += 1
+                    await self.prime(ref_url)
+                response = await self.client.get(url)
+            return response
+
+    def session_stats(self):
+        """
+        Returns the cookie priming counters of this client
+        :return: dict
+        """
+        return {
+            'priming_requests': self.priming_requests,
+            'priming_saved': self.priming_saved,
+            'cookie_refreshes': self.cookie_refreshes,
+            'rate_limit': self.transport.limiter.stats(),
+        }
+
+    def stats(self):
+        """
+        Per endpoint request metrics and cache hit ratios (shared by all clients using the same metrics)
+        :return: dict, see nse_metrics.Metrics.stats
+        """
+        return self.metrics.stats()
+
+    @staticmethod
+    async def _gather_map(keys, make_coro):
+        """
+        Run make_coro(key) for every key concurrently and return {key: result}. A key that fails
+        maps to None, so one bad symbol does not sink the whole batch.
+        """
+        keys = list(keys)
+        results = await asyncio.gather(*(make_coro(key) for key in keys), return_exceptions=True)
+        output = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching data for {key}: {result}")
+                result = None
+            output[key] = result
+        return output
+
+    def _sync_client(self):
+        # Archive (bhav copy) downloads and the local stores (filings, 52 week high / low, index membership) go
+        # through the blocking client in a worker thread
+        if self._sync is None:
+            self._sync = NseUtils(base_url=self.base_url)
+        return self._sync
+
+    # ------------------------------------------------------------------ #
+    #  Batch helpers
+    # ------------------------------------------------------------------ #
+
+    async def get_index_details_many(self, categories, list_only=False):
+        """
+        Fetch the constituents of many indices concurrently
+        :param categories: iterable of index names, eg: NseUtils.equity_market_list
+        :param list_only: If True, the symbol lists are returned instead of dataframes
+        :return: dict of index name -> DataFrame (or list)
+        """
+        return await self._gather_map(categories, lambda category: self.get_index_details(category, list_only))
+
+    async def equity_info_many(self, symbols):
+        """
+        :return: dict of symbol -> equity_info dict
+        """
+        return await self._gather_map(symbols, self.equity_info)
+
+    async def price_info_many(self, symbols):
+        """
+        :return: dict of symbol -> price_info dict
+        """
+        return await self._gather_map(symbols, self.price_info)
+
+    async def get_option_chain_many(self, symbols, indices=False):
+        """
+        :return: dict of symbol -> option chain DataFrame
+        """
+        return await self._gather_map(symbols, lambda symbol: self.get_option_chain(symbol, indices))
+
+    async def get_live_option_chain_many(self, symbols, expiry_date=None, oi_mode="full", indices=False,
+                                         as_array=False):
+        """
+        :return: dict of symbol -> live option chain DataFrame (or numpy structured array with as_array=True)
+        """
+        return await self._gather_map(
+            symbols, lambda symbol: self.get_live_option_chain(symbol, expiry_date, oi_mode, indices, as_array))
+
+    # ------------------------------------------------------------------ #
+    #  NseUtils method surface
+    # ------------------------------------------------------------------ #
+
+    async def pre_market_info(self, category='All'):
+        ref_url = 'https://www.nseindia.com/market-data/pre-open-market-cm-and-emerge-market'
+        url = f"https://www.nseindia.com/api/market-data-pre-open?key={NseUtils.pre_market_xref[category]}"
+        response = await self._get(url, ref_url)
+        return NseUtils._parse_pre_market(response.json())
+
+    async def get_index_details(self, category, list_only=False):
+        url, ref_url = NseUtils._index_details_urls(category)
+        response = await self._get(url, ref_url)
+        df = NseUtils._parse_index_details(response.json())
+        store = self._sync_client().index_membership
+        if store is not None:
+            await asyncio.to_thread(store.update, category.upper(), df.index[1:])
+        return sorted(df.index[1:].tolist()) if list_only else df
+
+    async def get_index_universe(self, indices, as_of=None):
+        return await asyncio.to_thread(self._sync_client().get_index_universe, indices, as_of)
+
+    async def get_symbol_indices(self, symbol):
+        return await asyncio.to_thread(self._sync_client().get_symbol_indices, symbol)
+
+    async def clearing_holidays(self, list_only=False):
+        response = await self._get('https://www.nseindia.com/api/holiday-master?type=clearing')
+        return NseUtils._parse_holidays(response.json(), list_only)
+
+    async def trading_holidays(self, list_only=False):
+        response = await self._get('https://www.nseindia.com/api/holiday-master?type=trading')
+        return NseUtils._parse_holidays(response.json(), list_only)
+
+    async def calendar(self):
+        """NSE trading calendar of the blocking client, built (or refreshed) in a worker thread"""
+        return await asyncio.to_thread(lambda: self._sync_client().calendar)
+
+    async def is_nse_trading_holiday(self, date_str=None):
+        date_obj = NseUtils._holiday_date(date_str)
+        return None if date_obj is None else (await self.calendar()).is_trading_holiday(date_obj)
+
+    async def is_nse_clearing_holiday(self, date_str=None):
+        date_obj = NseUtils._holiday_date(date_str)
+        return None if date_obj is None else (await self.calendar()).is_clearing_holiday(date_obj)
+
+    async def equity_info(self, symbol):
+        symbol = symbol.replace(' ', '%20').replace('&', '%26')
+        ref_url = 'https://www.nseindia.com/get-quotes/equity?symbol=' + symbol
+        url = 'https://www.nseindia.com/api/quote-equity?symbol=' + symbol
+        # Primary details and the 'Trade Information' tab are independent, fetch them together
+        data, trade_data = await asyncio.gather(self._get(url, ref_url),
+                                                self._get(url + "&section=trade_info", ref_url))
+        data = data.json()
+        data['tradeData'] = trade_data.json()
+        return data
+
+    async def price_info(self, symbol):
+        symbol = symbol.replace(' ', '%20').replace('&', '%26')
+        ref_url = 'https://www.nseindia.com/get-quotes/equity?symbol=' + symbol
+        url = 'https://www.nseindia.com/api/quote-equity?symbol=' + symbol
+        response = await self._get(url, ref_url)
+        return NseUtils._parse_price_info(symbol, response.json())
+
+    async def futures_data(self, symbol, indices=False):
+        symbol = symbol.replace(' ', '%20').replace('&', '%26')
+        ref_url = 'https://www.nseindia.com/get-quotes/derivatives?symbol=' + symbol
+        url = 'https://www.nseindia.com/api/quote-derivative?symbol=' + symbol
+        response = await self._get(url, ref_url)
+        return NseUtils._parse_futures_data(response.json(), indices)
+
+    async def get_option_chain(self, symbol, indices=False):
+        symbol = symbol.replace(' ', '%20').replace('&', '%26')
+        ref_url = 'https://www.nseindia.com/get-quotes/derivatives?symbol=' + symbol
+        response = await self._get(NseUtils._option_chain_url(symbol, indices), ref_url)
+        return NseUtils._parse_option_chain(response.json()["records"])
+
+    async def get_52week_high_low(self, stock=None):
+        return await asyncio.to_thread(self._sync_client().get_52week_high_low, stock)
+
+    async def fno_bhav_copy(self, trade_date: str = ""):
+        return await asyncio.to_thread(self._sync_client().fno_bhav_copy, trade_date)
+
+    async def bhav_copy_with_delivery(self, trade_date: str):
+        return await asyncio.to_thread(self._sync_client().bhav_copy_with_delivery, trade_date)
+
+    async def equity_bhav_copy(self, trade_date: str):
+        return await asyncio.to_thread(self._sync_client().equity_bhav_copy, trade_date)
+
+    async def bhav_copy_indices(self, trade_date: str):
+        return await asyncio.to_thread(self._sync_client().bhav_copy_indices, trade_date)
+
+    async def equity_bhav_copy_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        return await asyncio.to_thread(self._sync_client().equity_bhav_copy_range, from_date, to_date, max_workers)
+
+    async def fno_bhav_copy_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        return await asyncio.to_thread(self._sync_client().fno_bhav_copy_range, from_date, to_date, max_workers)
+
+    async def bhav_copy_with_delivery_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        return await asyncio.to_thread(self._sync_client().bhav_copy_with_delivery_range, from_date, to_date,
+                                       max_workers)
+
+    async def bhav_copy_indices_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        return await asyncio.to_thread(self._sync_client().bhav_copy_indices_range, from_date, to_date,
+                                       max_workers)
+
+    async def fii_dii_activity(self):
+        response = await self._get("https://www.nseindia.com/api/fiidiiTradeReact")
+        return NseUtils._parse_fii_dii(response.json())
+
+    async def get_live_option_chain(self, symbol: str, expiry_date: str = None, oi_mode: str = "full",
+                                    indices=False, as_array=False):
+        symbol = symbol.replace(' ', '%20').replace('&', '%26')
+        ref_url = 'https://www.nseindia.com/option-chain'
+        response = await self._get(NseUtils._option_chain_url(symbol, indices), ref_url)
+        return NseUtils._parse_live_option_chain(response.json(), symbol, expiry_date, oi_mode, as_array)
+
+    async def get_market_depth(self, symbol):
+        data = await self.equity_info(symbol)
+        return {
+            'ask': data['tradeData']['marketDeptOrderBook']['ask'],
+            'bid': data['tradeData']['marketDeptOrderBook']['bid']
+        }
+
+    async def get_index_data(self, index: str, from_date: str, to_date: str):
+        url, ref_url = NseUtils._index_data_urls(index, from_date, to_date)
+        response = await self._get(url, ref_url)
+        return NseUtils._parse_index_data(response.json())
+
+    async def get_index_historic_data(self, index: str, from_date: str = None, to_date: str = None):
+        # Only the windows missing from the local index history store are requested, all at once
+        sync = self._sync_client()
+        windows, ranges = await asyncio.to_thread(sync._index_history_plan, index, from_date, to_date)
+        frames = await asyncio.gather(*(self.get_index_data(index, start, end) for start, end in windows))
+        return await asyncio.to_thread(sync._index_history_merge, index, from_date, to_date, list(frames), ranges)
+
+    async def get_equity_full_list(self, list_only=False):
+        response = await self._get("https://archives.nseindia.com/content/equities/EQUITY_L.csv")
+        if response.status_code != 200:
+            raise FileNotFoundError(f" No data equity list available")
+        return NseUtils._parse_equity_full_list(response.content, list_only)
+
+    async def get_fno_full_list(self, list_only=False):
+        ref_url = 'https://www.nseindia.com/products-services/equity-derivatives-list-underlyings-information'
+        response = await self._get("https://www.nseindia.com/api/underlying-information", ref_url)
+        if response.status_code != 200:
+            raise FileNotFoundError("Resource not available for fno_equity_list")
+        return NseUtils._parse_fno_full_list(response.json(), list_only)
+
+    async def get_gainers_losers(self):
+        ref_url = 'https://www.nseindia.com/market-data/top-gainers-losers'
+        gainers, losers = await asyncio.gather(
+            self._get('https://www.nseindia.com/api/live-analysis-variations?index=gainers', ref_url),
+            self._get('https://www.nseindia.com/api/live-analysis-variations?index=loosers', ref_url))
+        if gainers.status_code != 200 or losers.status_code != 200:
+            raise FileNotFoundError("Resource not available for gainers / losers")
+        return NseUtils._parse_gainers_losers(gainers.json(), losers.json())
+
+    # Filings are served from the FilingsStore of the blocking client, which syncs the missing days only
+
+    async def get_corporate_action(self, from_date_str: str = None, to_date_str: str = None, filter: str = None):
+        return await asyncio.to_thread(self._sync_client().get_corporate_action, from_date_str, to_date_str, filter)
+
+    async def get_corporate_announcement(self, from_date_str: str = None, to_date_str: str = None):
+        return await asyncio.to_thread(self._sync_client().get_corporate_announcement, from_date_str, to_date_str)
+
+    async def sync_filings(self, feeds=None):
+        return await asyncio.to_thread(self._sync_client().sync_filings, feeds)
+
+    async def query_filings(self, feed, from_date: str = None, to_date: str = None, symbol=None, purpose: str = None):
+        return await asyncio.to_thread(self._sync_client().query_filings, feed, from_date, to_date, symbol, purpose)
+
+    async def index_snapshot(self, refresh=False):
+        """
+        The shared allIndices snapshot, downloaded again when older than index_snapshot_ttl
+        :return: IndexSnapshot
+        """
+        async with self._index_snapshot_lock:
+            if refresh or self._index_snapshot.is_stale():
+                response = await self._get(IndexSnapshot.url, IndexSnapshot.ref_url)
+                self._index_snapshot.update(response.json())
+        return self._index_snapshot
+
+    async def _all_indices_view(self, view):
+        try:
+            return view(await self.index_snapshot())
+        except Exception:
+            print("Error fetching allIndices Data. Check your input")
+            return None
+
+    async def get_index_pe_ratio(self):
+        return await self._all_indices_view(IndexSnapshot.pe_ratio)
+
+    async def get_index_pb_ratio(self):
+        return await self._all_indices_view(IndexSnapshot.pb_ratio)
+
+    async def get_index_div_yield(self):
+        return await self._all_indices_view(IndexSnapshot.div_yield)
+
+    async def get_advance_decline(self):
+        return await self._all_indices_view(IndexSnapshot.advance_decline)
+
+    async def _most_active(self, kind):
+        try:
+            url, key = self.most_active_endpoints[kind]
+            response = await self._get(url, NseUtils._most_active_ref_url(kind))
+            return NseUtils._parse_data_list(response.json(), key)
+        except Exception:
+            print("Error fetching most active data. Check your input")
+            return None
+
+    async def most_active_snapshot(self, kinds=None):
+        """
+        :return: dict of kind -> pandas.DataFrame (None if that variant failed), all with the same Fetch_Time
+        """
+        kinds = NseUtils._most_active_kinds(kinds)
+        fetch_time = pd.Timestamp.now()
+        frames = await asyncio.gather(*(self._most_active(kind) for kind in kinds))
+        return {kind: NseUtils._typed_frame(frame, fetch_time) for kind, frame in zip(kinds, frames)}
+
+    async def most_active_equity_stocks_by_volume(self):
+        return await self._most_active('equity_stocks_by_volume')
+
+    async def most_active_equity_stocks_by_value(self):
+        return await self._most_active('equity_stocks_by_value')
+
+    async def most_active_index_calls(self):
+        return await self._most_active('index_calls')
+
+    async def most_active_index_puts(self):
+        return await self._most_active('index_puts')
+
+    async def most_active_stock_calls(self):
+        return await self._most_active('stock_calls')
+
+    async def most_active_stock_puts(self):
+        return await self._most_active('stock_puts')
+
+    async def most_active_contracts_by_oi(self):
+        return await self._most_active('contracts_by_oi')
+
+    async def most_active_contracts_by_volume(self):
+        return await self._most_active('contracts_by_volume')
+
+    async def most_active_futures_contracts_by_volume(self):
+        return await self._most_active('futures_contracts_by_volume')
+
+    async def most_active_options_contracts_by_volume(self):
+        return await self._most_active('options_contracts_by_volume')
+
+    async def get_insider_trading(self, from_date: str = None, to_date: str = None):
+        return await asyncio.to_thread(self._sync_client().get_insider_trading, from_date, to_date)
+
+    async def get_upcoming_results_calendar(self):
+        try:
+            ref_url = 'https://www.nseindia.com/companies-listing/corporate-filings-event-calendar'
+            response = await self._get('https://www.nseindia.com/api/event-calendar?', ref_url)
+            return NseUtils._parse_results_calendar(response.json())
+        except Exception:
+            print("Error fetching Event Calendar Data. Check your input")
+            return None
+
+    async def get_etf_list(self):
+        try:
+            ref_url = 'https://www.nseindia.com/market-data/exchange-traded-funds-etf'
+            response = await self._get('https://www.nseindia.com/api/etf', ref_url)
+            return NseUtils._parse_data_list(response.json())
+        except Exception:
+            print("Error fetching ETF list. Check your input")
+            return None
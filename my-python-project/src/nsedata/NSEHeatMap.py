@@ -24,6 +24,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import requests
+from NseUtility import NseUtils
+from index_membership import SECTOR_INDICES
 
 
 @st.cache_data(ttl=300)
@@ -61,6 +63,16 @@ def get_index_details(category):
         print("Error Fetching Index Data from NSE. Aborting....")
         return pd.DataFrame()
 
+@st.cache_resource(ttl=3600)
+def get_sector_membership():
+    """
+    Membership store with the sectoral indices refreshed, snapshots of the day are reused
+    :return: index_membership.IndexMembershipStore
+    """
+    nse = NseUtils()
+    nse.sync_index_membership(SECTOR_INDICES)
+    return nse.index_membership
+
 # Include any additional NSE indices to list below
 index_list = ['NIFTY 50', 'NIFTY NEXT 50', 'NIFTY MIDCAP 50', 'NIFTY MIDCAP 100', 'NIFTY MIDCAP 150',
                       'NIFTY SMALLCAP 50',
@@ -106,9 +118,10 @@ with header1:
 # with st.container():
     st.image("https://fabtrader.in/wp-content/uploads/2025/05/appLogo.png")
     st.subheader("NSE Indices Heatmap - Visualizer")
-    col1, col2, _ = st.columns([2,1,1])
+    col1, col2, col3, _ = st.columns([2,1,1,1])
     index_filter = col1.selectbox("Choose Index", index_list, index=0)
     slice_by = col2.selectbox("Slice By", ["Market Cap","Gainers","Losers"], index=0)
+    group_by = col3.selectbox("Group By", ["None", "Sector"], index=0)
 
 with header2:
     df = get_index_details(index_filter)
@@ -155,11 +168,17 @@ if not df.empty:
         slice_factor = 'Abs'
         color_scale = ['#ff7a3a', 'white']
 
+    path = ['symbol']
+    if group_by == 'Sector':
+        # Sector of every symbol from the in memory symbol -> indices map of the membership store
+        df['sector'] = df['symbol'].map(get_sector_membership().sectors(df['symbol']))
+        path = ['sector', 'symbol']
+
     # Plotly Treemap
     st.divider()
     fig = px.treemap(
         df,
-        path=['symbol'],
+        path=path,
         values=slice_factor,
         color='pChange',
         color_continuous_scale=color_scale,
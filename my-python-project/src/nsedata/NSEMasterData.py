@@ -16,17 +16,81 @@
 
 """
 
+import numpy as np
 import pandas as pd
 import time
 import json
 import requests
 from datetime import datetime, timedelta
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from nse_metrics import default_metrics, timed_parse
+from nse_rate_limit import RateLimitedAdapter
+from nse_replay import rebase_url
+from symbol_index import SymbolIndex
+from symbol_master_cache import SymbolMasterCache
+from ohlcv_store import BAR_COLUMNS, OhlcvStore, bar_bounds, settled_until
+
+# Intraday intervals: minutes of the bars downloaded for them and of the bars they are aggregated to (None: as is)
+_INTRADAY_MINUTES = {'1m': (1, None), '3m': (3, None), '5m': (5, None), '15m': (15, None), '10m': (5, 10),
+                     '30m': (15, 30), '1h': (15, 60)}
+
+
+class HistoryBatch:
+    """
+    Histories of many symbols downloaded by NSEMasterData.get_history_many. Iterating it yields (symbol, frame)
+    pairs in the order the downloads finish. Symbols that failed are left out and collected in errors.
+    """
+
+    def __init__(self):
+        self._results = iter(())
+        self.errors = {}
+
+    def __iter__(self):
+        return self._results
+
+    def error_report(self):
+        """
+        Symbols that could not be downloaded, complete once the batch has been iterated
+        :return: pandas.DataFrame with Symbol, Error (exception type) and Message columns
+        """
+        return pd.DataFrame([{'Symbol': symbol, 'Error': type(error).__name__, 'Message': str(error)}
+                             for symbol, error in self.errors.items()], columns=['Symbol', 'Error', 'Message'])
+
 
 class NSEMasterData:
 
-    def __init__(self):
+    def __init__(self, limiter=None, adapter=None, base_url=None, metrics=None, master_cache=None,
+                 history_store=None):
+        """
+        :param limiter: Optional. nse_rate_limit.RateLimiter, defaults to the limiter shared by all NSE clients
+        :param adapter: Optional. Transport adapter replacing the rate limited one, eg: nse_replay.ReplayAdapter
+        :param base_url: Optional. Send every request to this server instead of NSE, eg: a nse_standin.NseStandIn
+        :param metrics: Optional. nse_metrics.Metrics recording requests and parse times, defaults to the shared one
+        :param master_cache: Optional. SymbolMasterCache the symbol masters are kept in between processes. Defaults
+        to the cache under ~/.nsedata/symbol_master when talking to NSE itself (no adapter / base_url), pass False
+        to always download
+        :param history_store: Optional. ohlcv_store.OhlcvStore get_history serves the bars it already downloaded
+        from, fetching only the missing range. Defaults to the store under ~/.nsedata/ohlcv when talking to NSE
+        itself (no adapter / base_url), pass False to always download the full range
+        """
         self.session = requests.Session()
+        self.metrics = metrics or default_metrics()
+        if master_cache is None and adapter is None and base_url is None:
+            master_cache = SymbolMasterCache()
+        self.master_cache = master_cache or None
+        if self.master_cache is not None:
+            self.metrics.register_cache('symbol_master', self.master_cache.stats)
+        if history_store is None and adapter is None and base_url is None:
+            history_store = OhlcvStore()
+        self.history_store = history_store or None
+        if self.history_store is not None:
+            self.metrics.register_cache('ohlcv', self.history_store.stats)
+        if adapter is None:
+            adapter = RateLimitedAdapter(limiter, self.metrics, pool_maxsize=20)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.limiter = getattr(adapter, 'limiter', None) or getattr(getattr(adapter, 'adapter', None), 'limiter', None)
         self.session.headers.update({
             'Connection': 'keep-alive',
             'Cache-Control': 'max-age=0',
@@ -41,40 +105,160 @@ class NSEMasterData:
             'Sec-Fetch-Site': 'none',
             'Sec-Fetch-Mode': 'navigate'
         })
-        self.nse_url = "https://charting.nseindia.com/Charts/GetEQMasters"
-        self.nfo_url = "https://charting.nseindia.com/Charts/GetFOMasters"
-        self.historical_url = "https://charting.nseindia.com//Charts/symbolhistoricaldata/"
-        self.nse_data = None
-        self.nfo_data = None
+        self.home_url = rebase_url("https://www.nseindia.com", base_url)
+        self.nse_url = rebase_url("https://charting.nseindia.com/Charts/GetEQMasters", base_url)
+        self.nfo_url = rebase_url("https://charting.nseindia.com/Charts/GetFOMasters", base_url)
+        self.historical_url = rebase_url("https://charting.nseindia.com//Charts/symbolhistoricaldata/", base_url)
+        self._masters = {}
+        self._master_lock = threading.RLock()
+        self._refresh_thread = None
+        self._stop_refresh = threading.Event()
+        self._indexes = {}
+        self._index_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    #  Symbol masters, loaded on first use
+    # ------------------------------------------------------------------ #
+
+    @property
+    def nse_data(self):
+        """NSE symbol master, read from the master cache or downloaded on first use"""
+        return self._master('NSE')
+
+    @nse_data.setter
+    def nse_data(self, df):
+        self._masters['NSE'] = df
+
+    @property
+    def nfo_data(self):
+        """NFO symbol master, read from the master cache or downloaded on first use"""
+        return self._master('NFO')
+
+    @nfo_data.setter
+    def nfo_data(self, df):
+        self._masters['NFO'] = df
+
+    def _master(self, exchange):
+        df = self._masters.get(exchange)
+        if df is not None:
+            return df
+        with self._master_lock:
+            if self._masters.get(exchange) is None:
+                cached = self.master_cache.load(exchange) if self.master_cache is not None else None
+                if cached is None:
+                    self._refresh_master(exchange)
+                else:
+                    self._masters[exchange] = cached
+                    if not self.master_cache.is_fresh(exchange):
+                        # Serve the cached master now, revalidate it without blocking the caller
+                        self.refresh_in_background()
+            return self._masters.get(exchange)
+
+    def _refresh_master(self, exchange, force=False):
+        """
+        Bring a master up to date: a master validated today is read from the cache, a stale one is
+        revalidated with a conditional request and a missing one downloaded. A failed download leaves the
+        master unset, so the next use tries again.
+        """
+        cache = self.master_cache
+        if cache is not None and not force and cache.is_fresh(exchange):
+            if self._masters.get(exchange) is None:
+                self._masters[exchange] = cache.load(exchange)
+            return
+        url = self.nse_url if exchange == 'NSE' else self.nfo_url
+        meta = cache.meta(exchange) if cache is not None and not force else None
+        df, response = self._fetch_symbol_master(url, meta)
+        if response is not None and response.status_code == 304:
+            cache.touch(exchange)
+            if self._masters.get(exchange) is None:
+                self._masters[exchange] = cache.load(exchange)
+        elif df is not None and not df.empty:
+            if cache is not None:
+                cache.save(exchange, df, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            self._masters[exchange] = df
+
+    def refresh_in_background(self):
+        """
+        Revalidate both masters in a daemon thread, unless a refresh is already running
+        :return: threading.Thread
+        """
+        with self._master_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return self._refresh_thread
+            self._refresh_thread = threading.Thread(target=self._refresh_safely, name='symbol-master-refresh',
+                                                    daemon=True)
+            self._refresh_thread.start()
+            return self._refresh_thread
+
+    def _refresh_safely(self):
+        try:
+            self.download_symbol_master()
+        except Exception as e:
+            print(f"Symbol master refresh failed: {e}")
 
-    def search(self, symbol, exchange, match=False):
+    def start_daily_refresh(self, interval=24 * 60 * 60, immediate=True):
+        """
+        Refresh the masters every interval seconds in a daemon thread, eg: in a long running API.
+        Nothing is downloaded while the cached masters are validated for the day.
+        :param interval: Optional. seconds between refreshes
+        :param immediate: Optional. refresh once right away too
+        :return: threading.Thread
+        """
+        def run():
+            if immediate:
+                self._refresh_safely()
+            while not self._stop_refresh.wait(interval):
+                self._refresh_safely()
+
+        self._stop_refresh.clear()
+        thread = threading.Thread(target=run, name='symbol-master-daily-refresh', daemon=True)
+        thread.start()
+        return thread
+
+    def stop_daily_refresh(self):
+        self._stop_refresh.set()
+
+    def symbol_index(self, exchange):
+        """
+        Index of the symbol master of an exchange, built on first use after every download
+        :param exchange: 'NSE' or 'NFO'
+        :return: symbol_index.SymbolIndex or None when the master is not downloaded
+        """
+        df = self.nse_data if exchange.upper() == 'NSE' else self.nfo_data
+        if df is None:
+            return None
+        with self._index_lock:
+            index = self._indexes.get(exchange.upper())
+            # The masters are plain attributes, a replaced frame gets a new index
+            if index is None or index.df is not df:
+                index = self._indexes[exchange.upper()] = SymbolIndex(df)
+            return index
+
+    def search(self, symbol, exchange, match=False, limit=None):
         """Search for symbols in the specified exchange.
 
         Args:
             symbol (str): The symbol or part of the symbol to search for.
             exchange (str): The exchange to search in ('NSE' or 'NFO').
             match (bool): If True, performs an exact match. If False, searches for symbols containing the input.
+            limit (int): Optional. Maximum number of rows returned.
 
         Returns:
-            pandas.DataFrame: A DataFrame containing all matching symbols.
+            pandas.DataFrame: A DataFrame containing all matching symbols, ranked: exact matches, symbols starting
+            with the input, then the other symbols containing it.
         """
         exchange = exchange.upper()
-        if exchange == 'NSE':
-            df = self.nse_data
-        elif exchange == 'NFO':
-            df = self.nfo_data
-        else:
+        if exchange not in ('NSE', 'NFO'):
             print(f"Invalid exchange '{exchange}'. Please choose 'NSE' or 'NFO'.")
             return pd.DataFrame()
 
-        if df is None:
+        index = self.symbol_index(exchange)
+        if index is None:
             print(f"Data for {exchange} not downloaded. Please run download() first.")
             return pd.DataFrame()
 
-        if match:
-            result = df[df['Symbol'].str.upper() == symbol.upper()]
-        else:
-            result = df[df['Symbol'].str.contains(symbol, case=False, na=False)]
+        rows = index.exact(symbol)[:limit] if match else index.search(symbol, limit)
+        result = index.df.iloc[rows]
 
         if result.empty:
             print(f"No matching result found for symbol '{symbol}' in {exchange}.")
@@ -82,53 +266,130 @@ class NSEMasterData:
 
         return result.reset_index(drop=True)
 
+    def stats(self):
+        """Per endpoint request metrics and cache hit ratios, see nse_metrics.Metrics.stats"""
+        return self.metrics.stats()
+
     def get_nse_symbol_master(self, url):
+        return self._fetch_symbol_master(url)[0]
+
+    @timed_parse
+    def _fetch_symbol_master(self, url, meta=None):
+        """
+        Download a symbol master, conditionally when meta holds the validators of the cached one
+        :return: (pandas.DataFrame, response), the frame is None on a 304 answer and empty on failure
+        """
+        headers = {}
+        if meta is not None and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta is not None and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
         try:
-            response = self.session.get(url, timeout=10)
+            response = self.session.get(url, timeout=10, headers=headers)
+            if response.status_code == 304 and headers:
+                return None, response
             response.raise_for_status()
             data = response.text.splitlines()
             columns = ['ScripCode', 'Symbol', 'Name', 'Type']
-            return pd.DataFrame([line.split('|') for line in data], columns=columns)
+            return pd.DataFrame([line.split('|') for line in data], columns=columns), response
         except requests.exceptions.RequestException as e:
             print(f"Failed to download data from {url}: {e}")
-            return pd.DataFrame()
+            return pd.DataFrame(), None
 
-    def download_symbol_master(self):
-        """Download NSE and NFO master data."""
-        self.nse_data = self.get_nse_symbol_master(self.nse_url)
-        self.nfo_data = self.get_nse_symbol_master(self.nfo_url)
+    def download_symbol_master(self, force=False):
+        """
+        Bring the NSE and NFO master data up to date. Masters validated today are read from the master cache,
+        stale ones are revalidated with a conditional request (ETag / Last-Modified) and only downloaded again
+        when NSE changed them.
+        :param force: Optional. download both masters whatever the cache holds
+        """
+        # Not under the master lock: a background refresh must not hold up readers of the cached masters
+        for exchange in ('NSE', 'NFO'):
+            self._refresh_master(exchange, force)
 
     def search_symbol(self, symbol, exchange):
-        """Search for a symbol in the specified exchange and return the first match."""
-        df = self.nse_data if exchange.upper() == 'NSE' else self.nfo_data
-        if df is None:
+        """
+        Search for a symbol in the specified exchange and return the exact match, else the first symbol
+        containing it.
+        """
+        index = self.symbol_index(exchange)
+        if index is None:
             print(f"Data for {exchange} not downloaded. Please run download() first.")
             return None
-        result = df[df['Symbol'].str.contains(symbol, case=False, na=False)]
-        if result.empty:
+        row = index.first(symbol)
+        if row is None:
             print(f"No matching result found for symbol '{symbol}' in {exchange}.")
             return None
-        return result.iloc[0]
-
-    def get_history(self, symbol="Nifty 50", exchange="NSE", start=None, end=None, interval='1d'):
-        """Get historical data for a symbol."""
-
-        def adjust_timestamp(ts):
-            if interval in ['30m', '1h']:
-                num = 15
-            elif interval in ['10m']:
-                num = 5
-            else:
-                num = int(re.match(r'\d+', interval).group())
-            if num == 0:
-                return (ts - timedelta(minutes=num)).round('min')
-            else:
-                return (ts - timedelta(minutes=num)).round((str(num) + 'min'))
+        return index.df.iloc[row]
 
+    @timed_parse
+    def get_history(self, symbol="Nifty 50", exchange="NSE", start=None, end=None, interval='1d', raise_errors=False):
+        """Get historical data for a symbol.
 
+        Args:
+            raise_errors (bool): If True, a failed download raises instead of returning an empty DataFrame, so
+                callers can tell a failure from a symbol without data.
+        """
         symbol_info = self.search_symbol(symbol, exchange)
         if symbol_info is None:
             return pd.DataFrame()
+        try:
+            return self._history(symbol_info, exchange, start, end, interval)
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred while fetching historical data: {e}")
+            if raise_errors:
+                raise
+            return pd.DataFrame()
+
+    def get_history_many(self, symbols, start=None, end=None, interval='1d', exchange="NSE", max_workers=10):
+        """
+        Get historical data for many symbols. Cookies are set once for the whole batch instead of before every
+        download, and at most max_workers downloads run at the same time.
+        :param symbols: list of symbols, eg: the equity list of a screener run
+        :return: HistoryBatch, iterate it for (symbol, pandas.DataFrame) pairs as the downloads finish. Its errors
+        map the symbols that were not found or failed to download to their exception (see error_report)
+        """
+        batch = HistoryBatch()
+        batch._results = self._history_many(batch, symbols, start, end, interval, exchange, max_workers)
+        return batch
+
+    def _history_many(self, batch, symbols, start, end, interval, exchange, max_workers):
+        resolved = []
+        for symbol in symbols:
+            symbol_info = self.search_symbol(symbol, exchange)
+            if symbol_info is None:
+                batch.errors[symbol] = LookupError(f"No matching result found for symbol '{symbol}' in {exchange}")
+            else:
+                resolved.append((symbol, symbol_info))
+        if not resolved:
+            return
+
+        try:
+            # Set Cookies once for the batch, the downloads reuse them
+            self.session.get(self.home_url, timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred while setting cookies: {e}")
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            future_to_symbol = {executor.submit(self._history, symbol_info, exchange, start, end, interval,
+                                                False): symbol for symbol, symbol_info in resolved}
+            for future in as_completed(future_to_symbol):
+                symbol = future_to_symbol[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print(f"An error occurred while fetching historical data for {symbol}: {e}")
+                    batch.errors[symbol] = e
+                    continue
+                yield symbol, df
+        finally:
+            # A consumer that stops early does not wait for the downloads still queued
+            executor.shutdown(cancel_futures=True)
+
+    @timed_parse
+    def _history(self, symbol_info, exchange, start, end, interval, set_cookies=True):
+        """get_history of a resolved symbol, download errors are raised"""
 
         interval_xref = {
             '1m': ('1', 'I'), '3m': ('3', 'I'), '5m': ('5', 'I'), '10m': ('5', 'I'),
@@ -137,79 +398,103 @@ class NSEMasterData:
         }
 
         time_interval, chart_period = interval_xref.get(interval, ('1', 'D'))
+        from_date = int(start.timestamp()) if start else 0
+        to_date = int(end.timestamp()) if end else int(time.time())
+
+        df = self._get_bars(symbol_info, exchange, time_interval, chart_period, from_date, to_date, set_cookies)
+        if df.empty:
+            print("No data received from the Source - NSE.")
+            return pd.DataFrame()
 
+        return self._shape_history(df, interval)
+
+    @staticmethod
+    def _shape_history(df, interval):
+        """
+        Index raw bars (ohlcv_store.BAR_COLUMNS) by Timestamp. NSE stamps an intraday bar with its end time:
+        intraday bars after 15:30 are dropped and the others are labeled with their start time, rounded to the
+        bar size. 10m / 30m / 1h bars are then aggregated from the 5 / 15 minute bars, in buckets counted from
+        the first bar.
+        Works on the integer ticks of the timestamps instead of a Timestamp per bar and a resample.
+        """
+        if interval not in _INTRADAY_MINUTES:
+            return df.rename(columns={'TS': 'Timestamp'}).set_index('Timestamp')
+        base_minutes, bucket_minutes = _INTRADAY_MINUTES[interval]
+        values = df['TS'].to_numpy()
+        minute = np.timedelta64(1, 'm') // np.timedelta64(1, np.datetime_data(values.dtype)[0])
+        ticks = values.view('i8')
+        keep = ticks % (1440 * minute) <= 930 * minute
+        ticks = ticks[keep]
+
+        # End time to start time, rounded half to even like Timestamp.round
+        step = base_minutes * minute
+        quotient, remainder = np.divmod(ticks - step, step)
+        quotient += (2 * remainder > step) | ((2 * remainder == step) & (quotient % 2 == 1))
+        starts = quotient * step
+        bars = df.loc[keep, BAR_COLUMNS[1:]]
+        # Labels in microseconds at least, the unit Timestamp - timedelta arithmetic gave them
+        label_dtype = np.promote_types(values.dtype, np.dtype('datetime64[us]'))
+        bars.index = pd.DatetimeIndex(starts.view(values.dtype).astype(label_dtype), name='Timestamp')
+        if bucket_minutes is None or bars.empty:
+            return bars
+
+        size = bucket_minutes * minute
+        first = starts.min()
+        buckets = (first + (starts - first) // size * size).view(values.dtype).astype(label_dtype)
+        buckets = pd.DatetimeIndex(buckets, name='Timestamp')
+        aggregated = bars.groupby(buckets).agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+                                                'Volume': 'sum'})
+        return aggregated.dropna()
+
+    def _get_bars(self, symbol_info, exchange, time_interval, chart_period, from_date, to_date, set_cookies=True):
+        """
+        Raw bars of a symbol between two epoch seconds, from the history store when there is one: only the
+        ranges it does not hold yet are downloaded and merged into it
+        :return: pandas.DataFrame with ohlcv_store.BAR_COLUMNS
+        """
+        store = self.history_store
+        if store is None:
+            return self._fetch_bars(symbol_info, exchange, time_interval, chart_period, from_date, to_date,
+                                    set_cookies)
+        partition = (exchange, symbol_info['Symbol'], f"{time_interval}{chart_period}")
+        gaps = store.missing(*partition, from_date, to_date)
+        if gaps:
+            frames = [self._fetch_bars(symbol_info, exchange, time_interval, chart_period, gap_start, gap_end,
+                                       set_cookies) for gap_start, gap_end in gaps]
+            # NSE answers a throttled request or one without cookies with no bars, so an empty range is not covered
+            answered = [gap for gap, frame in zip(gaps, frames) if not frame.empty]
+            store.store(*partition, pd.concat(frames, ignore_index=True), answered, settled_until(chart_period))
+        return store.load(*partition, *bar_bounds(chart_period, from_date, to_date))
+
+    def _fetch_bars(self, symbol_info, exchange, time_interval, chart_period, from_date, to_date, set_cookies=True):
+        """
+        Download the raw bars of a symbol between two epoch seconds from NSE
+        :param set_cookies: False when the cookies were already set, eg: once for a get_history_many batch
+        """
         payload = {
             "exch": "N" if exchange.upper() == "NSE" else "D",
             "instrType": "C" if exchange.upper() == "NSE" else "D",
             "ScripCode": int(symbol_info['ScripCode']),
             "ulScripCode": int(symbol_info['ScripCode']),
-            "fromDate": int(start.timestamp()) if start else 0,
-            "toDate": int(end.timestamp()) if end else int(time.time()),
+            "fromDate": from_date,
+            "toDate": to_date,
             "timeInterval": time_interval,
             "chartPeriod": chart_period,
             "chartStart": 0
         }
-
-        try:
-            # Set Cookies
-            self.session.get("https://www.nseindia.com", timeout=5)
-            response = self.session.post(self.historical_url, data=json.dumps(payload), timeout=10)
-            response.raise_for_status()
-            data = response.json()
-
-            if not data:
-                print("No data received from the Source - NSE.")
-                return pd.DataFrame()
-
-            df = pd.DataFrame(data)
-            df.columns = ['Status', 'TS', 'Open', 'High', 'Low', 'Close', 'Volume']
-            df['TS'] = pd.to_datetime(df['TS'], unit='s', utc=True)
-            df['TS'] = df['TS'].dt.tz_localize(None)
-            df = df[['TS', 'Open', 'High', 'Low', 'Close', 'Volume']]
-
-            # Apply cutoff time only for intraday intervals
-            intraday_intervals = ['1m', '3m', '5m', '15m']
-            intraday_consolidate_intervals = ['10m','30m', '1h']
-            if interval in intraday_intervals:
-                cutoff_time = pd.Timestamp('15:30:00').time()
-                df = df[df['TS'].dt.time <= cutoff_time]
-                df['Timestamp'] = df['TS'].apply(adjust_timestamp)
-                df.drop(columns=['TS'], inplace=True)
-                df.set_index('Timestamp', inplace=True, drop=True)
-                return df
-            if interval in intraday_consolidate_intervals:
-                cutoff_time = pd.Timestamp('15:30:00').time()
-                df = df[df['TS'].dt.time <= cutoff_time]
-                df['Timestamp'] = df['TS'].apply(adjust_timestamp)
-                df.drop(columns=['TS'], inplace=True)
-                df.set_index('Timestamp', inplace=True, drop=True)
-                agg_parm = ''
-                if interval == '30m':
-                    agg_parm = '30min'
-                elif interval == '10m':
-                    agg_parm = '10min'
-                else:
-                    agg_parm = '60min'
-                # Get the first timestamp to use as custom origin
-                first_ts = df.index.min()
-                offset_td = pd.to_timedelta(first_ts.time().strftime('%H:%M:%S'))
-                df_aggregated = df.resample(agg_parm, origin='start_day', offset=offset_td).agg({
-                    'Open': 'first',
-                    'High': 'max',
-                    'Low': 'min',
-                    'Close': 'last',
-                    'Volume': 'sum'
-                })
-                df_aggregated.dropna(inplace=True)
-                return df_aggregated
-
-            df.rename(columns={'TS': 'Timestamp'}, inplace=True)
-            df.set_index('Timestamp', inplace=True, drop=True)
-            return df
-
-        except requests.exceptions.RequestException as e:
-            print(f"An error occurred while fetching historical data: {e}")
-            return pd.DataFrame()
+        if set_cookies:
+            self.session.get(self.home_url, timeout=5)
+        response = self.session.post(self.historical_url, data=json.dumps(payload), timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        df = pd.DataFrame(data)
+        df.columns = ['Status', 'TS', 'Open', 'High', 'Low', 'Close', 'Volume']
+        df['TS'] = pd.to_datetime(df['TS'], unit='s', utc=True)
+        df['TS'] = df['TS'].dt.tz_localize(None)
+        return df[BAR_COLUMNS]
 
 if __name__ == "__main__":
 
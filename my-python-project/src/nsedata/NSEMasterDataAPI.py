@@ -1,11 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from datetime import datetime, timedelta
 from NSEMasterData import NSEMasterData
 import pandas as pd
 
 app = Flask(__name__)
 nse = NSEMasterData()
-nse.download_symbol_master()  # Download master data at startup
+# Nothing is downloaded at import: the symbol masters load on the first request from the local master cache
+# (a stale cache is served while it is revalidated in the background) and are refreshed once a day
+nse.start_daily_refresh(immediate=False)
 
 @app.route('/history', methods=['GET'])
 def get_history():
@@ -51,6 +53,15 @@ def get_history():
 
     return jsonify(candles.to_dict(orient='records'))
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape endpoint: per endpoint NSE request metrics and cache hit ratios
+    return Response(nse.metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify(nse.stats())
+
 if __name__ == '__main__':
     app.run(debug=True)
 
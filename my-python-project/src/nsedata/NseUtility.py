@@ -13,11 +13,247 @@
 
 """
 
+import functools
 import requests
 import pandas as pd
+import tempfile
+import threading
+import time
 from datetime import datetime, timedelta
-from io import StringIO, BytesIO
+from io import BytesIO, StringIO
+from urllib.parse import urlsplit
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bhav_archive import BhavArchive
+from filings_store import FilingsStore
+from high_low_store import HighLowStore
+from nse_schemas import BHAV_SCHEMAS, ENDPOINT_SCHEMAS, INDEX_HISTORY_SCHEMA, apply_schema, compact_frame, \
+    csv_dtypes, to_arrow
+from index_history_store import IndexHistoryStore, index_dates
+from index_membership import IndexMembershipStore
+from option_chain import parse_option_chain
+from price_adjustment import AdjustmentEngine
+from nse_calendar import NseCalendar
+from nse_metrics import default_metrics, timed_parse
+from nse_rate_limit import RateLimitedAdapter
+from nse_replay import rebase_url
+
+
+# Depth of the frame_output methods running in this thread, only the outermost one converts its result
+_output_state = threading.local()
+
+
+def frame_output(method):
+    """
+    Decorator of the NseUtils methods returning frames: in compact / arrow output mode the result is converted
+    with the schema of ENDPOINT_SCHEMAS named after the method. Frames used by other NseUtils methods are not
+    converted, nor are results that are not frames (lists, dicts, None).
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        depth = getattr(_output_state, 'depth', 0)
+        _output_state.depth = depth + 1
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            _output_state.depth = depth
+        if depth or not self.compact:
+            return result
+        return self._output(result, method.__name__)
+    return wrapper
+
+
+class NseSession:
+    """
+    Warm-cookie HTTP session shared by every NseUtils endpoint.
+
+    NSE API calls on www.nseindia.com only succeed with the cookies handed out by its web pages. Instead of
+    requesting a reference page before every API call, the cookies are primed once and the same pooled
+    keep-alive connection is reused for all endpoints. Cookies are refreshed only when one of them has
+    expired or when NSE answers with 401/403. All requests go through the shared per-host rate limiter.
+    """
+    home_url = 'https://www.nseindia.com'
+    cookie_host = 'www.nseindia.com'
+    refresh_status_codes = (401, 403)
+
+    def __init__(self, headers, pool_size=20, timeout=15, limiter=None, adapter=None, base_url=None, metrics=None):
+        """
+        :param limiter: Optional. nse_rate_limit.RateLimiter, defaults to the limiter shared by all NSE clients
+        :param metrics: Optional. nse_metrics.Metrics the requests are recorded in, defaults to the shared one
+        :param adapter: Optional. Transport adapter replacing the rate limited one, eg: nse_replay.ReplayAdapter
+        :param base_url: Optional. Send every NSE request to this server instead, eg: a nse_standin.NseStandIn
+        """
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        if adapter is None:
+            adapter = RateLimitedAdapter(limiter, metrics, pool_connections=4, pool_maxsize=pool_size)
+        self.limiter = getattr(adapter, 'limiter', None) or getattr(getattr(adapter, 'adapter', None), 'limiter', None)
+        self.metrics = metrics or default_metrics()
+        self.base_url = base_url
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._primed = False
+        self._cookie_expiry = None
+
+        self.priming_requests = 0  # reference page requests actually made
+        self.priming_saved = 0  # reference page requests skipped because cookies were still warm
+        self.cookie_refreshes = 0  # re-primes caused by an expired cookie or a 401/403
+
+    def _needs_cookies(self, url):
+        return urlsplit(url).hostname == self.cookie_host
+
+    def _cookies_expired(self):
+        return self._cookie_expiry is not None and time.time() >= self._cookie_expiry
+
+    def prime(self, ref_url=None):
+        """
+        Harvest fresh NSE cookies by visiting a web page
+        :param ref_url: Optional. Page to visit, defaults to the NSE home page
+        :return: None
+        """
+        self.session.get(rebase_url(ref_url or self.home_url, self.base_url), timeout=self.timeout)
+        expiries = [c.expires for c in self.session.cookies if c.expires and 'nseindia.com' in c.domain]
+        self._cookie_expiry = min(expiries) if expiries else None
+        self._primed = True
+        self.priming_requests += 1
+
+    def _ensure_primed(self, ref_url):
+        with self._lock:
+            if not self._primed:
+                self.prime(ref_url)
+            elif self._cookies_expired():
+                self.cookie_refreshes += 1
+                self.prime(ref_url)
+            elif ref_url:
+                self.priming_saved += 1
+
+    def get(self, url, ref_url=None, **kwargs):
+        """
+        GET a NSE url over the shared session, priming or refreshing cookies only when required
+        :param url: url to fetch
+        :param ref_url: Optional. NSE page the endpoint belongs to, used when cookies must be (re)primed
+        :return: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        needs_cookies = self._needs_cookies(url)
+        url = rebase_url(url, self.base_url)
+        if not needs_cookies:
+            return self.session.get(url, **kwargs)
+
+        self._ensure_primed(ref_url)
+        response = self.session.get(url, **kwargs)
+        if response.status_code in self.refresh_status_codes:
+            with self._lock:
+                self.cookie_refreshes += 1
+                self.prime(ref_url)
+            response.close()
+            response = self.session.get(url, **kwargs)
+        return response
+
+    def stats(self):
+        """
+        Returns the priming counters of this session
+        :return: dict
+        """
+        return {
+            'priming_requests': self.priming_requests,
+            'priming_saved': self.priming_saved,
+            'cookie_refreshes': self.cookie_refreshes,
+            'rate_limit': self.limiter.stats() if self.limiter is not None else {},
+        }
+
+
+class IndexSnapshot:
+    """
+    One allIndices payload shared by the index ratio and market breadth views.
+
+    PE, PB, dividend yield and advances / declines of every index all come from the same allIndices payload.
+    It is downloaded once and reused until it is older than ttl seconds; every view is a column subset of it.
+    """
+    url = 'https://www.nseindia.com/api/allIndices'
+    ref_url = 'https://www.nseindia.com/market-data/index-performances'
+    ratio_labels = {'pe': 'Profit Earning Ratio', 'pb': 'Price Book Ratio', 'dy': 'Div Yield'}
+
+    def __init__(self, get=None, ttl=30):
+        """
+        :param get: Optional. callable(url, ref_url) returning the response, eg: NseUtils._get. Without it the
+        snapshot only serves payloads handed to update()
+        :param ttl: seconds a downloaded payload is reused for, 0 downloads on every view
+        """
+        self._get = get
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.payload = None
+        self.fetched_at = None
+        self._fetched_monotonic = None
+        self._frame = None
+        self.fetches = 0
+        self.hits = 0
+
+    def is_stale(self):
+        return self.payload is None or time.monotonic() - self._fetched_monotonic >= self.ttl
+
+    def update(self, payload):
+        """Replace the snapshot with a freshly downloaded allIndices payload."""
+        frame = pd.json_normalize(payload['data'])
+        with self._lock:
+            self.payload = payload
+            self._frame = frame
+            self.fetched_at = datetime.now()
+            self._fetched_monotonic = time.monotonic()
+            self.fetches += 1
+
+    def frame(self, columns=None, refresh=False):
+        """
+        The allIndices rows as a DataFrame, downloaded again when older than ttl
+        :param columns: Optional. list of columns to keep, eg: ['indexSymbol', 'last', 'percentChange']
+        :param refresh: Optional. Download a new payload regardless of its age
+        :return: pandas.DataFrame
+        """
+        if self._get is not None and (refresh or self.is_stale()):
+            self.update(self._get(self.url, self.ref_url).json())
+        else:
+            self.hits += 1
+        df = self._frame
+        return (df if columns is None else df[list(columns)]).copy()
+
+    def ratio(self, column, label=None):
+        """
+        Index / Type / ratio view of one of the pe, pb or dy columns
+        :return: pandas.DataFrame or None
+        """
+        df = self.frame()
+        if df.empty:
+            return None
+        df = df[['indexSymbol', 'key', column]]
+        values = df[column].astype(str).str.strip()
+        df = df[(values != '') & (values != 'None')]  # Removes rows where the ratio is empty or none
+        df.columns = ['Index', 'Type', label or self.ratio_labels.get(column, column)]
+        return df
+
+    def pe_ratio(self):
+        return self.ratio('pe')
+
+    def pb_ratio(self):
+        return self.ratio('pb')
+
+    def div_yield(self):
+        return self.ratio('dy')
+
+    def advance_decline(self):
+        df = self.frame()
+        if df.empty:
+            return None
+        df = df[['indexSymbol', 'advances', 'declines', 'unchanged']].dropna()
+        df.columns = ['Index', 'Advances', 'Declines', 'Unchanged']
+        return df
+
+    def stats(self):
+        return {'fetches': self.fetches, 'hits': self.hits}
 
 
 class NseUtils:
@@ -38,47 +274,222 @@ class NseUtils:
                           'NIFTY100 LIQUID 15',
                           'NIFTY MIDCAP LIQUID 15']
     pre_market_list = ['NIFTY 50', 'Nifty Bank', 'Emerge', 'Securities in F&O', 'Others', 'All']
+    pre_market_xref = {"NIFTY 50": "NIFTY", "Nifty Bank": "BANKNIFTY", "Emerge": "SME", "Securities in F&O": "FO",
+                       "Others": "OTHERS", "All": "ALL"}
+
+    # most_active_* variant -> (api url, key of the data list in the response)
+    most_active_endpoints = {
+        'equity_stocks_by_volume': ('https://www.nseindia.com/api/live-analysis-most-active-securities?index=volume',
+                                    None),
+        'equity_stocks_by_value': ('https://www.nseindia.com/api/live-analysis-most-active-securities?index=value',
+                                   None),
+        'index_calls': ('https://www.nseindia.com/api/snapshot-derivatives-equity?index=calls-index-vol', 'OPTIDX'),
+        'index_puts': ('https://www.nseindia.com/api/snapshot-derivatives-equity?index=puts-index-vol', 'OPTIDX'),
+        'stock_calls': ('https://www.nseindia.com/api/snapshot-derivatives-equity?index=calls-stocks-vol', 'OPTSTK'),
+        'stock_puts': ('https://www.nseindia.com/api/snapshot-derivatives-equity?index=puts-stocks-vol', 'OPTSTK'),
+        'contracts_by_oi': ('https://www.nseindia.com/api/snapshot-derivatives-equity?index=oi', 'volume'),
+        'contracts_by_volume': ('https://www.nseindia.com/api/snapshot-derivatives-equity?index=contracts', 'volume'),
+        'futures_contracts_by_volume': ('https://www.nseindia.com/api/snapshot-derivatives-equity?index=futures',
+                                        'volume'),
+        'options_contracts_by_volume': (
+            'https://www.nseindia.com/api/snapshot-derivatives-equity?index=options&limit=20', 'volume'),
+    }
+
+    default_headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36',
+        'Upgrade-Insecure-Requests': "1",
+        "DNT": "1",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*,q=0.8",
+        'Accept-Language': 'en-US,en;q=0.9',
+        # 'Accept-Encoding': 'gzip, deflate, br, zstd',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive'
+    }
+
+    output_formats = ('pandas', 'arrow')
+
+    def __init__(self, bhav_archive=None, index_store=None, index_snapshot_ttl=30, adapter=None, base_url=None,
+                 metrics=None, compact=False, output='pandas', filings_store=None, high_low_store=None,
+                 index_membership=None):
+        """
+        :param bhav_archive: Optional. BhavArchive used to serve past bhav copies from disk. Defaults to the
+        archive under ~/.nsedata/bhav, pass False to always download
+        :param index_store: Optional. IndexHistoryStore used to keep downloaded index history. Defaults to the
+        store under ~/.nsedata/index_history, pass False to always download
+        :param index_snapshot_ttl: Optional. Seconds the allIndices payload behind the index ratio and advance /
+        decline views is reused for
+        :param adapter: Optional. Transport adapter of the session, eg: nse_replay.RecordingAdapter / ReplayAdapter
+        :param base_url: Optional. Send every request to this server instead of NSE, eg: a nse_standin.NseStandIn
+        :param metrics: Optional. nse_metrics.Metrics recording requests, parse times and cache hits. Defaults to
+        the metrics shared by all NSE clients
+        :param compact: Optional. Return memory lean frames: the per endpoint schemas of nse_schemas.ENDPOINT_SCHEMAS
+        (categorical symbols, parsed dates) with downcast numbers, see nse_schemas.compact_frame
+        :param output: Optional. 'pandas' or 'arrow' for pyarrow Tables of the compact frames
+        :param filings_store: Optional. FilingsStore the corporate action, announcement and insider trading
+        filings are synced into and queried from. Defaults to the store under ~/.nsedata/filings, pass False to
+        always download the full date range
+        :param high_low_store: Optional. HighLowStore the 52 week high / low are computed in from the equity bhav
+        copies. Defaults to the store saved under ~/.nsedata/high_low, read on the first get_52week_high_low.
+        Its prices are adjusted with the corporate actions of the last 365 days. Pass False to disable it:
+        get_52week_high_low then downloads the NSE 52 week high / low file
+        :param index_membership: Optional. IndexMembershipStore keeping the constituents of the indices and their
+        changes. Defaults to the store under ~/.nsedata/index_membership, pass False to disable it
+        :raise ValueError if output is not one of output_formats
+        """
+        if output not in self.output_formats:
+            raise ValueError(f"Unknown output {output!r}. Choose from {list(self.output_formats)}")
+        self.output = output
+        self.compact = compact or output == 'arrow'
+
+        self.headers = dict(self.default_headers)
+        if bhav_archive is None:
+            bhav_archive = BhavArchive()
+        self.bhav_archive = bhav_archive or None
+        if index_store is None:
+            index_store = IndexHistoryStore()
+        self.index_store = index_store or None
+        if filings_store is None:
+            filings_store = FilingsStore()
+        self.filings_store = filings_store or None
+        self._high_low_store = high_low_store
+        self._high_low_lock = threading.Lock()
+        if index_membership is None:
+            index_membership = IndexMembershipStore()
+        self.index_membership = index_membership or None
+
+        self.nse_session = NseSession(self.headers, adapter=adapter, base_url=base_url, metrics=metrics)
+        self.session = self.nse_session.session
+        self.metrics = self.nse_session.metrics
+        self._calendar = None
+        self._calendar_lock = threading.Lock()
+        self.index_snapshot = IndexSnapshot(self._get, ttl=index_snapshot_ttl)
+
+        self.metrics.register_cache('cookies', self.nse_session.stats, 'priming_saved', 'priming_requests')
+        self.metrics.register_cache('index_snapshot', self.index_snapshot.stats, misses='fetches')
+        if self.bhav_archive is not None:
+            self.metrics.register_cache('bhav_archive', self.bhav_archive.stats)
+        if self.index_store is not None:
+            self.metrics.register_cache('index_history', self.index_store.stats)
+        if self.filings_store is not None:
+            self.metrics.register_cache('filings', self.filings_store.stats)
+        if high_low_store:
+            self.metrics.register_cache('high_low', high_low_store.stats)
+        if self.index_membership is not None:
+            self.metrics.register_cache('index_membership', self.index_membership.stats)
+
+    @property
+    def calendar(self):
+        """
+        NSE trading calendar, loaded from ~/.nsedata/calendar and downloaded from NSE at most once a year
+        :return: NseCalendar
+        """
+        with self._calendar_lock:
+            if self._calendar is None:
+                self._calendar = NseCalendar(self)
+            return self._calendar
 
-    def __init__(self):
-
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36',
-            'Upgrade-Insecure-Requests': "1",
-            "DNT": "1",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*,q=0.8",
-            'Accept-Language': 'en-US,en;q=0.9',
-            # 'Accept-Encoding': 'gzip, deflate, br, zstd',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive'
-        }
+    @property
+    def high_low_store(self):
+        """
+        HighLowStore of the 52 week high / low, the saved one is read on first use
+        :return: HighLowStore, None when disabled
+        """
+        with self._high_low_lock:
+            if self._high_low_store is None:
+                # Splits and bonus issues of the window, so the highs / lows are adjusted like the NSE file
+                today = datetime.now()
+                adjustments = self._unconverted(AdjustmentEngine.from_nse)(
+                    self, today - timedelta(days=365), today)
+                self._high_low_store = HighLowStore.load(adjustments=adjustments)
+                self.metrics.register_cache('high_low', self._high_low_store.stats)
+            return self._high_low_store or None
+
+    @property
+    def cookies(self):
+        return self.session.cookies.get_dict()
+
+    def _get(self, url, ref_url=None, **kwargs):
+        """
+        Single entry point for every outbound GET made by this class.
+        :param url: API / archive url to fetch
+        :param ref_url: NSE page the endpoint belongs to. Only used when cookies need (re)priming
+        :return: requests.Response
+        """
+        return self.nse_session.get(url, ref_url=ref_url, **kwargs)
+
+    def _output(self, result, endpoint):
+        """Compact / arrow form of a method result, dicts of frames are converted frame by frame"""
+        if isinstance(result, pd.DataFrame):
+            result = compact_frame(result, ENDPOINT_SCHEMAS.get(endpoint))
+            return to_arrow(result) if self.output == 'arrow' else result
+        if isinstance(result, dict) and any(isinstance(value, pd.DataFrame) for value in result.values()):
+            return {key: self._output(value, endpoint) for key, value in result.items()}
+        return result
+
+    @staticmethod
+    def _unconverted(method):
+        """method for a worker thread, returning its frames as they are to the NseUtils method that submitted it"""
+
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            depth = getattr(_output_state, 'depth', 0)
+            _output_state.depth = depth + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _output_state.depth = depth
+        return call
 
-        self.session = requests.Session()
-        self.session.get("http://nseindia.com", headers=self.headers)
-        self.cookies = self.session.cookies.get_dict()
+    def session_stats(self):
+        """
+        Returns the cookie priming counters of the shared session
+        :return: dict
+        """
+        return self.nse_session.stats()
 
-    def pre_market_info(self, category='All'):
-        pre_market_xref = {"NIFTY 50": "NIFTY", "Nifty Bank": "BANKNIFTY", "Emerge": "SME", "Securities in F&O": "FO",
-                           "Others": "OTHERS", "All": "ALL"}
+    def stats(self):
+        """
+        Per endpoint request metrics (latency, bytes, status codes, retries, parse time) and cache hit ratios
+        :return: dict, see nse_metrics.Metrics.stats
+        """
+        return self.metrics.stats()
 
+    @timed_parse
+    @frame_output
+    def pre_market_info(self, category='All'):
         ref_url = 'https://www.nseindia.com/market-data/pre-open-market-cm-and-emerge-market'
-        ref = requests.get(ref_url, headers=self.headers)
-        url = f"https://www.nseindia.com/api/market-data-pre-open?key={pre_market_xref[category]}"
-        response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
+        url = f"https://www.nseindia.com/api/market-data-pre-open?key={self.pre_market_xref[category]}"
+        response = self._get(url, ref_url)
+        return self._parse_pre_market(response.json())
+
+    @staticmethod
+    def _parse_pre_market(data):
         processed_data = []
-        data = response.json()['data']
-        for i in data:
+        for i in data['data']:
             processed_data.append(i["metadata"])
         df = pd.DataFrame(processed_data)
         df = df.set_index("symbol", drop=True)
         return df
 
-    def get_index_details(self, category, list_only=False):
+    @staticmethod
+    def _index_details_urls(category):
         category = category.upper().replace('&', '%26').replace(' ', '%20')
-
-        ref_url = "https://www.nseindia.com/market-data/live-equity-market?symbol={category}"
-        ref = requests.get(ref_url, headers=self.headers)
+        ref_url = f"https://www.nseindia.com/market-data/live-equity-market?symbol={category}"
         url = f"https://www.nseindia.com/api/equity-stockIndices?index={category}"
-        data = requests.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()
+        return url, ref_url
+
+    @timed_parse
+    @frame_output
+    def get_index_details(self, category, list_only=False):
+        url, ref_url = self._index_details_urls(category)
+        data = self._get(url, ref_url).json()
+        df = self._parse_index_details(data)
+        if self.index_membership is not None:
+            self.index_membership.update(category.upper(), df.index[1:])
+        return sorted(df.index[1:].tolist()) if list_only else df
+
+    @staticmethod
+    def _parse_index_details(data, list_only=False):
         df = pd.DataFrame(data['data'])
         df = df.drop(["meta"], axis=1)
         df = df.set_index("symbol", drop=True)
@@ -88,6 +499,8 @@ class NseUtils:
         else:
             return df
 
+    @timed_parse
+    @frame_output
     def clearing_holidays(self, list_only=False):
         """
         Returns the list of NSE clearing holidays
@@ -95,14 +508,11 @@ class NseUtils:
         full details are provided in a dataframe
         :return:
         """
-        data = self.session.get(f'https://www.nseindia.com/api/holiday-master?type={'Clearing'.lower()}',
-                                headers=self.headers).json()
-        df = pd.DataFrame(list(data.values())[0])
-        if list_only:
-            holiday_list = df['tradingDate'].tolist()
-            return holiday_list
-        return df
+        data = self._get('https://www.nseindia.com/api/holiday-master?type=clearing').json()
+        return self._parse_holidays(data, list_only)
 
+    @timed_parse
+    @frame_output
     def trading_holidays(self, list_only=False):
         """
         Returns the list of NSE trading holidays
@@ -110,14 +520,16 @@ class NseUtils:
         full details are provided in a dataframe
         :return:
         """
-        data = self.session.get(f'https://www.nseindia.com/api/holiday-master?type={'Trading'.lower()}',
-                                headers=self.headers).json()
+        data = self._get('https://www.nseindia.com/api/holiday-master?type=trading').json()
+        return self._parse_holidays(data, list_only)
+
+    @staticmethod
+    def _parse_holidays(data, list_only=False):
         df = pd.DataFrame(list(data.values())[0])
         if list_only:
             holiday_list = df['tradingDate'].tolist()
             return holiday_list
-        else:
-            return df
+        return df
 
     def is_nse_trading_holiday(self, date_str=None):
         """
@@ -125,21 +537,8 @@ class NseUtils:
         :param date_str: Optional. If no date provided, current data will be assumed
         :return:
         """
-        holidays = self.trading_holidays(list_only=True)  # Fetch Trading holiday list from NSE
-
-        date_format = "%d-%b-%Y"  # Define the expected date format
-        # If date_str is provided, validate and parse it
-        if date_str:
-            try:
-                date_obj = datetime.strptime(date_str, date_format)  # Convert string to datetime
-            except ValueError:
-                print("Error: Invalid date format! Please use 'DD-MMM-YYYY' (e.g., '19-Feb-2025').")
-                return None
-        else:
-            date_obj = datetime.today()  # Use today's date if no input is given
-
-        formatted_date = date_obj.strftime(date_format)  # Convert date back to the required format
-        return formatted_date in holidays  # Check if it’s a holiday
+        date_obj = self._holiday_date(date_str)
+        return None if date_obj is None else self.calendar.is_trading_holiday(date_obj)
 
     def is_nse_clearing_holiday(self, date_str=None):
         """
@@ -147,8 +546,11 @@ class NseUtils:
         :param date_str: Optional. If no date provided, current data will be assumed
         :return:
         """
-        holidays = self.clearing_holidays(list_only=True)  # Fetch Trading holiday list from NSE
+        date_obj = self._holiday_date(date_str)
+        return None if date_obj is None else self.calendar.is_clearing_holiday(date_obj)
 
+    @staticmethod
+    def _holiday_date(date_str=None):
         date_format = "%d-%b-%Y"  # Define the expected date format
         # If date_str is provided, validate and parse it
         if date_str:
@@ -159,10 +561,9 @@ class NseUtils:
                 return None
         else:
             date_obj = datetime.today()  # Use today's date if no input is given
+        return date_obj
 
-        formatted_date = date_obj.strftime(date_format)  # Convert date back to the required format
-        return formatted_date in holidays  # Check if it’s a holiday
-
+    @timed_parse
     def equity_info(self, symbol):
         """
         Extracts the full details of a symbol as see on NSE website
@@ -173,18 +574,18 @@ class NseUtils:
 
         # Fetch primary details
         ref_url = 'https://www.nseindia.com/get-quotes/equity?symbol=' + symbol
-        ref = requests.get(ref_url, headers=self.headers)
         url = 'https://www.nseindia.com/api/quote-equity?symbol=' + symbol
-        data = requests.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()
+        data = self._get(url, ref_url).json()
 
         # Fetch Trade Data for symbol  ('Trade Information' tab on NSE website)
         url = 'https://www.nseindia.com/api/quote-equity?symbol=' + symbol + "&section=trade_info"
-        trade_data = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()
+        trade_data = self._get(url, ref_url).json()
 
         # Merge Meta data with Trade Information into final dataset
         data['tradeData'] = trade_data
         return data
 
+    @timed_parse
     def price_info(self, symbol):
         """
         Gets all key price related information for a given stock
@@ -194,9 +595,12 @@ class NseUtils:
         """
         symbol = symbol.replace(' ', '%20').replace('&', '%26')
         ref_url = 'https://www.nseindia.com/get-quotes/equity?symbol=' + symbol
-        ref = requests.get(ref_url, headers=self.headers)
         url = 'https://www.nseindia.com/api/quote-equity?symbol=' + symbol
-        data = requests.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()
+        data = self._get(url, ref_url).json()
+        return self._parse_price_info(symbol, data)
+
+    @staticmethod
+    def _parse_price_info(symbol, data):
         if not data:
             return None
         if 'error' in data:
@@ -217,6 +621,8 @@ class NseUtils:
             "LowerCircuit": data['priceInfo']['lowerCP'],
         }
 
+    @timed_parse
+    @frame_output
     def futures_data(self, symbol, indices=False):
         """
         Returns the list of futures instruments for a given stock and its  details
@@ -227,11 +633,13 @@ class NseUtils:
         symbol = symbol.replace(' ', '%20').replace('&', '%26')
 
         ref_url = 'https://www.nseindia.com/get-quotes/derivatives?symbol=' + symbol
-        ref = requests.get(ref_url, headers=self.headers)
 
         url = 'https://www.nseindia.com/api/quote-derivative?symbol=' + symbol
-        data = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()
+        data = self._get(url, ref_url).json()
+        return self._parse_futures_data(data, indices)
 
+    @staticmethod
+    def _parse_futures_data(data, indices=False):
         lst = []
         for i in data["stocks"]:
             if i["metadata"]["instrumentType"] == ("Index Futures" if indices else "Stock Futures"):
@@ -240,6 +648,8 @@ class NseUtils:
         df = df.set_index("identifier", drop=True)
         return df
 
+    @timed_parse
+    @frame_output
     def get_option_chain(self, symbol, indices=False):
         """
         Returns the full option chain table as seen on NSE website for the given stock/index
@@ -248,17 +658,18 @@ class NseUtils:
         :return:
         """
         symbol = symbol.replace(' ', '%20').replace('&', '%26')
+        ref_url = 'https://www.nseindia.com/get-quotes/derivatives?symbol=' + symbol
+        data = self._get(self._option_chain_url(symbol, indices), ref_url).json()["records"]
+        return self._parse_option_chain(data)
+
+    @staticmethod
+    def _option_chain_url(symbol, indices=False):
         if not indices:
-            ref_url = 'https://www.nseindia.com/get-quotes/derivatives?symbol=' + symbol
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/option-chain-equities?symbol=' + symbol
-            data = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()["records"]
-        else:
-            ref_url = 'https://www.nseindia.com/get-quotes/derivatives?symbol=' + symbol
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/option-chain-indices?symbol=' + symbol
-            data = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()["records"]
+            return 'https://www.nseindia.com/api/option-chain-equities?symbol=' + symbol
+        return 'https://www.nseindia.com/api/option-chain-indices?symbol=' + symbol
 
+    @staticmethod
+    def _parse_option_chain(data):
         my_df = []
         for i in data["data"]:
             for k, v in i.items():
@@ -271,17 +682,32 @@ class NseUtils:
         df = df.set_index("identifier", drop=True)
         return df
 
+    @timed_parse
+    @frame_output
     def get_52week_high_low(self, stock=None):
         """
         Get 52 Week High and Low data.  If stock is provided, the High/Low data for that
-        particular stock is returned. If not, the  full list is returned
+        particular stock is returned. If not, the  full list is returned.
+        Computed from the equity bhav copies of the last 52 weeks: the first call downloads the missing ones
+        (served by the bhav archive when present), later calls only add the new trading days. A client created
+        with high_low_store=False downloads the NSE 52 week high / low file instead.
         :param stock: Optional
-        :return:
+        :return: dict for a stock (None when it did not trade in the window), else pandas data frame
         """
-        url = 'https://nsearchives.nseindia.com/content/CM_52_wk_High_low_25012024.csv'
+        store = self.high_low_store
+        if store is None:
+            url = 'https://nsearchives.nseindia.com/content/CM_52_wk_High_low_25012024.csv'
+            response = self._get(url)
+            return self._parse_52week_high_low(response.text, stock)
+        store.sync(lambda from_date, to_date: self._bhav_copy_range('equity', self.equity_bhav_copy, from_date,
+                                                                     to_date, 8))
+        if stock is not None:
+            return store.get(stock)
+        return store.frame()
 
-        response = requests.get(url, headers=self.headers)
-        data = StringIO(response.text.replace(
+    @staticmethod
+    def _parse_52week_high_low(text, stock=None):
+        data = StringIO(text.replace(
             '"Disclaimer - The Data provided in the adjusted 52 week high and adjusted 52 week low columns  are adjusted for corporate actions (bonus, splits & rights).For actual (unadjusted) 52 week high & low prices, kindly refer bhavcopy."\n"Effective for 25-Jan-2024"\n',
             ''))
         df = pd.read_csv(data)
@@ -300,98 +726,252 @@ class NseUtils:
         # Return the full 52 Week High/Low list of all stocks
         return df
 
+    @timed_parse
+    @frame_output
     def fno_bhav_copy(self, trade_date: str = ""):
         """
         Get the NSE FNO bhav copy data as per the traded date
         :param trade_date: eg:'20-06-2023'
         :return: pandas data frame
         """
-        bhav_df = pd.DataFrame()
+        return self._bhav_copy('fno', trade_date, self._download_fno_bhav_copy)
+
+    def _bhav_copy(self, report, trade_date, download):
+        """
+        Serve a bhav copy from the local archive when the trade date is already archived, otherwise
+        download, type and archive it.
+        :param report: key of nse_schemas.BHAV_SCHEMAS
+        :param trade_date: eg:'20-06-2023'
+        :param download: callable taking the trade date as datetime and returning the parsed frame
+        :return: pandas data frame
+        """
         trade_date = datetime.strptime(trade_date, "%d-%m-%Y")
+        archive = self.bhav_archive
+        if archive is not None and archive.is_immutable(trade_date):
+            bhav_df = archive.load(report, trade_date)
+            if bhav_df is not None:
+                return bhav_df
+
+        bhav_df = download(trade_date)
+        if bhav_df.empty:
+            return bhav_df
+        bhav_df = apply_schema(bhav_df, BHAV_SCHEMAS[report], copy=False)
+        if archive is not None:
+            archive.store(report, trade_date, bhav_df)
+        return bhav_df
+
+    # Bytes of a streamed download kept in memory before it is spooled to a temporary file
+    spool_max_size = 1 << 20
+
+    def _spooled(self, response):
+        """
+        Stream a response body into a spooled temporary file
+        :return: SpooledTemporaryFile positioned at the start
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_max_size)
+        with response:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                spool.write(chunk)
+        spool.seek(0)
+        return spool
+
+    def _read_bhav_csv(self, response, report, **kwargs):
+        """Parse a streamed bhav csv, with the categorical columns of its schema built while parsing"""
+        with self._spooled(response) as spool:
+            return pd.read_csv(spool, dtype=csv_dtypes(BHAV_SCHEMAS[report]), **kwargs)
+
+    def _read_zipped_bhav_csv(self, response, report):
+        """Parse the csv in a streamed bhav zip, decompressing the member while it is parsed"""
+        with self._spooled(response) as spool, zipfile.ZipFile(spool) as zip_bhav:
+            members = zip_bhav.infolist()
+            if not members:
+                return pd.DataFrame()
+            with zip_bhav.open(members[-1]) as csv_stream:
+                return pd.read_csv(csv_stream, dtype=csv_dtypes(BHAV_SCHEMAS[report]))
+
+    def _download_fno_bhav_copy(self, trade_date):
         url = 'https://nsearchives.nseindia.com/content/fo/BhavCopy_NSE_FO_0_0_0_'
         payload = f"{str(trade_date.strftime('%Y%m%d'))}_F_0000.csv.zip"
-        request_bhav = requests.get(url + payload, headers=self.headers)
+        request_bhav = self._get(url + payload, stream=True)
         bhav_df = pd.DataFrame()
 
         if request_bhav.status_code == 200:
-            zip_bhav = zipfile.ZipFile(BytesIO(request_bhav.content), 'r')
-            for file_name in zip_bhav.filelist:
-                if file_name:
-                    bhav_df = pd.read_csv(zip_bhav.open(file_name))
+            bhav_df = self._read_zipped_bhav_csv(request_bhav, 'fno')
         elif request_bhav.status_code == 403:
+            request_bhav.close()
             url2 = "https://www.nseindia.com/api/reports?archives=" \
                    "%5B%7B%22name%22%3A%22F%26O%20-%20Bhavcopy(csv)%22%2C%22type%22%3A%22archives%22%2C%22category%22" \
                    f"%3A%22derivatives%22%2C%22section%22%3A%22equity%22%7D%5D&date={str(trade_date.strftime('%d-%b-%Y'))}" \
                    f"&type=equity&mode=single"
-            request_bhav = requests.get(url2 + payload, headers=self.headers)
+            request_bhav = self._get(url2 + payload, stream=True)
             if request_bhav.status_code == 200:
-                zip_bhav = zipfile.ZipFile(BytesIO(request_bhav.content), 'r')
-                for file_name in zip_bhav.filelist:
-                    if file_name:
-                        bhav_df = pd.read_csv(zip_bhav.open(file_name))
+                bhav_df = self._read_zipped_bhav_csv(request_bhav, 'fno')
             elif request_bhav.status_code == 403:
                 raise FileNotFoundError(f' Data not found, change the date...')
 
         return bhav_df
 
+    @timed_parse
+    @frame_output
     def bhav_copy_with_delivery(self, trade_date: str):
         """
         Get the NSE bhav copy with delivery data as per the traded date
         :param trade_date: eg:'20-06-2023'
         :return: pandas data frame
         """
-        trade_date = datetime.strptime(trade_date, "%d-%m-%Y")
+        return self._bhav_copy('delivery', trade_date, self._download_bhav_copy_with_delivery)
+
+    def _download_bhav_copy_with_delivery(self, trade_date):
         use_date = trade_date.strftime("%d%m%Y")
         url = f'https://nsearchives.nseindia.com/products/content/sec_bhavdata_full_{use_date}.csv'
-        request_bhav = requests.get(url, headers=self.headers)
+        request_bhav = self._get(url, stream=True)
         if request_bhav.status_code == 200:
-            bhav_df = pd.read_csv(BytesIO(request_bhav.content))
+            # The report pads every field with a leading space, skipped while parsing
+            bhav_df = self._read_bhav_csv(request_bhav, 'delivery', skipinitialspace=True)
         else:
             raise FileNotFoundError(f' Data not found, change the trade_date...')
         bhav_df.columns = [name.replace(' ', '') for name in bhav_df.columns]
-        bhav_df['SERIES'] = bhav_df['SERIES'].str.replace(' ', '')
-        bhav_df['DATE1'] = bhav_df['DATE1'].str.replace(' ', '')
         return bhav_df
 
+    @timed_parse
+    @frame_output
     def equity_bhav_copy(self, trade_date: str):
         """
         Extract Equity Bhav Copy per the traded date provided
         :param trade_date:
         :return: pandas dataframe
         """
-        trade_date = datetime.strptime(trade_date, "%d-%m-%Y")
-        # trade_date = datetime.strptime(trade_date, dd_mm_yyyy)
+        return self._bhav_copy('equity', trade_date, self._download_equity_bhav_copy)
+
+    def _download_equity_bhav_copy(self, trade_date):
         url = 'https://nsearchives.nseindia.com/content/cm/BhavCopy_NSE_CM_0_0_0_'
         payload = f"{str(trade_date.strftime('%Y%m%d'))}_F_0000.csv.zip"
-        request_bhav = requests.get(url + payload, headers=self.headers)
+        request_bhav = self._get(url + payload, stream=True)
         bhav_df = pd.DataFrame()
         if request_bhav.status_code == 200:
-            zip_bhav = zipfile.ZipFile(BytesIO(request_bhav.content), 'r')
-            for file_name in zip_bhav.filelist:
-                if file_name:
-                    bhav_df = pd.read_csv(zip_bhav.open(file_name))
+            bhav_df = self._read_zipped_bhav_csv(request_bhav, 'equity')
         elif request_bhav.status_code == 403:
             raise FileNotFoundError(f' Data not found, change the trade_date...')
         return bhav_df
 
+    @timed_parse
+    @frame_output
     def bhav_copy_indices(self, trade_date: str):
         """
         Get nse bhav copy as per the traded date provided
         :param trade_date: eg:'20-06-2023'
         :return: pandas dataframe
         """
-        trade_date = datetime.strptime(trade_date, "%d-%m-%Y")
+        return self._bhav_copy('indices', trade_date, self._download_bhav_copy_indices)
+
+    def _download_bhav_copy_indices(self, trade_date):
         url = f"https://nsearchives.nseindia.com/content/indices/ind_close_all_{str(trade_date.strftime('%d%m%Y').upper())}.csv"
         # nse_resp = nse_urlfetch(url)
-        nse_resp = requests.get(url, headers=self.headers)
+        nse_resp = self._get(url, stream=True)
         if nse_resp.status_code != 200:
             raise FileNotFoundError(f" No data available for : {trade_date}")
         try:
-            bhav_df = pd.read_csv(BytesIO(nse_resp.content))
+            bhav_df = self._read_bhav_csv(nse_resp, 'indices')
         except Exception as e:
             raise FileNotFoundError(f' Bhav copy indices not found for : {trade_date} :: NSE error : {e}')
         return bhav_df
 
+    def trading_days(self, from_date: str, to_date: str):
+        """
+        Returns the NSE trading sessions between two dates (both inclusive): weekdays that are not trading holidays
+        :param from_date: eg:'01-06-2023'
+        :param to_date: eg:'30-06-2023'
+        :return: list of datetime
+        """
+        from_dt = datetime.strptime(from_date, "%d-%m-%Y")
+        to_dt = datetime.strptime(to_date, "%d-%m-%Y")
+        return pd.DatetimeIndex(self.calendar.trading_days_between(from_dt, to_dt)).to_pydatetime().tolist()
+
+    def _bhav_copy_range(self, report, fetch, from_date, to_date, max_workers):
+        """
+        Download the bhav copies of every trading day in a date range concurrently and stack them
+        into one frame with a TRADE_DATE column
+        :param fetch: single day loader, eg: self.equity_bhav_copy
+        :return: pandas data frame
+        """
+        days = self.trading_days(from_date, to_date)
+        frames = {}
+        missing = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_day = {executor.submit(self._unconverted(fetch), day.strftime("%d-%m-%Y")): day
+                             for day in days}
+            for future in as_completed(future_to_day):
+                day = future_to_day[future]
+                try:
+                    bhav_df = future.result()
+                except FileNotFoundError as e:
+                    # Unscheduled closures are not in the holiday list, NSE simply has no file for them
+                    print(f"No {report} bhav copy for {day:%d-%m-%Y}: {e}")
+                    missing.append(day)
+                    continue
+                if bhav_df.empty:
+                    missing.append(day)
+                else:
+                    frames[day] = bhav_df
+        # Holidays of past years the calendar has no list for are not requested again
+        if missing:
+            self.calendar.add_closures(missing)
+
+        if not frames:
+            return pd.DataFrame()
+        stacked = []
+        for day in sorted(frames):
+            bhav_df = frames[day]
+            bhav_df.insert(0, 'TRADE_DATE', pd.Timestamp(day).as_unit('ns'))
+            stacked.append(bhav_df)
+        return pd.concat(stacked, ignore_index=True)
+
+    @frame_output
+    def equity_bhav_copy_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        """
+        Equity bhav copies of every trading day between two dates (both inclusive) in one frame
+        :param from_date: eg:'01-06-2023'
+        :param to_date: eg:'30-06-2023'
+        :param max_workers: Optional. Number of concurrent downloads
+        :return: pandas data frame with a TRADE_DATE column
+        """
+        return self._bhav_copy_range('equity', self.equity_bhav_copy, from_date, to_date, max_workers)
+
+    @frame_output
+    def fno_bhav_copy_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        """
+        FNO bhav copies of every trading day between two dates (both inclusive) in one frame
+        :param from_date: eg:'01-06-2023'
+        :param to_date: eg:'30-06-2023'
+        :param max_workers: Optional. Number of concurrent downloads
+        :return: pandas data frame with a TRADE_DATE column
+        """
+        return self._bhav_copy_range('fno', self.fno_bhav_copy, from_date, to_date, max_workers)
+
+    @frame_output
+    def bhav_copy_with_delivery_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        """
+        Bhav copies with delivery data of every trading day between two dates (both inclusive) in one frame
+        :param from_date: eg:'01-06-2023'
+        :param to_date: eg:'30-06-2023'
+        :param max_workers: Optional. Number of concurrent downloads
+        :return: pandas data frame with a TRADE_DATE column
+        """
+        return self._bhav_copy_range('delivery', self.bhav_copy_with_delivery, from_date, to_date, max_workers)
+
+    @frame_output
+    def bhav_copy_indices_range(self, from_date: str, to_date: str, max_workers: int = 8):
+        """
+        Index bhav copies of every trading day between two dates (both inclusive) in one frame
+        :param from_date: eg:'01-06-2023'
+        :param to_date: eg:'30-06-2023'
+        :param max_workers: Optional. Number of concurrent downloads
+        :return: pandas data frame with a TRADE_DATE column
+        """
+        return self._bhav_copy_range('indices', self.bhav_copy_indices, from_date, to_date, max_workers)
+
+    @timed_parse
+    @frame_output
     def fii_dii_activity(self):
         """
         FII and DII trading activity of the day in data frame
@@ -399,107 +979,37 @@ class NseUtils:
         """
         url = "https://www.nseindia.com/api/fiidiiTradeReact"
         # data_json = nse_urlfetch(url).json()
-        data_json = requests.get(url, headers=self.headers)
-        data_df = pd.DataFrame(data_json.json())
+        data_json = self._get(url)
+        return self._parse_fii_dii(data_json.json())
+
+    @staticmethod
+    def _parse_fii_dii(data):
+        data_df = pd.DataFrame(data)
         return data_df
 
-    def get_live_option_chain(self, symbol: str, expiry_date: str = None, oi_mode: str = "full", indices=False):
+    @timed_parse
+    @frame_output
+    def get_live_option_chain(self, symbol: str, expiry_date: str = None, oi_mode: str = "full", indices=False,
+                              as_array=False):
         """
         get live nse option chain.
         :param symbol: eg:SBIN/BANKNIFTY
         :param expiry_date: '20-06-2023'
         :param oi_mode: eg: full/compact
+        :param as_array: If True returns a numpy structured array instead of a DataFrame
         :return: pands dataframe
         """
         symbol = symbol.replace(' ', '%20').replace('&', '%26')
         ref_url = 'https://www.nseindia.com/option-chain'
-        ref = requests.get(ref_url, headers=self.headers)
-        if not indices:
-            url = 'https://www.nseindia.com/api/option-chain-equities?symbol=' + symbol
-        else:
-            # ref_url = 'https://www.nseindia.com/option-chain'
-            # ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/option-chain-indices?symbol=' + symbol
-        payload = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()
+        payload = self._get(self._option_chain_url(symbol, indices), ref_url).json()
         # payload = get_nse_option_chain(symbol).json()
-        if expiry_date:
-            exp_date = pd.to_datetime(expiry_date, format='%d-%m-%Y')
-            expiry_date = exp_date.strftime('%d-%b-%Y')
-
-        if oi_mode == 'compact':
-            col_names = ['Fetch_Time', 'Symbol', 'Expiry_Date', 'CALLS_OI', 'CALLS_Chng_in_OI', 'CALLS_Volume',
-                         'CALLS_IV',
-                         'CALLS_LTP', 'CALLS_Net_Chng', 'Strike_Price', 'PUTS_OI', 'PUTS_Chng_in_OI', 'PUTS_Volume',
-                         'PUTS_IV', 'PUTS_LTP', 'PUTS_Net_Chng']
-        else:
-            col_names = ['Fetch_Time', 'Symbol', 'Expiry_Date', 'CALLS_OI', 'CALLS_Chng_in_OI', 'CALLS_Volume',
-                         'CALLS_IV',
-                         'CALLS_LTP', 'CALLS_Net_Chng', 'CALLS_Bid_Qty', 'CALLS_Bid_Price', 'CALLS_Ask_Price',
-                         'CALLS_Ask_Qty', 'Strike_Price', 'PUTS_Bid_Qty', 'PUTS_Bid_Price', 'PUTS_Ask_Price',
-                         'PUTS_Ask_Qty',
-                         'PUTS_Net_Chng', 'PUTS_LTP', 'PUTS_IV', 'PUTS_Volume', 'PUTS_Chng_in_OI', 'PUTS_OI']
-
-        oi_data = pd.DataFrame(columns=col_names)
-
-        oi_row = {'Fetch_Time': None, 'Symbol': None, 'Expiry_Date': None, 'CALLS_OI': 0, 'CALLS_Chng_in_OI': 0,
-                  'CALLS_Volume': 0,
-                  'CALLS_IV': 0, 'CALLS_LTP': 0, 'CALLS_Net_Chng': 0, 'CALLS_Bid_Qty': 0, 'CALLS_Bid_Price': 0,
-                  'CALLS_Ask_Price': 0, 'CALLS_Ask_Qty': 0, 'Strike_Price': 0, 'PUTS_OI': 0, 'PUTS_Chng_in_OI': 0,
-                  'PUTS_Volume': 0, 'PUTS_IV': 0, 'PUTS_LTP': 0, 'PUTS_Net_Chng': 0, 'PUTS_Bid_Qty': 0,
-                  'PUTS_Bid_Price': 0, 'PUTS_Ask_Price': 0, 'PUTS_Ask_Qty': 0}
-
-        for m in range(len(payload['records']['data'])):
-            if not expiry_date or (payload['records']['data'][m]['expiryDate'] == expiry_date):
-                try:
-                    oi_row['Expiry_Date'] = payload['records']['data'][m]['expiryDate']
-                    oi_row['CALLS_OI'] = payload['records']['data'][m]['CE']['openInterest']
-                    oi_row['CALLS_Chng_in_OI'] = payload['records']['data'][m]['CE']['changeinOpenInterest']
-                    oi_row['CALLS_Volume'] = payload['records']['data'][m]['CE']['totalTradedVolume']
-                    oi_row['CALLS_IV'] = payload['records']['data'][m]['CE']['impliedVolatility']
-                    oi_row['CALLS_LTP'] = payload['records']['data'][m]['CE']['lastPrice']
-                    oi_row['CALLS_Net_Chng'] = payload['records']['data'][m]['CE']['change']
-                    if oi_mode == 'full':
-                        oi_row['CALLS_Bid_Qty'] = payload['records']['data'][m]['CE']['bidQty']
-                        oi_row['CALLS_Bid_Price'] = payload['records']['data'][m]['CE']['bidprice']
-                        oi_row['CALLS_Ask_Price'] = payload['records']['data'][m]['CE']['askPrice']
-                        oi_row['CALLS_Ask_Qty'] = payload['records']['data'][m]['CE']['askQty']
-                except KeyError:
-                    oi_row['CALLS_OI'], oi_row['CALLS_Chng_in_OI'], oi_row['CALLS_Volume'], oi_row['CALLS_IV'], oi_row[
-                        'CALLS_LTP'], oi_row['CALLS_Net_Chng'] = 0, 0, 0, 0, 0, 0
-                    if oi_mode == 'full':
-                        oi_row['CALLS_Bid_Qty'], oi_row['CALLS_Bid_Price'], oi_row['CALLS_Ask_Price'], oi_row[
-                            'CALLS_Ask_Qty'] = 0, 0, 0, 0
-                    pass
-
-                oi_row['Strike_Price'] = payload['records']['data'][m]['strikePrice']
+        return self._parse_live_option_chain(payload, symbol, expiry_date, oi_mode, as_array)
 
-                try:
-                    oi_row['PUTS_OI'] = payload['records']['data'][m]['PE']['openInterest']
-                    oi_row['PUTS_Chng_in_OI'] = payload['records']['data'][m]['PE']['changeinOpenInterest']
-                    oi_row['PUTS_Volume'] = payload['records']['data'][m]['PE']['totalTradedVolume']
-                    oi_row['PUTS_IV'] = payload['records']['data'][m]['PE']['impliedVolatility']
-                    oi_row['PUTS_LTP'] = payload['records']['data'][m]['PE']['lastPrice']
-                    oi_row['PUTS_Net_Chng'] = payload['records']['data'][m]['PE']['change']
-                    if oi_mode == 'full':
-                        oi_row['PUTS_Bid_Qty'] = payload['records']['data'][m]['PE']['bidQty']
-                        oi_row['PUTS_Bid_Price'] = payload['records']['data'][m]['PE']['bidprice']
-                        oi_row['PUTS_Ask_Price'] = payload['records']['data'][m]['PE']['askPrice']
-                        oi_row['PUTS_Ask_Qty'] = payload['records']['data'][m]['PE']['askQty']
-                except KeyError:
-                    oi_row['PUTS_OI'], oi_row['PUTS_Chng_in_OI'], oi_row['PUTS_Volume'], oi_row['PUTS_IV'], oi_row[
-                        'PUTS_LTP'], oi_row['PUTS_Net_Chng'] = 0, 0, 0, 0, 0, 0
-                    if oi_mode == 'full':
-                        oi_row['PUTS_Bid_Qty'], oi_row['PUTS_Bid_Price'], oi_row['PUTS_Ask_Price'], oi_row[
-                            'PUTS_Ask_Qty'] = 0, 0, 0, 0
-
-                if oi_data.empty:
-                    oi_data = pd.DataFrame([oi_row]).copy()
-                else:
-                    oi_data = pd.concat([oi_data, pd.DataFrame([oi_row])], ignore_index=True)
-                oi_data['Symbol'] = symbol
-                oi_data['Fetch_Time'] = payload['records']['timestamp']
-        return oi_data
+    @staticmethod
+    def _parse_live_option_chain(payload, symbol, expiry_date=None, oi_mode="full", as_array=False):
+        return parse_option_chain(payload, symbol, expiry_date, oi_mode, as_array)
 
+    @timed_parse
     def get_market_depth(self, symbol):
 
         """
@@ -514,19 +1024,76 @@ class NseUtils:
         }
         return merged_dict
 
-    def get_index_historic_data(self, index: str, from_date: str = None, to_date: str = None):
+    @timed_parse
+    @frame_output
+    def get_index_historic_data(self, index: str, from_date: str = None, to_date: str = None, max_workers: int = 8):
         """
         get historical index data set for the specific time period.
         apply the index name as per the nse india site
+        Past days are kept in the local index history store, so only the part of the range that was not
+        downloaded before is requested. The <= 365 day windows of that part are downloaded concurrently.
         :param index: 'NIFTY 50'/'NIFTY BANK'
         :param from_date: '17-03-2022' ('dd-mm-YYYY')
         :param to_date: '17-06-2023' ('dd-mm-YYYY')
-        :return: pandas.DataFrame
+        :param max_workers: Optional. Number of windows downloaded in parallel
+        :return: pandas.DataFrame, oldest day first
+        :raise ValueError if the parameter input is not proper
+        """
+        windows, ranges = self._index_history_plan(index, from_date, to_date)
+        frames = {}
+        if windows:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(windows))) as executor:
+                future_to_window = {executor.submit(self._unconverted(self.get_index_data), index, start, end): (start, end)
+                                    for start, end in windows}
+                for future in as_completed(future_to_window):
+                    frames[future_to_window[future]] = future.result()
+        return self._index_history_merge(index, from_date, to_date, [frames[window] for window in windows], ranges)
+
+    def _index_history_plan(self, index, from_date, to_date):
+        """
+        Windows that have to be downloaded for a request
+        :return: (list of (start_date, end_date) windows in 'dd-mm-YYYY', list of (start, end) date ranges they cover)
+        """
+        windows = self._index_history_windows(from_date, to_date)
+        if self.index_store is None:
+            return windows, []
+        from_dt = datetime.strptime(from_date, "%d-%m-%Y").date()
+        to_dt = datetime.strptime(to_date, "%d-%m-%Y").date()
+        ranges = self.index_store.missing(index, from_dt, to_dt)
+        windows = []
+        for start, end in ranges:
+            # The api wants at least one day between from and to
+            start = min(start, end - timedelta(days=1))
+            windows.extend(self._index_history_windows(start.strftime("%d-%m-%Y"), end.strftime("%d-%m-%Y")))
+        return windows, ranges
+
+    def _index_history_merge(self, index, from_date, to_date, frames, ranges):
+        """
+        Store the downloaded windows and combine them with the stored rows of the requested range
+        :return: pandas.DataFrame, oldest day first
+        """
+        from_dt = datetime.strptime(from_date, "%d-%m-%Y")
+        to_dt = datetime.strptime(to_date, "%d-%m-%Y")
+        frames = [frame for frame in frames if frame is not None and not frame.empty]
+        fetched = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(INDEX_HISTORY_SCHEMA))
+        if self.index_store is not None:
+            self.index_store.store(index, fetched, ranges)
+            fetched = pd.concat([self.index_store.load(index, from_dt, to_dt), fetched], ignore_index=True)
+        nse_df = apply_schema(fetched, INDEX_HISTORY_SCHEMA)
+        dates = index_dates(nse_df['TIMESTAMP'])
+        nse_df = nse_df.assign(_date=dates)[((dates >= from_dt) & (dates <= to_dt)).to_numpy()]
+        nse_df = nse_df.drop_duplicates('_date', keep='last').sort_values('_date').drop(columns='_date')
+        return nse_df[list(INDEX_HISTORY_SCHEMA)].reset_index(drop=True)
+
+    @staticmethod
+    def _index_history_windows(from_date, to_date):
+        """
+        Split a date range into the <= 365 day windows accepted by the indicesHistory api
+        :param from_date: '17-03-2022' ('dd-mm-YYYY')
+        :param to_date: '17-06-2023' ('dd-mm-YYYY')
+        :return: list of (start_date, end_date) tuples in 'dd-mm-YYYY'
         :raise ValueError if the parameter input is not proper
         """
-        index_data_columns = ['TIMESTAMP', 'INDEX_NAME', 'OPEN_INDEX_VAL', 'HIGH_INDEX_VAL', 'CLOSE_INDEX_VAL',
-                              'LOW_INDEX_VAL', 'TRADED_QTY', 'TURN_OVER']
-
         # Check for valid dates and period inputs
         if not from_date or not to_date:
             raise ValueError(' Please provide the valid parameters')
@@ -541,7 +1108,7 @@ class NseUtils:
             print(e)
             raise ValueError(f'either or both from_date = {from_date} || to_date = {to_date} are not valid value')
 
-        nse_df = pd.DataFrame(columns=index_data_columns)
+        windows = []
         from_date = datetime.strptime(from_date, "%d-%m-%Y")
         to_date = datetime.strptime(to_date, "%d-%m-%Y")
         load_days = (to_date - from_date).days
@@ -554,36 +1121,45 @@ class NseUtils:
                 end_date = to_date.strftime("%d-%m-%Y")
                 start_date = from_date.strftime("%d-%m-%Y")
 
-            data_df = self.get_index_data(index=index, from_date=start_date, to_date=end_date)
+            windows.append((start_date, end_date))
             from_date = from_date + timedelta(365)
             load_days = (to_date - from_date).days
-            if nse_df.empty:
-                nse_df = data_df
-            else:
-                nse_df = pd.concat([nse_df, data_df], ignore_index=True)
-        return nse_df
+        return windows
 
+    @timed_parse
+    @frame_output
     def get_index_data(self, index: str, from_date: str, to_date: str):
+        url, ref_url = self._index_data_urls(index, from_date, to_date)
+        try:
+            data_json = self._get(url, ref_url).json()
+        except Exception as e:
+            raise ValueError(" Resource not available") from e
+        return self._parse_index_data(data_json)
 
-        index_data_columns = ['TIMESTAMP', 'INDEX_NAME', 'OPEN_INDEX_VAL', 'HIGH_INDEX_VAL', 'CLOSE_INDEX_VAL',
-                              'LOW_INDEX_VAL', 'TRADED_QTY', 'TURN_OVER']
-
+    @staticmethod
+    def _index_data_urls(index, from_date, to_date):
         index = index.replace(' ', '%20').upper()
         ref_url = 'https://www.nseindia.com/reports-indices-historical-index-data'
-        ref = requests.get(ref_url, headers=self.headers)
-
         url = f"https://www.nseindia.com/api/historical/indicesHistory?indexType={index}&from={from_date}&to={to_date}"
+        return url, ref_url
 
-        try:
-            data_json = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict()).json()
+    @staticmethod
+    def _parse_index_data(data_json):
 
-            data_close_df = pd.DataFrame(data_json['data']['indexCloseOnlineRecords']).drop(
-                columns=['_id', "EOD_TIMESTAMP"])
-            data_turnover_df = pd.DataFrame(data_json['data']['indexTurnoverRecords']).drop(columns=['_id',
-                                                                                                     'HIT_INDEX_NAME_UPPER'])
+        index_data_columns = ['TIMESTAMP', 'INDEX_NAME', 'OPEN_INDEX_VAL', 'HIGH_INDEX_VAL', 'CLOSE_INDEX_VAL',
+                              'LOW_INDEX_VAL', 'TRADED_QTY', 'TURN_OVER']
+
+        try:
+            close_records = data_json['data']['indexCloseOnlineRecords']
+            turnover_records = data_json['data']['indexTurnoverRecords']
+            # A window without sessions (weekend, holidays) has no records
+            if not close_records or not turnover_records:
+                return pd.DataFrame(columns=index_data_columns)
+            data_close_df = pd.DataFrame(close_records).drop(columns=['_id', "EOD_TIMESTAMP"])
+            data_turnover_df = pd.DataFrame(turnover_records).drop(columns=['_id', 'HIT_INDEX_NAME_UPPER'])
             data_df = pd.merge(data_close_df, data_turnover_df, on='TIMESTAMP', how='inner')
         except Exception as e:
-            raise " Resource not available"
+            raise ValueError(" Resource not available") from e
 
         data_df.drop(columns='TIMESTAMP', inplace=True)
 
@@ -595,6 +1171,8 @@ class NseUtils:
         data_df.columns = new_col
         return data_df[index_data_columns]
 
+    @timed_parse
+    @frame_output
     def get_equity_full_list(self, list_only=False):
         """
         get list of all equity available to trade in NSE
@@ -603,11 +1181,15 @@ class NseUtils:
         :return: pandas data frame
         """
         url = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
-        nse_resp = self.session.get(url, headers=self.headers, cookies=self.cookies)
+        nse_resp = self._get(url)
         if nse_resp.status_code != 200:
             raise FileNotFoundError(f" No data equity list available")
+        return self._parse_equity_full_list(nse_resp.content, list_only)
+
+    @staticmethod
+    def _parse_equity_full_list(content, list_only=False):
         try:
-            data_df = pd.read_csv(BytesIO(nse_resp.content))
+            data_df = pd.read_csv(BytesIO(content))
         except Exception as e:
             raise FileNotFoundError(f' Equity List not found :: NSE error : {e}')
         data_df = data_df[['SYMBOL', 'NAME OF COMPANY', ' SERIES', ' DATE OF LISTING', ' FACE VALUE']]
@@ -616,6 +1198,8 @@ class NseUtils:
             return symbol_list
         return data_df
 
+    @timed_parse
+    @frame_output
     def get_fno_full_list(self, list_only=False):
         """
         get a dataframe of all listed derivative list with the recent lot size to trade
@@ -624,31 +1208,42 @@ class NseUtils:
         :return: pandas data frame
         """
         ref_url = 'https://www.nseindia.com/products-services/equity-derivatives-list-underlyings-information'
-        ref = requests.get(ref_url, headers=self.headers)
         url = "https://www.nseindia.com/api/underlying-information"
-        response = requests.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
+        response = self._get(url, ref_url)
 
         if response.status_code != 200:
             raise ("Resource not available for fno_equity_list")
-        data_dict = response.json()
+        return self._parse_fno_full_list(response.json(), list_only)
+
+    @staticmethod
+    def _parse_fno_full_list(data_dict, list_only=False):
         data_df = pd.DataFrame(data_dict['data']['UnderlyingList'])
         if list_only:
             symbol_list = data_df['symbol'].tolist()
             return symbol_list
         return data_df
 
+    @timed_parse
     def get_gainers_losers(self):
 
-        gain_loss_dict = {}
-
         ref_url = 'https://www.nseindia.com/market-data/top-gainers-losers'
-        ref = requests.get(ref_url, headers=self.headers)
 
         url = 'https://www.nseindia.com/api/live-analysis-variations?index=gainers'
-        data_obj = requests.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
+        data_obj = self._get(url, ref_url)
         if data_obj.status_code != 200:
             raise ("Resource not available for fno_equity_list")
-        data_dict = data_obj.json()
+        gainers = data_obj.json()
+
+        url = 'https://www.nseindia.com/api/live-analysis-variations?index=loosers'
+        data_obj = self._get(url, ref_url)
+        if data_obj.status_code != 200:
+            raise ("Resource not available for fno_equity_list")
+        losers = data_obj.json()
+
+        return self._parse_gainers_losers(gainers, losers)
+
+    @staticmethod
+    def _parse_gainers_losers(data_dict, loser_dict):
 
         # Nifty Gainer
         data_df = pd.DataFrame(data_dict['NIFTY']['data'])
@@ -670,11 +1265,7 @@ class NseUtils:
         data_df = pd.DataFrame(data_dict['FOSec']['data'])
         fno_gainer = data_df['symbol'].to_list()
 
-        url = 'https://www.nseindia.com/api/live-analysis-variations?index=loosers'
-        data_obj = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-        if data_obj.status_code != 200:
-            raise ("Resource not available for fno_equity_list")
-        data_dict = data_obj.json()
+        data_dict = loser_dict
 
         # Nifty Gainer
         data_df = pd.DataFrame(data_dict['NIFTY']['data'])
@@ -714,361 +1305,228 @@ class NseUtils:
 
         return gain_dict, loss_dict
 
-    def get_corporate_action(self, from_date_str: str = None, to_date_str: str = None, filter: str = None):
-
-        # Fetch Corporate Action data from NSE
+    @staticmethod
+    def _default_date_range(from_date_str=None, to_date_str=None, days=30):
+        # Filings endpoints default to the last 30 days when no range is supplied
         if from_date_str is None:
-            from_date  = datetime.now() - timedelta(days=30)
+            from_date = datetime.now() - timedelta(days=days)
             from_date_str = from_date.strftime("%d-%m-%Y")
             to_date_str = datetime.now().strftime("%d-%m-%Y")
         if to_date_str is None:
             to_date_str = datetime.now().strftime("%d-%m-%Y")
+        return from_date_str, to_date_str
+
+    @staticmethod
+    def _corporate_action_urls(from_date_str, to_date_str):
+        ref_url = 'https://www.nseindia.com/companies-listing/corporate-filings-actions'
+        url = f"https://www.nseindia.com/api/corporates-corporateActions?index=equities&from_date={from_date_str}&to_date={to_date_str}"
+        return url, ref_url
+
+    @timed_parse
+    @frame_output
+    def get_corporate_action(self, from_date_str: str = None, to_date_str: str = None, filter: str = None):
+
+        # Fetch Corporate Action data from NSE
+        from_date_str, to_date_str = self._default_date_range(from_date_str, to_date_str)
 
         try:
-            ref_url = 'https://www.nseindia.com/companies-listing/corporate-filings-actions'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = f"https://www.nseindia.com/api/corporates-corporateActions?index=equities&from_date={from_date_str}&to_date={to_date_str}"
-            data_obj = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            corp_action = pd.DataFrame(data_obj.json())
-            if filter is not None:
-                corp_action = corp_action[corp_action['subject'].str.contains(filter, case=False, na=False)]
-            return corp_action
+            if self.filings_store is not None:
+                return self._stored_filings('corporate_action', from_date_str, to_date_str, purpose=filter)
+            url, ref_url = self._corporate_action_urls(from_date_str, to_date_str)
+            data_obj = self._get(url, ref_url)
+            return self._parse_corporate_action(data_obj.json(), filter)
         except:
             print("Error fetching Corporate Action Data. Check your input")
             return None
 
+    @staticmethod
+    def _parse_corporate_action(data, filter=None):
+        corp_action = pd.DataFrame(data)
+        if filter is not None:
+            corp_action = corp_action[corp_action['subject'].str.contains(filter, case=False, na=False)]
+        return corp_action
+
+    @staticmethod
+    def _corporate_announcement_urls(from_date_str, to_date_str):
+        ref_url = 'https://www.nseindia.com/companies-listing/corporate-filings-announcements'
+        url = f'https://www.nseindia.com/api/corporate-announcements?index=equities&from_date={from_date_str}&to_date={to_date_str}'
+        return url, ref_url
+
+    @timed_parse
+    @frame_output
     def get_corporate_announcement(self, from_date_str: str = None, to_date_str: str = None):
 
         # Fetch Corporate Announcements data from NSE
-        if from_date_str is None:
-            from_date  = datetime.now() - timedelta(days=30)
-            from_date_str = from_date.strftime("%d-%m-%Y")
-            to_date_str = datetime.now().strftime("%d-%m-%Y")
-        if to_date_str is None:
-            to_date_str = datetime.now().strftime("%d-%m-%Y")
+        from_date_str, to_date_str = self._default_date_range(from_date_str, to_date_str)
 
         try:
-            ref_url = ('https://www.nseindia.com/companies-listing/corporate-filings-announcements')
-            ref = requests.get(ref_url, headers=self.headers)
-            url = f'https://www.nseindia.com/api/corporate-announcements?index=equities&from_date={from_date_str}&to_date={to_date_str}'
-            data_obj = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
+            if self.filings_store is not None:
+                return self._stored_filings('announcement', from_date_str, to_date_str)
+            url, ref_url = self._corporate_announcement_urls(from_date_str, to_date_str)
+            data_obj = self._get(url, ref_url)
             corp_announcement = pd.DataFrame(data_obj.json())
             return corp_announcement
         except:
             print("Error fetching Corporate Action Data. Check your input")
             return None
 
+    @timed_parse
+    @frame_output
     def get_index_pe_ratio(self):
+        return self.index_snapshot.pe_ratio()
 
-        # try:
-            ref_url = 'https://www.nseindia.com/market-data/index-performances'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/allIndices'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            data = response.json()  # Convert response to JSON
-
-            # Convert JSON data to a DataFrame
-            df = pd.json_normalize(data['data'])  # Extract the main data list
-
-            # Retain only PE Ratio
-            if not df.empty:
-                df = df[['indexSymbol', 'key', 'pe']]
-                df = df[df['pe'].str.strip() != '']  # Removes rows where PE is an empty string
-                df = df[df['pe'].str.strip() != 'None']  # Removes rows where PE is none
-                df.columns = ['Index', 'Type', 'Profit Earning Ratio']
-                return df
-            else:
-                return None
-
-        # except:
-        #     print("Error fetching Corporate Action Data. Check your input")
-        #     return None
-
+    @timed_parse
+    @frame_output
     def get_index_pb_ratio(self):
 
         try:
-            ref_url = 'https://www.nseindia.com/market-data/index-performances'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/allIndices'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            data = response.json()  # Convert response to JSON
-
-            # Convert JSON data to a DataFrame
-            df = pd.json_normalize(data['data'])  # Extract the main data list
-
-            # Retain only PE Ratio
-            if not df.empty:
-                df = df[['indexSymbol', 'key', 'pb']]
-                df = df[df['pb'].str.strip() != '']  # Removes rows where PE is an empty string
-                df = df[df['pb'].str.strip() != 'None']  # Removes rows where PE is none
-                df.columns = ['Index', 'Type', 'Price Book Ratio']
-                return df
-            else:
-                return None
-
+            return self.index_snapshot.pb_ratio()
         except:
-            print("Error fetching Corporate Action Data. Check your input")
+            print("Error fetching index PB ratio. Check your input")
             return None
 
+    @timed_parse
+    @frame_output
     def get_index_div_yield(self):
 
         try:
-            ref_url = 'https://www.nseindia.com/market-data/index-performances'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/allIndices'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            data = response.json()  # Convert response to JSON
-
-            # Convert JSON data to a DataFrame
-            df = pd.json_normalize(data['data'])  # Extract the main data list
-
-            # Retain only PE Ratio
-            if not df.empty:
-                df = df[['indexSymbol', 'key', 'dy']]
-                df = df[df['dy'].str.strip() != '']  # Removes rows where PE is an empty string
-                df = df[df['dy'].str.strip() != 'None']  # Removes rows where PE is none
-                df.columns = ['Index', 'Type', 'Div Yield']
-                return df
-            else:
-                return None
-
+            return self.index_snapshot.div_yield()
         except:
-            print("Error fetching Corporate Action Data. Check your input")
+            print("Error fetching index dividend yield. Check your input")
             return None
 
+    @timed_parse
+    @frame_output
     def get_advance_decline(self):
 
         try:
-            ref_url = 'https://www.nseindia.com/market-data/live-market-indices'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/allIndices'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            data = response.json()  # Convert response to JSON
-
-            # Convert JSON data to a DataFrame
-            df = pd.json_normalize(data['data'])  # Extract the main data list
-
-            # Retain only PE Ratio
-            if not df.empty:
-                df = df[['indexSymbol', 'advances', 'declines', 'unchanged']]
-                df.dropna(inplace=True)
-                df.columns = ['Index', 'Advances', 'Declines', 'Unchanged']
-                return df
-            else:
-                return None
-
+            return self.index_snapshot.advance_decline()
         except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
+            print("Error fetching advance / decline data. Check your input")
             return None
 
-    def most_active_equity_stocks_by_volume(self):
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-equities'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/live-analysis-most-active-securities?index=volume'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
+    @staticmethod
+    def _most_active_ref_url(kind):
+        if kind.startswith('equity_'):
+            return 'https://www.nseindia.com/market-data/most-active-equities'
+        return 'https://www.nseindia.com/market-data/most-active-contracts'
 
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['data'])  # Extract the main data list
+    @staticmethod
+    def _parse_data_list(data, key=None):
+        # Convert JSON data to a DataFrame
+        df = pd.DataFrame(data['data'] if key is None else data[key]['data'])  # Extract the main data list
 
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
+        if df.empty:
             return None
+        else:
+            return df
 
-    def most_active_equity_stocks_by_value(self):
+    @timed_parse
+    def _most_active(self, kind):
         try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-equities'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/live-analysis-most-active-securities?index=value'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
-
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
+            url, key = self.most_active_endpoints[kind]
+            response = self._get(url, self._most_active_ref_url(kind))
+            return self._parse_data_list(response.json(), key)
         except Exception as e:
             print("Error fetching Corporate Action Data. Check your input")
             return None
 
-    def most_active_index_calls(self):
-
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=calls-index-vol'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['OPTIDX']['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
+    @staticmethod
+    def _most_active_kinds(kinds=None):
+        kinds = list(NseUtils.most_active_endpoints) if kinds is None else list(kinds)
+        unknown = [kind for kind in kinds if kind not in NseUtils.most_active_endpoints]
+        if unknown:
+            raise ValueError(f"Unknown most active kind(s) {unknown}. "
+                             f"Choose from {list(NseUtils.most_active_endpoints)}")
+        return kinds
+
+    @staticmethod
+    def _typed_frame(df, fetch_time):
+        """
+        Convert the columns that are entirely numeric (NSE sends some numbers as strings) and add the
+        shared Fetch_Time as first column
+        """
+        if df is None:
             return None
+        df = df.copy()
+        for column in df.select_dtypes(include=['object', 'string']).columns:
+            numbers = pd.to_numeric(df[column], errors='coerce')
+            if numbers.notna().sum() == df[column].notna().sum():
+                df[column] = numbers
+        df.insert(0, 'Fetch_Time', fetch_time)
+        return df
 
-    def most_active_index_puts(self):
+    @frame_output
+    def most_active_snapshot(self, kinds=None, max_workers=10):
+        """
+        Download several most active variants at once over the shared session
+        :param kinds: Optional. keys of most_active_endpoints, eg: ['index_calls', 'index_puts']. Defaults to all
+        :param max_workers: Optional. Number of variants downloaded in parallel
+        :return: dict of kind -> pandas.DataFrame (None if that variant failed), all with the same Fetch_Time
+        """
+        kinds = self._most_active_kinds(kinds)
+        fetch_time = pd.Timestamp.now()
+        frames = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_kind = {executor.submit(self._most_active, kind): kind for kind in kinds}
+            for future in as_completed(future_to_kind):
+                frames[future_to_kind[future]] = self._typed_frame(future.result(), fetch_time)
+        return {kind: frames[kind] for kind in kinds}
+
+    @frame_output
+    def most_active_equity_stocks_by_volume(self):
+        return self._most_active('equity_stocks_by_volume')
 
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=puts-index-vol'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
+    @frame_output
+    def most_active_equity_stocks_by_value(self):
+        return self._most_active('equity_stocks_by_value')
 
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['OPTIDX']['data'])  # Extract the main data list
+    @frame_output
+    def most_active_index_calls(self):
+        return self._most_active('index_calls')
 
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
-            return None
+    @frame_output
+    def most_active_index_puts(self):
+        return self._most_active('index_puts')
 
+    @frame_output
     def most_active_stock_calls(self):
+        return self._most_active('stock_calls')
 
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=calls-stocks-vol'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['OPTSTK']['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
-            return None
-
+    @frame_output
     def most_active_stock_puts(self):
+        return self._most_active('stock_puts')
 
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=puts-stocks-vol'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['OPTSTK']['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
-            return None
-
+    @frame_output
     def most_active_contracts_by_oi(self):
+        return self._most_active('contracts_by_oi')
 
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=oi'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['volume']['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
-            return None
-
+    @frame_output
     def most_active_contracts_by_volume(self):
+        return self._most_active('contracts_by_volume')
 
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=contracts'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['volume']['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
-            return None
-
+    @frame_output
     def most_active_futures_contracts_by_volume(self):
+        return self._most_active('futures_contracts_by_volume')
 
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=futures'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['volume']['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
-            return None
-
+    @frame_output
     def most_active_options_contracts_by_volume(self):
+        return self._most_active('options_contracts_by_volume')
 
-        try:
-            ref_url = 'https://www.nseindia.com/market-data/most-active-contracts'
-            ref = requests.get(ref_url, headers=self.headers)
-            url = 'https://www.nseindia.com/api/snapshot-derivatives-equity?index=options&limit=20'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['volume']['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
-        except Exception as e:
-            print("Error fetching Corporate Action Data. Check your input")
-            return None
-
+    @staticmethod
+    def _insider_trading_urls(from_date_str, to_date_str):
+        ref_url = 'https://www.nseindia.com/companies-listing/corporate-filings-insider-trading'
+        url = f'https://www.nseindia.com/api/corporates-pit?index=equities&from_date={from_date_str}&to_date={to_date_str}'
+        return url, ref_url
 
+    @timed_parse
+    @frame_output
     def get_insider_trading(self, from_date: str = None, to_date: str = None):
 
         try:
 
             if from_date is None:
-                from_date  = datetime.now() - timedelta(days=30)
-                from_date_str = from_date.strftime("%d-%m-%Y")
-                to_date_str = datetime.now().strftime("%d-%m-%Y")
+                from_date_str, to_date_str = self._default_date_range()
             else:
                 from_date_str = from_date
             if to_date is None:
@@ -1076,10 +1534,10 @@ class NseUtils:
             else:
                 to_date_str = to_date
 
-            ref_url = 'https://www.nseindia.com/companies-listing/corporate-filings-insider-trading'
-            ref = requests.get(ref_url, headers=self.headers)
-            url= f'https://www.nseindia.com/api/corporates-pit?index=equities&from_date={from_date_str}&to_date={to_date_str}'
-            response = requests.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
+            if self.filings_store is not None:
+                return self._stored_filings('insider', from_date_str, to_date_str)
+            url, ref_url = self._insider_trading_urls(from_date_str, to_date_str)
+            response = self._get(url, ref_url)
             data = response.json()
             df = pd.DataFrame(data['data'])
 
@@ -1089,37 +1547,165 @@ class NseUtils:
             print("Error fetching Corporate Action Data. Check your input")
             return None
 
+    # filings feed of the FilingsStore -> (urls of a date range, key of the filings list in the response)
+    filings_endpoints = {
+        'corporate_action': ('_corporate_action_urls', None),
+        'announcement': ('_corporate_announcement_urls', None),
+        'insider': ('_insider_trading_urls', 'data'),
+    }
+
+    @timed_parse
+    def _fetch_filings(self, feed, from_date_str, to_date_str):
+        """
+        Download the filings of a feed for a date range
+        :return: pandas.DataFrame in the api layout
+        """
+        urls, key = self.filings_endpoints[feed]
+        url, ref_url = getattr(self, urls)(from_date_str, to_date_str)
+        data = self._get(url, ref_url).json()
+        return pd.DataFrame(data if key is None else data[key])
+
+    def _stored_filings(self, feed, from_date_str, to_date_str, symbol=None, purpose=None):
+        """Sync the days of a date range that are not in the filings store yet and query the range locally"""
+        from_dt = datetime.strptime(from_date_str, "%d-%m-%Y").date()
+        to_dt = datetime.strptime(to_date_str, "%d-%m-%Y").date()
+        self.filings_store.sync(feed, functools.partial(self._fetch_filings, feed), from_dt, to_dt)
+        return self.filings_store.query(feed, from_dt, to_dt, symbol=symbol, purpose=purpose)
+
+    def _require_filings_store(self):
+        if self.filings_store is None:
+            raise ValueError("This NseUtils was created with filings_store=False")
+        return self.filings_store
+
+    @frame_output
+    def sync_filings(self, feeds=None):
+        """
+        Download the filings published since the last sync (the watermark of each feed) into the filings store.
+        The first sync of a feed downloads the last FilingsStore.first_sync_days days.
+        :param feeds: Optional. list of 'corporate_action' / 'announcement' / 'insider', defaults to all
+        :return: dict of feed -> pandas.DataFrame of the filings that were new or changed since the last sync
+        :raise ValueError if a feed is unknown or the client has no filings store
+        """
+        store = self._require_filings_store()
+        feeds = list(store.feeds) if feeds is None else list(feeds)
+        unknown = [feed for feed in feeds if feed not in store.feeds]
+        if unknown:
+            raise ValueError(f"Unknown filings feed(s) {unknown}. Choose from {list(store.feeds)}")
+        return {feed: store.sync(feed, functools.partial(self._fetch_filings, feed)) for feed in feeds}
+
+    @frame_output
+    def query_filings(self, feed, from_date: str = None, to_date: str = None, symbol=None, purpose: str = None):
+        """
+        Query the filings store without any download, see sync_filings to bring it up to date
+        :param feed: 'corporate_action' / 'announcement' / 'insider'
+        :param from_date: Optional. eg:'01-06-2023', first filing date (inclusive)
+        :param to_date: Optional. eg:'30-06-2023', last filing date (inclusive)
+        :param symbol: Optional. symbol or list of symbols, eg: 'SBIN'
+        :param purpose: Optional. text the subject / description / acquisition mode contains, eg: 'dividend'
+        :return: pandas.DataFrame in the layout of the api, oldest first
+        :raise ValueError if the feed is unknown or the client has no filings store
+        """
+        from_dt = datetime.strptime(from_date, "%d-%m-%Y").date() if from_date else None
+        to_dt = datetime.strptime(to_date, "%d-%m-%Y").date() if to_date else None
+        return self._require_filings_store().query(feed, from_dt, to_dt, symbol=symbol, purpose=purpose)
+
+    def _require_index_membership(self):
+        if self.index_membership is None:
+            raise ValueError("This NseUtils was created with index_membership=False")
+        return self.index_membership
+
+    def _fetch_index_members(self, category):
+        try:
+            url, ref_url = self._index_details_urls(category)
+            return self._parse_index_details(self._get(url, ref_url).json(), list_only=True)
+        except Exception as e:
+            print(f"Error fetching the constituents of {category}: {e}")
+            return None
+
+    @frame_output
+    def sync_index_membership(self, indices=None, max_workers: int = 8):
+        """
+        Download the constituents of the indices that have no snapshot of the day into the membership store and
+        record the symbols added and removed since the previous snapshot
+        :param indices: Optional. list of index names, defaults to equity_market_list
+        :param max_workers: Optional. Number of concurrent downloads
+        :return: pandas.DataFrame of the changes (Date, Index, Symbol, Change), empty when nothing changed
+        :raise ValueError if the client has no membership store
+        """
+        indices = self.equity_market_list if indices is None else indices
+        return self._require_index_membership().sync(indices, self._fetch_index_members, max_workers=max_workers)
+
+    def get_index_universe(self, indices, as_of=None):
+        """
+        Symbols that belong to any of the indices, eg: the universe of a screener
+        :param indices: index name or list of index names, eg: ['NIFTY 50', 'NIFTY NEXT 50']
+        :param as_of: Optional. eg:'01-06-2023', the members on that day, from the recorded changes
+        :return: sorted list of symbols
+        :raise ValueError if the client has no membership store
+        """
+        indices = [indices] if isinstance(indices, str) else list(indices)
+        store = self._require_index_membership()
+        store.sync(indices, self._fetch_index_members)
+        if as_of is None:
+            return store.universe(indices)
+        as_of = datetime.strptime(as_of, "%d-%m-%Y").date()
+        return sorted({symbol for index in indices for symbol in store.members(index, as_of) or ()})
+
+    def get_symbol_indices(self, symbol):
+        """
+        Indices of equity_market_list a symbol belongs to. The first call of the day refreshes the stale
+        snapshots, later calls are in memory lookups.
+        :param symbol: eg: 'SBIN'
+        :return: sorted list of index names
+        :raise ValueError if the client has no membership store
+        """
+        self.sync_index_membership()
+        return self.index_membership.indices_of(symbol)
+
+    @frame_output
+    def get_index_membership_changes(self, index=None, symbol=None, from_date: str = None, to_date: str = None):
+        """
+        Recorded constituent changes, without any download, see sync_index_membership
+        :param index: Optional. index name, eg: 'NIFTY 50'
+        :param symbol: Optional. eg: 'SBIN'
+        :param from_date: Optional. eg:'01-06-2023' (inclusive)
+        :param to_date: Optional. eg:'30-06-2023' (inclusive)
+        :return: pandas.DataFrame with Date, Index, Symbol and Change ('added' / 'removed'), oldest first
+        :raise ValueError if the client has no membership store
+        """
+        from_dt = datetime.strptime(from_date, "%d-%m-%Y").date() if from_date else None
+        to_dt = datetime.strptime(to_date, "%d-%m-%Y").date() if to_date else None
+        return self._require_index_membership().changes(index, symbol, from_dt, to_dt)
+
+    @timed_parse
+    @frame_output
     def get_upcoming_results_calendar(self):
 
         # Extracts the events calendar from NSE - Filters only the upcoming Financial results related events
         try:
             ref_url = 'https://www.nseindia.com/companies-listing/corporate-filings-event-calendar'
-            ref = requests.get(ref_url, headers=self.headers)
-            url= f'https://www.nseindia.com/api/event-calendar?'
-            response = requests.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            data = response.json()
-            df = pd.DataFrame(data)
-            events = df[df['purpose'].str.contains('Results', case=False, na=False)]
-            return events
+            url = f'https://www.nseindia.com/api/event-calendar?'
+            response = self._get(url, ref_url)
+            return self._parse_results_calendar(response.json())
         except:
             print("Error fetching Corporate Action Data. Check your input")
             return None
 
+    @staticmethod
+    def _parse_results_calendar(data):
+        df = pd.DataFrame(data)
+        events = df[df['purpose'].str.contains('Results', case=False, na=False)]
+        return events
+
+    @timed_parse
+    @frame_output
     def get_etf_list(self):
 
         try:
             ref_url = 'https://www.nseindia.com/market-data/exchange-traded-funds-etf'
-            ref = requests.get(ref_url, headers=self.headers)
             url = 'https://www.nseindia.com/api/etf'
-            response = self.session.get(url, headers=self.headers, cookies=ref.cookies.get_dict())
-            data = response.json()  # Convert response to JSON
-            # Convert JSON data to a DataFrame
-            df = pd.DataFrame(data['data'])  # Extract the main data list
-
-            if df.empty:
-                return None
-            else:
-                return df
+            response = self._get(url, ref_url)
+            return self._parse_data_list(response.json())
         except Exception as e:
             print("Error fetching ETF list. Check your input")
-            return None
\ No newline at end of file
+            return None
@@ -1,5 +1,5 @@
-from flask import Flask, request, jsonify
-from nsepostionaldata import get_positional_index_data
+from flask import Flask, Response, request, jsonify
+from nsepostionaldata import get_positional_index_data, nse
 
 app = Flask(__name__)
 
@@ -28,5 +28,14 @@ def get_data():
     
     return jsonify(result)
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape endpoint: per endpoint NSE request metrics and cache hit ratios
+    return Response(nse.metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify(nse.stats())
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
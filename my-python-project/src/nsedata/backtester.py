@@ -10,9 +10,9 @@
 
 import pandas as pd
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from NSEMasterData import NSEMasterData
 from NseUtility import NseUtils
+from nse_rate_limit import RetryQueue
 
 def calculate_atr(df, period=14):
     '''Calculates the Average True Range (ATR) for a given DataFrame.'''
@@ -24,51 +24,49 @@ def calculate_atr(df, period=14):
     df_atr['atr'] = df_atr['tr'].rolling(window=period).mean()
     return df_atr['atr'].iloc[-1]
 
-def process_stock_for_backtest(stock, nse_master, end_date, days_to_backtest):
+def process_stock_for_backtest(stock, nse_master, start_date, end_date, backtest_days):
+    '''Downloads the history of a single stock and backtests it.
+    Download errors are raised, so the caller can retry the stock instead of reporting it as not shortlisted.'''
+    # Fetch data for the entire period needed (252 sessions of lookback + backtest sessions)
+    hist_data_full = nse_master.get_history(symbol=stock, exchange='NSE', start=start_date, end=end_date, interval='1d',
+                                            raise_errors=True)
+    return backtest_stock(stock, hist_data_full, backtest_days)
+
+def backtest_stock(stock, hist_data_full, backtest_days):
     '''Processes a single stock for the entire backtesting period.'''
-    try:
-        # Fetch data for the entire period needed (365 days for lookback + backtest duration)
-        start_date = end_date - timedelta(days=365 + days_to_backtest)
-        hist_data_full = nse_master.get_history(symbol=stock, exchange='NSE', start=start_date, end=end_date, interval='1d')
-        
-        if hist_data_full.empty or len(hist_data_full) < 252:
-            return (stock, [])
-
-        shortlisted_dates = []
-
-        for i in range(days_to_backtest):
-            current_date = end_date - timedelta(days=i)
-           # print(f"Processing {stock}...date range {start_date}.. ")
-            # Create a view of the dataframe up to the current backtesting day
-            hist_data = hist_data_full[hist_data_full.index <= current_date].copy()
-
-            if len(hist_data) < 90:
-                continue
-
-            # --- Apply Screening Conditions for the current day ---
-            volume_today = hist_data['Volume'].iloc[-1]
-            close_today = hist_data['Close'].iloc[-1]
-            sma_volume_20 = hist_data['Volume'].rolling(window=10).mean().iloc[-1]
-            high_52wk = hist_data['High'].tail(252).max() # Using 252 trading days
-            high_last_90d = hist_data['High'].tail(20).max()
-            atr_14 = calculate_atr(hist_data, period=14)
-            hist_data['turnover'] = hist_data['Close'] * hist_data['Volume']
-            avg_daily_turnover = hist_data['turnover'].tail(20).mean()
-
-            if (
-                (volume_today >= 1.5 * sma_volume_20) and \
-                (close_today > high_52wk) # max(high_52wk, high_last_90d)) #and \
-                #(atr_14 is not None and (atr_14 / close_today) > 0.03) #and \
-                #(avg_daily_turnover > 1e7)
-            ):
-                shortlisted_dates.append(current_date.strftime('%Y-%m-%d'))
-        
-        return (stock, shortlisted_dates)
-
-    except Exception:
-        # Silently handle errors for individual stocks
+    if hist_data_full.empty or len(hist_data_full) < 252:
         return (stock, [])
 
+    shortlisted_dates = []
+
+    for current_date in backtest_days:
+       # print(f"Processing {stock}...date range {start_date}.. ")
+        # Create a view of the dataframe up to the current backtesting day
+        hist_data = hist_data_full[hist_data_full.index < current_date + timedelta(days=1)].copy()
+
+        if len(hist_data) < 90:
+            continue
+
+        # --- Apply Screening Conditions for the current day ---
+        volume_today = hist_data['Volume'].iloc[-1]
+        close_today = hist_data['Close'].iloc[-1]
+        sma_volume_20 = hist_data['Volume'].rolling(window=10).mean().iloc[-1]
+        high_52wk = hist_data['High'].tail(252).max() # Using 252 trading days
+        high_last_90d = hist_data['High'].tail(20).max()
+        atr_14 = calculate_atr(hist_data, period=14)
+        hist_data['turnover'] = hist_data['Close'] * hist_data['Volume']
+        avg_daily_turnover = hist_data['turnover'].tail(20).mean()
+
+        if (
+            (volume_today >= 1.5 * sma_volume_20) and \
+            (close_today > high_52wk) # max(high_52wk, high_last_90d)) #and \
+            #(atr_14 is not None and (atr_14 / close_today) > 0.03) #and \
+            #(avg_daily_turnover > 1e7)
+        ):
+            shortlisted_dates.append(current_date.strftime('%Y-%m-%d'))
+    
+    return (stock, shortlisted_dates)
+
 def backtest_screener(days_to_backtest=3):
     '''
     Backtests the screener criteria for the given number of days.
@@ -76,32 +74,46 @@ def backtest_screener(days_to_backtest=3):
     Args:
         days_to_backtest (int): The number of past days to run the backtest on.
     '''
-    nse_master = NSEMasterData()
-    nse_master.download_symbol_master()
+    nse_master = NSEMasterData()  # symbol masters load lazily from the local master cache
     nse_utility = NseUtils()
     stock_universe = nse_utility.get_fno_full_list(list_only=True)
 
     backtest_results = {}
     today = datetime.now()
 
+    # Backtest the last days_to_backtest trading sessions, newest first
+    calendar = nse_utility.calendar
+    last_day = calendar.offset(today, 0)
+    first_day = calendar.offset(last_day, -(days_to_backtest - 1))
+    backtest_days = list(pd.DatetimeIndex(calendar.trading_days_between(first_day, last_day))[::-1])
+    start_date = calendar.offset(first_day, -252)
+
     # --- Print the dates being backtested ---
-    backtest_dates = [ (today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days_to_backtest) ]
+    backtest_dates = [day.strftime('%Y-%m-%d') for day in backtest_days]
     print(f"Backtesting for the following dates: {', '.join(backtest_dates)}\n")
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        # Create futures for all stocks
-        future_to_stock = {
-            executor.submit(process_stock_for_backtest, stock, nse_master, today, days_to_backtest): stock 
-            for stock in stock_universe
-        }
-
-        for future in as_completed(future_to_stock):
-            stock, dates = future.result()
-            if dates:
-                for date_str in dates:
-                    if date_str not in backtest_results:
-                        backtest_results[date_str] = []
-                    backtest_results[date_str].append(stock)
+    # One cookie request for the whole universe, histories are backtested as they arrive
+    histories = nse_master.get_history_many(stock_universe, start_date, today, interval='1d', max_workers=10)
+    results = [backtest_stock(stock, hist_data_full, backtest_days) for stock, hist_data_full in histories]
+
+    retry_queue = RetryQueue()
+    for stock, error in histories.errors.items():
+        print(f"An error occurred while backtesting {stock}: {error}")
+        if not isinstance(error, LookupError):  # unknown symbols would fail again
+            retry_queue.put(stock, process_stock_for_backtest, stock, nse_master, start_date, today, backtest_days)
+
+    if len(retry_queue):
+        print(f"Retrying {len(retry_queue)} stocks that failed...")
+        results.extend(retry_queue.drain().values())
+    if retry_queue.failed:
+        print(f"Could not backtest {len(retry_queue.failed)} stocks: {', '.join(sorted(retry_queue.failed))}")
+    print(f"Request stats: {nse_master.limiter.stats()}")
+
+    for stock, dates in results:
+        for date_str in dates:
+            if date_str not in backtest_results:
+                backtest_results[date_str] = []
+            backtest_results[date_str].append(stock)
 
     # --- Format and Print Results ---
     if not backtest_results:
@@ -0,0 +1,94 @@
+"""
+    * BHAV COPY ARCHIVE *
+
+    Description: Immutable local archive of parsed NSE bhav copies.
+
+    A bhav copy for a past trade date never changes, so once downloaded and parsed it is stored as a
+    parquet file keyed by (report type, trade date) and served from disk from then on. Files are typed
+    with the explicit schemas in nse_schemas, so a frame read from the archive is identical to the one
+    built from the network download.
+
+    Layout : <root>/<report>/<YYYY>/<YYYYMMDD>.parquet   (root defaults to ~/.nsedata/bhav)
+
+"""
+
+import threading
+from datetime import date, datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from nse_schemas import BHAV_SCHEMAS, apply_schema, arrow_schema
+from nse_storage import atomic_write, data_dir
+
+
+class BhavArchive:
+    reports = tuple(BHAV_SCHEMAS)
+
+    def __init__(self, root=None):
+        """
+        :param root: Optional. Folder of the archive, defaults to ~/.nsedata/bhav
+        """
+        self.root = data_dir('bhav') if root is None else root
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _as_date(trade_date):
+        if isinstance(trade_date, datetime):
+            return trade_date.date()
+        if isinstance(trade_date, date):
+            return trade_date
+        return datetime.strptime(trade_date, "%d-%m-%Y").date()
+
+    def path(self, report, trade_date):
+        if report not in BHAV_SCHEMAS:
+            raise ValueError(f"Unknown bhav report '{report}'. Choose one of {self.reports}")
+        trade_date = self._as_date(trade_date)
+        return self.root / report / f"{trade_date:%Y}" / f"{trade_date:%Y%m%d}.parquet"
+
+    def is_immutable(self, trade_date):
+        """A bhav copy is final once its trade date is in the past."""
+        return self._as_date(trade_date) < date.today()
+
+    def has(self, report, trade_date):
+        return self.path(report, trade_date).exists()
+
+    def load(self, report, trade_date):
+        """
+        Read an archived bhav copy
+        :return: pandas.DataFrame or None when the date is not archived
+        """
+        path = self.path(report, trade_date)
+        if not path.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return pq.read_table(path).to_pandas()
+
+    def store(self, report, trade_date, df):
+        """
+        Archive a parsed bhav copy. Empty frames and frames of the current trade date are not stored.
+        :return: True if the frame was written
+        """
+        if df is None or df.empty or not self.is_immutable(trade_date):
+            return False
+        schema = BHAV_SCHEMAS[report]
+        df = apply_schema(df, schema)
+        table = pa.Table.from_pandas(df, schema=arrow_schema(df, schema), preserve_index=False)
+        atomic_write(self.path(report, trade_date), lambda tmp_path: pq.write_table(table, tmp_path))
+        return True
+
+    def dates(self, report):
+        """
+        List the archived trade dates of a report
+        :return: sorted list of datetime.date
+        """
+        folder = self.root / report
+        if not folder.exists():
+            return []
+        return sorted(datetime.strptime(p.stem, "%Y%m%d").date() for p in folder.glob("*/*.parquet"))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
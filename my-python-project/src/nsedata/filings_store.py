@@ -0,0 +1,238 @@
+"""
+    * CORPORATE FILINGS STORE *
+
+    Description: Local, incrementally synced store of the NSE corporate filings feeds: corporate actions,
+    corporate announcements and insider trading (PIT) disclosures.
+
+    Every feed keeps the filings it has seen, keyed by their identifiers, and the date ranges that have
+    been downloaded completely. A sync only downloads the days after the last complete day (the watermark)
+    or the parts of a requested range that were never downloaded, and upserts the rows: a filing seen again
+    replaces the stored one. Queries by date, symbol and purpose run on the local rows. Only past days are
+    recorded as downloaded, the current day is always downloaded again.
+
+    Filings are stored as the json records of the api, so a query returns the same frame as the api call.
+
+    Layout : <root>/<feed>.parquet + <feed>.json   (root defaults to ~/.nsedata/filings)
+
+"""
+
+import json
+import threading
+from datetime import date, datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from nse_storage import atomic_write, data_dir, merge_ranges
+
+# feed -> identifier fields of a filing, the field with its date (the date the api filters on), its symbol and
+# the field describing its purpose
+FEEDS = {
+    'corporate_action': {
+        'key': ('symbol', 'series', 'subject', 'exDate', 'recDate'), 'date': 'exDate', 'symbol': 'symbol',
+        'purpose': 'subject',
+    },
+    'announcement': {
+        'key': ('seq_id',), 'date': 'an_dt', 'symbol': 'symbol', 'purpose': 'desc',
+    },
+    'insider': {
+        'key': ('did',), 'date': 'date', 'symbol': 'symbol', 'purpose': 'acqMode',
+    },
+}
+
+# Days downloaded by the first sync of a feed, the window the NseUtils filings methods default to
+FIRST_SYNC_DAYS = 30
+
+_TABLE_SCHEMA = pa.schema([
+    ('key', pa.string()), ('date', pa.timestamp('ns')), ('symbol', pa.string()), ('purpose', pa.string()),
+    ('record', pa.string()),
+])
+
+
+def filing_dates(values):
+    """Parse filing dates ('17-Jun-2023', '17-Jun-2023 18:30:00') to datetime64, unparsable values become NaT"""
+    return pd.to_datetime(pd.Series(values, dtype='string'), format='mixed', dayfirst=True, errors='coerce')
+
+
+class FilingsStore:
+    feeds = tuple(FEEDS)
+
+    def __init__(self, root=None, first_sync_days=FIRST_SYNC_DAYS):
+        """
+        :param root: Optional. Folder of the store, defaults to ~/.nsedata/filings
+        :param first_sync_days: Optional. Days downloaded by the first sync of a feed
+        """
+        self.root = data_dir('filings') if root is None else root
+        self.first_sync_days = first_sync_days
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, feed):
+        if feed not in FEEDS:
+            raise ValueError(f"Unknown filings feed '{feed}'. Choose one of {self.feeds}")
+        return self.root / f"{feed}.parquet", self.root / f"{feed}.json"
+
+    # ------------------------------------------------------------------ #
+    #  Coverage
+    # ------------------------------------------------------------------ #
+
+    def covered(self, feed):
+        """
+        Date ranges already downloaded for a feed
+        :return: sorted list of [start, end] datetime.date, both inclusive
+        """
+        _, meta_path = self._paths(feed)
+        if not meta_path.exists():
+            return []
+        with open(meta_path) as f:
+            ranges = json.load(f)['covered']
+        return [[datetime.strptime(start, "%Y-%m-%d").date(), datetime.strptime(end, "%Y-%m-%d").date()]
+                for start, end in ranges]
+
+    def watermark(self, feed):
+        """
+        Last day of the feed downloaded completely
+        :return: datetime.date or None before the first sync
+        """
+        covered = self.covered(feed)
+        return covered[-1][1] if covered else None
+
+    def missing(self, feed, from_date, to_date):
+        """
+        Parts of a date range that were not downloaded yet
+        :param from_date: datetime.date
+        :param to_date: datetime.date
+        :return: list of (start, end) datetime.date, both inclusive
+        """
+        gaps = []
+        cursor = from_date
+        for start, end in self.covered(feed):
+            if end < cursor or start > to_date:
+                continue
+            if start > cursor:
+                gaps.append((cursor, start - timedelta(days=1)))
+            cursor = max(cursor, end + timedelta(days=1))
+        if cursor <= to_date:
+            gaps.append((cursor, to_date))
+        return gaps
+
+    # ------------------------------------------------------------------ #
+    #  Sync
+    # ------------------------------------------------------------------ #
+
+    def sync(self, feed, fetch, from_date=None, to_date=None):
+        """
+        Download the missing days of a date range and upsert them
+        :param feed: key of FEEDS
+        :param fetch: callable(from_date_str, to_date_str) with dates in 'dd-mm-YYYY', returning the api frame
+        :param from_date: Optional. datetime.date, defaults to the day after the watermark (first_sync_days
+        back on the first sync)
+        :param to_date: Optional. datetime.date, defaults to today
+        :return: pandas.DataFrame of the filings that were new or changed, in the api layout
+        """
+        today = date.today()
+        to_date = today if to_date is None else to_date
+        if from_date is None:
+            watermark = self.watermark(feed)
+            from_date = to_date - timedelta(days=self.first_sync_days) if watermark is None else \
+                min(watermark + timedelta(days=1), to_date)
+        gaps = self.missing(feed, from_date, to_date)
+        with self._lock:
+            if gaps:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        frames = [fetch(start.strftime("%d-%m-%Y"), end.strftime("%d-%m-%Y")) for start, end in gaps]
+        return self.upsert(feed, [frame for frame in frames if frame is not None], gaps)
+
+    def _rows(self, feed, df):
+        """Stored rows of api records: key, date, symbol, purpose and the json record"""
+        spec = FEEDS[feed]
+        records = df.to_dict('records')
+        text = [json.dumps(record, default=str) for record in records]
+        if all(field in df.columns for field in spec['key']):
+            keys = ['|'.join(str(record[field]) for field in spec['key']) for record in records]
+        else:
+            # Without its identifiers a filing is identified by its full content
+            keys = text
+
+        missing = pd.Series(pd.NA, index=df.index, dtype='string')
+        symbol, purpose, dates = (df[spec[name]].astype('string') if spec[name] in df.columns else missing
+                                  for name in ('symbol', 'purpose', 'date'))
+        return pd.DataFrame({
+            'key': keys, 'date': filing_dates(dates).astype('datetime64[ns]').to_numpy(),
+            'symbol': symbol.to_numpy(), 'purpose': purpose.to_numpy(), 'record': text,
+        })
+
+    def upsert(self, feed, frames, ranges=()):
+        """
+        Merge downloaded filings into the store and mark the ranges they were downloaded for as covered.
+        Ranges of the current day (or later) are not marked.
+        :param frames: list of api frames
+        :param ranges: list of (start, end) datetime.date the frames were downloaded for
+        :return: pandas.DataFrame of the filings that were new or changed, in the api layout
+        """
+        data_path, meta_path = self._paths(feed)
+        frames = [frame for frame in frames if not frame.empty]
+        with self._lock:
+            stored = self._table(feed)
+            changed = pd.DataFrame(columns=_TABLE_SCHEMA.names)
+            if frames:
+                rows = pd.concat([self._rows(feed, frame) for frame in frames], ignore_index=True)
+                rows = rows.drop_duplicates('key', keep='last')
+                known = stored.set_index('key')['record']
+                changed = rows[rows['key'].map(known).ne(rows['record']).fillna(True).to_numpy(dtype=bool)]
+                if not changed.empty:
+                    merged = pd.concat([stored[~stored['key'].isin(changed['key'])], changed], ignore_index=True)
+                    merged = merged.sort_values(['date', 'key'], kind='stable', ignore_index=True)
+                    table = pa.Table.from_pandas(merged, schema=_TABLE_SCHEMA, preserve_index=False)
+                    atomic_write(data_path, lambda tmp_path: pq.write_table(table, tmp_path))
+
+            today = date.today()
+            ranges = [(start, min(end, today - timedelta(days=1))) for start, end in ranges if start < today]
+            if ranges:
+                covered = merge_ranges([tuple(r) for r in self.covered(feed)] + ranges)
+                meta = {'covered': [[f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}"] for start, end in covered]}
+                atomic_write(meta_path, lambda tmp_path: tmp_path.write_text(json.dumps(meta)))
+        return self._records(changed)
+
+    # ------------------------------------------------------------------ #
+    #  Queries
+    # ------------------------------------------------------------------ #
+
+    def _table(self, feed):
+        data_path, _ = self._paths(feed)
+        if not data_path.exists():
+            return pd.DataFrame({name: pd.Series(dtype='datetime64[ns]' if name == 'date' else 'string')
+                                 for name in _TABLE_SCHEMA.names})
+        return pq.read_table(data_path).to_pandas()
+
+    @staticmethod
+    def _records(rows):
+        return pd.DataFrame([json.loads(record) for record in rows['record']])
+
+    def query(self, feed, from_date=None, to_date=None, symbol=None, purpose=None):
+        """
+        Stored filings of a feed, oldest first
+        :param from_date: Optional. datetime.date, first filing date (inclusive)
+        :param to_date: Optional. datetime.date, last filing date (inclusive)
+        :param symbol: Optional. symbol or list of symbols, eg: 'SBIN' / ['SBIN', 'INFY']
+        :param purpose: Optional. text the purpose of a filing contains (case insensitive), eg: 'dividend'
+        :return: pandas.DataFrame in the api layout (empty when nothing matches)
+        """
+        rows = self._table(feed)
+        keep = pd.Series(True, index=rows.index)
+        if from_date is not None:
+            keep &= rows['date'] >= pd.Timestamp(from_date)
+        if to_date is not None:
+            keep &= rows['date'] < pd.Timestamp(to_date) + pd.Timedelta(days=1)
+        if symbol is not None:
+            symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+            keep &= rows['symbol'].str.upper().isin([s.upper() for s in symbols]).fillna(False)
+        if purpose is not None:
+            keep &= rows['purpose'].str.contains(purpose, case=False, na=False)
+        return self._records(rows[keep.to_numpy()])
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,304 @@
+"""
+    * 52 WEEK HIGH / LOW STORE *
+
+    Description: Rolling 52 week high and low of every symbol, computed locally from daily bars (equity
+    bhav copies or NSEMasterData.get_history) instead of the NSE 52 week high / low file.
+
+    Every symbol keeps two monotonic deques of (day, price) over the window: highs in decreasing and lows in
+    increasing order. Adding a day pushes one price on each deque, dropping the entries it dominates, and
+    expires the entries that left the window, so a new trading day costs O(symbols) and the high / low of a
+    symbol is the front of its deque, an O(1) lookup.
+
+    Like the adjusted columns of the NSE file, the prices are adjusted for splits and bonus issues when an
+    price_adjustment.AdjustmentEngine is given: on the ex date the deques of the symbol are scaled by the
+    factor of the event, which keeps them ordered. Without one the prices are the traded ones, and frame()
+    names its columns accordingly.
+
+    Location : <root>/high_low/<name>.json   (root defaults to ~/.nsedata)
+
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from nse_storage import atomic_write, data_dir
+
+# Series of the equity bhav copy that carry the regular (and trade for trade) equity prices
+EQUITY_SERIES = ('EQ', 'BE', 'BZ', 'SM', 'ST')
+
+
+def _as_day(value):
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return pd.Timestamp(value).date().toordinal()
+
+
+class _Extremes:
+    """
+    Monotonic deques of one symbol: highs (front is the highest) and lows (front is the lowest), and the last
+    day pushed
+    """
+    __slots__ = ('highs', 'lows', 'last')
+
+    def __init__(self, highs=(), lows=(), last=None):
+        self.highs = deque(highs)
+        self.lows = deque(lows)
+        self.last = last
+
+    def push(self, day, high, low):
+        self.last = day
+        highs, lows = self.highs, self.lows
+        if high == high:  # not NaN
+            while highs and highs[-1][1] <= high:
+                highs.pop()
+            highs.append((day, high))
+        if low == low:
+            while lows and lows[-1][1] >= low:
+                lows.pop()
+            lows.append((day, low))
+
+    def expire(self, first_day):
+        """Drop the entries older than the first day of the window"""
+        highs, lows = self.highs, self.lows
+        while highs and highs[0][0] < first_day:
+            highs.popleft()
+        while lows and lows[0][0] < first_day:
+            lows.popleft()
+
+    def scale(self, factor):
+        self.highs = deque((day, price * factor) for day, price in self.highs)
+        self.lows = deque((day, price * factor) for day, price in self.lows)
+
+
+class HighLowStore:
+    # Seconds before a sync that found no new bhav copy (eg: today's, before it is published) fetches again
+    retry_interval = 900
+
+    def __init__(self, window_days=365, adjustments=None, path=None):
+        """
+        :param window_days: Optional. Calendar days of the window, a day is in it when it is less than window_days
+        before the last day added
+        :param adjustments: Optional. price_adjustment.AdjustmentEngine, splits and bonus issues of its events are
+        applied to the stored prices on their ex date. Events added to the engine later are not picked up
+        :param path: Optional. json file the state is saved to, see load / save
+        """
+        self.window_days = window_days
+        self.adjustments = adjustments
+        self.path = path
+        self.last_day = None
+        self._symbols = {}
+        self._events = None
+        self._empty_sync = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def last_date(self):
+        """Last day added, datetime.date or None when empty"""
+        return date.fromordinal(self.last_day) if self.last_day is not None else None
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self._symbols
+
+    # ------------------------------------------------------------------ #
+    #  Updates
+    # ------------------------------------------------------------------ #
+
+    def _split_events(self):
+        """symbol -> [(ex day, factor)] of the split / bonus events of the adjustment engine"""
+        if self._events is None:
+            self._events = {}
+            if self.adjustments is not None:
+                events = self.adjustments.events()
+                events = events[events['kind'].isin(['split', 'bonus'])]
+                for symbol, ex_date, factor in zip(events['symbol'], events['ex_date'], events['price_factor']):
+                    self._events.setdefault(symbol, []).append((ex_date.date().toordinal(), factor))
+        return self._events
+
+    def add_day(self, trade_date, symbols, highs, lows):
+        """
+        Add the bars of one trading day. Bars of a symbol up to the last day added for it are ignored, so
+        replaying days is harmless.
+        :param trade_date: date of the bars
+        :param symbols: array like of symbols
+        :param highs: array like of highs, same order
+        :param lows: array like of lows, same order
+        :return: number of bars added
+        """
+        day = _as_day(trade_date)
+        first_day = day - self.window_days + 1
+        added = 0
+        with self._lock:
+            store = self._symbols
+            events = self._split_events()
+            for symbol, high, low in zip(symbols, np.asarray(highs, dtype=np.float64),
+                                         np.asarray(lows, dtype=np.float64)):
+                extremes = store.get(symbol)
+                if extremes is None:
+                    extremes = store[symbol] = _Extremes()
+                elif extremes.last >= day:
+                    continue
+                elif symbol in events:
+                    for ex_day, factor in events[symbol]:
+                        if extremes.last < ex_day <= day:
+                            extremes.scale(factor)
+                extremes.push(day, float(high), float(low))
+                extremes.expire(first_day)
+                added += 1
+            if added and (self.last_day is None or day > self.last_day):
+                self.last_day = day
+        return added
+
+    def add_bhav(self, bhav_df, series=EQUITY_SERIES):
+        """
+        Add the trading days of equity bhav copies (NseUtils.equity_bhav_copy / equity_bhav_copy_range)
+        :param series: Optional. series rows are taken from, None for all
+        :return: number of days added
+        """
+        if bhav_df is None or bhav_df.empty:
+            return 0
+        if series is not None:
+            bhav_df = bhav_df[bhav_df['SctySrs'].astype('string').str.strip().isin(series).fillna(False).to_numpy()]
+        dates = bhav_df['TRADE_DATE'] if 'TRADE_DATE' in bhav_df.columns else bhav_df['TradDt']
+        added = 0
+        for trade_date, day_df in bhav_df.groupby(pd.to_datetime(dates), sort=True):
+            added += self.add_day(trade_date, day_df['TckrSymb'].astype('string').str.upper(),
+                                  day_df['HghPric'].to_numpy(dtype=np.float64, na_value=np.nan),
+                                  day_df['LwPric'].to_numpy(dtype=np.float64, na_value=np.nan)) > 0
+        return added
+
+    def add_history(self, symbol, df, high='High', low='Low'):
+        """
+        Add the daily bars of one symbol, oldest first, eg: NSEMasterData.get_history(symbol, interval='1d')
+        (dates in the index)
+        :return: number of bars added
+        """
+        if df is None or df.empty:
+            return 0
+        symbol = symbol.upper()
+        added = 0
+        for trade_date, bar_high, bar_low in zip(df.index, df[high].to_numpy(dtype=np.float64),
+                                                 df[low].to_numpy(dtype=np.float64)):
+            added += self.add_day(trade_date, [symbol], [bar_high], [bar_low])
+        return added
+
+    # ------------------------------------------------------------------ #
+    #  Lookups
+    # ------------------------------------------------------------------ #
+
+    def get(self, symbol):
+        """
+        52 week high / low of a symbol, as returned by NseUtils.get_52week_high_low(stock)
+        :return: dict or None when the symbol has no bars in the window
+        """
+        with self._lock:
+            symbol = symbol.upper()
+            extremes = self._symbols.get(symbol)
+            if extremes is None:
+                return None
+            # Symbols that stopped trading still hold days that left the window
+            extremes.expire(self.last_day - self.window_days + 1)
+            if not extremes.highs or not extremes.lows:
+                return None
+            (high_day, high), (low_day, low) = extremes.highs[0], extremes.lows[0]
+        return {
+            "Symbol": symbol,
+            "52 Week High": high,
+            "52 Week High Date": f"{date.fromordinal(high_day):%d-%b-%Y}",
+            "52 Week Low": low,
+            "52 Week Low Date": f"{date.fromordinal(low_day):%d-%b-%Y}",
+        }
+
+    def frame(self):
+        """
+        52 week high / low of every symbol, in the layout of the NSE 52 week high / low file. The high / low
+        columns are named 'Adjusted 52_Week_High / Low' only when the store adjusts for splits and bonus issues,
+        '52_Week_High / Low' otherwise
+        :return: pandas.DataFrame sorted by symbol
+        """
+        rows = [self.get(symbol) for symbol in sorted(self._symbols)]
+        df = pd.DataFrame([row for row in rows if row is not None],
+                          columns=['Symbol', '52 Week High', '52 Week High Date', '52 Week Low', '52 Week Low Date'])
+        prefix = 'Adjusted ' if self.adjustments is not None else ''
+        return df.rename(columns={'Symbol': 'SYMBOL', '52 Week High': f"{prefix}52_Week_High",
+                                  '52 Week High Date': '52_Week_High_Date', '52 Week Low': f"{prefix}52_Week_Low",
+                                  '52 Week Low Date': '52_Week_Low_DT'})
+
+    # ------------------------------------------------------------------ #
+    #  Persistence
+    # ------------------------------------------------------------------ #
+
+    @classmethod
+    def load(cls, path=None, window_days=365, adjustments=None):
+        """
+        Store saved at path, or an empty one when there is none (or it was saved with another window)
+        :param path: Optional. defaults to ~/.nsedata/high_low/equity.json
+        """
+        path = data_dir('high_low') / 'equity.json' if path is None else path
+        store = cls(window_days, adjustments, path)
+        if path.exists():
+            with open(path) as f:
+                state = json.load(f)
+            if state['window_days'] == window_days:
+                store.last_day = state['last_day']
+                store._symbols = {symbol: _Extremes(map(tuple, highs), map(tuple, lows), last)
+                                  for symbol, (highs, lows, last) in state['symbols'].items()}
+        return store
+
+    def save(self, path=None):
+        path = self.path if path is None else path
+        with self._lock:
+            state = {
+                'window_days': self.window_days, 'last_day': self.last_day,
+                'symbols': {symbol: [list(extremes.highs), list(extremes.lows), extremes.last]
+                            for symbol, extremes in self._symbols.items()},
+            }
+        atomic_write(path, lambda tmp_path: tmp_path.write_text(json.dumps(state)))
+
+    def sync_days(self, today=None):
+        """
+        First and last day still to be added to bring the store up to date
+        :return: (from datetime.date, to datetime.date) or None when up to date
+        """
+        today = date.today() if today is None else today
+        start = today - timedelta(days=self.window_days - 1) if self.last_day is None else \
+            date.fromordinal(self.last_day + 1)
+        return (start, today) if start <= today else None
+
+    def sync(self, fetch, today=None):
+        """
+        Add the trading days after the last day added, the whole window on the first sync, and save the store
+        when it has a path. A day without a bhav copy yet (eg: today before the close) is fetched again, but not
+        before retry_interval seconds when the previous fetch of the same days added nothing.
+        :param fetch: callable(from_date_str, to_date_str) with dates in 'dd-mm-YYYY', returning the equity bhav
+        copies of the range, eg: NseUtils.equity_bhav_copy_range
+        :param today: Optional. datetime.date, defaults to today
+        :return: number of days added
+        """
+        days = self.sync_days(today)
+        with self._lock:
+            empty = self._empty_sync
+            if days is None or (empty is not None and empty[0] == days
+                                and time.monotonic() - empty[1] < self.retry_interval):
+                self.hits += 1
+                return 0
+            self.misses += 1
+        added = self.add_bhav(fetch(days[0].strftime("%d-%m-%Y"), days[1].strftime("%d-%m-%Y")))
+        with self._lock:
+            self._empty_sync = None if added else (days, time.monotonic())
+        if added and self.path is not None:
+            self.save()
+        return added
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'symbols': len(self._symbols)}
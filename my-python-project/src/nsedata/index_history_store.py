@@ -0,0 +1,130 @@
+"""
+    * INDEX HISTORY STORE *
+
+    Description: Local store of the daily index history returned by NseUtils.get_index_historic_data.
+
+    Every index has one parquet file with its daily rows and a json file with the date ranges that have
+    already been downloaded (weekends and holidays have no rows, so the rows alone cannot tell what is
+    missing). A request is answered from disk and only the ranges not covered yet are downloaded and
+    merged in. Only past dates are recorded as covered, the current day is always downloaded again.
+
+    Layout : <root>/<INDEX NAME>.parquet + <INDEX NAME>.json   (root defaults to ~/.nsedata/index_history)
+
+"""
+
+import json
+import threading
+from datetime import date, datetime, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from nse_schemas import INDEX_HISTORY_SCHEMA, apply_schema, arrow_schema
+from nse_storage import atomic_write, data_dir, merge_ranges
+
+
+def index_dates(timestamps):
+    """Parse the TIMESTAMP column of the indicesHistory api ('17-Jun-2023') to datetime64"""
+    dates = pd.to_datetime(timestamps, format='%d-%b-%Y', errors='coerce')
+    if dates.isna().any():
+        dates = dates.fillna(pd.to_datetime(timestamps, dayfirst=True, format='mixed', errors='coerce'))
+    return dates
+
+
+class IndexHistoryStore:
+    def __init__(self, root=None):
+        """
+        :param root: Optional. Folder of the store, defaults to ~/.nsedata/index_history
+        """
+        self.root = data_dir('index_history') if root is None else root
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, index):
+        name = index.upper().replace('/', '_')
+        return self.root / f"{name}.parquet", self.root / f"{name}.json"
+
+    def covered(self, index):
+        """
+        Date ranges already downloaded for an index
+        :return: sorted list of [start, end] datetime.date, both inclusive
+        """
+        _, meta_path = self._paths(index)
+        if not meta_path.exists():
+            return []
+        with open(meta_path) as f:
+            ranges = json.load(f)['covered']
+        return [[datetime.strptime(start, "%Y-%m-%d").date(), datetime.strptime(end, "%Y-%m-%d").date()]
+                for start, end in ranges]
+
+    def missing(self, index, from_date, to_date):
+        """
+        Parts of a date range that are not in the store yet
+        :param from_date: datetime.date
+        :param to_date: datetime.date
+        :return: list of (start, end) datetime.date, both inclusive
+        """
+        gaps = []
+        cursor = from_date
+        for start, end in self.covered(index):
+            if end < cursor or start > to_date:
+                continue
+            if start > cursor:
+                gaps.append((cursor, start - timedelta(days=1)))
+            cursor = max(cursor, end + timedelta(days=1))
+        if cursor <= to_date:
+            gaps.append((cursor, to_date))
+        with self._lock:
+            if gaps:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return gaps
+
+    def load(self, index, from_date=None, to_date=None):
+        """
+        Stored rows of an index, oldest first
+        :return: pandas.DataFrame (empty when nothing is stored)
+        """
+        data_path, _ = self._paths(index)
+        if not data_path.exists():
+            return pd.DataFrame(columns=list(INDEX_HISTORY_SCHEMA))
+        df = pq.read_table(data_path).to_pandas()
+        dates = index_dates(df['TIMESTAMP'])
+        keep = pd.Series(True, index=df.index)
+        if from_date is not None:
+            keep &= dates >= pd.Timestamp(from_date)
+        if to_date is not None:
+            keep &= dates <= pd.Timestamp(to_date)
+        return df[keep].reset_index(drop=True)
+
+    def store(self, index, df, ranges):
+        """
+        Merge downloaded rows into the store and mark the ranges they were downloaded for as covered.
+        Rows and ranges of the current day (or later) are left out.
+        :param df: rows in the get_index_data layout
+        :param ranges: list of (start, end) datetime.date the rows were downloaded for
+        """
+        today = date.today()
+        ranges = [(start, min(end, today - timedelta(days=1))) for start, end in ranges if start < today]
+        if df is not None and not df.empty:
+            df = df[(index_dates(df['TIMESTAMP']) < pd.Timestamp(today)).to_numpy()]
+        if not ranges:
+            return
+        data_path, meta_path = self._paths(index)
+        with self._lock:
+            frames = [frame for frame in (self.load(index), df) if frame is not None and not frame.empty]
+            if frames:
+                merged = apply_schema(pd.concat(frames, ignore_index=True), INDEX_HISTORY_SCHEMA)
+                merged = merged.assign(_date=index_dates(merged['TIMESTAMP']))
+                merged = merged.drop_duplicates('_date', keep='last').sort_values('_date').drop(columns='_date')
+                table = pa.Table.from_pandas(merged, schema=arrow_schema(merged, INDEX_HISTORY_SCHEMA),
+                                             preserve_index=False)
+                atomic_write(data_path, lambda tmp_path: pq.write_table(table, tmp_path))
+
+            covered = merge_ranges([tuple(r) for r in self.covered(index)] + ranges)
+            meta = {'covered': [[f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}"] for start, end in covered]}
+            atomic_write(meta_path, lambda tmp_path: tmp_path.write_text(json.dumps(meta)))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,267 @@
+"""
+    * INDEX MEMBERSHIP STORE *
+
+    Description: Constituents of the NSE indices (NseUtils.equity_market_list), with the history of the
+    symbols added to and removed from every index.
+
+    Every refresh of an index stores a snapshot of its members and records the difference with the previous
+    snapshot as dated 'added' / 'removed' changes, so the members of an index on a past day are the current
+    snapshot with the later changes undone. An inverted symbol -> indices map is kept in memory next to the
+    snapshots, which makes "which indices contain X" and universe selection (members of a set of indices)
+    dictionary lookups instead of one download per index.
+
+    Location : <root>/index_membership/membership.json   (root defaults to ~/.nsedata)
+
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import pandas as pd
+from nse_storage import atomic_write, data_dir
+
+CHANGE_COLUMNS = ['Date', 'Index', 'Symbol', 'Change']
+
+# Sectoral indices of NseUtils.equity_market_list, the sector of a symbol is the first of them it belongs to
+SECTOR_INDICES = ['NIFTY BANK', 'NIFTY PRIVATE BANK', 'NIFTY PSU BANK', 'NIFTY FINANCIAL SERVICES', 'NIFTY IT',
+                  'NIFTY AUTO', 'NIFTY PHARMA', 'NIFTY FMCG', 'NIFTY METAL', 'NIFTY ENERGY', 'NIFTY REALTY',
+                  'NIFTY MEDIA']
+
+
+def _as_date(value):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def _change_day(change):
+    return change[0]
+
+
+class IndexMembershipStore:
+    def __init__(self, path=None):
+        """
+        :param path: Optional. json file of the store, defaults to ~/.nsedata/index_membership/membership.json.
+        The store is loaded from it when it exists
+        """
+        self.path = data_dir('index_membership') / 'membership.json' if path is None else path
+        self._lock = threading.Lock()
+        self._snapshots = {}  # index -> {'since': first snapshot date, 'date': datetime.date, 'members': set}
+        self._changes = []  # [datetime.date, index, symbol, 'added' / 'removed'], oldest first
+        self._by_symbol = {}  # symbol -> set of indices
+        self._dirty = False  # snapshot dates moved without a change of members, not saved yet
+        self.hits = 0
+        self.misses = 0
+        if self.path.exists():
+            self._load()
+
+    def _load(self):
+        with open(self.path) as f:
+            state = json.load(f)
+        for index, snapshot in state['snapshots'].items():
+            self._snapshots[index] = {'since': date.fromisoformat(snapshot['since']),
+                                      'date': date.fromisoformat(snapshot['date']), 'members': set(snapshot['members'])}
+            for symbol in snapshot['members']:
+                self._by_symbol.setdefault(symbol, set()).add(index)
+        self._changes = [[date.fromisoformat(day), index, symbol, change]
+                         for day, index, symbol, change in state['changes']]
+        # Stores saved before the changes were kept in date order across indices
+        self._changes.sort(key=_change_day)
+
+    def _save(self):
+        state = {
+            'snapshots': {index: {'since': snapshot['since'].isoformat(), 'date': snapshot['date'].isoformat(),
+                                  'members': sorted(snapshot['members'])}
+                          for index, snapshot in self._snapshots.items()},
+            'changes': [[day.isoformat(), index, symbol, change] for day, index, symbol, change in self._changes],
+        }
+        atomic_write(self.path, lambda tmp_path: tmp_path.write_text(json.dumps(state)))
+        self._dirty = False
+
+    def flush(self):
+        """Save snapshot dates that moved without a change of members, see update"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    # ------------------------------------------------------------------ #
+    #  Updates
+    # ------------------------------------------------------------------ #
+
+    def update(self, index, symbols, as_of=None):
+        """
+        Store a snapshot of the members of an index and record the changes since the previous one
+        :param index: index name, eg: 'NIFTY 50'
+        :param symbols: members, eg: NseUtils.get_index_details('NIFTY 50', list_only=True)
+        :param as_of: Optional. date of the snapshot, defaults to today. Snapshots older than the stored one are
+        ignored
+        :return: pandas.DataFrame of the changes recorded, with CHANGE_COLUMNS
+
+        The store is saved when the members changed. A snapshot with the same members only moves its date in
+        memory, saved by the next change, sync or flush, so refreshing an index on every read costs no write.
+        """
+        as_of = _as_date(as_of)
+        members = {symbol.upper() for symbol in symbols}
+        with self._lock:
+            previous = self._snapshots.get(index)
+            if previous is not None and as_of < previous['date']:
+                return pd.DataFrame(columns=CHANGE_COLUMNS)
+            old = set() if previous is None else previous['members']
+            if previous is not None and members == old:
+                if as_of > previous['date']:
+                    previous['date'] = as_of
+                    self._dirty = True
+                return pd.DataFrame(columns=CHANGE_COLUMNS)
+            changes = []
+            if previous is not None:
+                changes = [[as_of, index, symbol, 'added'] for symbol in sorted(members - old)] + \
+                          [[as_of, index, symbol, 'removed'] for symbol in sorted(old - members)]
+            for symbol in old - members:
+                indices = self._by_symbol[symbol]
+                indices.discard(index)
+                if not indices:
+                    del self._by_symbol[symbol]
+            for symbol in members - old:
+                self._by_symbol.setdefault(symbol, set()).add(index)
+            self._snapshots[index] = {'since': as_of if previous is None else previous['since'], 'date': as_of,
+                                      'members': members}
+            # Indices are updated in any order: a late snapshot of one index may predate the last change of another.
+            # The stable sort keeps the date order members(as_of) walks back on
+            out_of_order = changes and self._changes and as_of < self._changes[-1][0]
+            self._changes.extend(changes)
+            if out_of_order:
+                self._changes.sort(key=_change_day)
+            self._save()
+        return pd.DataFrame(changes, columns=CHANGE_COLUMNS)
+
+    def stale(self, indices, as_of=None):
+        """
+        Indices without a snapshot of the day
+        :param indices: iterable of index names
+        :param as_of: Optional. datetime.date, defaults to today
+        :return: list of index names
+        """
+        as_of = _as_date(as_of)
+        indices = list(indices)
+        with self._lock:
+            stale = [index for index in indices
+                     if index not in self._snapshots or self._snapshots[index]['date'] < as_of]
+            self.hits += len(indices) - len(stale)
+            self.misses += len(stale)
+        return stale
+
+    def sync(self, indices, fetch, as_of=None, max_workers=8):
+        """
+        Refresh the indices without a snapshot of the day
+        :param indices: iterable of index names, eg: NseUtils.equity_market_list
+        :param fetch: callable(index) returning its members, None when the download failed
+        :param as_of: Optional. datetime.date, defaults to today
+        :param max_workers: Optional. Number of concurrent downloads
+        :return: pandas.DataFrame of the changes recorded, with CHANGE_COLUMNS
+        """
+        stale = self.stale(indices, as_of)
+        if not stale:
+            return pd.DataFrame(columns=CHANGE_COLUMNS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = list(executor.map(fetch, stale))
+        frames = [self.update(index, members, as_of) for index, members in zip(stale, fetched) if members is not None]
+        self.flush()
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CHANGE_COLUMNS)
+
+    # ------------------------------------------------------------------ #
+    #  Lookups
+    # ------------------------------------------------------------------ #
+
+    @property
+    def indices(self):
+        """Indices with a snapshot"""
+        return sorted(self._snapshots)
+
+    def members(self, index, as_of=None):
+        """
+        Members of an index
+        :param as_of: Optional. date, the members on that day rebuilt from the change history
+        :return: sorted list of symbols, None when the index has no snapshot (or no snapshot before as_of)
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(index)
+            if snapshot is None:
+                return None
+            members = set(snapshot['members'])
+            if as_of is not None:
+                as_of = _as_date(as_of)
+                if as_of < snapshot['since']:
+                    return None
+                for day, name, symbol, change in reversed(self._changes):
+                    if day <= as_of:
+                        break
+                    if name == index:
+                        if change == 'added':
+                            members.discard(symbol)
+                        else:
+                            members.add(symbol)
+        return sorted(members)
+
+    def indices_of(self, symbol):
+        """
+        Indices a symbol currently belongs to
+        :return: sorted list of index names, empty when it is in none of the stored snapshots
+        """
+        with self._lock:
+            return sorted(self._by_symbol.get(symbol.upper(), ()))
+
+    def universe(self, indices):
+        """
+        Symbols that belong to any of the indices
+        :param indices: index name or list of index names
+        :return: sorted list of symbols
+        """
+        indices = [indices] if isinstance(indices, str) else indices
+        with self._lock:
+            symbols = set()
+            for index in indices:
+                snapshot = self._snapshots.get(index)
+                if snapshot is not None:
+                    symbols |= snapshot['members']
+        return sorted(symbols)
+
+    def sectors(self, symbols, sector_indices=SECTOR_INDICES):
+        """
+        Sector of every symbol: the first of the sector indices it belongs to, eg: to group a heatmap
+        :param symbols: iterable of symbols
+        :param sector_indices: Optional. ordered index names
+        :return: dict of symbol -> index name, 'OTHERS' when in none of them
+        """
+        with self._lock:
+            sectors = {}
+            for symbol in symbols:
+                indices = self._by_symbol.get(symbol.upper(), ())
+                sectors[symbol] = next((index for index in sector_indices if index in indices), 'OTHERS')
+        return sectors
+
+    def changes(self, index=None, symbol=None, from_date=None, to_date=None):
+        """
+        Recorded membership changes, oldest first
+        :param index: Optional. index name
+        :param symbol: Optional. symbol
+        :param from_date: Optional. date, first day (inclusive)
+        :param to_date: Optional. date, last day (inclusive)
+        :return: pandas.DataFrame with CHANGE_COLUMNS
+        """
+        from_date = _as_date(from_date) if from_date is not None else None
+        to_date = _as_date(to_date) if to_date is not None else None
+        symbol = symbol.upper() if symbol is not None else None
+        with self._lock:
+            rows = [row for row in self._changes
+                    if (index is None or row[1] == index) and (symbol is None or row[2] == symbol)
+                    and (from_date is None or row[0] >= from_date) and (to_date is None or row[0] <= to_date)]
+        return pd.DataFrame(rows, columns=CHANGE_COLUMNS)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
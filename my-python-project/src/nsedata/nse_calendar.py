@@ -0,0 +1,220 @@
+"""
+    * NSE TRADING CALENDAR *
+
+    Description: Precomputed NSE session calendar.
+
+    The trading and clearing holiday lists are downloaded once and kept in a local json file that is
+    refreshed once a year (NSE publishes the list of the current year only, so past years are kept
+    from earlier downloads). From them two numpy business day calendars (Mon-Fri minus the holidays,
+    held as sorted datetime64[D] arrays) are built, and all lookups are numpy calls on those.
+
+    Past years that were never downloaded have no holidays in the lists. Their closures are learnt
+    instead: a weekday of such a year NSE has no bhav copy for is added with add_closures, saved with
+    the lists, and is no session from then on.
+
+    Every query accepts a single date or an array like of dates. Dates may be datetime / date / Timestamp /
+    numpy datetime64 or strings in the 'dd-mm-YYYY' or 'dd-Mon-YYYY' formats used across NseUtils.
+    A single date returns a single value, an array returns a numpy array.
+
+    Location : <root>/calendar/nse_holidays.json   (root defaults to ~/.nsedata)
+
+"""
+
+import json
+import threading
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from nse_storage import atomic_write, data_dir
+
+_DATE_FORMATS = ("%d-%m-%Y", "%d-%b-%Y", "%Y-%m-%d")
+
+
+def _parse_date_str(value):
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{value}'. Please use 'dd-mm-YYYY' or 'dd-Mon-YYYY'")
+
+
+def to_days(dates):
+    """
+    Convert one or many dates to numpy datetime64[D]
+    :return: (datetime64[D] array, True if a single date was given)
+    """
+    if isinstance(dates, str):
+        return np.array([_parse_date_str(dates)], dtype='datetime64[D]'), True
+    if isinstance(dates, (datetime, date, np.datetime64, pd.Timestamp)):
+        return np.array([pd.Timestamp(dates).to_datetime64()]).astype('datetime64[D]'), True
+    values = list(dates) if not isinstance(dates, (np.ndarray, pd.Index, pd.Series)) else dates
+    if len(values) and isinstance(values[0], str):
+        values = [_parse_date_str(value) for value in values]
+    return np.asarray(pd.DatetimeIndex(values).values).astype('datetime64[D]'), False
+
+
+def _as_result(days, scalar):
+    """Return days as datetime for a single date, as datetime64[D] array otherwise."""
+    if scalar:
+        return pd.Timestamp(days[0]).to_pydatetime()
+    return days
+
+
+class NseCalendar:
+    refresh_days = 365
+
+    def __init__(self, nse=None, path=None):
+        """
+        :param nse: Optional. NseUtils used to download the holiday lists, a new one is created when needed
+        :param path: Optional. json file of the holidays, defaults to ~/.nsedata/calendar/nse_holidays.json
+        """
+        self._nse = nse
+        self.path = data_dir('calendar') / 'nse_holidays.json' if path is None else path
+        self._lock = threading.Lock()
+        self.refreshed = None
+        self._set_holidays([], [])
+        self.load()
+
+    # ------------------------------------------------------------------ #
+    #  Holiday lists
+    # ------------------------------------------------------------------ #
+
+    def _set_holidays(self, trading, clearing, closures=()):
+        self.trading_holidays = np.unique(to_days(trading)[0]) if len(trading) else np.array([], 'datetime64[D]')
+        self.clearing_holidays = np.unique(to_days(clearing)[0]) if len(clearing) else np.array([], 'datetime64[D]')
+        self.closures = np.unique(to_days(closures)[0]) if len(closures) else np.array([], 'datetime64[D]')
+        self._trading = np.busdaycalendar(holidays=np.union1d(self.trading_holidays, self.closures))
+        self._clearing = np.busdaycalendar(holidays=np.union1d(self.clearing_holidays, self.closures))
+
+    def _save(self, trading, clearing, closures):
+        data = {
+            'refreshed': self.refreshed.strftime("%Y-%m-%d"),
+            'trading': [str(day) for day in trading],
+            'clearing': [str(day) for day in clearing],
+            'closures': [str(day) for day in closures],
+        }
+        atomic_write(self.path, lambda tmp_path: tmp_path.write_text(json.dumps(data, indent=1)))
+        self._set_holidays(trading, clearing, closures)
+
+    def _is_stale(self):
+        return self.refreshed is None or self.refreshed.year < date.today().year
+
+    def load(self):
+        """Load the holidays from the local file, downloading them first when missing or from an earlier year."""
+        data = None
+        if self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            self.refreshed = datetime.strptime(data['refreshed'], "%Y-%m-%d").date()
+            self._set_holidays(data['trading'], data['clearing'], data.get('closures', []))
+        if self._is_stale():
+            try:
+                self.refresh()
+            except Exception as e:
+                if data is None:
+                    print(f"Error downloading the NSE holidays, the calendar only knows weekends: {e}")
+                else:
+                    print(f"Error refreshing the NSE holidays, using the list of {self.refreshed:%Y}: {e}")
+
+    def refresh(self):
+        """Download the holiday lists of the current year and merge them into the local file."""
+        if self._nse is None:
+            from NseUtility import NseUtils
+            self._nse = NseUtils()
+        trading = self._nse.trading_holidays(list_only=True)
+        clearing = self._nse.clearing_holidays(list_only=True)
+        with self._lock:
+            trading = np.union1d(self.trading_holidays, to_days(trading)[0])
+            clearing = np.union1d(self.clearing_holidays, to_days(clearing)[0])
+            self.refreshed = date.today()
+            self._save(trading, clearing, self.closures)
+
+    def add_closures(self, dates):
+        """
+        Record days without a session of past years the holiday lists do not cover, eg: the days a bhav copy
+        range found no file for. Days of the current year, of a year with listed holidays, weekends and known
+        holidays are ignored, so a missing file of a listed year is not mistaken for a closure.
+        :param dates: date or array like of dates
+        :return: datetime64[D] array of the days added
+        """
+        days = to_days(dates)[0]
+        with self._lock:
+            listed_years = np.unique(self.trading_holidays.astype('datetime64[Y]'))
+            this_year = np.datetime64(date.today(), 'Y')
+            years = days.astype('datetime64[Y]')
+            days = days[(years < this_year) & ~np.isin(years, listed_years)
+                        & np.is_busday(days, busdaycal=self._trading)]
+            days = np.unique(days)
+            closures = np.union1d(self.closures, days)
+            if self.refreshed is None:
+                # Nothing downloaded yet: the closures are saved with the holiday lists by the next refresh
+                self._set_holidays(self.trading_holidays, self.clearing_holidays, closures)
+            elif len(days):
+                self._save(self.trading_holidays, self.clearing_holidays, closures)
+        return days
+
+    # ------------------------------------------------------------------ #
+    #  Queries
+    # ------------------------------------------------------------------ #
+
+    def is_trading_day(self, dates):
+        """True for dates with a trading session"""
+        days, scalar = to_days(dates)
+        result = np.is_busday(days, busdaycal=self._trading)
+        return bool(result[0]) if scalar else result
+
+    def is_clearing_day(self, dates):
+        days, scalar = to_days(dates)
+        result = np.is_busday(days, busdaycal=self._clearing)
+        return bool(result[0]) if scalar else result
+
+    def is_trading_holiday(self, dates):
+        """True for dates in the NSE trading holiday list (weekends are not listed)"""
+        days, scalar = to_days(dates)
+        result = np.isin(days, self.trading_holidays)
+        return bool(result[0]) if scalar else result
+
+    def is_clearing_holiday(self, dates):
+        days, scalar = to_days(dates)
+        result = np.isin(days, self.clearing_holidays)
+        return bool(result[0]) if scalar else result
+
+    def offset(self, dates, n):
+        """
+        The n-th trading day after (n > 0) or before (n < 0) a date. A date that is not a trading day is first
+        rolled to the trading day before it when moving forward and to the one after it when moving back, so
+        offset(d, 1) is always the first session after d and offset(d, -1) the last session before d.
+        offset(d, 0) is d itself or the last session before it.
+        """
+        days, scalar = to_days(dates)
+        n = np.asarray(n)
+        forward = np.busday_offset(days, n, roll='backward', busdaycal=self._trading)
+        backward = np.busday_offset(days, n, roll='forward', busdaycal=self._trading)
+        return _as_result(np.where(n >= 0, forward, backward), scalar)
+
+    def next_trading_day(self, dates):
+        """First trading day strictly after the date(s)"""
+        return self.offset(dates, 1)
+
+    def previous_trading_day(self, dates):
+        """Last trading day strictly before the date(s)"""
+        return self.offset(dates, -1)
+
+    def trading_days_between(self, from_date, to_date):
+        """
+        Trading days between two dates, both inclusive
+        :return: sorted datetime64[D] array
+        """
+        start, end = to_days(from_date)[0][0], to_days(to_date)[0][0]
+        if end < start:
+            raise ValueError(f'to_date = {to_date} should not be before from_date = {from_date}')
+        days = np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+        return days[np.is_busday(days, busdaycal=self._trading)]
+
+    def count_trading_days(self, from_date, to_date):
+        """Number of trading days between two dates (array likes allowed), both inclusive"""
+        start, scalar = to_days(from_date)
+        end = to_days(to_date)[0] + np.timedelta64(1, 'D')
+        result = np.busday_count(start, end, busdaycal=self._trading)
+        return int(result[0]) if scalar else result
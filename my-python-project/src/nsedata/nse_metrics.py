@@ -0,0 +1,266 @@
+"""
+    * NSE CLIENT METRICS *
+
+    Description: Per endpoint request metrics of the NSE clients.
+
+    The rate limited transport (nse_rate_limit.RateLimitedAdapter / AsyncRateLimitedTransport) records every
+    outbound request: latency, response bytes, status code and retries, labelled by endpoint. The endpoint of a
+    url is its path with the numbers (dates, ids) replaced by '{n}', eg:
+    /content/cm/BhavCopy_NSE_CM_0_0_0_{n}_F_{n}.csv.zip
+
+    Parse time is the time a client method spends after the last response of the call arrived (json decoding,
+    frame building). It is recorded for methods decorated with timed_parse. Cache hit ratios are read from the
+    stats of the caches registered with register_cache (bhav archive, index history store, ...).
+
+    Metrics.stats() returns everything as a dict; Metrics.prometheus() in the Prometheus text format.
+
+"""
+
+import bisect
+import contextlib
+import functools
+import re
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_NUMBER = re.compile(r'\d+')
+
+
+def endpoint_of(url):
+    """Endpoint label of a url, eg: 'https://www.nseindia.com/api/quote-equity?symbol=SBIN' -> '/api/quote-equity'"""
+    return _NUMBER.sub('{n}', urlsplit(url).path) or '/'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        """
+        :param buckets: sorted upper bounds, +Inf is added
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate of the q quantile, interpolated inside its bucket like Prometheus histogram_quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - cumulative) / count)
+            cumulative += count
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'max': self.max,
+        }
+
+    def cumulative(self):
+        """(upper bound label, cumulative count) pairs, ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), total
+
+
+class _Endpoint:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.parse = Histogram(PARSE_BUCKETS)
+        self.status = {}
+        self.bytes = 0
+        self.retries = 0
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._caches = {}
+        self._local = threading.local()
+
+    def _endpoint(self, endpoint):
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints.setdefault(endpoint, _Endpoint())
+        return metrics
+
+    # ------------------------------------------------------------------ #
+    #  Recording
+    # ------------------------------------------------------------------ #
+
+    def observe_request(self, endpoint, status, seconds, size):
+        """
+        Record one request attempt
+        :param status: http status code, or 'error' for a connection error / timeout
+        :param size: response bytes
+        """
+        with self._lock:
+            metrics = self._endpoint(endpoint)
+            metrics.latency.observe(seconds)
+            metrics.status[status] = metrics.status.get(status, 0) + 1
+            metrics.bytes += size
+        self._local.last_response = (endpoint, time.perf_counter())
+
+    def observe_retry(self, endpoint):
+        with self._lock:
+            self._endpoint(endpoint).retries += 1
+
+    def observe_parse(self, endpoint, seconds):
+        with self._lock:
+            self._endpoint(endpoint).parse.observe(seconds)
+
+    @contextlib.contextmanager
+    def parse_scope(self):
+        """
+        Record the time from the last response received in this thread to the end of the block as parse time of
+        that response's endpoint. Nested scopes are part of the outermost one.
+        """
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if not depth:
+            local.last_response = None
+        local.depth = depth + 1
+        try:
+            yield
+            last_response = local.last_response
+            if not depth and last_response is not None:
+                endpoint, received = last_response
+                self.observe_parse(endpoint, time.perf_counter() - received)
+        finally:
+            local.depth = depth
+
+    def register_cache(self, name, stats, hits='hits', misses='misses'):
+        """
+        Report the hit ratio of a cache. Caches registered under the same name are summed.
+        :param stats: bound stats method of the cache, eg: bhav_archive.stats. Only weakly referenced, so a
+        cache stops being reported once its client is gone
+        :param hits: key of the hit counter in the stats dict
+        :param misses: key of the miss counter in the stats dict
+        """
+        with self._lock:
+            self._caches.setdefault(name, []).append((weakref.WeakMethod(stats), hits, misses))
+
+    # ------------------------------------------------------------------ #
+    #  Reporting
+    # ------------------------------------------------------------------ #
+
+    def cache_stats(self):
+        with self._lock:
+            # Drop the caches of clients that are gone
+            for name, sources in self._caches.items():
+                self._caches[name] = [source for source in sources if source[0]() is not None]
+            caches = {name: list(sources) for name, sources in self._caches.items()}
+        result = {}
+        for name, sources in caches.items():
+            hits = misses = 0
+            for ref, hits_key, misses_key in sources:
+                stats_method = ref()
+                if stats_method is not None:
+                    stats = stats_method()
+                    hits += stats[hits_key]
+                    misses += stats[misses_key]
+            total = hits + misses
+            result[name] = {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None}
+        return result
+
+    def stats(self):
+        """
+        All metrics as a dict: {'endpoints': {endpoint: {...}}, 'caches': {name: {...}}}
+        """
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    'requests': sum(metrics.status.values()),
+                    'status': {str(status): count for status, count in metrics.status.items()},
+                    'retries': metrics.retries, 'bytes': metrics.bytes,
+                    'latency': metrics.latency.summary(), 'parse': metrics.parse.summary(),
+                }
+                for endpoint, metrics in sorted(self._endpoints.items())
+            }
+        return {'endpoints': endpoints, 'caches': self.cache_stats()}
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, label, histogram_):
+            for bound, count in histogram_.cumulative():
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"{name}_sum{{{label}}} {histogram_.sum}")
+            lines.append(f"{name}_count{{{label}}} {histogram_.count}")
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            family('nse_requests_total', 'counter', 'Requests sent to NSE by endpoint and status')
+            for endpoint, metrics in endpoints:
+                for status, count in sorted(metrics.status.items(), key=str):
+                    lines.append(f'nse_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            family('nse_request_retries_total', 'counter', 'Requests retried after a throttled or failed answer')
+            for endpoint, metrics in endpoints:
+                lines.append(f'nse_request_retries_total{{endpoint="{endpoint}"}} {metrics.retries}')
+            family('nse_response_bytes_total', 'counter', 'Response body bytes received')
+            for endpoint, metrics in endpoints:
+                lines.append(f'nse_response_bytes_total{{endpoint="{endpoint}"}} {metrics.bytes}')
+            family('nse_request_duration_seconds', 'histogram', 'Request latency including the body download')
+            for endpoint, metrics in endpoints:
+                histogram('nse_request_duration_seconds', f'endpoint="{endpoint}"', metrics.latency)
+            family('nse_parse_duration_seconds', 'histogram', 'Time spent parsing a response into its result')
+            for endpoint, metrics in endpoints:
+                if metrics.parse.count:
+                    histogram('nse_parse_duration_seconds', f'endpoint="{endpoint}"', metrics.parse)
+
+        caches = self.cache_stats()
+        family('nse_cache_hits_total', 'counter', 'Cache hits')
+        lines.extend(f'nse_cache_hits_total{{cache="{name}"}} {cache["hits"]}' for name, cache in caches.items())
+        family('nse_cache_misses_total', 'counter', 'Cache misses')
+        lines.extend(f'nse_cache_misses_total{{cache="{name}"}} {cache["misses"]}' for name, cache in caches.items())
+        family('nse_cache_hit_ratio', 'gauge', 'Share of cache lookups served from the cache')
+        lines.extend(f'nse_cache_hit_ratio{{cache="{name}"}} {cache["hit_ratio"] or 0.0}'
+                     for name, cache in caches.items())
+        return '\n'.join(lines) + '\n'
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def default_metrics():
+    """The process wide metrics shared by NseUtils and NSEMasterData"""
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+        return _default_metrics
+
+
+def timed_parse(method):
+    """Decorator of client methods (of objects with a metrics attribute) that records their parse time"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.metrics.parse_scope():
+            return method(self, *args, **kwargs)
+    return wrapper
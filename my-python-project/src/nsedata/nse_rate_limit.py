@@ -0,0 +1,261 @@
+"""
+    * NSE RATE LIMITER *
+
+    Description: Shared per-host rate limiting and retry layer for the NSE clients.
+
+    Every NSE host gets a token bucket, so requests from all threads (and all clients sharing the limiter)
+    go out at a steady rate just below what NSE tolerates instead of in bursts. When NSE still answers with
+    429 / 5xx the request is retried with jittered exponential backoff, and the whole host is paused
+    for that time so the other threads back off too.
+
+    403 is answered as it is: on www.nseindia.com it means the cookies were rejected and NseSession primes
+    them again, on the archive hosts it is how NSE reports a report that does not exist (eg: a holiday).
+
+    RateLimitedAdapter plugs the limiter into a requests.Session. RetryQueue collects work items (eg: a
+    symbol of the screener) that still failed so they can be run again once the batch has finished.
+
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from nse_metrics import default_metrics, endpoint_of
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# host -> (requests per second, burst)
+DEFAULT_LIMITS = {
+    'www.nseindia.com': (3.0, 6),
+    'nsearchives.nseindia.com': (5.0, 10),
+    'archives.nseindia.com': (5.0, 10),
+    'charting.nseindia.com': (5.0, 10),
+}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """
+        :param rate: tokens added per second
+        :param burst: maximum number of tokens kept
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token
+        :return: seconds the caller has to wait before the token may be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A negative balance queues the callers behind each other, one 1/rate apart
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+def retry_after(response):
+    """Seconds asked for by a Retry-After header, or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RateLimiter:
+    def __init__(self, limits=None, max_retries=3, backoff_base=0.5, backoff_cap=30.0,
+                 retry_status_codes=RETRY_STATUS_CODES):
+        """
+        :param limits: Optional. dict of host -> (requests per second, burst). Hosts not listed are not limited
+        :param max_retries: retries of a request answered with one of retry_status_codes
+        :param backoff_base: seconds of the first backoff, doubled on every further retry
+        :param backoff_cap: maximum backoff in seconds
+        """
+        limits = DEFAULT_LIMITS if limits is None else limits
+        self.buckets = {host: TokenBucket(rate, burst) for host, (rate, burst) in limits.items()}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_status_codes = tuple(retry_status_codes)
+        self._paused_until = {}
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _count(self, host, counter):
+        with self._lock:
+            counters = self._counters.setdefault(host, {'requests': 0, 'throttled': 0, 'retried': 0, 'failed': 0})
+            counters[counter] += 1
+
+    def reserve(self, host):
+        """
+        Reserve a request slot on a host
+        :return: seconds to wait before sending
+        """
+        self._count(host, 'requests')
+        bucket = self.buckets.get(host)
+        delay = bucket.reserve() if bucket is not None else 0.0
+        with self._lock:
+            delay = max(delay, self._paused_until.get(host, 0.0) - time.monotonic())
+        if delay > 0:
+            self._count(host, 'throttled')
+        return max(delay, 0.0)
+
+    def should_retry(self, status_code, attempt):
+        return status_code in self.retry_status_codes and attempt < self.max_retries
+
+    def backoff(self, host, attempt, delay=None):
+        """
+        Pause a host after a throttled / failed response
+        :param attempt: 0 for the first retry
+        :param delay: Optional. Delay asked for by the server (Retry-After)
+        :return: seconds the host is paused for
+        """
+        if delay is None:
+            ceiling = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+            delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        self._count(host, 'retried')
+        with self._lock:
+            self._paused_until[host] = max(self._paused_until.get(host, 0.0), time.monotonic() + delay)
+        return delay
+
+    def record_failure(self, host):
+        self._count(host, 'failed')
+
+    def stats(self):
+        """
+        Request counters, in total and per host
+        :return: dict
+        """
+        with self._lock:
+            hosts = {host: dict(counters) for host, counters in self._counters.items()}
+        totals = {name: sum(counters[name] for counters in hosts.values())
+                  for name in ('requests', 'throttled', 'retried', 'failed')}
+        totals['hosts'] = hosts
+        return totals
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def default_limiter():
+    """The process wide limiter shared by NseUtils and NSEMasterData"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """requests transport adapter that sends every request through a RateLimiter."""
+
+    def __init__(self, limiter=None, metrics=None, **kwargs):
+        """
+        :param limiter: Optional. RateLimiter, defaults to the shared default_limiter()
+        :param metrics: Optional. nse_metrics.Metrics recording every request, defaults to the shared one
+        :param kwargs: passed on to HTTPAdapter, eg: pool_maxsize
+        """
+        self.limiter = limiter or default_limiter()
+        self.metrics = metrics or default_metrics()
+        super().__init__(**kwargs)
+
+    def _send(self, request, endpoint, **kwargs):
+        """One attempt, timed until the body is downloaded (headers only for streamed requests)"""
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.metrics.observe_request(endpoint, 'error', time.perf_counter() - start, 0)
+            raise
+        size = int(response.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(response.content)
+        self.metrics.observe_request(endpoint, response.status_code, time.perf_counter() - start, size)
+        return response
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname
+        endpoint = endpoint_of(request.url)
+        attempt = 0
+        while True:
+            delay = self.limiter.reserve(host)
+            if delay:
+                time.sleep(delay)
+            try:
+                response = self._send(request, endpoint, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.limiter.max_retries:
+                    self.limiter.record_failure(host)
+                    raise
+                self.limiter.backoff(host, attempt)
+                self.metrics.observe_retry(endpoint)
+                attempt += 1
+                continue
+
+            if not self.limiter.should_retry(response.status_code, attempt):
+                if response.status_code in self.limiter.retry_status_codes:
+                    self.limiter.record_failure(host)
+                return response
+            self.limiter.backoff(host, attempt, retry_after(response))
+            self.metrics.observe_retry(endpoint)
+            response.close()
+            attempt += 1
+
+
+class RetryQueue:
+    """Work items that failed during a batch, run again one by one once the batch has finished."""
+
+    def __init__(self, max_rounds=2, delay=5.0):
+        """
+        :param max_rounds: number of times the queue is worked through
+        :param delay: seconds to wait before the first round, multiplied by the round number after that
+        """
+        self.max_rounds = max_rounds
+        self.delay = delay
+        self._items = []
+        self._lock = threading.Lock()
+        self.failed = {}
+
+    def put(self, key, func, *args, **kwargs):
+        with self._lock:
+            self._items.append((key, func, args, kwargs))
+
+    def __len__(self):
+        return len(self._items)
+
+    def drain(self):
+        """
+        Run the queued items again
+        :return: dict of key -> result of the items that succeeded. Items that failed every round are in
+        self.failed as key -> last exception
+        """
+        results = {}
+        for round_number in range(1, self.max_rounds + 1):
+            with self._lock:
+                items, self._items = self._items, []
+            if not items:
+                break
+            time.sleep(self.delay * round_number)
+            for key, func, args, kwargs in items:
+                try:
+                    results[key] = func(*args, **kwargs)
+                    self.failed.pop(key, None)
+                except Exception as e:
+                    self.failed[key] = e
+                    self.put(key, func, *args, **kwargs)
+        with self._lock:
+            self._items = []
+        return results
@@ -0,0 +1,177 @@
+"""
+    * NSE RECORD / REPLAY *
+
+    Description: Record real NSE responses to fixture files and replay them without network access.
+
+    RecordingAdapter sits in front of the normal transport adapter of a requests.Session and writes every
+    response (json, csv, zipped bhav copies, charting POST responses ...) to a FixtureStore. ReplayAdapter
+    answers requests from that store only. Both plug into NseUtils / NSEMasterData through their adapter
+    parameter, eg:
+
+        NseUtils(adapter=RecordingAdapter(FixtureStore('fixtures/nse')))     # record while using live NSE
+        NseUtils(adapter=ReplayAdapter(FixtureStore('fixtures/nse')))        # offline, from the fixtures
+
+    Fixtures are keyed on method + path + query (+ a hash of the body for POST requests) and not on the
+    host, so the same fixtures are served by nse_standin.py when the clients run with a base_url override.
+
+    Layout : <folder>/index.json + <folder>/bodies/<key hash>.<json|csv|zip|bin>
+
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from nse_rate_limit import RateLimitedAdapter
+from nse_storage import atomic_write
+
+# Headers kept with a fixture, everything else (cookies, dates, ...) is dropped. The body is stored as requests
+# decoded it, so Content-Encoding / Content-Length of the live response would not describe it
+_KEPT_HEADERS = ('Content-Type', 'Content-Disposition')
+
+
+def rebase_url(url, base_url):
+    """
+    Point an NSE url at another server, keeping path and query
+    eg: rebase_url('https://www.nseindia.com/api/allIndices', 'http://127.0.0.1:8000') -> 'http://127.0.0.1:8000/api/allIndices'
+    """
+    if not base_url:
+        return url
+    parts = urlsplit(url)
+    return base_url.rstrip('/') + parts.path + (f"?{parts.query}" if parts.query else '')
+
+
+def build_response(request, status, headers, content):
+    """requests.Response for a request answered without network access"""
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response._content_consumed = True
+    response.url = request.url
+    response.request = request
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.reason = 'OK' if status < 400 else 'Replayed error'
+    return response
+
+
+class FixtureNotFound(requests.exceptions.RequestException):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+class FixtureStore:
+    def __init__(self, folder, autoflush=True):
+        """
+        :param folder: fixture folder, created when recording
+        :param autoflush: write index.json after every save. Bulk recordings pass False and call flush() once
+        """
+        self.folder = Path(folder)
+        self.autoflush = autoflush
+        self._lock = threading.Lock()
+        index_path = self.folder / 'index.json'
+        self._index = json.loads(index_path.read_text()) if index_path.exists() else {}
+
+    @staticmethod
+    def key(method, url, body=None):
+        """Host independent fixture key of a request"""
+        parts = urlsplit(url)
+        key = f"{method.upper()} {parts.path}" + (f"?{parts.query}" if parts.query else '')
+        if body:
+            body = body.encode() if isinstance(body, str) else body
+            key += f" #{hashlib.sha1(body).hexdigest()[:12]}"
+        return key
+
+    @staticmethod
+    def _extension(url, content_type):
+        path = urlsplit(url).path.lower()
+        for extension in ('zip', 'csv', 'json'):
+            if path.endswith('.' + extension) or extension in content_type:
+                return extension
+        return 'bin'
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        return list(self._index)
+
+    def save(self, key, url, status, headers, content):
+        """Write one response to the store."""
+        headers = {name: headers[name] for name in _KEPT_HEADERS if name in headers}
+        extension = self._extension(url, headers.get('Content-Type', ''))
+        file_name = f"{hashlib.sha1(key.encode()).hexdigest()[:16]}.{extension}"
+        atomic_write(self.folder / 'bodies' / file_name, lambda tmp_path: tmp_path.write_bytes(content))
+        with self._lock:
+            self._index[key] = {'url': url, 'status': status, 'headers': headers, 'file': file_name}
+        if self.autoflush:
+            self.flush()
+
+    def flush(self):
+        """Write index.json"""
+        with self._lock:
+            index = json.dumps(self._index, indent=1, sort_keys=True)
+            atomic_write(self.folder / 'index.json', lambda tmp_path: tmp_path.write_text(index))
+
+    def load(self, key):
+        """
+        :return: (status, headers, content) of a recorded response
+        :raise KeyError when the request was not recorded
+        """
+        entry = self._index[key]
+        content = (self.folder / 'bodies' / entry['file']).read_bytes()
+        # Fixtures recorded before Content-Encoding was dropped may still carry it
+        headers = {name: value for name, value in entry['headers'].items() if name in _KEPT_HEADERS}
+        return entry['status'], headers, content
+
+
+class RecordingAdapter(BaseAdapter):
+    """Transport adapter that sends requests through an inner adapter and records every response."""
+
+    def __init__(self, store, adapter=None):
+        """
+        :param store: FixtureStore to record to
+        :param adapter: Optional. Adapter doing the actual I/O, defaults to a RateLimitedAdapter
+        """
+        super().__init__()
+        self.store = store
+        self.adapter = adapter or RateLimitedAdapter(pool_maxsize=20)
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        # Reading content here also means streamed responses are fully buffered before they are recorded
+        self.store.save(FixtureStore.key(request.method, request.url, request.body), request.url,
+                        response.status_code, response.headers, response.content)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers requests from a FixtureStore, without any network access."""
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def send(self, request, **kwargs):
+        key = FixtureStore.key(request.method, request.url, request.body)
+        try:
+            status, headers, content = self.store.load(key)
+        except KeyError:
+            self.misses += 1
+            raise FixtureNotFound(f"No fixture recorded for '{key}'", request=request)
+        self.hits += 1
+        return build_response(request, status, headers, content)
+
+    def close(self):
+        pass
@@ -0,0 +1,286 @@
+"""
+Explicit column schemas for NSE reports.
+
+A schema maps a column name to one of the kinds below. Columns not listed in a schema are kept as
+strings. The same schema is used to type a freshly downloaded frame and to write it to disk, so a
+frame read back from a local store is identical to the one returned by the network path.
+
+    str      - text
+    category - pandas categorical, for the few distinct values of symbol / series / instrument columns
+    float    - float64, unparsable values ('-', '') become NaN
+    price    - float32 when every value survives the round trip to the paisa (prices below ~1.3 lakh),
+               float64 otherwise
+    int      - nullable Int64
+    date     - datetime64, parsed with the format in DATE_FORMATS (or inferred). Every distinct value is
+               parsed once, a bhav copy has one or two trade dates and a few expiries
+
+compact_frame applies the schema of an endpoint (ENDPOINT_SCHEMAS) for the compact output mode of NseUtils and
+also shrinks the columns a schema does not list: numbers sent as text are parsed, integers and floats are
+downcast, repetitive text becomes categorical and the remaining text arrow backed strings.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# UDiFF bhav copy layout, shared by the CM and F&O reports
+_UDIFF_BHAV = {
+    'TradDt': 'date', 'BizDt': 'date', 'Sgmt': 'category', 'Src': 'category', 'FinInstrmTp': 'category',
+    'FinInstrmId': 'int', 'ISIN': 'str', 'TckrSymb': 'category', 'SctySrs': 'category', 'XpryDt': 'date',
+    'FininstrmActlXpryDt': 'date', 'StrkPric': 'price', 'OptnTp': 'category', 'FinInstrmNm': 'str',
+    'OpnPric': 'price', 'HghPric': 'price', 'LwPric': 'price', 'ClsPric': 'price', 'LastPric': 'price',
+    'PrvsClsgPric': 'price', 'UndrlygPric': 'price', 'SttlmPric': 'price', 'OpnIntrst': 'int',
+    'ChngInOpnIntrst': 'int', 'TtlTradgVol': 'int', 'TtlTrfVal': 'float', 'TtlNbOfTxsExctd': 'int',
+    'SsnId': 'category', 'NewBrdLotQty': 'int', 'Rmks': 'str', 'Rsvd1': 'str', 'Rsvd2': 'str', 'Rsvd3': 'str',
+    'Rsvd4': 'str',
+}
+
+BHAV_SCHEMAS = {
+    'equity': dict(_UDIFF_BHAV),
+    'fno': dict(_UDIFF_BHAV),
+    'delivery': {
+        'SYMBOL': 'category', 'SERIES': 'category', 'DATE1': 'date', 'PREV_CLOSE': 'price', 'OPEN_PRICE': 'price',
+        'HIGH_PRICE': 'price', 'LOW_PRICE': 'price', 'LAST_PRICE': 'price', 'CLOSE_PRICE': 'price',
+        'AVG_PRICE': 'price', 'TTL_TRD_QNTY': 'int', 'TURNOVER_LACS': 'float', 'NO_OF_TRADES': 'int',
+        'DELIV_QTY': 'int', 'DELIV_PER': 'price',
+    },
+    'indices': {
+        'Index Name': 'category', 'Index Date': 'date', 'Open Index Value': 'price', 'High Index Value': 'price',
+        'Low Index Value': 'price', 'Closing Index Value': 'price', 'Points Change': 'price',
+        'Change(%)': 'price', 'Volume': 'float', 'Turnover (Rs. Cr.)': 'float', 'P/E': 'price', 'P/B': 'price',
+        'Div Yield': 'price',
+    },
+}
+
+# Daily rows of the indicesHistory api as returned by NseUtils.get_index_data
+INDEX_HISTORY_SCHEMA = {
+    'TIMESTAMP': 'str', 'INDEX_NAME': 'str', 'OPEN_INDEX_VAL': 'float', 'HIGH_INDEX_VAL': 'float',
+    'CLOSE_INDEX_VAL': 'float', 'LOW_INDEX_VAL': 'float', 'TRADED_QTY': 'int', 'TURN_OVER': 'float',
+}
+
+# Compact mode schemas of the NseUtils methods, by method name. Dates without an entry in DATE_FORMATS are
+# parsed with the format inferred from their first value (NSE api dates read like '17-Jun-2023 15:30:00')
+_MOST_ACTIVE = {
+    'symbol': 'category', 'identifier': 'str', 'instrumentType': 'category', 'instrument': 'category',
+    'expiryDate': 'date', 'optionType': 'category', 'strikePrice': 'price', 'lastPrice': 'price',
+    'underlying': 'category', 'underlyingValue': 'price',
+}
+_FILINGS = {'symbol': 'category', 'series': 'category', 'isin': 'category', 'comp': 'category'}
+
+ENDPOINT_SCHEMAS = {
+    'pre_market_info': {'series': 'category', 'lastPrice': 'price', 'previousClose': 'price', 'iep': 'price',
+                        'yearHigh': 'price', 'yearLow': 'price', 'lastUpdateTime': 'date'},
+    'get_index_details': {'series': 'category', 'open': 'price', 'dayHigh': 'price', 'dayLow': 'price',
+                          'lastPrice': 'price', 'previousClose': 'price', 'yearHigh': 'price', 'yearLow': 'price',
+                          'lastUpdateTime': 'date', 'date365dAgo': 'date', 'date30dAgo': 'date'},
+    'clearing_holidays': {'tradingDate': 'date', 'weekDay': 'category', 'Sr_no': 'int'},
+    'trading_holidays': {'tradingDate': 'date', 'weekDay': 'category', 'Sr_no': 'int'},
+    'futures_data': _MOST_ACTIVE,
+    'get_option_chain': dict(_MOST_ACTIVE, timestamp='date'),
+    'get_52week_high_low': {'SYMBOL': 'str', 'Adjusted 52_Week_High': 'price', '52_Week_High': 'price',
+                            '52_Week_High_Date': 'date', 'Adjusted 52_Week_Low': 'price', '52_Week_Low': 'price',
+                            '52_Week_Low_DT': 'date'},
+    'fii_dii_activity': {'category': 'category', 'date': 'date', 'buyValue': 'float', 'sellValue': 'float',
+                         'netValue': 'float'},
+    'get_live_option_chain': {'Fetch_Time': 'date', 'Symbol': 'category', 'Expiry_Date': 'date',
+                              'Strike_Price': 'price'},
+    'get_index_data': {'TIMESTAMP': 'date', 'INDEX_NAME': 'category'},
+    'get_index_historic_data': {'TIMESTAMP': 'date', 'INDEX_NAME': 'category'},
+    'get_equity_full_list': {'SYMBOL': 'str', ' SERIES': 'category', ' DATE OF LISTING': 'date',
+                             ' FACE VALUE': 'int'},
+    'get_fno_full_list': {'symbol': 'str', 'underlying': 'str'},
+    'get_corporate_action': dict(_FILINGS, subject='str', exDate='date', recDate='date', bcStartDate='date',
+                                 bcEndDate='date', ndStartDate='date', ndEndDate='date', faceVal='price'),
+    'get_corporate_announcement': dict(_FILINGS, an_dt='date', sort_date='date', desc='category'),
+    'get_insider_trading': dict(_FILINGS, date='date', acqfromDt='date', acqtoDt='date', intimDt='date',
+                                personCategory='category', acqMode='category', tdpTransactionType='category'),
+    'get_upcoming_results_calendar': dict(_FILINGS, date='date', purpose='category'),
+    'get_index_pe_ratio': {'Index': 'str', 'Type': 'category', 'P/E': 'price'},
+    'get_index_pb_ratio': {'Index': 'str', 'Type': 'category', 'P/B': 'price'},
+    'get_index_div_yield': {'Index': 'str', 'Type': 'category', 'Div Yield': 'price'},
+    'get_advance_decline': {'Index': 'str', 'Advances': 'int', 'Declines': 'int', 'Unchanged': 'int'},
+    'most_active_snapshot': dict(_MOST_ACTIVE, Fetch_Time='date'),
+    'get_etf_list': {'symbol': 'str', 'assets': 'str'},
+}
+ENDPOINT_SCHEMAS.update({
+    f"{report}_bhav_copy{suffix}": schema
+    for report, schema in (('equity', BHAV_SCHEMAS['equity']), ('fno', BHAV_SCHEMAS['fno']))
+    for suffix in ('', '_range')
+})
+ENDPOINT_SCHEMAS.update({
+    'bhav_copy_with_delivery': BHAV_SCHEMAS['delivery'], 'bhav_copy_with_delivery_range': BHAV_SCHEMAS['delivery'],
+    'bhav_copy_indices': BHAV_SCHEMAS['indices'], 'bhav_copy_indices_range': BHAV_SCHEMAS['indices'],
+})
+ENDPOINT_SCHEMAS.update({
+    f"most_active_{kind}": _MOST_ACTIVE
+    for kind in ('equity_stocks_by_volume', 'equity_stocks_by_value', 'index_calls', 'index_puts', 'stock_calls',
+                 'stock_puts', 'contracts_by_oi', 'contracts_by_volume', 'futures_contracts_by_volume',
+                 'options_contracts_by_volume')
+})
+
+DATE_FORMATS = {
+    'TradDt': '%Y-%m-%d', 'BizDt': '%Y-%m-%d', 'XpryDt': '%Y-%m-%d', 'FininstrmActlXpryDt': '%Y-%m-%d',
+    'DATE1': '%d-%b-%Y', 'Index Date': '%d-%m-%Y', 'TIMESTAMP': '%d-%b-%Y', 'tradingDate': '%d-%b-%Y',
+}
+
+_ARROW_TYPES = {
+    'str': pa.string(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'float': pa.float64(),
+    'int': pa.int64(),
+    'date': pa.timestamp('ns'),
+}
+
+_CSV_DTYPES = {'str': 'string', 'category': 'category'}
+
+# Largest error of a float32 price that still rounds back to the same paisa
+_PRICE_TOLERANCE = 0.005
+
+
+def csv_dtypes(schema):
+    """
+    read_csv dtypes of a schema, so text and categorical columns get their final dtype while parsing instead of
+    being converted afterwards. Numeric columns are left to the parser, they may hold '-' placeholders that
+    apply_schema turns into NaN.
+    :return: dict of column -> dtype
+    """
+    return {column: _CSV_DTYPES[kind] for column, kind in schema.items() if kind in _CSV_DTYPES}
+
+
+def _price(values):
+    values = pd.to_numeric(values, errors='coerce').astype('float64')
+    narrow = values.astype('float32')
+    error = np.abs(narrow.to_numpy(dtype='float64') - values.to_numpy())
+    return narrow if not (error > _PRICE_TOLERANCE).any() else values
+
+
+def _dates(values, date_format):
+    """Parse every distinct value once and map the rows onto the parsed values"""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype='string').str.strip(), format=date_format, errors='coerce')
+    # code -1 (missing value) picks the trailing NaT
+    parsed = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(parsed[codes], index=values.index)
+
+
+def apply_schema(df, schema, copy=True):
+    """
+    Coerce the columns of df to the kinds declared in schema.
+    :param df: pandas.DataFrame as parsed from the NSE csv
+    :param schema: dict of column -> kind
+    :param copy: Optional. False converts df in place, for frames nothing else refers to yet
+    :return: new pandas.DataFrame (df itself when copy is False)
+    """
+    if copy:
+        df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        converted = _convert(values, schema.get(column, 'str'), column)
+        if converted is not values:
+            df[column] = converted
+    return df
+
+
+def _convert(values, kind, column):
+    """Column values as the kind, the same series when they already are"""
+    if kind == 'float':
+        return pd.to_numeric(values, errors='coerce').astype('float64')
+    if kind == 'price':
+        return _price(values)
+    if kind == 'int':
+        return pd.to_numeric(values, errors='coerce').astype('Int64')
+    if kind == 'date':
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            values = _dates(values, DATE_FORMATS.get(column))
+        return values.astype('datetime64[ns]')
+    if kind == 'category':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+    if isinstance(values.dtype, pd.StringDtype) and values.dtype.na_value is pd.NA:
+        return values
+    return values.astype('string')
+
+
+# Share of distinct values below which a text column of a compacted frame becomes categorical
+CATEGORY_RATIO = 0.5
+_TEXT = pd.StringDtype('pyarrow')
+
+
+def _is_text(values):
+    if isinstance(values.dtype, pd.StringDtype):
+        return True
+    if values.dtype != object:
+        return False
+    # Object columns may hold the nested dicts / lists of an api payload, those are left alone
+    return values.dropna().map(type).eq(str).all()
+
+
+def _shrink(values):
+    """Smallest lossless dtype of a column no schema covers"""
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_datetime64_any_dtype(values) or \
+            isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    if pd.api.types.is_integer_dtype(values):
+        return pd.to_numeric(values, downcast='integer')
+    if pd.api.types.is_float_dtype(values):
+        return _price(values) if values.dtype != 'float32' else values
+    if not _is_text(values):
+        return values
+    present = values.notna().sum()
+    numbers = pd.to_numeric(values, errors='coerce')
+    if present and numbers.notna().sum() == present:
+        return _shrink(numbers)
+    if present and values.nunique() <= present * CATEGORY_RATIO:
+        return values.astype('category')
+    return values.astype(_TEXT)
+
+
+def compact_frame(df, schema=None):
+    """
+    Memory lean copy of a frame: the columns listed in schema are converted to their kind, numeric columns
+    are downcast (integers to the smallest integer type, floats to float32 when that keeps every value to the
+    paisa) and text columns outside the schema become categorical or arrow backed strings.
+    :param df: pandas.DataFrame as returned by NseUtils
+    :param schema: Optional. dict of column -> kind, eg: ENDPOINT_SCHEMAS['get_index_details']
+    :return: new pandas.DataFrame
+    """
+    schema = schema or {}
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values, pd.DataFrame):
+            # Duplicated column names are left as they are
+            continue
+        kind = schema.get(column)
+        if kind == 'str':
+            values = values.astype(_TEXT) if _is_text(values) else values
+        elif kind is not None:
+            values = _convert(values, kind, column)
+            if kind in ('int', 'float'):
+                values = _shrink(values)
+        else:
+            values = _shrink(values)
+        df[column] = values
+    if not isinstance(df.index, pd.RangeIndex) and not isinstance(df.index, pd.MultiIndex):
+        df.index = pd.Index(_shrink(df.index.to_series()), name=df.index.name)
+    return df
+
+
+def to_arrow(df):
+    """
+    pyarrow Table of a frame, keeping its index when it is not the default range index
+    :return: pyarrow.Table
+    """
+    return pa.Table.from_pandas(df, preserve_index=not isinstance(df.index, pd.RangeIndex))
+
+
+def arrow_schema(df, schema):
+    """
+    Arrow schema for a frame typed with apply_schema, in the column order of the frame.
+    :return: pyarrow.Schema
+    """
+    def arrow_type(column):
+        kind = schema.get(column, 'str')
+        if kind == 'price':
+            return pa.float32() if df[column].dtype == 'float32' else pa.float64()
+        return _ARROW_TYPES[kind]
+    return pa.schema([(column, arrow_type(column)) for column in df.columns])
@@ -0,0 +1,150 @@
+"""
+    * NSE STAND-IN SERVER *
+
+    Description: Small local HTTP server that serves recorded NSE fixtures (see nse_replay.py), so NseUtils
+    and NSEMasterData can run against it with a base_url override for offline benchmarks and tests.
+
+    It behaves like NSE where it matters for the clients:
+    - /api/ endpoints answer 401 unless the request carries the cookies handed out by a page request
+    - any other unrecorded GET (home / reference pages) answers a small html page that sets those cookies
+    - optional latency and a random failure rate (503) to exercise concurrency and retry code
+
+    Usage : python nse_standin.py fixtures/nse --port 8765 --latency 0.05 --failure-rate 0.02
+
+"""
+
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from nse_replay import FixtureStore
+
+COOKIE_NAMES = ('nsit', 'nseappid')
+
+
+class NseStandIn:
+    def __init__(self, store, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0, require_cookies=True,
+                 seed=None):
+        """
+        :param store: FixtureStore (or fixture folder) to serve
+        :param port: Optional. 0 picks a free port
+        :param latency: seconds added to every response
+        :param failure_rate: share of requests answered with 503
+        :param require_cookies: answer /api/ requests without NSE cookies with 401
+        """
+        self.store = store if isinstance(store, FixtureStore) else FixtureStore(store)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.require_cookies = require_cookies
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'served': 0, 'pages': 0, 'failed': 0, 'unauthorized': 0, 'missing': 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, content=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def _serve(self, method):
+                standin._count('requests')
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0)) or None
+                if standin.latency:
+                    time.sleep(standin.latency)
+                with standin._lock:
+                    fail = standin._random.random() < standin.failure_rate
+                if fail:
+                    standin._count('failed')
+                    return self._reply(503, b'Service Unavailable')
+
+                # Absolute url, so a path like //Charts/... is not taken for a host
+                key = FixtureStore.key(method, 'http://standin' + self.path, body)
+                if key not in standin.store:
+                    if method == 'GET' and not self.path.startswith('/api/'):
+                        # Reference / home page: hand out the cookies the api endpoints check
+                        standin._count('pages')
+                        expires = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 3600))
+                        self.send_response(200)
+                        for name in COOKIE_NAMES:
+                            self.send_header('Set-Cookie', f"{name}=standin; Path=/; Expires={expires}")
+                        content = b'<html><body>NSE stand-in</body></html>'
+                        self.send_header('Content-Type', 'text/html')
+                        self.send_header('Content-Length', str(len(content)))
+                        self.end_headers()
+                        return self.wfile.write(content)
+                    standin._count('missing')
+                    return self._reply(404, f"No fixture for '{key}'".encode())
+
+                cookies = self.headers.get('Cookie', '')
+                if standin.require_cookies and self.path.startswith('/api/') and \
+                        not all(f"{name}=" in cookies for name in COOKIE_NAMES):
+                    standin._count('unauthorized')
+                    return self._reply(401, b'Unauthorized')
+
+                status, headers, content = standin.store.load(key)
+                standin._count('served')
+                return self._reply(status, content, headers)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread. :return: self"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve recorded NSE fixtures')
+    parser.add_argument('fixtures', help='fixture folder written by nse_replay.RecordingAdapter')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--no-cookie-check', action='store_true')
+    args = parser.parse_args()
+
+    standin = NseStandIn(args.fixtures, args.host, args.port, args.latency, args.failure_rate,
+                         not args.no_cookie_check)
+    print(f"Serving {len(standin.store)} fixtures on {standin.base_url}")
+    standin.server.serve_forever()
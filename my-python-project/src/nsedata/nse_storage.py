@@ -0,0 +1,56 @@
+"""
+Location of the local nsedata stores (bhav archive, calendars, caches ...).
+
+Everything lives under one root so it can be moved or wiped in one go. The root defaults to
+~/.nsedata and can be overridden with the NSEDATA_HOME environment variable.
+"""
+
+import os
+from datetime import timedelta
+from pathlib import Path
+
+
+def data_root():
+    """Return the root folder of all local nsedata stores."""
+    return Path(os.environ.get('NSEDATA_HOME', Path.home() / '.nsedata'))
+
+
+def data_dir(*parts):
+    """Return (and create) a folder below the nsedata root, eg: data_dir('bhav', 'equity')."""
+    path = data_root().joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def atomic_write(path, write):
+    """
+    Write a file through a temporary sibling and rename it into place, so readers never see a
+    half written file.
+    :param path: final file path
+    :param write: callable that writes to the temporary path it is given
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def merge_ranges(ranges, step=timedelta(days=1)):
+    """
+    Merge inclusive (start, end) ranges that overlap or touch, eg: the covered dates of a store.
+    :param ranges: iterable of (start, end), both inclusive
+    :param step: Optional. Gap between two ranges that still touch, one day for dates, 1 for epoch seconds
+    :return: sorted list of [start, end]
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + step:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
@@ -2,8 +2,11 @@ import pandas as pd
 from datetime import datetime, timedelta
 from NseUtility import NseUtils
 dateformat="%d-%m-%Y"
+# One client for all requests: its index history store keeps the downloaded days, so repeat requests
+# only fetch the days added since the last call
+nse = NseUtils()
+
 def get_positional_index_data(index: str, interval: str, limit: int, daybefore: int):
-    nse = NseUtils()
     today = datetime.today() - timedelta(days=daybefore)
 
     if interval == '1d':
@@ -0,0 +1,169 @@
+"""
+    * OHLCV STORE *
+
+    Description: Local store of the raw bars of the charting historical api behind NSEMasterData.get_history.
+
+    Bars are partitioned by (exchange, symbol, base interval), the interval the api is asked for ('1I', '5I',
+    '15I', '1D', '1W', '1M': a 10m history is built from 5 minute bars, 30m and 1h from 15 minute bars). Every
+    partition has a parquet file with its bars and a json file with the time ranges already downloaded, in
+    epoch seconds like the fromDate / toDate of the api. A request is answered from disk and only the parts of
+    its range that were never downloaded, usually the tail since the last call, are fetched and merged in.
+
+    The api stamps a bar with its IST wall time written as if it were UTC, so stored bars are selected with the
+    IST times of the requested range (see bar_bounds), whatever the timezone of the machine.
+
+    Bars of a period that is not over yet (today for intraday and daily bars, the current week / month for
+    weekly / monthly bars, in IST) are never recorded as downloaded, so they are fetched again until they settle.
+
+    Layout : <root>/<EXCHANGE>/<SYMBOL>/<base>.parquet + <base>.json   (root defaults to ~/.nsedata/ohlcv)
+
+"""
+
+import json
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from nse_storage import atomic_write, data_dir, merge_ranges
+
+BAR_COLUMNS = ['TS', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+_BAR_SCHEMA = pa.schema([
+    ('TS', pa.timestamp('s')), ('Open', pa.float64()), ('High', pa.float64()), ('Low', pa.float64()),
+    ('Close', pa.float64()), ('Volume', pa.int64()),
+])
+
+
+IST_OFFSET = pd.Timedelta(hours=5, minutes=30)
+
+
+def _ist(epoch):
+    """IST wall time of an epoch second, as a naive pandas.Timestamp like the bar times of the api"""
+    return pd.to_datetime(epoch, unit='s') + IST_OFFSET
+
+
+def _period_start(moment, chart_period):
+    """Start of the day (week, month) of a Timestamp for daily (weekly, monthly) bars, the Timestamp for intraday"""
+    if chart_period == 'I':
+        return moment
+    start = moment.normalize()
+    if chart_period == 'W':
+        start -= pd.Timedelta(days=start.weekday())
+    elif chart_period == 'M':
+        start = start.replace(day=1)
+    return start
+
+
+def settled_until(chart_period, now=None):
+    """
+    Epoch second from which the bars of a chart period may still change: the start of the current IST day for
+    intraday and daily bars, of the current IST week / month for weekly / monthly bars
+    :param chart_period: 'I', 'D', 'W' or 'M'
+    :param now: Optional. epoch seconds, defaults to the current time
+    """
+    now = time.time() if now is None else now
+    start = _period_start(_ist(int(now)), 'D' if chart_period == 'I' else chart_period)
+    return int((start - IST_OFFSET).timestamp())
+
+
+def bar_bounds(chart_period, start, end):
+    """
+    Bar timestamps of a requested range: the IST times of its epoch seconds, from the start of the period
+    of the first one for daily, weekly and monthly bars
+    :return: (first, last) pandas.Timestamp, both inclusive
+    """
+    return _period_start(_ist(start), chart_period), _ist(end)
+
+
+class OhlcvStore:
+    def __init__(self, root=None):
+        """
+        :param root: Optional. Folder of the store, defaults to ~/.nsedata/ohlcv
+        """
+        self.root = data_dir('ohlcv') if root is None else root
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, exchange, symbol, base):
+        folder = self.root / exchange.upper() / symbol.upper().replace('/', '_')
+        return folder / f"{base}.parquet", folder / f"{base}.json"
+
+    def covered(self, exchange, symbol, base):
+        """
+        Time ranges already downloaded for a partition
+        :return: sorted list of [start, end] epoch seconds, both inclusive
+        """
+        _, meta_path = self._paths(exchange, symbol, base)
+        if not meta_path.exists():
+            return []
+        with open(meta_path) as f:
+            return json.load(f)['covered']
+
+    def missing(self, exchange, symbol, base, start, end):
+        """
+        Parts of a time range that are not in the store yet
+        :param start: epoch seconds
+        :param end: epoch seconds
+        :return: list of (start, end) epoch seconds, both inclusive
+        """
+        gaps = []
+        cursor = start
+        for covered_start, covered_end in self.covered(exchange, symbol, base):
+            if covered_end < cursor or covered_start > end:
+                continue
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - 1))
+            cursor = max(cursor, covered_end + 1)
+        if cursor <= end:
+            gaps.append((cursor, end))
+        with self._lock:
+            if gaps:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return gaps
+
+    def load(self, exchange, symbol, base, first=None, last=None):
+        """
+        Stored bars of a partition, oldest first
+        :param first: Optional. pandas.Timestamp, first bar time (inclusive), see bar_bounds
+        :param last: Optional. pandas.Timestamp, last bar time (inclusive)
+        :return: pandas.DataFrame with BAR_COLUMNS (empty when nothing is stored)
+        """
+        data_path, _ = self._paths(exchange, symbol, base)
+        if not data_path.exists():
+            return _BAR_SCHEMA.empty_table().to_pandas()
+        filters = []
+        if first is not None:
+            filters.append(('TS', '>=', first))
+        if last is not None:
+            filters.append(('TS', '<=', last))
+        # Parquet has no second timestamps, they are written as milliseconds
+        return pq.read_table(data_path, filters=filters or None).cast(_BAR_SCHEMA).to_pandas()
+
+    def store(self, exchange, symbol, base, df, spans, settled):
+        """
+        Merge downloaded bars into a partition (a bar downloaded again replaces the stored one) and mark the
+        spans they were downloaded for as covered, up to the settled time
+        :param df: bars with BAR_COLUMNS
+        :param spans: list of (start, end) epoch seconds the bars were downloaded for. Only pass spans the api
+        answered with bars: an empty answer may be a throttled request and must not hide the range for good
+        :param settled: epoch seconds from which bars may still change, see settled_until
+        """
+        spans = [(start, min(end, settled - 1)) for start, end in spans if start < settled]
+        data_path, meta_path = self._paths(exchange, symbol, base)
+        with self._lock:
+            if df is not None and not df.empty:
+                frames = [frame for frame in (self.load(exchange, symbol, base), df[BAR_COLUMNS]) if not frame.empty]
+                merged = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+                merged = merged.drop_duplicates('TS', keep='last').sort_values('TS', ignore_index=True)
+                table = pa.Table.from_pandas(merged, schema=_BAR_SCHEMA, preserve_index=False)
+                atomic_write(data_path, lambda tmp_path: pq.write_table(table, tmp_path))
+            if spans:
+                covered = merge_ranges([tuple(span) for span in self.covered(exchange, symbol, base)] + spans, step=1)
+                atomic_write(meta_path, lambda tmp_path: tmp_path.write_text(json.dumps({'covered': covered})))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,105 @@
+"""
+    * OPTION CHAIN PARSER *
+
+    Description: Columnar parser for the NSE option chain payload (api/option-chain-indices and
+    api/option-chain-equities) as used by NseUtils.get_live_option_chain.
+
+    The payload is walked once. Every strike contributes one tuple per side, and the columns are built
+    from those tuples in a single numpy conversion at the end, so parsing is linear in the number of strikes.
+
+"""
+
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+
+# Payload fields of one side (CE / PE) and the column suffix they map to
+_COMPACT_FIELDS = (('openInterest', 'OI'), ('changeinOpenInterest', 'Chng_in_OI'),
+                   ('totalTradedVolume', 'Volume'), ('impliedVolatility', 'IV'), ('lastPrice', 'LTP'),
+                   ('change', 'Net_Chng'))
+_FULL_FIELDS = _COMPACT_FIELDS + (('bidQty', 'Bid_Qty'), ('bidprice', 'Bid_Price'), ('askPrice', 'Ask_Price'),
+                                  ('askQty', 'Ask_Qty'))
+_INT_SUFFIXES = {'OI', 'Chng_in_OI', 'Volume', 'Bid_Qty', 'Ask_Qty'}
+
+COMPACT_COLUMNS = ['Fetch_Time', 'Symbol', 'Expiry_Date', 'CALLS_OI', 'CALLS_Chng_in_OI', 'CALLS_Volume', 'CALLS_IV',
+                   'CALLS_LTP', 'CALLS_Net_Chng', 'Strike_Price', 'PUTS_OI', 'PUTS_Chng_in_OI', 'PUTS_Volume',
+                   'PUTS_IV', 'PUTS_LTP', 'PUTS_Net_Chng']
+FULL_COLUMNS = ['Fetch_Time', 'Symbol', 'Expiry_Date', 'CALLS_OI', 'CALLS_Chng_in_OI', 'CALLS_Volume', 'CALLS_IV',
+                'CALLS_LTP', 'CALLS_Net_Chng', 'CALLS_Bid_Qty', 'CALLS_Bid_Price', 'CALLS_Ask_Price', 'CALLS_Ask_Qty',
+                'Strike_Price', 'PUTS_Bid_Qty', 'PUTS_Bid_Price', 'PUTS_Ask_Price', 'PUTS_Ask_Qty', 'PUTS_Net_Chng',
+                'PUTS_LTP', 'PUTS_IV', 'PUTS_Volume', 'PUTS_Chng_in_OI', 'PUTS_OI']
+
+
+def _side_columns(rows, fields, prefix):
+    """Turn the per-strike field tuples of one side into typed column arrays."""
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(fields))
+    columns = {}
+    for position, (_, suffix) in enumerate(fields):
+        column = values[:, position]
+        columns[f'{prefix}_{suffix}'] = column.astype(np.int64) if suffix in _INT_SUFFIXES else column
+    return columns
+
+
+def _to_structured(columns, column_order):
+    dtype = []
+    for name in column_order:
+        column = columns[name]
+        if column.dtype.kind in 'OU':
+            width = max((len(value) for value in column), default=1)
+            dtype.append((name, f'U{max(width, 1)}'))
+        else:
+            dtype.append((name, column.dtype))
+    array = np.empty(len(columns['Strike_Price']), dtype=dtype)
+    for name in column_order:
+        array[name] = columns[name]
+    return array
+
+
+def parse_option_chain(payload, symbol, expiry_date=None, oi_mode="full", as_array=False):
+    """
+    Parse a NSE option chain payload into one row per (expiry, strike)
+    :param payload: json of the option chain api
+    :param symbol: symbol written to the Symbol column
+    :param expiry_date: Optional. '20-06-2023', only strikes of this expiry are kept
+    :param oi_mode: full/compact. compact leaves out the bid / ask columns
+    :param as_array: If True a numpy structured array is returned instead of a DataFrame
+    :return: pandas.DataFrame or numpy structured array
+    """
+    if expiry_date:
+        expiry_date = pd.to_datetime(expiry_date, format='%d-%m-%Y').strftime('%d-%b-%Y')
+
+    compact = oi_mode == 'compact'
+    fields = _COMPACT_FIELDS if compact else _FULL_FIELDS
+    column_order = COMPACT_COLUMNS if compact else FULL_COLUMNS
+    getter = itemgetter(*(field for field, _ in fields))
+    missing = (0,) * len(fields)
+
+    expiries, strikes, calls, puts = [], [], [], []
+    for record in payload['records']['data']:
+        if expiry_date and record['expiryDate'] != expiry_date:
+            continue
+        expiries.append(record['expiryDate'])
+        strikes.append(record['strikePrice'])
+        # A side without a quote (or with an incomplete one) is reported as all zeros
+        try:
+            calls.append(getter(record['CE']))
+        except KeyError:
+            calls.append(missing)
+        try:
+            puts.append(getter(record['PE']))
+        except KeyError:
+            puts.append(missing)
+
+    rows = len(strikes)
+    columns = {
+        'Fetch_Time': np.full(rows, payload['records']['timestamp'], dtype=object),
+        'Symbol': np.full(rows, symbol, dtype=object),
+        'Expiry_Date': np.array(expiries, dtype=object),
+        'Strike_Price': np.array(strikes, dtype=np.float64),
+    }
+    columns.update(_side_columns(calls, fields, 'CALLS'))
+    columns.update(_side_columns(puts, fields, 'PUTS'))
+
+    if as_array:
+        return _to_structured(columns, column_order)
+    return pd.DataFrame({name: columns[name] for name in column_order})
@@ -0,0 +1,288 @@
+"""
+    * OPTION CHAIN RECORDER *
+
+    Description: Records intraday option chain history for a symbol and replays it.
+
+    The recorder polls NseUtils.get_live_option_chain on a schedule. The first snapshot of a session (and
+    every keyframe_every-th snapshot after it) is stored in full as a keyframe. All other snapshots only
+    store the strikes whose OI / volume / IV / LTP / bid / ask changed since the previous snapshot,
+    plus a removal row for strikes that left the chain. A chain at any point in time is rebuilt from
+    the last keyframe before it and the deltas that follow.
+
+    Rows are appended to a columnar log, flushed as immutable parquet segments at every keyframe.
+
+    Layout : <root>/<SYMBOL>/<YYYYMMDD>/<segment>.parquet   (root defaults to ~/.nsedata/option_chain)
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from option_chain import FULL_COLUMNS
+from nse_storage import atomic_write, data_dir
+
+KEY_COLUMNS = ['Expiry_Date', 'Strike_Price']
+VALUE_COLUMNS = [c for c in FULL_COLUMNS if c.startswith(('CALLS_', 'PUTS_'))]
+LOG_COLUMNS = ['Snapshot_Time', 'Kind', 'Fetch_Time'] + KEY_COLUMNS + VALUE_COLUMNS
+
+KEYFRAME, DELTA, REMOVED = 'K', 'D', 'R'
+
+_LOG_SCHEMA = pa.schema(
+    [('Snapshot_Time', pa.timestamp('ns')), ('Kind', pa.string()), ('Fetch_Time', pa.string()),
+     ('Expiry_Date', pa.string()), ('Strike_Price', pa.float64())] +
+    [(c, pa.int64() if c.endswith(('_OI', '_Volume', '_Qty')) else pa.float64()) for c in VALUE_COLUMNS])
+
+
+def changed_rows(previous, current):
+    """
+    Compare two chains on (Expiry_Date, Strike_Price)
+    :param previous: chain of the previous snapshot, or None
+    :param current: chain of this snapshot
+    :return: (rows of current that are new or changed, keys of previous missing from current)
+    """
+    current = current.set_index(KEY_COLUMNS)
+    if previous is None:
+        return current.reset_index(), pd.MultiIndex.from_tuples([], names=KEY_COLUMNS)
+    previous = previous.set_index(KEY_COLUMNS)
+    before = previous[VALUE_COLUMNS].reindex(current.index)
+    mask = before.isna().any(axis=1).to_numpy() | (current[VALUE_COLUMNS].to_numpy() != before.to_numpy()).any(axis=1)
+    return current[mask].reset_index(), previous.index.difference(current.index)
+
+
+class OptionChainLog:
+    """Append-only columnar log of keyframes and deltas of one symbol."""
+
+    def __init__(self, symbol, root=None, cached_segments=128):
+        """
+        :param symbol: eg: NIFTY/BANKNIFTY
+        :param root: Optional. Folder of the log, defaults to ~/.nsedata/option_chain
+        :param cached_segments: Optional. Number of segments kept in memory, least recently read dropped first.
+        The default holds a full session recorded with the default keyframe_every of OptionChainRecorder
+        """
+        self.symbol = symbol
+        self.root = data_dir('option_chain') if root is None else root
+        self.cached_segments = cached_segments
+        self._lock = threading.Lock()
+        self._pending = []
+        self._segments = OrderedDict()  # path -> segment, least recently read first
+
+    def _day_dir(self, day):
+        return self.root / self.symbol / f"{day:%Y%m%d}"
+
+    def append(self, snapshot_time, kind, rows):
+        """
+        Append the rows of one snapshot
+        :param snapshot_time: time of the snapshot
+        :param kind: KEYFRAME, DELTA or REMOVED
+        :param rows: DataFrame with (a subset of) the LOG_COLUMNS
+        """
+        if rows.empty:
+            return
+        rows = rows.reindex(columns=LOG_COLUMNS)
+        rows['Snapshot_Time'] = pd.Timestamp(snapshot_time)
+        rows['Kind'] = kind
+        rows[VALUE_COLUMNS] = rows[VALUE_COLUMNS].fillna(0)
+        with self._lock:
+            if kind == KEYFRAME:
+                self._flush()
+            self._pending.append(rows)
+
+    def flush(self):
+        """Write the buffered rows as a new parquet segment."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        rows = pd.concat(self._pending, ignore_index=True)
+        self._pending = []
+        for day, part in rows.groupby(rows['Snapshot_Time'].dt.normalize(), sort=True):
+            first = part['Snapshot_Time'].iloc[0]
+            path = self._day_dir(day) / f"{first:%H%M%S%f}.parquet"
+            table = pa.Table.from_pandas(part, schema=_LOG_SCHEMA, preserve_index=False)
+            atomic_write(path, lambda tmp_path: pq.write_table(table, tmp_path))
+
+    def _read_segment(self, path):
+        # Segments never change once written
+        with self._lock:
+            segment = self._segments.get(path)
+            if segment is not None:
+                self._segments.move_to_end(path)
+                return segment
+        segment = pq.read_table(path).to_pandas()
+        with self._lock:
+            self._segments[path] = segment
+            while len(self._segments) > self.cached_segments:
+                self._segments.popitem(last=False)
+        return segment
+
+    def read(self, start, end):
+        """
+        Rows with start <= Snapshot_Time <= end, in the order they were recorded
+        :return: pandas.DataFrame of LOG_COLUMNS
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        frames = []
+        for day in pd.date_range(start.normalize(), end.normalize(), freq='D'):
+            folder = self._day_dir(day)
+            if folder.exists():
+                frames.extend(self._read_segment(path) for path in sorted(folder.glob('*.parquet')))
+        with self._lock:
+            frames.extend(self._pending)
+        if not frames:
+            return pd.DataFrame(columns=LOG_COLUMNS)
+        rows = pd.concat(frames, ignore_index=True)
+        rows['Snapshot_Time'] = rows['Snapshot_Time'].astype('datetime64[ns]')
+        rows = rows[(rows['Snapshot_Time'] >= start) & (rows['Snapshot_Time'] <= end)]
+        return rows.sort_values('Snapshot_Time', kind='stable', ignore_index=True)
+
+    def _last_keyframe(self, rows, at):
+        keyframes = rows.loc[(rows['Kind'] == KEYFRAME) & (rows['Snapshot_Time'] <= at), 'Snapshot_Time']
+        return None if keyframes.empty else keyframes.iloc[-1]
+
+    def _as_chain(self, state):
+        chain = state.copy()
+        chain['Symbol'] = self.symbol
+        chain['Fetch_Time'] = state['Fetch_Time'].iloc[-1] if len(state) else None
+        expiry = pd.to_datetime(chain['Expiry_Date'], format='%d-%b-%Y')
+        order = np.lexsort((chain['Strike_Price'].to_numpy(), expiry.to_numpy()))
+        return chain.iloc[order][FULL_COLUMNS].reset_index(drop=True)
+
+    def chain_at(self, timestamp):
+        """
+        Rebuild the full chain as it was at timestamp
+        :param timestamp: datetime / str
+        :return: pandas.DataFrame in the get_live_option_chain layout, or None if nothing was recorded before it
+        """
+        at = pd.Timestamp(timestamp)
+        rows = self.read(at.normalize(), at)
+        keyframe = self._last_keyframe(rows, at)
+        if keyframe is None:
+            return None
+        rows = rows[rows['Snapshot_Time'] >= keyframe]
+        latest = rows.drop_duplicates(KEY_COLUMNS, keep='last')
+        return self._as_chain(latest[latest['Kind'] != REMOVED])
+
+    def iter_snapshots(self, start, end):
+        """
+        Replay the recorded chains between start and end
+        :return: generator of (snapshot time, pandas.DataFrame), one per snapshot that changed the chain
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        rows = self.read(start.normalize(), end)
+        keyframe = self._last_keyframe(rows, start)
+        if keyframe is None:
+            keyframes = rows.loc[rows['Kind'] == KEYFRAME, 'Snapshot_Time']
+            if keyframes.empty:
+                return
+            keyframe = keyframes.iloc[0]
+        rows = rows[rows['Snapshot_Time'] >= keyframe]
+
+        state = None
+        for snapshot_time, snapshot in rows.groupby('Snapshot_Time', sort=True):
+            snapshot = snapshot.set_index(KEY_COLUMNS)
+            if (snapshot['Kind'] == KEYFRAME).all():
+                state = snapshot
+            else:
+                kept = state.drop(snapshot.index, errors='ignore')
+                state = pd.concat([kept, snapshot[snapshot['Kind'] != REMOVED]])
+            if snapshot_time >= start:
+                yield snapshot_time, self._as_chain(state.reset_index())
+
+
+class OptionChainRecorder:
+    def __init__(self, symbol, nse=None, log=None, interval=5, keyframe_every=60, indices=True):
+        """
+        :param symbol: eg: NIFTY/BANKNIFTY
+        :param nse: Optional. NseUtils used to poll, a new one is created by default
+        :param log: Optional. OptionChainLog to append to
+        :param interval: seconds between two snapshots
+        :param keyframe_every: store a full chain every n snapshots
+        :param indices: True for index options
+        """
+        if nse is None:
+            from NseUtility import NseUtils
+            nse = NseUtils()
+        self.symbol = symbol
+        self.nse = nse
+        self.log = OptionChainLog(symbol) if log is None else log
+        self.interval = interval
+        self.keyframe_every = keyframe_every
+        self.indices = indices
+        self._previous = None
+        self._previous_time = None
+        self._snapshots = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.rows_written = 0
+        self.rows_seen = 0
+
+    def snapshot(self, chain=None, snapshot_time=None):
+        """
+        Take one snapshot and append it to the log
+        :param chain: Optional. Chain to record instead of polling NSE
+        :return: number of rows written
+        """
+        snapshot_time = pd.Timestamp.now() if snapshot_time is None else pd.Timestamp(snapshot_time)
+        if chain is None:
+            chain = self.nse.get_live_option_chain(self.symbol, indices=self.indices)
+        if chain is None or chain.empty:
+            return 0
+
+        new_day = self._previous is not None and self._previous_time.normalize() != snapshot_time.normalize()
+        if self._previous is None or new_day or self._snapshots % self.keyframe_every == 0:
+            self.log.append(snapshot_time, KEYFRAME, chain)
+            written = len(chain)
+        else:
+            changed, removed = changed_rows(self._previous, chain)
+            self.log.append(snapshot_time, DELTA, changed)
+            self.log.append(snapshot_time, REMOVED, removed.to_frame(index=False))
+            written = len(changed) + len(removed)
+
+        self._previous, self._previous_time = chain, snapshot_time
+        self._snapshots += 1
+        self.rows_seen += len(chain)
+        self.rows_written += written
+        return written
+
+    def record(self, snapshots=None, until=None):
+        """
+        Poll every interval seconds until snapshots were taken, until is reached or stop() is called
+        :param snapshots: Optional. number of snapshots to take
+        :param until: Optional. datetime to stop at
+        """
+        until = None if until is None else pd.Timestamp(until)
+        taken = 0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"Error recording option chain of {self.symbol}: {e}")
+            taken += 1
+            if (snapshots is not None and taken >= snapshots) or (until is not None and pd.Timestamp.now() >= until):
+                break
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        self.log.flush()
+
+    def start(self, until=None):
+        """Record in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.record, kwargs={'until': until}, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.log.flush()
+
+    def stats(self):
+        """Rows stored vs rows polled, the ratio is the saving of the delta encoding."""
+        return {'snapshots': self._snapshots, 'rows_seen': self.rows_seen, 'rows_written': self.rows_written}
@@ -0,0 +1,233 @@
+"""
+    * CORPORATE ACTION PRICE ADJUSTMENT *
+
+    Description: Back adjusts OHLCV prices for splits, bonus issues and dividends, using the records of
+    NseUtils.get_corporate_action.
+
+    Every action becomes an event (symbol, ex date, factor). The price of a bar is multiplied by the product
+    of the factors of the events of its symbol with an ex date after the bar, so the history lines up with the
+    prices traded after the last action. Volumes are divided by the split / bonus factors only.
+
+        split / consolidation  'Face Value Split (Sub-Division) - From Rs 10/- Per Share To Rs 2/- Per Share'
+                               factor = new face value / old face value
+        bonus                  'Bonus 1:2', a new shares for every b held, factor = b / (a + b)
+        dividend               'Interim Dividend - Rs 5 Per Share', 'Dividend - 150%' (of the face value)
+                               factor = 1 - dividend / close of the last session before the ex date
+
+    Subjects are parsed once into a cached event table. A dividend factor depends on a close, it is resolved
+    from the first frame adjusted that has the session before the ex date and cached with the event. Frames are
+    adjusted in one vectorized pass whatever the number of symbols: bars and events are matched with a single
+    searchsorted on (symbol, day) keys.
+
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+_SPLIT = r'(?i)(?:split|sub-division|consolidation).*?from\s+r[se]\.?\s*([\d.]+).*?to\s+r[se]\.?\s*([\d.]+)'
+_BONUS = r'(?i)bonus\D*?(\d+)\s*:\s*(\d+)'
+_DIVIDEND_AMOUNT = r'(?i)r[se]\.?\s*([\d.]+)\s*(?:/-)?\s*per\s+share'
+_DIVIDEND_PERCENT = r'([\d.]+)\s*%'
+
+# Bits of a (symbol, day) key holding the day, days since 1970 stay below 2**20 until the year 4840
+_DAY_BITS = 20
+
+EVENT_COLUMNS = ['symbol', 'ex_date', 'kind', 'price_factor', 'volume_factor', 'dividend']
+
+
+def parse_actions(actions):
+    """
+    Events of corporate action records
+    :param actions: pandas.DataFrame with the symbol, subject and exDate (and faceVal) columns of the api
+    :return: pandas.DataFrame with EVENT_COLUMNS, dividends have a NaN price_factor until resolved
+    """
+    if actions is None or actions.empty:
+        return pd.DataFrame({column: pd.Series(dtype='float64') for column in EVENT_COLUMNS})
+    subject = actions['subject'].astype('string').fillna('')
+    symbol = actions['symbol'].astype('string').str.strip().str.upper()
+    ex_date = pd.to_datetime(actions['exDate'].astype('string'), format='%d-%b-%Y', errors='coerce')
+    events = []
+
+    split = subject.str.extract(_SPLIT).astype('float64')
+    split_factor = split[1] / split[0]
+    keep_split = split_factor.notna() & (split_factor > 0)
+    events.append(pd.DataFrame({'symbol': symbol[keep_split], 'ex_date': ex_date[keep_split], 'kind': 'split',
+                                'price_factor': split_factor[keep_split], 'volume_factor': split_factor[keep_split],
+                                'dividend': 0.0}))
+
+    bonus = subject.str.extract(_BONUS).astype('float64')
+    bonus_factor = bonus[1] / (bonus[0] + bonus[1])
+    keep = bonus_factor.notna() & (bonus_factor > 0)
+    events.append(pd.DataFrame({'symbol': symbol[keep], 'ex_date': ex_date[keep], 'kind': 'bonus',
+                                'price_factor': bonus_factor[keep], 'volume_factor': bonus_factor[keep],
+                                'dividend': 0.0}))
+
+    is_dividend = subject.str.contains('dividend', case=False) & ~keep_split
+    amounts = subject[is_dividend].str.extractall(_DIVIDEND_AMOUNT)[0].astype('float64')
+    dividend = amounts.groupby(level=0).sum().reindex(subject.index, fill_value=0.0)
+    if 'faceVal' in actions.columns:
+        # 'Dividend - 150%' is a share of the face value
+        percent = subject[is_dividend].str.extractall(_DIVIDEND_PERCENT)[0].astype('float64')
+        percent = percent.groupby(level=0).sum().reindex(subject.index, fill_value=0.0)
+        face_value = pd.to_numeric(actions['faceVal'], errors='coerce').fillna(0.0)
+        dividend = dividend.where(dividend > 0, percent * face_value / 100)
+    keep = is_dividend & (dividend > 0)
+    events.append(pd.DataFrame({'symbol': symbol[keep], 'ex_date': ex_date[keep], 'kind': 'dividend',
+                                'price_factor': np.nan, 'volume_factor': 1.0, 'dividend': dividend[keep]}))
+
+    events = pd.concat(events, ignore_index=True)
+    events = events[events['ex_date'].notna() & events['symbol'].notna()]
+    events = events.drop_duplicates(['symbol', 'ex_date', 'kind', 'price_factor', 'dividend'])
+    events['ex_date'] = events['ex_date'].astype('datetime64[ns]')
+    return events.sort_values(['symbol', 'ex_date'], kind='stable', ignore_index=True)[EVENT_COLUMNS]
+
+
+def _day_keys(codes, dates):
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return (np.asarray(codes, dtype=np.int64) << _DAY_BITS) + days
+
+
+def _suffix_product(values, codes):
+    """Product of values[i:] within the run of equal codes i belongs to (codes sorted)"""
+    reverse = pd.Series(values[::-1]).groupby(codes[::-1]).cumprod().to_numpy()
+    return reverse[::-1]
+
+
+class AdjustmentEngine:
+    def __init__(self, actions=None):
+        """
+        :param actions: Optional. corporate action records, eg: NseUtils.get_corporate_action(from, to)
+        """
+        self._lock = threading.Lock()
+        self._actions = []
+        self._events = None
+        if actions is not None:
+            self.update(actions)
+
+    @classmethod
+    def from_nse(cls, nse, from_date, to_date):
+        """
+        Engine for the corporate actions of a date range
+        :param nse: NseUtils
+        :param from_date: eg:'01-06-2023' or datetime
+        :param to_date: eg:'30-06-2023' or datetime
+        :return: AdjustmentEngine
+        """
+        from_date = from_date if isinstance(from_date, str) else from_date.strftime("%d-%m-%Y")
+        to_date = to_date if isinstance(to_date, str) else to_date.strftime("%d-%m-%Y")
+        return cls(nse.get_corporate_action(from_date, to_date))
+
+    def update(self, actions):
+        """Add corporate action records, the events are parsed again on the next use"""
+        if actions is not None and not actions.empty:
+            with self._lock:
+                self._actions.append(actions)
+                self._events = None
+
+    def _table(self):
+        """The cached event table, parsed on first use after an update"""
+        with self._lock:
+            if self._events is None:
+                actions = pd.concat(self._actions, ignore_index=True) if self._actions else None
+                self._events = parse_actions(actions)
+            return self._events
+
+    def events(self, symbols=None):
+        """
+        Parsed events, with the dividend factors resolved so far
+        :param symbols: Optional. symbol or list of symbols
+        :return: pandas.DataFrame with EVENT_COLUMNS
+        """
+        events = self._table().copy()
+        if symbols is not None:
+            symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+            events = events[events['symbol'].isin([symbol.upper() for symbol in symbols])]
+        return events.reset_index(drop=True)
+
+    def _resolve_dividends(self, table, events, codes, keys, closes):
+        """Fill the dividend factors the bars can resolve into the cached event table"""
+        pending = events['price_factor'].isna().to_numpy()
+        if not pending.any() or closes is None:
+            return
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        event_keys = _day_keys(codes, events['ex_date'].to_numpy())[pending]
+        # Last bar of the same symbol before the ex date
+        position = np.searchsorted(sorted_keys, event_keys, side='left') - 1
+        found = (position >= 0) & ((sorted_keys[np.maximum(position, 0)] >> _DAY_BITS) == (event_keys >> _DAY_BITS))
+        close = np.asarray(closes, dtype=np.float64)[order][np.maximum(position, 0)]
+        dividend = events['dividend'].to_numpy()[pending]
+        factor = np.where((dividend > 0) & (dividend < close), 1 - dividend / close, 1.0)
+        resolved = events.index[pending][found]
+        with self._lock:
+            table.loc[resolved, 'price_factor'] = factor[found]
+
+    def factors(self, symbols, dates, closes=None):
+        """
+        Cumulative adjustment factors of bars
+        :param symbols: symbol of every bar (array like)
+        :param dates: date of every bar (array like of datetime64 / Timestamp)
+        :param closes: Optional. unadjusted close of every bar, needed to resolve dividend factors
+        :return: (price factors, volume factors) numpy arrays, 1.0 for bars without a later event
+        """
+        bar_codes, uniques = pd.factorize(pd.Series(symbols, dtype='string').str.upper())
+        bar_keys = _day_keys(bar_codes, pd.DatetimeIndex(dates).values)
+
+        table = self._table()
+        with self._lock:
+            events = table[table['symbol'].isin(uniques)]
+        price = np.ones(len(bar_keys))
+        volume = np.ones(len(bar_keys))
+        if events.empty:
+            return price, volume
+        event_codes = uniques.get_indexer(events['symbol'])
+        self._resolve_dividends(table, events, event_codes, bar_keys, closes)
+        with self._lock:
+            events = table.loc[events.index]
+
+        order = np.lexsort((events['ex_date'].to_numpy(), event_codes))
+        event_codes = event_codes[order]
+        event_keys = _day_keys(event_codes, events['ex_date'].to_numpy()[order])
+        # Unresolved dividends have no bar before their ex date in this frame, so they adjust nothing
+        price_suffix = _suffix_product(events['price_factor'].fillna(1.0).to_numpy()[order], event_codes)
+        volume_suffix = _suffix_product(events['volume_factor'].to_numpy()[order], event_codes)
+
+        position = np.searchsorted(event_keys, bar_keys, side='right')
+        clipped = np.minimum(position, len(event_keys) - 1)
+        later = (position < len(event_keys)) & (event_codes[clipped] == bar_codes)
+        price[later] = price_suffix[clipped[later]]
+        volume[later] = volume_suffix[clipped[later]]
+        return price, volume
+
+    def adjust(self, df, symbol=None, symbol_column='Symbol', date_column=None,
+               prices=('Open', 'High', 'Low', 'Close'), close='Close', volume='Volume'):
+        """
+        Back adjusted copy of an OHLCV frame of one symbol or a whole universe
+        :param df: pandas.DataFrame, eg: NSEMasterData.get_history (dates in the index) or a bhav copy
+        :param symbol: Optional. symbol of every row, for single symbol frames like get_history
+        :param symbol_column: Optional. column with the symbol of each row when symbol is not given
+        :param date_column: Optional. column with the bar dates, defaults to the index
+        :param prices: Optional. price columns to adjust, eg: ('OpnPric', 'HghPric', 'LwPric', 'ClsPric')
+        :param close: Optional. unadjusted close column, used to resolve dividend factors
+        :param volume: Optional. volume column, None to leave volumes alone
+        :return: new pandas.DataFrame
+        """
+        if df.empty:
+            return df.copy()
+        symbols = np.full(len(df), symbol, dtype=object) if symbol is not None else df[symbol_column].to_numpy()
+        dates = df.index if date_column is None else df[date_column]
+        closes = df[close].to_numpy(dtype=np.float64, na_value=np.nan) if close in df.columns else None
+        price_factor, volume_factor = self.factors(symbols, dates, closes)
+
+        df = df.copy()
+        for column in prices:
+            if column in df.columns:
+                values = df[column].to_numpy(dtype=np.float64, na_value=np.nan) * price_factor
+                df[column] = values.astype(df[column].dtype) if df[column].dtype.kind == 'f' else values
+        if volume is not None and volume in df.columns:
+            values = df[volume].to_numpy(dtype=np.float64, na_value=np.nan) / volume_factor
+            if pd.api.types.is_integer_dtype(df[volume]):
+                values = pd.array(np.rint(values), dtype='Int64' if df[volume].isna().any() else 'int64')
+            df[volume] = values
+        return df
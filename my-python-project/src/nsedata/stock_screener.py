@@ -5,16 +5,17 @@
 
 # Criteria:
 # 1. Today's volume is at least double the 20-day simple moving average of volume.
-# 2. Today's closing price is a new 52-week and 90-day high.
+# 2. Today's closing price is a new 52-week and 90-day high, on prices adjusted for splits, bonuses and dividends.
 # 3. The 14-day Average True Range (ATR) as a percentage of the closing price is greater than 3%.
 # 4. The average daily turnover is greater than 1 crore (1e7).
 
 #'''
 import pandas as pd
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from NSEMasterData import NSEMasterData
 from NseUtility import NseUtils
+from nse_rate_limit import RetryQueue
+from price_adjustment import AdjustmentEngine
 
 def calculate_atr(df, period=14):
     '''Calculates the Average True Range (ATR) for a given DataFrame.'''
@@ -25,15 +26,26 @@ def calculate_atr(df, period=14):
     df['atr'] = df['tr'].rolling(window=period).mean()
     return df['atr'].iloc[-1]
 
-def process_stock(stock, nse_master, start_date, today):
-    '''Processes a single stock to check if it meets the screening criteria.'''
+def process_stock(stock, nse_master, start_date, today, adjustments=None):
+    '''Downloads the history of a single stock and checks if it meets the screening criteria.
+    Download errors are raised, so the caller can retry the stock instead of silently dropping it.'''
+    hist_data = nse_master.get_history(symbol=stock, exchange='NSE', start=start_date, end=today, interval='1d',
+                                       raise_errors=True)
+    return screen_stock(stock, hist_data, adjustments)
+
+def screen_stock(stock, hist_data, adjustments=None):
+    '''Checks if a single stock meets the screening criteria on its daily history.
+
+    adjustments: optional price_adjustment.AdjustmentEngine, back adjusts the history for corporate actions
+    so a split or bonus does not make the current price look like a new high.
+    '''
     try:
         print(f"Processing {stock}...")
-        hist_data = nse_master.get_history(symbol=stock, exchange='NSE', start=start_date, end=today, interval='1d')
-
         if hist_data.empty or len(hist_data) < 90:
             print(f"Not enough historical data for {stock}. Skipping.")
             return None
+        if adjustments is not None:
+            hist_data = adjustments.adjust(hist_data, symbol=stock)
 
         volume_today = hist_data['Volume'].iloc[-1]
         close_today = hist_data['Close'].iloc[-1]
@@ -60,25 +72,44 @@ def process_stock(stock, nse_master, start_date, today):
         print(f"An error occurred while processing {stock}: {e}")
         return None
 
-def screen_stocks():
-    '''Screens stocks based on the specified criteria using parallel processing.'''
-    nse_master = NSEMasterData()
-    nse_master.download_symbol_master()
+def screen_stocks(indices=None):
+    '''
+    Screens stocks based on the specified criteria using parallel processing.
+    :param indices: Optional. index names the universe is taken from, eg: ['NIFTY 200'], defaults to every equity
+    '''
+    nse_master = NSEMasterData()  # symbol masters load lazily from the local master cache
     nse_utility = NseUtils()
     #stock_universe = nse_utility.get_fno_full_list(list_only=True)
-    stock_universe = nse_utility.get_equity_full_list(list_only=True)
+    if indices:
+        # Constituents come from the membership store, only indices without a snapshot of the day are downloaded
+        stock_universe = nse_utility.get_index_universe(indices)
+    else:
+        stock_universe = nse_utility.get_equity_full_list(list_only=True)
     shortlisted = []
     today = datetime.now()
-    start_date = today - timedelta(days=365)
+    start_date = nse_utility.calendar.offset(today, -252)  # 52 weeks of trading sessions
+    adjustments = AdjustmentEngine.from_nse(nse_utility, start_date, today)
 
     print("Screening stocks...")
 
-    with ThreadPoolExecutor(max_workers=10) as executor: # Adjust max_workers as needed
-        future_to_stock = {executor.submit(process_stock, stock, nse_master, start_date, today): stock for stock in stock_universe}
-        for future in as_completed(future_to_stock):
-            result = future.result()
-            if result:
-                shortlisted.append(result)
+    # One cookie request for the whole universe, histories are screened as they arrive
+    histories = nse_master.get_history_many(stock_universe, start_date, today, interval='1d', max_workers=10)
+    for stock, hist_data in histories:
+        result = screen_stock(stock, hist_data, adjustments)
+        if result:
+            shortlisted.append(result)
+
+    retry_queue = RetryQueue()
+    for stock, error in histories.errors.items():
+        if not isinstance(error, LookupError):  # unknown symbols would fail again
+            retry_queue.put(stock, process_stock, stock, nse_master, start_date, today, adjustments)
+
+    if len(retry_queue):
+        print(f"Retrying {len(retry_queue)} stocks that failed...")
+        shortlisted.extend(result for result in retry_queue.drain().values() if result)
+    if retry_queue.failed:
+        print(f"Could not screen {len(retry_queue.failed)} stocks: {', '.join(sorted(retry_queue.failed))}")
+    print(f"Request stats: {nse_master.limiter.stats()}")
 
     return shortlisted
 
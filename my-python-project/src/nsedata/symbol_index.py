@@ -0,0 +1,172 @@
+"""
+    * SYMBOL MASTER INDEX *
+
+    Description: In memory index of a symbol master (NSEMasterData.nse_data / nfo_data) for exact and
+    substring symbol search without scanning the master.
+
+        exact       hash map of symbol -> rows, an O(1) lookup
+        prefix      the symbols in sorted order, a prefix is a binary searched range
+        substring   n-gram postings: every 1, 2 and 3 byte gram of the symbols as an integer code, with the rows
+                    containing it, in one array sorted by (code, row). The rows of a gram are a binary searched
+                    slice. A query of up to 3 bytes is one slice, a longer one the intersection of the slices of
+                    its trigrams, verified against the symbols (usually a handful of rows).
+
+    Matching is case insensitive. Search results are ranked: exact matches first, then symbols starting with
+    the query (in alphabetical order), then the other symbols containing it (in master order).
+
+    The n-gram postings are built on the first substring search, exact lookups only need the hash map.
+
+"""
+
+import threading
+from bisect import bisect_left
+import numpy as np
+
+# Longest gram indexed, queries longer than this intersect the postings of their grams of this length
+GRAM = 3
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+class SymbolIndex:
+    def __init__(self, df, column='Symbol'):
+        """
+        :param df: symbol master, eg: NSEMasterData.nse_data
+        :param column: Optional. column with the symbols
+        """
+        self.df = df
+        symbols = df[column].astype('string').str.upper().fillna('')
+        self._symbols = symbols.tolist()
+        self._exact = {}
+        for row, symbol in enumerate(self._symbols):
+            self._exact.setdefault(symbol, []).append(row)
+        order = np.argsort(np.asarray(self._symbols, dtype=str), kind='stable')
+        self._sorted = [self._symbols[row] for row in order]
+        self._sorted_rows = order
+        self._grams = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._symbols)
+
+    # ------------------------------------------------------------------ #
+    #  N-gram postings
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _gram_code(gram):
+        """Integer code of a gram of up to GRAM bytes: its length in the top byte, then its bytes"""
+        code = len(gram)
+        for position in range(GRAM):
+            code = (code << 8) | (gram[position] if position < len(gram) else 0)
+        return code
+
+    def _postings(self):
+        """(sorted gram codes, rows) of every (gram, row) pair, the rows of a gram are a sorted slice. Built once"""
+        with self._lock:
+            if self._grams is None:
+                encoded = np.array([symbol.encode() for symbol in self._symbols], dtype=bytes)
+                width = max(encoded.dtype.itemsize, 1)
+                chars = encoded.view(np.uint8).reshape(len(encoded), width)
+                lengths = np.char.str_len(encoded)
+                # Pad with GRAM zero bytes so every start position has a full window
+                chars = np.hstack([chars, np.zeros((len(encoded), GRAM), dtype=np.uint8)])
+                rows = np.arange(len(encoded), dtype=np.int32)
+                codes, code_rows = [], []
+                for size in range(1, GRAM + 1):
+                    for start in range(width - size + 1):
+                        keep = lengths >= start + size
+                        code = np.full(int(keep.sum()), size, dtype=np.int64)
+                        for position in range(GRAM):
+                            code <<= 8
+                            if position < size:
+                                code |= chars[keep, start + position]
+                        codes.append(code)
+                        code_rows.append(rows[keep])
+                # One sort of (code, row) keys drops the repeated grams of a symbol and orders the postings
+                keys = np.concatenate(codes + [_NO_ROWS])
+                del codes
+                keys <<= 32
+                keys |= np.concatenate(code_rows + [_NO_ROWS.astype(np.int32)])
+                keys.sort()
+                keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+                # Codes take 26 bits and rows 32, both fit 4 byte arrays
+                self._grams = ((keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.int32))
+            return self._grams
+
+    def _gram_rows(self, gram):
+        codes, rows = self._postings()
+        code = np.int32(self._gram_code(gram))
+        return rows[np.searchsorted(codes, code, 'left'):np.searchsorted(codes, code, 'right')]
+
+    def _containing(self, query):
+        """Sorted rows whose symbol contains the query"""
+        encoded = query.encode()
+        if len(encoded) <= GRAM:
+            return self._gram_rows(encoded)
+        lists = sorted((self._gram_rows(encoded[start:start + GRAM]) for start in range(len(encoded) - GRAM + 1)),
+                       key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            if not len(rows):
+                break
+            # Binary search the rows left in the next (longer) posting list
+            found = other[np.minimum(np.searchsorted(other, rows), len(other) - 1)] if len(other) else other
+            rows = rows[found == rows] if len(other) else other
+        symbols = self._symbols
+        return np.fromiter((row for row in rows if query in symbols[row]), dtype=np.int64)
+
+    # ------------------------------------------------------------------ #
+    #  Lookups
+    # ------------------------------------------------------------------ #
+
+    def exact(self, symbol):
+        """
+        Rows of a symbol
+        :return: numpy array of row positions in master order, empty when unknown
+        """
+        rows = self._exact.get(symbol.upper())
+        return _NO_ROWS if rows is None else np.array(rows, dtype=np.int64)
+
+    def prefix(self, query):
+        """
+        Rows whose symbol starts with the query
+        :return: numpy array of row positions, in alphabetical order of the symbols
+        """
+        query = query.upper()
+        start = bisect_left(self._sorted, query)
+        end = bisect_left(self._sorted, query + '\uffff', start)
+        return self._sorted_rows[start:end]
+
+    def search(self, query, limit=None):
+        """
+        Rows whose symbol contains the query, ranked: exact, prefix, then substring matches
+        :param query: text, eg: 'BANKNIFTY25APR'
+        :param limit: Optional. Maximum number of rows
+        :return: numpy array of row positions
+        """
+        query = query.upper()
+        if not query:
+            return _NO_ROWS
+        exact = self.exact(query)
+        # The exact matches sort first among the symbols starting with the query
+        prefix = self.prefix(query)[len(exact):]
+        ranked = np.concatenate([exact, prefix])
+        if limit is not None and len(ranked) >= limit:
+            return ranked[:limit]
+        rest = self._containing(query)
+        if len(prefix) or len(exact):
+            rest = rest[~np.isin(rest, ranked, assume_unique=True)]
+        ranked = np.concatenate([ranked, rest])
+        return ranked if limit is None else ranked[:limit]
+
+    def first(self, symbol):
+        """
+        Row of a symbol: its first exact match, else the first row (in master order) whose symbol contains it
+        :return: row position or None when nothing matches
+        """
+        rows = self.exact(symbol)
+        if len(rows):
+            return int(rows[0])
+        rows = self._containing(symbol.upper()) if symbol else _NO_ROWS
+        return int(rows[0]) if len(rows) else None
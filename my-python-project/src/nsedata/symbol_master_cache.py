@@ -0,0 +1,96 @@
+"""
+    * SYMBOL MASTER CACHE *
+
+    Description: Parsed NSE / NFO symbol masters of NSEMasterData (GetEQMasters / GetFOMasters) kept on disk,
+    so a new process reads them from a local file instead of downloading both masters.
+
+    Every master is a parquet file (dictionary encoded, compressed) with a json sidecar holding the day it was
+    last validated against NSE and the ETag / Last-Modified validators of that response. A master validated
+    today is fresh. A stale one is still served, while NSEMasterData revalidates it with a conditional request:
+    a 304 answer only marks it validated again, a 200 replaces it.
+
+    Layout : <root>/<exchange>.parquet + <exchange>.json   (root defaults to ~/.nsedata/symbol_master)
+
+"""
+
+import json
+import threading
+from datetime import date
+import pyarrow as pa
+import pyarrow.parquet as pq
+from nse_storage import atomic_write, data_dir
+
+
+class SymbolMasterCache:
+    exchanges = ('NSE', 'NFO')
+
+    def __init__(self, root=None):
+        """
+        :param root: Optional. Folder of the cache, defaults to ~/.nsedata/symbol_master
+        """
+        self.root = data_dir('symbol_master') if root is None else root
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, exchange):
+        exchange = exchange.upper()
+        if exchange not in self.exchanges:
+            raise ValueError(f"Unknown exchange '{exchange}'. Choose one of {self.exchanges}")
+        return self.root / f"{exchange}.parquet", self.root / f"{exchange}.json"
+
+    def meta(self, exchange):
+        """
+        Validation data of a cached master
+        :return: dict with validated ('YYYY-mm-dd'), etag and last_modified, None when it is not cached
+        """
+        data_path, meta_path = self._paths(exchange)
+        if not (data_path.exists() and meta_path.exists()):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def is_fresh(self, exchange, today=None):
+        """True when the master was validated against NSE today"""
+        meta = self.meta(exchange)
+        today = date.today() if today is None else today
+        return meta is not None and meta['validated'] == today.isoformat()
+
+    def load(self, exchange):
+        """
+        Cached master
+        :return: pandas.DataFrame in the layout of NSEMasterData.get_nse_symbol_master, None when not cached
+        """
+        data_path, _ = self._paths(exchange)
+        with self._lock:
+            if not data_path.exists():
+                self.misses += 1
+                return None
+            self.hits += 1
+        df = pq.read_table(data_path).to_pandas()
+        # Dictionary encoded columns come back as categories, the master holds plain strings
+        return df.astype({column: 'str' for column in df.columns})
+
+    def save(self, exchange, df, etag=None, last_modified=None):
+        """Store a downloaded master with the validators of its response"""
+        data_path, _ = self._paths(exchange)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with self._lock:
+            atomic_write(data_path, lambda tmp_path: pq.write_table(table, tmp_path, compression='zstd',
+                                                                    use_dictionary=True))
+            self._write_meta(exchange, {'etag': etag, 'last_modified': last_modified})
+
+    def touch(self, exchange):
+        """Mark a cached master as validated today, eg: after a 304 answer"""
+        meta = self.meta(exchange)
+        if meta is not None:
+            with self._lock:
+                self._write_meta(exchange, meta)
+
+    def _write_meta(self, exchange, meta):
+        _, meta_path = self._paths(exchange)
+        meta = dict(meta, validated=date.today().isoformat())
+        atomic_write(meta_path, lambda tmp_path: tmp_path.write_text(json.dumps(meta)))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,27 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# nsedata modules import each other flatly
+for path in (PROJECT_DIR, PROJECT_DIR / 'src' / 'nsedata'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# Modules building a client on import (eg: nsepostionaldata) create its stores while the tests are collected
+_COLLECTION_HOME = tempfile.mkdtemp(prefix='nsedata_home_')
+os.environ['NSEDATA_HOME'] = _COLLECTION_HOME
+atexit.register(shutil.rmtree, _COLLECTION_HOME, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def nsedata_home(tmp_path, monkeypatch):
+    """Stores a test does not disable write under a temporary NSEDATA_HOME, never the user's ~/.nsedata"""
+    home = tmp_path / 'nsedata_home'
+    monkeypatch.setenv('NSEDATA_HOME', str(home))
+    return home
@@ -0,0 +1,68 @@
+import asyncio
+import httpx
+from AsyncNseUtility import AsyncNseUtils
+from NseUtility import NseUtils
+
+INDICES = ['NIFTY 50', 'NIFTY IT', 'NIFTY BANK', 'NIFTY AUTO', 'NIFTY PHARMA', 'NIFTY FMCG']
+
+
+def _payload(number, index):
+    return {'data': [{'symbol': index, 'meta': {}}, {'symbol': f"SYM{number}", 'meta': {}}]}
+
+
+class NseServer:
+    """
+    httpx transport answering like NSE after a delay: web pages hand out the cookies, api calls without them
+    get a 401 and unknown indices a 404. Counts the requests in flight.
+    """
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.payloads = {NseUtils._index_details_urls(index)[0]: _payload(number, index)
+                         for number, index in enumerate(INDICES)}
+        self.counters = {'pages': 0, 'served': 0, 'unauthorized': 0}
+        self.in_flight = self.max_in_flight = 0
+
+    async def __call__(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if not request.url.path.startswith('/api/'):
+                self.counters['pages'] += 1
+                return httpx.Response(200, headers={'Set-Cookie': 'nsit=warm; Domain=www.nseindia.com; Path=/'},
+                                      text='<html></html>')
+            if 'nsit=' not in request.headers.get('Cookie', ''):
+                self.counters['unauthorized'] += 1
+                return httpx.Response(401)
+            payload = self.payloads.get(str(request.url))
+            if payload is None:
+                return httpx.Response(404, json={})
+            self.counters['served'] += 1
+            return httpx.Response(200, json=payload)
+        finally:
+            self.in_flight -= 1
+
+
+async def _index_details_many(server, indices, max_concurrency):
+    async with AsyncNseUtils(max_concurrency=max_concurrency) as nse:
+        await nse.client.aclose()
+        nse.client = httpx.AsyncClient(transport=httpx.MockTransport(server), headers=nse.headers)
+        result = await nse.get_index_details_many(indices, list_only=True)
+        return result, nse.session_stats()
+
+
+def test_batch_is_bounded_primed_once_and_keeps_failures():
+    server = NseServer()
+    result, stats = asyncio.run(_index_details_many(server, INDICES + ['NIFTY MISSING'], 2))
+    assert result == dict({index: [f"SYM{number}"] for number, index in enumerate(INDICES)}, **{'NIFTY MISSING': None})
+    assert server.max_in_flight == 2
+    # Concurrent first requests wait for one priming instead of each visiting a page
+    assert server.counters['pages'] == 1 and server.counters['unauthorized'] == 0
+    assert stats['priming_requests'] == 1 and stats['priming_saved'] == len(INDICES)
+
+
+def test_batch_matches_the_blocking_client():
+    result, _ = asyncio.run(_index_details_many(NseServer(latency=0), INDICES[:2], 10))
+    assert result == {index: NseUtils._parse_index_details(_payload(number, index), list_only=True)
+                      for number, index in enumerate(INDICES[:2])}
@@ -0,0 +1,53 @@
+import json
+import pandas as pd
+from benchmarks import fixtures, suite
+from benchmarks.legacy import legacy_zipped_bhav_copy
+from bhav_archive import BhavArchive
+from NseUtility import NseUtils
+from nse_replay import FixtureStore, ReplayAdapter
+from nse_schemas import BHAV_SCHEMAS
+
+
+def test_suite_replays_recorded_fixtures(tmp_path):
+    """Every selected case runs on freshly recorded synthetic fixtures and the result is json serialisable"""
+    fixtures.record_fixtures(tmp_path, symbols=5)
+    results = suite.run_suite(tmp_path, ['option_chain', 'bhav', 'history_30m', 'positional_1w', 'screener',
+                                         'backtester'], repeat=1)
+    assert set(results['results']) == {'option_chain_parse', 'bhav_equity', 'bhav_fno', 'bhav_equity_legacy',
+                                       'bhav_fno_legacy', 'history_30m', 'history_30m_legacy', 'positional_1w',
+                                       'screener', 'backtester'}
+    for result in results['results'].values():
+        assert result['items'] > 0 and result['throughput'] > 0 and result['peak_mb'] > 0
+    assert results['results']['screener']['items'] == 5
+    assert set(results['comparisons']) == {'bhav_equity', 'bhav_fno', 'history_30m'}
+    json.dumps(results)
+
+
+def test_compare_flags_throughput_and_memory_regressions():
+    baseline = {'results': {'a': {'throughput': 100.0, 'peak_mb': 10.0, 'unit': 'rows'}}}
+    current = {'results': {'a': {'throughput': 70.0, 'peak_mb': 13.0, 'unit': 'rows'},
+                           'new': {'throughput': 1.0, 'peak_mb': 1.0, 'unit': 'rows'}}}
+    assert len(suite.compare(baseline, current, tolerance=0.2)) == 2
+    assert suite.compare(baseline, current, tolerance=0.5) == []
+
+
+def test_streamed_bhav_matches_legacy_parse_and_archive(tmp_path):
+    """The streamed, schema typed fno bhav copy holds the legacy values and reads back unchanged from the archive"""
+    fixtures.record_fixtures(tmp_path / 'fixtures', symbols=5)
+    store = FixtureStore(tmp_path / 'fixtures')
+    trade_date = fixtures.load_scenario(tmp_path / 'fixtures')['bhav_date']
+    nse = NseUtils(bhav_archive=BhavArchive(tmp_path / 'archive'), index_store=False, adapter=ReplayAdapter(store))
+    nse.nse_session.prime()
+    bhav = nse.fno_bhav_copy(trade_date)
+
+    assert isinstance(bhav['TckrSymb'].dtype, pd.CategoricalDtype)
+    assert bhav['ClsPric'].dtype == 'float32'
+    url = f"{suite.ARCHIVES}/content/fo/BhavCopy_NSE_FO_0_0_0_{trade_date[6:]}{trade_date[3:5]}{trade_date[:2]}" \
+          "_F_0000.csv.zip"
+    legacy = legacy_zipped_bhav_copy(store.load(FixtureStore.key('GET', url))[2], BHAV_SCHEMAS['fno'])
+    assert (bhav['TckrSymb'].astype('string') == legacy['TckrSymb']).all()
+    assert (bhav['ClsPric'].astype('float64').round(2) == legacy['ClsPric']).all()
+    assert bhav['XpryDt'].equals(legacy['XpryDt'])
+
+    pd.testing.assert_frame_equal(nse.fno_bhav_copy(trade_date), bhav)
+    assert nse.bhav_archive.stats() == {'hits': 1, 'misses': 1}
@@ -0,0 +1,70 @@
+from datetime import date, datetime, timedelta
+import pandas as pd
+import pytest
+from bhav_archive import BhavArchive
+from NseUtility import NseUtils
+from nse_schemas import BHAV_SCHEMAS, apply_schema
+
+
+def _delivery(day):
+    return pd.DataFrame({'SYMBOL': ['SBIN', 'INFY'], 'SERIES': ['EQ', 'EQ'], 'DATE1': [f"{day:%d-%b-%Y}"] * 2,
+                         'CLOSE_PRICE': ['570.50', '1450.00'], 'TTL_TRD_QNTY': ['1200', '900'],
+                         'DELIV_PER': ['45.10', '-']})
+
+
+class Download:
+    def __init__(self):
+        self.days = []
+
+    def __call__(self, trade_date):
+        self.days.append(trade_date.date())
+        return _delivery(trade_date)
+
+
+def test_store_and_load_round_trip(tmp_path):
+    archive = BhavArchive(tmp_path / 'bhav')
+    day = date(2023, 6, 20)
+    assert archive.load('delivery', day) is None
+
+    assert archive.store('delivery', '20-06-2023', _delivery(day))
+    assert archive.path('delivery', day) == tmp_path / 'bhav' / 'delivery' / '2023' / '20230620.parquet'
+    loaded = archive.load('delivery', datetime(2023, 6, 20, 15, 30))
+    pd.testing.assert_frame_equal(loaded, apply_schema(_delivery(day), BHAV_SCHEMAS['delivery']))
+    assert loaded['DELIV_PER'].isna().tolist() == [False, True]
+    assert archive.dates('delivery') == [day] and archive.dates('fno') == []
+    assert archive.stats() == {'hits': 1, 'misses': 1}
+    with pytest.raises(ValueError):
+        archive.path('cm', day)
+
+
+def test_only_past_trade_dates_are_archived(tmp_path):
+    archive = BhavArchive(tmp_path / 'bhav')
+    today = date.today()
+    assert archive.is_immutable(today - timedelta(days=1)) and not archive.is_immutable(today)
+    assert not archive.store('delivery', today, _delivery(today))
+    assert not archive.store('delivery', today - timedelta(days=1), pd.DataFrame())
+    assert archive.dates('delivery') == []
+
+
+
+
+def test_past_copies_are_served_from_the_archive_and_today_is_downloaded_again(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    nse = NseUtils(bhav_archive=BhavArchive(tmp_path / 'bhav'))
+    download = Download()
+    today = f"{date.today():%d-%m-%Y}"
+    for trade_date in ('20-06-2023', '20-06-2023', today, today):
+        assert nse._bhav_copy('delivery', trade_date, download)['SYMBOL'].tolist() == ['SBIN', 'INFY']
+    assert download.days == [date(2023, 6, 20), date.today(), date.today()]
+    assert nse.bhav_archive.dates('delivery') == [date(2023, 6, 20)]
+
+
+def test_disabled_archive_downloads_every_time(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    nse = NseUtils(bhav_archive=False)
+    assert nse.bhav_archive is None
+    download = Download()
+    nse._bhav_copy('delivery', '20-06-2023', download)
+    nse._bhav_copy('delivery', '20-06-2023', download)
+    assert download.days == [date(2023, 6, 20)] * 2
+    assert not (tmp_path / 'home' / 'bhav').exists()
@@ -0,0 +1,77 @@
+import threading
+import time
+import pandas as pd
+import pytest
+import requests
+from NseUtility import NseUtils
+
+
+class BhavServer:
+    """Single day bhav loader: no file on 17-08-2023 and the days_without_file, an empty one on 18-08-2023"""
+
+    def __init__(self, fail_on=None):
+        self.days = []
+        self.fail_on = fail_on
+        self.days_without_file = set()
+        self._lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+
+    def __call__(self, trade_date):
+        with self._lock:
+            self.days.append(trade_date)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.05)
+            if trade_date == '17-08-2023' or trade_date in self.days_without_file:
+                raise FileNotFoundError(f"No bhav copy for {trade_date}")
+            if trade_date == self.fail_on:
+                raise requests.exceptions.ConnectionError('reset')
+            if trade_date == '18-08-2023':
+                return pd.DataFrame()
+            return pd.DataFrame({'TckrSymb': ['ABC', 'XYZ'], 'ClsPric': [float(trade_date[:2])] * 2})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def nse(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    nse = NseUtils(bhav_archive=False)
+    nse.trading_holidays = nse.clearing_holidays = lambda list_only=False: ['15-Aug-2023']
+    return nse
+
+
+def test_range_fans_out_over_trading_days_and_skips_missing_files(nse):
+    nse.equity_bhav_copy = server = BhavServer()
+    df = nse.equity_bhav_copy_range('11-08-2023', '22-08-2023', max_workers=3)
+    # Weekends and the 15 August holiday are not requested
+    assert sorted(server.days) == ['11-08-2023', '14-08-2023', '16-08-2023', '17-08-2023', '18-08-2023',
+                                   '21-08-2023', '22-08-2023']
+    assert 1 < server.max_in_flight <= 3
+    assert df['TRADE_DATE'].dt.strftime('%d-%m-%Y').unique().tolist() == \
+        ['11-08-2023', '14-08-2023', '16-08-2023', '21-08-2023', '22-08-2023']
+    assert df.columns.tolist() == ['TRADE_DATE', 'TckrSymb', 'ClsPric'] and len(df) == 10
+    assert df.loc[df['TRADE_DATE'] == '2023-08-21', 'ClsPric'].tolist() == [21.0, 21.0]
+
+
+
+def test_missing_days_of_unlisted_years_are_not_requested_again(nse):
+    # 2022 has no holiday list: 26 January (a holiday) has no file and is learnt as a closure
+    nse.equity_bhav_copy = server = BhavServer()
+    server.days_without_file = {'26-01-2022'}
+    assert nse.equity_bhav_copy_range('25-01-2022', '27-01-2022')['TRADE_DATE'].dt.day.unique().tolist() == [25, 27]
+    server.days.clear()
+    nse.equity_bhav_copy_range('24-01-2022', '28-01-2022')
+    assert sorted(server.days) == ['24-01-2022', '25-01-2022', '27-01-2022', '28-01-2022']
+    # Missing files of a listed year are only skipped
+    nse.equity_bhav_copy_range('17-08-2023', '17-08-2023')
+    assert nse.calendar.is_trading_day('17-08-2023')
+
+def test_range_without_files_is_empty_and_download_errors_are_raised(nse):
+    nse.equity_bhav_copy = BhavServer()
+    assert nse.equity_bhav_copy_range('17-08-2023', '18-08-2023').empty
+    nse.equity_bhav_copy = BhavServer(fail_on='16-08-2023')
+    with pytest.raises(requests.exceptions.ConnectionError):
+        nse.equity_bhav_copy_range('14-08-2023', '18-08-2023')
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+from AsyncNseUtility import AsyncNseUtils
+from filings_store import FilingsStore
+from NseUtility import NseUtils
+from nse_replay import FixtureStore, ReplayAdapter
+
+TODAY = date.today()
+
+
+def _action(symbol, days_ago, subject='Dividend - Rs 5 Per Share'):
+    return {'symbol': symbol, 'series': 'EQ', 'subject': subject, 'faceVal': '10',
+            'exDate': f"{TODAY - timedelta(days=days_ago):%d-%b-%Y}", 'recDate': '-'}
+
+
+class FakeFeed:
+    """Corporate actions api answering with the filings whose exDate is in the requested range"""
+
+    def __init__(self, filings):
+        self.filings = filings
+        self.requests = []
+
+    def __call__(self, from_date_str, to_date_str):
+        self.requests.append((from_date_str, to_date_str))
+        dates = pd.to_datetime(pd.Series([f['exDate'] for f in self.filings], dtype=object), format='%d-%b-%Y')
+        keep = (dates >= pd.to_datetime(from_date_str, format='%d-%m-%Y')) & \
+               (dates <= pd.to_datetime(to_date_str, format='%d-%m-%Y'))
+        return pd.DataFrame([f for f, k in zip(self.filings, keep) if k])
+
+
+def test_sync_downloads_only_the_days_after_the_watermark(tmp_path):
+    store = FilingsStore(tmp_path)
+    feed = FakeFeed([_action('SBIN', 20), _action('INFY', 5, 'Bonus 1:1'), _action('TCS', 0)])
+
+    first = store.sync('corporate_action', feed)
+    assert len(first) == 3 and len(feed.requests) == 1
+    assert store.watermark('corporate_action') == TODAY - timedelta(days=1)
+
+    # Only today is downloaded again, the unchanged filing of today is not reported as new
+    feed.filings.append(_action('SBIN', 0, 'Interim Dividend'))
+    delta = store.sync('corporate_action', feed)
+    assert feed.requests[-1] == (f"{TODAY:%d-%m-%Y}", f"{TODAY:%d-%m-%Y}")
+    assert delta['subject'].tolist() == ['Interim Dividend']
+
+    assert store.query('corporate_action', symbol='sbin')['subject'].tolist() == \
+        ['Dividend - Rs 5 Per Share', 'Interim Dividend']
+    assert store.query('corporate_action', purpose='bonus')['symbol'].tolist() == ['INFY']
+    assert store.query('corporate_action', from_date=TODAY - timedelta(days=6),
+                       to_date=TODAY - timedelta(days=1))['symbol'].tolist() == ['INFY']
+    assert store.query('corporate_action').columns.tolist() == list(_action('X', 0))
+
+    with pytest.raises(ValueError):
+        store.query('results')
+
+
+def test_nse_utils_serves_corporate_actions_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    from_str, to_str = f"{TODAY - timedelta(days=10):%d-%m-%Y}", f"{TODAY - timedelta(days=1):%d-%m-%Y}"
+    url, ref_url = NseUtils._corporate_action_urls(from_str, to_str)
+    fixtures = FixtureStore(tmp_path / 'fixtures')
+    fixtures.save(FixtureStore.key('GET', url), url, 200, {'Content-Type': 'application/json'},
+                  json.dumps([_action('SBIN', 3), _action('INFY', 2, 'Bonus 1:1')]).encode())
+    fixtures.save(FixtureStore.key('GET', ref_url), ref_url, 200, {'Content-Type': 'text/html'}, b'<html></html>')
+    replay = ReplayAdapter(fixtures)
+    nse = NseUtils(bhav_archive=False, index_store=False, adapter=replay,
+                   filings_store=FilingsStore(tmp_path / 'filings'))
+
+    assert nse.get_corporate_action(from_str, to_str, filter='bonus')['symbol'].tolist() == ['INFY']
+    served = replay.hits
+    # The range is covered now, so the next call is answered locally
+    assert nse.get_corporate_action(from_str, to_str)['symbol'].tolist() == ['SBIN', 'INFY']
+    assert replay.hits == served
+    assert nse.query_filings('corporate_action', symbol=['SBIN'])['exDate'].tolist() == \
+        [f"{TODAY - timedelta(days=3):%d-%b-%Y}"]
+
+
+def test_async_client_serves_filings_from_the_store(tmp_path):
+    from_str, to_str = f"{TODAY - timedelta(days=10):%d-%m-%Y}", f"{TODAY - timedelta(days=1):%d-%m-%Y}"
+    url, ref_url = NseUtils._insider_trading_urls(from_str, to_str)
+    fixtures = FixtureStore(tmp_path / 'fixtures')
+    fixtures.save(FixtureStore.key('GET', url), url, 200, {'Content-Type': 'application/json'},
+                  json.dumps({'data': [{'did': 1, 'symbol': 'SBIN', 'acqMode': 'Market Purchase',
+                                        'date': f"{TODAY - timedelta(days=2):%d-%b-%Y} 10:00"}]}).encode())
+    fixtures.save(FixtureStore.key('GET', ref_url), ref_url, 200, {'Content-Type': 'text/html'}, b'<html></html>')
+    replay = ReplayAdapter(fixtures)
+
+    async def scenario():
+        async with AsyncNseUtils() as nse:
+            nse._sync = NseUtils(bhav_archive=False, index_store=False, adapter=replay,
+                                 filings_store=FilingsStore(tmp_path / 'filings'))
+            first = await nse.get_insider_trading(from_str, to_str)
+            served = replay.hits
+            again = await nse.get_insider_trading(from_str, to_str)
+            stored = await nse.query_filings('insider', symbol='SBIN')
+            return first, again, stored, served
+
+    first, again, stored, served = asyncio.run(scenario())
+    assert first['symbol'].tolist() == again['symbol'].tolist() == stored['symbol'].tolist() == ['SBIN']
+    assert replay.hits == served
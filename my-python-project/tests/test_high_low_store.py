@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from high_low_store import HighLowStore
+from NseUtility import NseUtils
+from nse_replay import FixtureStore, ReplayAdapter
+from price_adjustment import AdjustmentEngine
+
+START = date(2023, 1, 2)
+
+
+def _bars(days, symbols, seed=7):
+    rng = np.random.default_rng(seed)
+    highs = rng.uniform(50, 150, (days, len(symbols)))
+    return highs, highs - rng.uniform(0, 40, (days, len(symbols)))
+
+
+def test_deques_match_a_brute_force_rolling_window():
+    symbols = ['AAA', 'BBB', 'CCC']
+    highs, lows = _bars(600, symbols)
+    store = HighLowStore(window_days=365)
+    for offset in range(600):
+        day = START + timedelta(days=offset)
+        # CCC stops trading after 200 days, its old bars must still leave the window
+        traded = symbols if offset < 200 else symbols[:2]
+        store.add_day(day, traded, highs[offset, :len(traded)], lows[offset, :len(traded)])
+        if offset % 97 == 0 or offset == 599:
+            first = max(0, offset - 364)
+            for column, symbol in enumerate(symbols):
+                window = slice(first, min(offset, 199 if symbol == 'CCC' else offset) + 1)
+                result = store.get(symbol.lower())
+                if window.start >= window.stop:
+                    assert result is None
+                    continue
+                high = highs[window, column]
+                assert result['52 Week High'] == high.max()
+                assert result['52 Week High Date'] == \
+                    f"{START + timedelta(days=first + int(high.argmax())):%d-%b-%Y}"
+                assert result['52 Week Low'] == lows[window, column].min()
+
+    # Replayed days change nothing
+    assert store.add_day(START, symbols, [1e6] * 3, [0.0] * 3) == 0
+    assert store.frame()['SYMBOL'].tolist() == ['AAA', 'BBB']
+
+
+def test_bhav_copies_splits_and_persistence(tmp_path):
+    actions = pd.DataFrame([{'symbol': 'ABC', 'series': 'EQ', 'faceVal': '10', 'exDate': '04-Jan-2023',
+                             'subject': 'Face Value Split (Sub-Division) - From Rs 10/- Per Share To Rs 5/- Per Share'}])
+    bhav = pd.DataFrame({
+        'TradDt': ['2023-01-02', '2023-01-02', '2023-01-03', '2023-01-04', '2023-01-04'],
+        'TckrSymb': ['ABC', 'ABC', 'ABC', 'ABC', 'XYZ'], 'SctySrs': ['EQ', 'W1', 'EQ', 'EQ', 'BE'],
+        'HghPric': [210.0, 999.0, 200.0, 104.0, 10.0], 'LwPric': [190.0, 1.0, 180.0, 98.0, 9.0],
+    })
+    adjustments = AdjustmentEngine(actions)
+    store = HighLowStore(adjustments=adjustments, path=tmp_path / 'equity.json')
+    assert store.add_bhav(bhav) == 3
+
+    abc = store.get('ABC')
+    assert (abc['52 Week High'], abc['52 Week High Date']) == (105.0, '02-Jan-2023')
+    assert (abc['52 Week Low'], abc['52 Week Low Date']) == (90.0, '03-Jan-2023')
+
+    store.save()
+    loaded = HighLowStore.load(tmp_path / 'equity.json', adjustments=adjustments)
+    assert loaded.last_date == date(2023, 1, 4)
+    pd.testing.assert_frame_equal(loaded.frame(), store.frame())
+    assert 'Adjusted 52_Week_High' in store.frame()
+    assert list(HighLowStore.load(tmp_path / 'equity.json').frame().columns) == \
+        ['SYMBOL', '52_Week_High', '52_Week_High_Date', '52_Week_Low', '52_Week_Low_DT']
+    assert loaded.sync_days(date(2023, 1, 6)) == (date(2023, 1, 5), date(2023, 1, 6))
+
+    requests = []
+    fetch = lambda from_date, to_date: requests.append((from_date, to_date)) or bhav.iloc[:0]
+    assert loaded.sync(fetch, date(2023, 1, 4)) == 0 and not requests
+    loaded.sync(fetch, date(2023, 1, 6))
+    assert requests == [('05-01-2023', '06-01-2023')]
+    assert loaded.stats() == {'hits': 1, 'misses': 1, 'symbols': 2}
+
+    # The unpublished days are fetched again only after retry_interval
+    loaded.sync(fetch, date(2023, 1, 6))
+    assert len(requests) == 1 and loaded.stats()['hits'] == 2
+    loaded.retry_interval = 0
+    loaded.sync(fetch, date(2023, 1, 6))
+    assert len(requests) == 2
+
+
+def test_nse_utils_reads_the_saved_store_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path))
+    saved = HighLowStore.load()
+    saved.add_day(START, ['ABC'], [10.0], [8.0])
+    saved.save()
+    monkeypatch.setattr(HighLowStore, 'load', classmethod(lambda cls, *args, **kwargs: loads.append(kwargs) or saved))
+    loads = []
+    nse = NseUtils(bhav_archive=False, index_store=False, filings_store=False, index_membership=False,
+                   adapter=ReplayAdapter(FixtureStore(tmp_path / 'fixtures')))
+    assert not loads
+    assert nse.high_low_store is saved and nse.high_low_store.get('ABC')['52 Week High'] == 10.0
+    # Adjusted like the NSE file, so the columns keep their 'Adjusted' names
+    assert len(loads) == 1 and isinstance(loads[0]['adjustments'], AdjustmentEngine)
+    assert NseUtils(bhav_archive=False, index_store=False, filings_store=False, index_membership=False,
+                    high_low_store=False).high_low_store is None
+
+
+def test_a_disabled_store_downloads_the_nse_file(tmp_path):
+    url = 'https://nsearchives.nseindia.com/content/CM_52_wk_High_low_25012024.csv'
+    fixtures = FixtureStore(tmp_path / 'fixtures')
+    fixtures.save(FixtureStore.key('GET', url), url, 200, {'Content-Type': 'text/csv'}, (
+        '"Disclaimer - The Data provided in the adjusted 52 week high and adjusted 52 week low columns  are adjusted '
+        'for corporate actions (bonus, splits & rights).For actual (unadjusted) 52 week high & low prices, kindly '
+        'refer bhavcopy."\n"Effective for 25-Jan-2024"\n'
+        'SYMBOL,SERIES,Adjusted 52_Week_High,52_Week_High_Date,Adjusted 52_Week_Low,52_Week_Low_DT\n'
+        'ABC,EQ,120.5,02-Jan-2024,80.25,03-Mar-2023\n').encode())
+    nse = NseUtils(bhav_archive=False, index_store=False, filings_store=False, index_membership=False,
+                   high_low_store=False, adapter=ReplayAdapter(fixtures))
+
+    assert nse.get_52week_high_low('ABC') == {'Symbol': 'ABC', '52 Week High': 120.5,
+                                              '52 Week High Date': '02-Jan-2024', '52 Week Low': 80.25,
+                                              '52 Week Low Date': '03-Mar-2023'}
+    assert nse.get_52week_high_low('XYZ') is None
+    assert nse.get_52week_high_low()['Adjusted 52_Week_High'].tolist() == [120.5]
@@ -0,0 +1,35 @@
+import pandas as pd
+from benchmarks import fixtures
+from benchmarks.legacy import legacy_history_bars
+from NSEMasterData import NSEMasterData
+from nse_replay import FixtureStore, ReplayAdapter
+
+
+def test_vectorized_bars_match_the_resampled_bars_on_recorded_history(tmp_path, monkeypatch):
+    """Every interval built from the recorded 1 / 5 / 15 minute and daily bars equals the previous output"""
+    fixtures.record_fixtures(tmp_path, symbols=3)
+    plan = fixtures.load_scenario(tmp_path)
+    master = NSEMasterData(adapter=ReplayAdapter(FixtureStore(tmp_path)))
+    symbol = fixtures.universe(master, plan['symbols'])[fixtures.HISTORY_SYMBOL_INDEX]
+    end = pd.Timestamp(plan['end'])
+    starts = dict.fromkeys(['1m', '5m', '10m', '15m', '30m', '1h'], pd.Timestamp(plan['intraday_start']))
+    starts['1d'] = pd.Timestamp(plan['daily_start'])
+
+    current = {interval: master.get_history(symbol, 'NSE', start, end, interval) for interval, start in starts.items()}
+    monkeypatch.setattr(NSEMasterData, '_shape_history', staticmethod(legacy_history_bars))
+    for interval, start in starts.items():
+        expected = master.get_history(symbol, 'NSE', start, end, interval)
+        assert len(expected) > 0, interval
+        pd.testing.assert_frame_equal(current[interval], expected)
+
+
+def test_bars_are_cut_off_and_labeled_with_their_rounded_start_time():
+    df = pd.DataFrame({'TS': pd.to_datetime(['2024-01-01 09:16:00', '2024-01-01 09:17:30', '2024-01-01 09:18:30',
+                                             '2024-01-01 15:30:00', '2024-01-01 15:31:00']).astype('datetime64[s]'),
+                       'Open': [1.0, 2.0, 3.0, 4.0, 5.0], 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 10})
+    bars = NSEMasterData._shape_history(df, '1m')
+    # Half a minute rounds to the even minute, like Timestamp.round
+    assert bars.index.strftime('%H:%M').tolist() == ['09:15', '09:16', '09:18', '15:29']
+    pd.testing.assert_frame_equal(bars, legacy_history_bars(df, '1m'))
+    pd.testing.assert_frame_equal(NSEMasterData._shape_history(df, '1h'), legacy_history_bars(df, '1h'),
+                                  check_freq=False)
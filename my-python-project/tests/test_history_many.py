@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+import pandas as pd
+from requests.adapters import BaseAdapter
+from NSEMasterData import NSEMasterData
+from nse_replay import build_response
+
+MASTER = pd.DataFrame({'ScripCode': ['1', '2', '3'], 'Symbol': ['TCS', 'INFY', 'WIPRO'], 'Name': ['', '', ''],
+                       'Type': ['EQ', 'EQ', 'EQ']})
+
+
+class HistoryServer(BaseAdapter):
+    """Charting history api with two daily bars per symbol, answering a 500 for WIPRO"""
+
+    def __init__(self):
+        super().__init__()
+        self.cookie_requests = 0
+        self.posts = 0
+
+    def send(self, request, **kwargs):
+        if request.method == 'GET':
+            self.cookie_requests += 1
+            return build_response(request, 200, {}, b'')
+        self.posts += 1
+        code = json.loads(request.body)['ScripCode']
+        if code == 3:
+            return build_response(request, 500, {}, b'')
+        body = {'s': ['Ok', 'Ok'], 't': [1704153600, 1704240000], 'o': [code, code], 'h': [code, code],
+                'l': [code, code], 'c': [code, code], 'v': [100, 200]}
+        return build_response(request, 200, {'Content-Type': 'application/json'}, json.dumps(body).encode())
+
+    def close(self):
+        pass
+
+
+def client(server):
+    nse = NSEMasterData(adapter=server, master_cache=False, history_store=False)
+    nse.nse_data = MASTER
+    return nse
+
+
+def test_batch_sets_cookies_once_and_streams_each_symbol():
+    server = HistoryServer()
+    nse = client(server)
+    batch = nse.get_history_many(['TCS', 'INFY', 'WIPRO', 'NOSUCH'], datetime(2024, 1, 1), datetime(2024, 1, 5),
+                                 max_workers=2)
+    frames = dict(batch)
+    assert server.cookie_requests == 1 and server.posts == 3
+    assert sorted(frames) == ['INFY', 'TCS']
+    pd.testing.assert_frame_equal(frames['TCS'], client(HistoryServer()).get_history('TCS', 'NSE', datetime(2024, 1, 1),
+                                                                                      datetime(2024, 1, 5)))
+    report = batch.error_report().set_index('Symbol')
+    assert report.loc['WIPRO', 'Error'] == 'HTTPError' and report.loc['NOSUCH', 'Error'] == 'LookupError'
+
+
+def test_empty_batch_makes_no_requests():
+    server = HistoryServer()
+    batch = client(server).get_history_many(['NOSUCH'])
+    assert list(batch) == [] and server.cookie_requests == 0
+    assert batch.error_report()['Symbol'].tolist() == ['NOSUCH']
@@ -0,0 +1,83 @@
+import threading
+import time
+from datetime import date
+import pandas as pd
+import pytest
+from benchmarks.fixtures import SyntheticNseAdapter
+from NseUtility import NseUtils
+from index_history_store import IndexHistoryStore
+
+
+class IndexServer:
+    """indicesHistory stand-in: one row per weekday of the window, counting the windows in flight"""
+
+    def __init__(self):
+        self.windows = []
+        self._lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+
+    def __call__(self, index, from_date, to_date):
+        with self._lock:
+            self.windows.append((from_date, to_date))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.05)
+            days = pd.bdate_range(*pd.to_datetime([from_date, to_date], format='%d-%m-%Y'))
+            return pd.DataFrame({'TIMESTAMP': days.strftime('%d-%b-%Y'), 'INDEX_NAME': index,
+                                 'OPEN_INDEX_VAL': 100.0, 'HIGH_INDEX_VAL': 101.0, 'CLOSE_INDEX_VAL': 100.5,
+                                 'LOW_INDEX_VAL': 99.0, 'TRADED_QTY': 1000, 'TURN_OVER': 1.5})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def nse(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    nse = NseUtils(bhav_archive=False, index_store=IndexHistoryStore(tmp_path / 'index_history'))
+    nse.get_index_data = IndexServer()
+    return nse
+
+
+def _dates(df):
+    return pd.to_datetime(df['TIMESTAMP'], format='%d-%b-%Y')
+
+
+def test_long_ranges_download_their_windows_concurrently(nse):
+    df = nse.get_index_historic_data('NIFTY 50', '01-01-2021', '30-06-2023')
+    assert len(nse.get_index_data.windows) == 3
+    assert nse.get_index_data.max_in_flight > 1
+    dates = _dates(df)
+    assert dates.is_monotonic_increasing and dates.is_unique
+    assert dates.tolist() == pd.bdate_range('2021-01-01', '2023-06-30').tolist()
+
+
+def test_only_the_missing_part_of_a_range_is_downloaded_and_merged(nse):
+    nse.get_index_historic_data('NIFTY 50', '01-01-2023', '30-06-2023')
+    nse.get_index_data.windows.clear()
+
+    df = nse.get_index_historic_data('NIFTY 50', '01-03-2023', '31-08-2023')
+    assert nse.get_index_data.windows == [('01-07-2023', '31-08-2023')]
+    assert _dates(df).tolist() == pd.bdate_range('2023-03-01', '2023-08-31').tolist()
+    assert nse.index_store.covered('NIFTY 50') == [[date(2023, 1, 1), date(2023, 8, 31)]]
+
+    nse.get_index_data.windows.clear()
+    again = nse.get_index_historic_data('NIFTY 50', '01-02-2023', '31-07-2023')
+    assert nse.get_index_data.windows == []
+    assert _dates(again).tolist() == pd.bdate_range('2023-02-01', '2023-07-31').tolist()
+    assert nse.index_store.stats()['hits'] == 1
+
+
+def test_a_gap_without_sessions_is_covered_without_rows(tmp_path, monkeypatch):
+    """A weekend after a stored Friday is answered with empty records, not an error"""
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    nse = NseUtils(bhav_archive=False, index_store=IndexHistoryStore(tmp_path / 'index_history'),
+                   adapter=SyntheticNseAdapter(symbols=1))
+    week = nse.get_index_historic_data('NIFTY 50', '30-06-2025', '04-07-2025')
+    assert len(week) == 5
+
+    weekend = nse.get_index_historic_data('NIFTY 50', '30-06-2025', '06-07-2025')
+    pd.testing.assert_frame_equal(weekend, week)
+    assert nse.index_store.covered('NIFTY 50') == [[date(2025, 6, 30), date(2025, 7, 6)]]
+    assert nse.index_store.missing('NIFTY 50', date(2025, 7, 5), date(2025, 7, 6)) == []
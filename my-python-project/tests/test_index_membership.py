@@ -0,0 +1,106 @@
+import asyncio
+import json
+from datetime import date
+import httpx
+from AsyncNseUtility import AsyncNseUtils
+from index_membership import IndexMembershipStore
+from NseUtility import NseUtils
+from nse_replay import FixtureStore, ReplayAdapter
+
+
+def test_snapshots_record_changes_and_the_inverted_index(tmp_path):
+    store = IndexMembershipStore(tmp_path / 'membership.json')
+    assert store.update('NIFTY IT', ['INFY', 'TCS', 'WIPRO'], date(2024, 1, 1)).empty
+    store.update('NIFTY BANK', ['SBIN', 'HDFCBANK'], date(2024, 1, 1))
+    changes = store.update('NIFTY IT', ['INFY', 'TCS', 'LTIM'], date(2024, 3, 28))
+    assert changes[['Symbol', 'Change']].values.tolist() == [['LTIM', 'added'], ['WIPRO', 'removed']]
+
+    assert store.indices_of('wipro') == [] and store.indices_of('SBIN') == ['NIFTY BANK']
+    assert store.universe(['NIFTY IT', 'NIFTY BANK']) == ['HDFCBANK', 'INFY', 'LTIM', 'SBIN', 'TCS']
+    assert store.members('NIFTY IT', date(2024, 2, 1)) == ['INFY', 'TCS', 'WIPRO']
+    assert store.members('NIFTY IT', date(2023, 12, 1)) is None
+    assert store.sectors(['SBIN', 'LTIM', 'ZOMATO']) == {'SBIN': 'NIFTY BANK', 'LTIM': 'NIFTY IT', 'ZOMATO': 'OTHERS'}
+    # Older snapshots do not overwrite newer ones
+    assert store.update('NIFTY IT', ['WIPRO'], date(2024, 2, 1)).empty
+
+    # Unchanged members only move the snapshot date, saved on flush
+    saved = (tmp_path / 'membership.json').read_text()
+    assert store.update('NIFTY BANK', ['SBIN', 'HDFCBANK'], date(2024, 3, 28)).empty
+    assert (tmp_path / 'membership.json').read_text() == saved
+    store.flush()
+
+    loaded = IndexMembershipStore(tmp_path / 'membership.json')
+    assert loaded.indices_of('LTIM') == ['NIFTY IT']
+    assert loaded.changes(symbol='wipro')['Date'].tolist() == [date(2024, 3, 28)]
+    assert loaded.stale(['NIFTY IT', 'NIFTY BANK', 'NIFTY AUTO'], date(2024, 3, 28)) == ['NIFTY AUTO']
+
+
+
+def test_members_as_of_with_indices_updated_out_of_date_order(tmp_path):
+    store = IndexMembershipStore(tmp_path / 'membership.json')
+    store.update('NIFTY IT', ['INFY', 'WIPRO'], date(2024, 1, 1))
+    store.update('NIFTY BANK', ['SBIN'], date(2024, 1, 1))
+    store.update('NIFTY IT', ['INFY', 'LTIM'], date(2024, 3, 10))
+    # Refreshed late: its change predates the last one of NIFTY IT
+    store.update('NIFTY BANK', ['SBIN', 'AXISBANK'], date(2024, 3, 5))
+
+    assert store.members('NIFTY IT', date(2024, 3, 7)) == ['INFY', 'WIPRO']
+    assert store.members('NIFTY BANK', date(2024, 3, 7)) == ['AXISBANK', 'SBIN']
+    assert store.changes()['Date'].tolist() == [date(2024, 3, 5)] + [date(2024, 3, 10)] * 2
+    assert IndexMembershipStore(tmp_path / 'membership.json').members('NIFTY IT', date(2024, 3, 7)) == \
+        ['INFY', 'WIPRO']
+
+def test_universe_downloads_each_index_once_a_day(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    fixtures = FixtureStore(tmp_path / 'fixtures')
+    for index, members in {'NIFTY IT': ['TCS', 'INFY'], 'NIFTY BANK': ['SBIN']}.items():
+        url, ref_url = NseUtils._index_details_urls(index)
+        payload = {'data': [{'symbol': index, 'meta': {}}] + [{'symbol': symbol, 'meta': {}} for symbol in members]}
+        fixtures.save(FixtureStore.key('GET', url), url, 200, {'Content-Type': 'application/json'},
+                      json.dumps(payload).encode())
+        fixtures.save(FixtureStore.key('GET', ref_url), ref_url, 200, {'Content-Type': 'text/html'},
+                      b'<html></html>')
+    replay = ReplayAdapter(fixtures)
+    nse = NseUtils(bhav_archive=False, index_store=False, filings_store=False, high_low_store=False,
+                   adapter=replay, index_membership=IndexMembershipStore(tmp_path / 'membership.json'))
+
+    assert nse.get_index_universe(['NIFTY IT', 'NIFTY BANK']) == ['INFY', 'SBIN', 'TCS']
+    served = replay.hits
+    assert nse.get_index_universe('NIFTY IT') == ['INFY', 'TCS']
+    assert nse.index_membership.indices_of('SBIN') == ['NIFTY BANK']
+    assert replay.hits == served
+
+
+
+def test_index_details_feed_the_store_under_the_index_name(tmp_path):
+    url, ref_url = NseUtils._index_details_urls('NIFTY IT')
+    payload = {'data': [{'symbol': symbol, 'meta': {}} for symbol in ('NIFTY IT', 'TCS', 'INFY')]}
+    fixtures = FixtureStore(tmp_path / 'fixtures')
+    fixtures.save(FixtureStore.key('GET', url), url, 200, {'Content-Type': 'application/json'},
+                  json.dumps(payload).encode())
+    fixtures.save(FixtureStore.key('GET', ref_url), ref_url, 200, {'Content-Type': 'text/html'}, b'<html></html>')
+    replay = ReplayAdapter(fixtures)
+    nse = NseUtils(bhav_archive=False, index_store=False, filings_store=False, high_low_store=False,
+                   adapter=replay, index_membership=IndexMembershipStore(tmp_path / 'sync.json'))
+    nse.get_index_details('nifty it')
+    assert nse.index_membership.indices == ['NIFTY IT']
+
+    def server(request):
+        if not request.url.path.startswith('/api/'):
+            return httpx.Response(200, text='<html></html>')
+        return httpx.Response(200, json=payload)
+
+    async def scenario():
+        async with AsyncNseUtils() as anse:
+            await anse.client.aclose()
+            anse.client = httpx.AsyncClient(transport=httpx.MockTransport(server), headers=anse.headers)
+            anse._sync = NseUtils(bhav_archive=False, index_store=False, filings_store=False, high_low_store=False,
+                                  adapter=replay, index_membership=IndexMembershipStore(tmp_path / 'async.json'))
+            members = await anse.get_index_details('nifty it', list_only=True)
+            served = replay.hits
+            # The snapshot of the day is in the store, the universe needs no download
+            return members, await anse.get_index_universe('NIFTY IT'), await anse.get_symbol_indices('tcs'), \
+                replay.hits - served
+
+    members, universe, indices, downloads = asyncio.run(scenario())
+    assert members == universe == ['INFY', 'TCS'] and indices == ['NIFTY IT'] and downloads == 0
@@ -0,0 +1,90 @@
+import json
+import pandas as pd
+import pytest
+import requests
+from NseUtility import IndexSnapshot, NseUtils
+
+PAYLOAD = {'data': [
+    {'key': 'BROAD MARKET INDICES', 'indexSymbol': 'NIFTY 50', 'last': 19500.5, 'pe': '22.5', 'pb': '4.1',
+     'dy': '1.3', 'advances': '30', 'declines': '19', 'unchanged': '1'},
+    {'key': 'SECTORAL INDICES', 'indexSymbol': 'NIFTY BANK', 'last': 44100.0, 'pe': '', 'pb': '2.9', 'dy': 'None',
+     'advances': '8', 'declines': '4', 'unchanged': '0'},
+    {'key': 'FIXED INCOME INDICES', 'indexSymbol': 'NIFTY 10 YR BENCHMARK G-SEC', 'last': 2300.0, 'pe': '',
+     'pb': '', 'dy': '', 'advances': None, 'declines': None, 'unchanged': None},
+]}
+
+
+def _old_ratio(data, column, label):
+    """get_index_pe_ratio / pb / dy before the snapshot: a download and a parse per call"""
+    df = pd.json_normalize(data['data'])
+    df = df[['indexSymbol', 'key', column]]
+    df = df[df[column].str.strip() != '']
+    df = df[df[column].str.strip() != 'None']
+    df.columns = ['Index', 'Type', label]
+    return df
+
+
+def _old_advance_decline(data):
+    df = pd.json_normalize(data['data'])
+    df = df[['indexSymbol', 'advances', 'declines', 'unchanged']]
+    df.dropna(inplace=True)
+    df.columns = ['Index', 'Advances', 'Declines', 'Unchanged']
+    return df
+
+
+class AllIndices:
+    """NseSession.get answering the allIndices api"""
+
+    def __init__(self):
+        self.hits = 0
+
+    def __call__(self, url, ref_url=None, **kwargs):
+        assert url == IndexSnapshot.url
+        self.hits += 1
+        response = requests.Response()
+        response.status_code, response._content = 200, json.dumps(PAYLOAD).encode()
+        return response
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    return AllIndices()
+
+
+def _nse(server, ttl):
+    nse = NseUtils(bhav_archive=False, index_store=False, index_snapshot_ttl=ttl)
+    nse.nse_session.get = server
+    return nse
+
+
+def test_views_match_the_per_call_parse_with_one_download(server):
+    nse = _nse(server, ttl=60)
+    pd.testing.assert_frame_equal(nse.get_index_pe_ratio(), _old_ratio(PAYLOAD, 'pe', 'Profit Earning Ratio'))
+    served = server.hits
+    pd.testing.assert_frame_equal(nse.get_index_pb_ratio(), _old_ratio(PAYLOAD, 'pb', 'Price Book Ratio'))
+    pd.testing.assert_frame_equal(nse.get_index_div_yield(), _old_ratio(PAYLOAD, 'dy', 'Div Yield'))
+    pd.testing.assert_frame_equal(nse.get_advance_decline(), _old_advance_decline(PAYLOAD))
+    assert nse.index_snapshot.stats() == {'fetches': 1, 'hits': 3}
+    assert server.hits == served
+
+
+def test_zero_ttl_downloads_on_every_view_like_before(server):
+    nse = _nse(server, ttl=0)
+    nse.get_index_pe_ratio()
+    nse.get_advance_decline()
+    assert nse.index_snapshot.stats() == {'fetches': 2, 'hits': 0}
+
+    nse = _nse(server, ttl=60)
+    nse.get_index_pe_ratio()
+    nse.index_snapshot.frame(refresh=True)
+    assert nse.index_snapshot.stats()['fetches'] == 2
+
+
+def test_frame_views_are_copies_of_the_snapshot():
+    snapshot = IndexSnapshot()
+    snapshot.update(PAYLOAD)
+    view = snapshot.frame(['indexSymbol', 'last'])
+    view.loc[0, 'last'] = 0.0
+    assert snapshot.frame(['last'])['last'].tolist() == [19500.5, 44100.0, 2300.0]
+    assert snapshot.is_stale() is False and snapshot.stats() == {'fetches': 1, 'hits': 2}
@@ -0,0 +1,60 @@
+import json
+import pytest
+import requests
+from NseUtility import NseUtils
+
+PAYLOADS = {
+    'equity_stocks_by_volume': {'data': [{'symbol': 'SBIN', 'lastPrice': 570.5, 'totalTradedVolume': '1200'},
+                                         {'symbol': 'INFY', 'lastPrice': 1450.0, 'totalTradedVolume': '900'}]},
+    'index_calls': {'OPTIDX': {'data': [{'identifier': 'OPTIDXNIFTY', 'strikePrice': '19500',
+                                         'lastPrice': '120.5', 'optionType': 'Call'}]}},
+    'index_puts': {'OPTIDX': {'data': []}},
+}
+
+
+class MostActive:
+    """NseSession.get answering the PAYLOADS, other urls fail like a dropped connection"""
+
+    def __init__(self):
+        self.payloads = {NseUtils.most_active_endpoints[kind][0]: payload for kind, payload in PAYLOADS.items()}
+        self.hits = 0
+
+    def __call__(self, url, ref_url=None, **kwargs):
+        self.hits += 1
+        if url not in self.payloads:
+            raise requests.exceptions.ConnectionError(url)
+        response = requests.Response()
+        response.status_code, response._content = 200, json.dumps(self.payloads[url]).encode()
+        return response
+
+
+@pytest.fixture
+def nse(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    nse = NseUtils(bhav_archive=False, index_store=False)
+    nse.nse_session.get = MostActive()
+    return nse
+
+
+def test_snapshot_shares_one_fetch_time_and_types_the_numbers(nse):
+    kinds = ['index_calls', 'equity_stocks_by_volume', 'index_puts', 'stock_calls']
+    snapshot = nse.most_active_snapshot(kinds, max_workers=4)
+
+    assert list(snapshot) == kinds
+    # An empty list and a failed download are both None, the other variants are still returned
+    assert snapshot['index_puts'] is None and snapshot['stock_calls'] is None
+    calls, equities = snapshot['index_calls'], snapshot['equity_stocks_by_volume']
+    assert calls.columns[0] == 'Fetch_Time' and calls['Fetch_Time'].iloc[0] == equities['Fetch_Time'].iloc[0]
+    assert calls['strikePrice'].tolist() == [19500] and calls['lastPrice'].tolist() == [120.5]
+    assert calls['identifier'].tolist() == ['OPTIDXNIFTY']
+    assert equities['totalTradedVolume'].tolist() == [1200, 900]
+
+    # The single variant methods return the same rows, without the Fetch_Time column
+    single = nse.most_active_equity_stocks_by_volume()
+    assert single['symbol'].tolist() == equities['symbol'].tolist()
+
+
+def test_snapshot_rejects_unknown_kinds(nse):
+    with pytest.raises(ValueError, match='most_traded'):
+        nse.most_active_snapshot(['index_calls', 'most_traded'])
+    assert nse.nse_session.get.hits == 0
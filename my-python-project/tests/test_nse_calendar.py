@@ -0,0 +1,78 @@
+from datetime import date, datetime
+import numpy as np
+import pytest
+from nse_calendar import NseCalendar
+
+
+class FakeNse:
+    """Holiday lists as returned by NseUtils.trading_holidays / clearing_holidays(list_only=True)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def trading_holidays(self, list_only=False):
+        self.calls += 1
+        return ['26-Jan-2023', '15-Aug-2023', '24-Oct-2023']
+
+    def clearing_holidays(self, list_only=False):
+        return ['26-Jan-2023', '15-Aug-2023', '24-Oct-2023', '19-Feb-2023']
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    return NseCalendar(FakeNse(), path=tmp_path / 'nse_holidays.json')
+
+
+def test_holidays_are_persisted_and_reused(tmp_path):
+    """The holiday lists are downloaded once and then read from the local file"""
+    nse = FakeNse()
+    NseCalendar(nse, path=tmp_path / 'nse_holidays.json')
+    reloaded = NseCalendar(nse, path=tmp_path / 'nse_holidays.json')
+    assert nse.calls == 1
+    assert reloaded.is_trading_holiday('15-Aug-2023')
+    assert reloaded.refreshed == date.today()
+
+
+def test_trading_day_queries(calendar):
+    """Single dates return scalars, array likes return numpy arrays"""
+    assert calendar.is_trading_day('14-08-2023')
+    assert not calendar.is_trading_day(datetime(2023, 8, 15))
+    assert not calendar.is_trading_day('19-Aug-2023')  # Saturday
+    np.testing.assert_array_equal(calendar.is_trading_day(['14-08-2023', '15-08-2023', '16-08-2023']),
+                                  [True, False, True])
+    assert calendar.is_clearing_holiday('19-Feb-2023') and not calendar.is_trading_holiday('19-Feb-2023')
+
+
+def test_navigation(calendar):
+    """next / previous / offset skip weekends and holidays"""
+    assert calendar.next_trading_day('14-08-2023') == datetime(2023, 8, 16)
+    assert calendar.previous_trading_day('16-08-2023') == datetime(2023, 8, 14)
+    assert calendar.next_trading_day('19-08-2023') == datetime(2023, 8, 21)
+    assert calendar.previous_trading_day('19-08-2023') == datetime(2023, 8, 18)
+    assert calendar.offset('19-08-2023', 0) == datetime(2023, 8, 18)
+    assert calendar.offset('11-08-2023', 3) == datetime(2023, 8, 17)
+    assert calendar.offset('17-08-2023', -3) == datetime(2023, 8, 11)
+
+
+def test_trading_days_between(calendar):
+    """Both ends are inclusive, holidays and weekends are left out"""
+    days = calendar.trading_days_between('11-08-2023', '21-08-2023')
+    assert [str(day) for day in days] == ['2023-08-11', '2023-08-14', '2023-08-16', '2023-08-17', '2023-08-18',
+                                          '2023-08-21']
+    assert calendar.count_trading_days('11-08-2023', '21-08-2023') == 6
+    with pytest.raises(ValueError):
+        calendar.trading_days_between('21-08-2023', '11-08-2023')
+
+
+def test_closures_of_unlisted_years_are_learnt_and_persisted(tmp_path):
+    """Days of past years without a holiday list become non sessions, listed years keep their list"""
+    calendar = NseCalendar(FakeNse(), path=tmp_path / 'nse_holidays.json')
+    # 26 January 2022 is a holiday the lists do not know, 17 August 2023 is in a listed year, 14 May 2022 a Saturday
+    added = calendar.add_closures(['26-01-2022', '17-08-2023', '14-05-2022', f"02-01-{date.today().year}"])
+    assert [str(day) for day in added] == ['2022-01-26']
+    assert calendar.add_closures('26-01-2022').size == 0
+
+    reloaded = NseCalendar(FakeNse(), path=tmp_path / 'nse_holidays.json')
+    assert not reloaded.is_trading_day('26-01-2022') and not reloaded.is_trading_holiday('26-01-2022')
+    assert reloaded.next_trading_day('25-01-2022') == datetime(2022, 1, 27)
+    assert reloaded.is_trading_day('17-08-2023')
@@ -0,0 +1,58 @@
+import json
+import pytest
+from NseUtility import NseUtils
+from nse_metrics import Metrics, endpoint_of
+from nse_rate_limit import RateLimitedAdapter, RateLimiter
+from nse_replay import FixtureStore
+from nse_standin import NseStandIn
+
+INDEX_URL = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
+PAYLOAD = {'data': [{'symbol': 'NIFTY 50', 'meta': {}}, {'symbol': 'INFY', 'meta': {}}]}
+
+
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    store = FixtureStore(tmp_path / 'fixtures')
+    store.save(FixtureStore.key('GET', INDEX_URL), INDEX_URL, 200, {'Content-Type': 'application/json'},
+               json.dumps(PAYLOAD).encode())
+    with NseStandIn(store) as standin:
+        yield standin
+
+
+def test_endpoint_labels_collapse_numbers():
+    assert endpoint_of(INDEX_URL) == '/api/equity-stockIndices'
+    assert endpoint_of('https://nsearchives.nseindia.com/content/cm/BhavCopy_NSE_CM_0_0_0_20240628_F_0000.csv.zip') \
+        == '/content/cm/BhavCopy_NSE_CM_{n}_{n}_{n}_{n}_F_{n}.csv.zip'
+
+
+def test_requests_parse_time_and_caches_are_recorded(standin):
+    metrics = Metrics()
+    limiter = RateLimiter(limits={}, max_retries=2, backoff_base=0.01)
+    nse = NseUtils(bhav_archive=False, index_store=False, base_url=standin.base_url, metrics=metrics,
+                   adapter=RateLimitedAdapter(limiter, metrics))
+    nse.get_index_details('NIFTY 50')
+    nse.get_index_details('NIFTY 50', list_only=True)
+
+    endpoint = nse.stats()['endpoints']['/api/equity-stockIndices']
+    assert endpoint['requests'] == 2 and endpoint['status'] == {'200': 2}
+    assert endpoint['bytes'] == 2 * len(json.dumps(PAYLOAD))
+    assert endpoint['latency']['count'] == 2 and endpoint['parse']['count'] == 2
+    assert nse.stats()['caches']['cookies'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+    text = metrics.prometheus()
+    assert 'nse_requests_total{endpoint="/api/equity-stockIndices",status="200"} 2' in text
+    assert 'nse_request_duration_seconds_bucket{endpoint="/api/equity-stockIndices",le="+Inf"} 2' in text
+    assert 'nse_cache_hit_ratio{cache="cookies"} 0.5' in text
+
+
+def test_retries_are_counted_per_endpoint(standin):
+    standin.failure_rate = 1.0
+    metrics = Metrics()
+    limiter = RateLimiter(limits={}, max_retries=2, backoff_base=0.01)
+    nse = NseUtils(bhav_archive=False, index_store=False, base_url=standin.base_url, metrics=metrics,
+                   adapter=RateLimitedAdapter(limiter, metrics))
+    nse.nse_session.prime()
+    nse.nse_session.session.get(standin.base_url + '/api/equity-stockIndices?index=NIFTY%2050')
+    endpoint = metrics.stats()['endpoints']['/api/equity-stockIndices']
+    assert endpoint['status'] == {'503': 3} and endpoint['retries'] == 2
@@ -0,0 +1,114 @@
+import time
+from email.utils import formatdate
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import nse_rate_limit
+from nse_rate_limit import RateLimitedAdapter, RateLimiter, RetryQueue, TokenBucket, retry_after
+
+URL = 'https://www.nseindia.com/api/allIndices'
+HOST = 'www.nseindia.com'
+
+
+def build_response(request, status, headers, content):
+    response = requests.Response()
+    response.status_code, response.headers, response._content = status, CaseInsensitiveDict(headers), content
+    response._content_consumed = True
+    response.url, response.request = request.url, request
+    return response
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Scripted answers of the transport below RateLimitedAdapter, and the sleeps of the adapter"""
+    script = {'answers': [], 'sent': 0, 'sleeps': []}
+
+    def send(adapter, request, **kwargs):
+        status, headers = script['answers'][script['sent']]
+        script['sent'] += 1
+        return build_response(request, status, headers, b'{}')
+
+    monkeypatch.setattr(HTTPAdapter, 'send', send)
+    monkeypatch.setattr(nse_rate_limit.time, 'sleep', script['sleeps'].append)
+    return script
+
+
+def _session(limiter):
+    session = requests.Session()
+    session.mount('https://', RateLimitedAdapter(limiter))
+    return session
+
+
+def test_bucket_queues_callers_behind_each_other_and_refills():
+    bucket = TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2:] == pytest.approx([0.1, 0.2], abs=0.02)
+    # 0.35 seconds refill 3.5 tokens, the bucket was 2 tokens short
+    time.sleep(0.35)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() > 0.0
+
+
+def test_limits_apply_only_to_listed_hosts():
+    limiter = RateLimiter(limits={HOST: (1.0, 1)})
+    assert limiter.reserve(HOST) == 0.0 and limiter.reserve(HOST) == pytest.approx(1.0, abs=0.05)
+    assert limiter.reserve('charting.nseindia.com') == 0.0
+    unlimited = RateLimiter(limits={})
+    assert [unlimited.reserve(HOST) for _ in range(20)] == [0.0] * 20
+    assert limiter.stats()['throttled'] == 1
+
+
+def test_throttled_answers_are_retried_after_the_pause_of_the_host(server):
+    server['answers'] = [(429, {'Retry-After': '2'}), (503, {}), (200, {})]
+    limiter = RateLimiter(limits={}, max_retries=3, backoff_base=0.5)
+    response = _session(limiter).get(URL)
+    assert response.status_code == 200 and server['sent'] == 3
+    # Retry-After pauses the whole host, the jittered backoff of the 503 (0.5 - 1 s) ends within that pause
+    assert server['sleeps'] == pytest.approx([2.0, 2.0], abs=0.05)
+    assert limiter.reserve(HOST) == pytest.approx(2.0, abs=0.05)
+    assert limiter.reserve('nsearchives.nseindia.com') == 0.0
+    assert limiter.stats()['hosts'][HOST]['retried'] == 2 and limiter.stats()['failed'] == 0
+
+
+def test_exhausted_retries_return_the_last_answer(server):
+    server['answers'] = [(500, {}), (502, {}), (404, {})]
+    limiter = RateLimiter(limits={}, max_retries=1, backoff_base=0.5)
+    session = _session(limiter)
+    assert session.get(URL).status_code == 502 and server['sent'] == 2
+    assert 0.25 <= server['sleeps'][0] <= 0.5
+    assert limiter.stats()['failed'] == 1
+    # Other errors are answered as they are
+    assert session.get(URL).status_code == 404 and server['sent'] == 3
+    assert not limiter.should_retry(404, 0) and limiter.should_retry(429, 0) and not limiter.should_retry(429, 1)
+    # 403 is left to the cookie refresh of NseSession and the not-found handling of the archive downloads
+    assert not limiter.should_retry(403, 0)
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    request = requests.Request('GET', URL).prepare()
+    answer = lambda value: build_response(request, 429, {'Retry-After': value} if value else {}, b'')
+    assert retry_after(answer('7')) == 7.0
+    assert retry_after(answer(formatdate(time.time() + 30, usegmt=True))) == pytest.approx(30, abs=2)
+    assert retry_after(answer('soon')) is None and retry_after(answer(None)) is None
+
+
+def test_retry_queue_keeps_the_items_that_failed_every_round():
+    calls = []
+
+    def flaky(key, failures):
+        calls.append(key)
+        if calls.count(key) <= failures:
+            raise ConnectionError(f"{key} failed")
+        return key.lower()
+
+    queue = RetryQueue(max_rounds=2, delay=0)
+    queue.put('A', flaky, 'A', 1)
+    queue.put('B', flaky, 'B', 5)
+    queue.put('C', flaky, 'C', 0)
+    assert len(queue) == 3
+    assert queue.drain() == {'A': 'a', 'C': 'c'}
+    assert calls == ['A', 'B', 'C', 'A', 'B']
+    assert list(queue.failed) == ['B'] and str(queue.failed['B']) == 'B failed'
+    assert len(queue) == 0
@@ -0,0 +1,79 @@
+import json
+import pytest
+from NseUtility import NseUtils
+from NSEMasterData import NSEMasterData
+from nse_rate_limit import RateLimitedAdapter, RateLimiter
+from nse_replay import FixtureNotFound, FixtureStore, RecordingAdapter, ReplayAdapter, rebase_url
+from nse_standin import NseStandIn
+
+INDEX_URL = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
+PAYLOAD = {'data': [
+    {'symbol': 'NIFTY 50', 'lastPrice': 19500.0, 'meta': {}},
+    {'symbol': 'RELIANCE', 'lastPrice': 2500.5, 'meta': {}},
+    {'symbol': 'INFY', 'lastPrice': 1450.0, 'meta': {}},
+]}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    store = FixtureStore(tmp_path / 'fixtures')
+    store.save(FixtureStore.key('GET', INDEX_URL), INDEX_URL, 200, {'Content-Type': 'application/json'},
+               json.dumps(PAYLOAD).encode())
+    return store
+
+
+def _no_limit_adapter():
+    return RateLimitedAdapter(RateLimiter(limits={}, max_retries=0))
+
+
+def test_rebase_url_keeps_path_and_query():
+    assert rebase_url(INDEX_URL, 'http://127.0.0.1:8000/') == \
+        'http://127.0.0.1:8000/api/equity-stockIndices?index=NIFTY%2050'
+    assert rebase_url(INDEX_URL, None) == INDEX_URL
+
+
+def test_standin_serves_fixtures_after_cookie_priming(store):
+    """The stand-in answers api calls only with the cookies handed out by the reference page"""
+    with NseStandIn(store) as standin:
+        nse = NseUtils(bhav_archive=False, index_store=False, adapter=_no_limit_adapter(),
+                       base_url=standin.base_url)
+        assert nse.get_index_details('NIFTY 50', list_only=True) == ['INFY', 'RELIANCE']
+        assert standin.counters['pages'] == 1
+        assert standin.counters['served'] == 1
+        assert standin.counters['unauthorized'] == 0
+
+
+def test_standin_serves_recordings_of_encoded_responses(tmp_path, monkeypatch):
+    """A live gzip / br response is stored decoded, so its encoding headers are not replayed over the body"""
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    store = FixtureStore(tmp_path / 'fixtures')
+    store.save(FixtureStore.key('GET', INDEX_URL), INDEX_URL, 200,
+               {'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'Content-Length': '120'},
+               json.dumps(PAYLOAD).encode())
+    assert store.load(FixtureStore.key('GET', INDEX_URL))[1] == {'Content-Type': 'application/json'}
+    with NseStandIn(store) as standin:
+        nse = NseUtils(bhav_archive=False, index_store=False, adapter=_no_limit_adapter(),
+                       base_url=standin.base_url)
+        assert nse.get_index_details('NIFTY 50', list_only=True) == ['INFY', 'RELIANCE']
+
+
+def test_record_then_replay_offline(store, tmp_path):
+    """Responses recorded against the stand-in replay without any server, under the real NSE urls"""
+    recorded = FixtureStore(tmp_path / 'recorded')
+    with NseStandIn(store) as standin:
+        nse = NseUtils(bhav_archive=False, index_store=False,
+                       adapter=RecordingAdapter(recorded, _no_limit_adapter()), base_url=standin.base_url)
+        live = nse.get_index_details('NIFTY 50')
+    assert FixtureStore.key('GET', INDEX_URL) in FixtureStore(tmp_path / 'recorded')
+
+    replay = ReplayAdapter(FixtureStore(tmp_path / 'recorded'))
+    nse = NseUtils(bhav_archive=False, index_store=False, adapter=replay)
+    assert nse.get_index_details('NIFTY 50').equals(live)
+    assert replay.misses == 0
+
+
+def test_replay_raises_for_unrecorded_requests(store):
+    master = NSEMasterData(adapter=ReplayAdapter(store))
+    with pytest.raises(FixtureNotFound):
+        master.session.get(master.nse_url)
@@ -0,0 +1,66 @@
+import json
+import pandas as pd
+import pyarrow as pa
+import pytest
+from NseUtility import NseUtils
+from nse_replay import FixtureStore, ReplayAdapter
+from nse_schemas import compact_frame
+
+INDEX_URL = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
+PAGE_URL = "https://www.nseindia.com/market-data/live-equity-market?symbol=NIFTY%2050"
+PAYLOAD = {'data': [
+    {'symbol': 'NIFTY 50', 'series': None, 'lastPrice': 19500.05, 'totalTradedVolume': 1200,
+     'lastUpdateTime': '17-Jun-2023 15:30:00', 'meta': {}},
+    {'symbol': 'RELIANCE', 'series': 'EQ', 'lastPrice': 2500.5, 'totalTradedVolume': 900,
+     'lastUpdateTime': '17-Jun-2023 15:30:00', 'meta': {}},
+    {'symbol': 'INFY', 'series': 'EQ', 'lastPrice': 1450.0, 'totalTradedVolume': 300,
+     'lastUpdateTime': '17-Jun-2023 15:30:00', 'meta': {}},
+]}
+
+
+@pytest.fixture
+def adapter(tmp_path, monkeypatch):
+    monkeypatch.setenv('NSEDATA_HOME', str(tmp_path / 'home'))
+    store = FixtureStore(tmp_path / 'fixtures')
+    store.save(FixtureStore.key('GET', INDEX_URL), INDEX_URL, 200, {'Content-Type': 'application/json'},
+               json.dumps(PAYLOAD).encode())
+    store.save(FixtureStore.key('GET', PAGE_URL), PAGE_URL, 200, {'Content-Type': 'text/html'}, b'<html></html>')
+    return ReplayAdapter(store)
+
+
+def test_compact_frame_shrinks_columns_outside_the_schema():
+    df = pd.DataFrame({
+        'qty': [1, 2, 300], 'price': [10.05, 20.1, 30.15], 'turnover': ['1000', '2000.5', None],
+        'series': pd.Series(['EQ', 'EQ', 'EQ'], dtype=object), 'name': ['A Ltd', 'B Ltd', 'C Ltd'],
+        'nested': [{'a': 1}, {}, None],
+    })
+    compact = compact_frame(df, {'name': 'str'})
+    assert compact['qty'].dtype == 'int16'
+    assert compact['price'].dtype == 'float32'
+    assert compact['turnover'].dtype == 'float32' and compact['turnover'].isna().iloc[2]
+    assert isinstance(compact['series'].dtype, pd.CategoricalDtype)
+    assert compact['name'].dtype == pd.StringDtype('pyarrow')
+    assert compact['nested'].dtype == object
+    assert df['qty'].dtype == 'int64'
+
+
+def test_compact_and_arrow_output(adapter):
+    plain = NseUtils(bhav_archive=False, index_store=False, adapter=adapter).get_index_details('NIFTY 50')
+    compact = NseUtils(bhav_archive=False, index_store=False, adapter=adapter, compact=True)
+    df = compact.get_index_details('NIFTY 50')
+    assert isinstance(df['series'].dtype, pd.CategoricalDtype)
+    assert df['lastPrice'].dtype == 'float32' and df['totalTradedVolume'].dtype == 'int16'
+    assert df['lastUpdateTime'].iloc[0] == pd.Timestamp('2023-06-17 15:30:00')
+    assert df.index.tolist() == plain.index.tolist()
+    assert df.memory_usage(deep=True).sum() < plain.memory_usage(deep=True).sum()
+    # Results that are not frames are unchanged
+    assert compact.get_index_details('NIFTY 50', list_only=True) == ['INFY', 'RELIANCE']
+
+    table = NseUtils(bhav_archive=False, index_store=False, adapter=adapter,
+                     output='arrow').get_index_details('NIFTY 50')
+    assert isinstance(table, pa.Table)
+    assert table.column('symbol').to_pylist() == ['NIFTY 50', 'RELIANCE', 'INFY']
+    assert pa.types.is_dictionary(table.schema.field('series').type)
+
+    with pytest.raises(ValueError):
+        NseUtils(bhav_archive=False, index_store=False, adapter=adapter, output='polars')
@@ -0,0 +1,118 @@
+import json
+import time
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+import nse_rate_limit
+from NseUtility import NseSession, NseUtils
+from nse_rate_limit import RateLimiter
+
+INDICES = {'NIFTY 50': ['RELIANCE', 'INFY'], 'NIFTY IT': ['TCS', 'INFY']}
+
+
+class NseServer(HTTPAdapter):
+    """
+    Transport answering like NSE: web pages hand out the cookies, api calls without them get a 401 (or 403) and
+    archive files that do not exist a 403
+    """
+
+    def __init__(self, session, cookie_lifetime=3600, rejected=401):
+        super().__init__()
+        self.session = session
+        self.cookie_lifetime = cookie_lifetime
+        self.rejected = rejected
+        self.counters = {'requests': 0, 'pages': 0, 'served': 0, 'unauthorized': 0}
+
+    def _answer(self, request, status, content=b''):
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        response._content = content
+        response.url = request.url
+        response.request = request
+        return response
+
+    def send(self, request, **kwargs):
+        self.counters['requests'] += 1
+        url = urlsplit(request.url)
+        if url.hostname != 'www.nseindia.com':
+            return self._answer(request, 403 if 'missing' in url.path else 200, b'SYMBOL\n')
+        if not url.path.startswith('/api/'):
+            self.counters['pages'] += 1
+            self.session.cookies.set('nsit', f"cookie{self.counters['pages']}", domain='www.nseindia.com',
+                                     expires=int(time.time()) + self.cookie_lifetime)
+            return self._answer(request, 200, b'<html></html>')
+        if 'nsit=' not in request.headers.get('Cookie', ''):
+            self.counters['unauthorized'] += 1
+            return self._answer(request, self.rejected)
+        index = next(index for index in INDICES if index.replace(' ', '%20') in request.url)
+        payload = {'data': [{'symbol': index, 'meta': {}}] + [{'symbol': s, 'meta': {}} for s in INDICES[index]]}
+        self.counters['served'] += 1
+        return self._answer(request, 200, json.dumps(payload).encode())
+
+
+def _serve(session):
+    server = NseServer(session)
+    session.mount('https://', server)
+    return server
+
+
+def _index_url(index):
+    index = index.replace(' ', '%20')
+    return (f"https://www.nseindia.com/api/equity-stockIndices?index={index}",
+            f"https://www.nseindia.com/market-data/live-equity-market?symbol={index}")
+
+
+def test_cookies_are_primed_once_for_every_endpoint():
+    nse = NseUtils()
+    server = _serve(nse.session)
+    for _ in range(2):
+        assert nse.get_index_details('NIFTY 50', list_only=True) == ['INFY', 'RELIANCE']
+        assert nse.get_index_details('NIFTY IT', list_only=True) == ['INFY', 'TCS']
+    assert server.counters['pages'] == 1 and server.counters['served'] == 4
+    assert server.counters['unauthorized'] == 0
+    assert nse.session_stats()['priming_requests'] == 1 and nse.session_stats()['priming_saved'] == 3
+
+
+def test_cookies_are_primed_again_when_rejected_or_expired():
+    session = NseSession({})
+    server = _serve(session.session)
+    url, ref_url = _index_url('NIFTY 50')
+    assert session.get(url, ref_url).status_code == 200
+
+    # NSE dropped the session: the 401 re-primes and the request is sent again
+    session.session.cookies.clear()
+    assert session.get(url, ref_url).status_code == 200
+    assert server.counters['unauthorized'] == 1 and server.counters['pages'] == 2
+
+    # An expired cookie re-primes before the request
+    session._cookie_expiry = time.time() - 1
+    assert session.get(url, ref_url).status_code == 200
+    assert server.counters['unauthorized'] == 1 and server.counters['pages'] == 3
+    assert session.stats()['cookie_refreshes'] == 2 and session.stats()['priming_requests'] == 3
+
+
+def test_hosts_without_cookies_are_not_primed():
+    session = NseSession({})
+    server = _serve(session.session)
+    session.get('https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv')
+    assert session.stats()['priming_requests'] == 0 and server.counters['requests'] == 1
+
+
+def test_403_reaches_the_session_through_the_default_limiter(monkeypatch):
+    """The rate limiter does not retry a 403: NseSession primes again, a missing archive file fails at once"""
+    sleeps = []
+    monkeypatch.setattr(nse_rate_limit.time, 'sleep', sleeps.append)
+    session = NseSession({}, limiter=RateLimiter())
+    server = NseServer(session.session, rejected=403)
+    monkeypatch.setattr(HTTPAdapter, 'send', lambda adapter, request, **kwargs: server.send(request, **kwargs))
+    url, ref_url = _index_url('NIFTY 50')
+    assert session.get(url, ref_url).status_code == 200
+
+    session.session.cookies.clear()
+    assert session.get(url, ref_url).status_code == 200
+    assert server.counters['unauthorized'] == 1 and server.counters['pages'] == 2
+    assert session.get('https://nsearchives.nseindia.com/content/cm/missing.csv.zip').status_code == 403
+    assert server.counters['requests'] == 6
+    assert sleeps == [] and session.limiter.stats()['retried'] == 0
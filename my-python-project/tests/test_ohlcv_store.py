@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from requests.adapters import BaseAdapter
+from NSEMasterData import NSEMasterData
+from nse_replay import build_response
+from ohlcv_store import IST_OFFSET, OhlcvStore, settled_until
+
+MASTER = pd.DataFrame({'ScripCode': ['11536'], 'Symbol': ['TCS'], 'Name': ['TATA CONSULTANCY'], 'Type': ['EQ']})
+
+
+class HistoryServer(BaseAdapter):
+    """
+    Charting history api stamping its bars with their IST wall time written as UTC: one daily bar per weekday,
+    or one bar per minute of the requested range for intraday requests. Answers no bars while empty is set.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.ranges = []
+        self.empty = False
+
+    def send(self, request, **kwargs):
+        if request.method == 'GET':
+            return build_response(request, 200, {}, b'')
+        payload = json.loads(request.body)
+        self.ranges.append((payload['fromDate'], payload['toDate']))
+        first, last = (pd.Timestamp(payload[key], unit='s') + IST_OFFSET for key in ('fromDate', 'toDate'))
+        if self.empty:
+            stamps = pd.DatetimeIndex([])
+        elif payload['chartPeriod'] == 'I':
+            stamps = pd.date_range(first.ceil('min'), last.floor('min'), freq='min')
+        else:
+            stamps = pd.date_range(first.normalize(), last.normalize(), freq='B')
+        price = (stamps.dayofyear * 1.5 + stamps.minute).to_numpy()
+        body = {'s': ['Ok'] * len(stamps), 't': [int(stamp.timestamp()) for stamp in stamps], 'o': price.tolist(),
+                'h': (price + 2).tolist(), 'l': (price - 1).tolist(), 'c': (price + 1).tolist(),
+                'v': (stamps.dayofyear * 100).tolist()}
+        return build_response(request, 200, {'Content-Type': 'application/json'}, json.dumps(body).encode())
+
+    def close(self):
+        pass
+
+
+def client(server, store):
+    nse = NSEMasterData(adapter=server, master_cache=False, history_store=store)
+    nse.nse_data = MASTER
+    return nse
+
+
+@pytest.fixture(params=['UTC', 'America/New_York', 'Asia/Kolkata'])
+def host_timezone(request):
+    """Run a test on a machine in another timezone"""
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = request.param
+    time.tzset()
+    yield request.param
+    if previous is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = previous
+    time.tzset()
+
+
+def test_second_run_fetches_only_the_unsettled_tail(tmp_path):
+    end = datetime.now()
+    start = end - timedelta(days=60)
+    server = HistoryServer()
+    store = OhlcvStore(tmp_path)
+    first = client(server, store).get_history('TCS', 'NSE', start, end)
+    assert server.ranges == [(int(start.timestamp()), int(end.timestamp()))]
+
+    later = end + timedelta(seconds=5)
+    second = client(server, store).get_history('TCS', 'NSE', start, later)
+    assert server.ranges[1:] == [(settled_until('D'), int(later.timestamp()))]
+    expected = client(HistoryServer(), False).get_history('TCS', 'NSE', start, later)
+    pd.testing.assert_frame_equal(second, expected)
+    pd.testing.assert_frame_equal(first, expected)
+    assert len(expected) >= 40 and store.stats() == {'hits': 0, 'misses': 2}
+
+
+def test_stored_bars_keep_the_latest_bars_in_any_host_timezone(tmp_path, host_timezone):
+    # 09:00 to 15:00 IST on 5 March 2024, as local datetimes of the host
+    epochs = [int((pd.Timestamp(f"2024-03-05 {hour}") - IST_OFFSET).timestamp()) for hour in ('09:00', '15:00')]
+    start, end = (datetime.fromtimestamp(epoch) for epoch in epochs)
+    stored = client(HistoryServer(), OhlcvStore(tmp_path)).get_history('TCS', 'NSE', start, end, '1m')
+    expected = client(HistoryServer(), False).get_history('TCS', 'NSE', start, end, '1m')
+    pd.testing.assert_frame_equal(stored, expected)
+    # NSE labels a bar with its end time, the 15:00 bar is the one starting at 14:59
+    assert stored.index[0] == pd.Timestamp('2024-03-05 08:59') and stored.index[-1] == pd.Timestamp('2024-03-05 14:59')
+
+
+def test_empty_answer_is_not_marked_covered(tmp_path):
+    server = HistoryServer()
+    store = OhlcvStore(tmp_path)
+    nse = client(server, store)
+    start, end = datetime(2024, 3, 1), datetime(2024, 3, 31)
+    server.empty = True
+    assert nse.get_history('TCS', 'NSE', start, end).empty
+    assert store.covered('NSE', 'TCS', '1D') == []
+
+    server.empty = False
+    assert len(nse.get_history('TCS', 'NSE', start, end)) == 21
+    assert server.ranges[1] == server.ranges[0]
+
+
+def test_only_missing_head_and_settled_ranges_are_fetched(tmp_path):
+    store = OhlcvStore(tmp_path)
+    server = HistoryServer()
+    nse = client(server, store)
+    start = datetime(2024, 3, 1)
+    nse.get_history('TCS', 'NSE', start, datetime(2024, 3, 31))
+    earlier = nse.get_history('TCS', 'NSE', datetime(2024, 1, 1), datetime(2024, 3, 15))
+    assert server.ranges[1:] == [(int(datetime(2024, 1, 1).timestamp()), int(start.timestamp()) - 1)]
+    assert earlier.index[0] == pd.Timestamp('2024-01-01') and earlier.index[-1] == pd.Timestamp('2024-03-15')
+    assert earlier.index.is_unique and earlier.index.is_monotonic_increasing
+
+    nse.get_history('TCS', 'NSE', datetime(2024, 2, 1), datetime(2024, 3, 20))
+    assert len(server.ranges) == 2 and store.stats()['hits'] == 1
+    assert store.covered('NSE', 'TCS', '1D') == [[int(datetime(2024, 1, 1).timestamp()),
+                                                   int(datetime(2024, 3, 31).timestamp())]]
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from benchmarks.legacy import legacy_live_option_chain
+from benchmarks.payloads import option_chain_payload
+from option_chain import COMPACT_COLUMNS, FULL_COLUMNS, parse_option_chain
+from option_chain_recorder import OptionChainLog, OptionChainRecorder
+
+
+def _assert_same_values(df, legacy):
+    """Columns may differ in dtype (legacy infers them row by row), values must not."""
+    assert len(df) == len(legacy)
+    for column in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            assert df[column].tolist() == legacy[column].tolist(), column
+        else:
+            np.testing.assert_array_equal(df[column].to_numpy(float), legacy[column].to_numpy(float), column)
+
+
+def test_full_mode_matches_legacy_parser():
+    """Full chain has the same rows and values as the old parser, including strikes without quotes"""
+    payload = option_chain_payload(expiries=3, strikes_per_expiry=40, missing_ratio=0.2)
+    df = parse_option_chain(payload, 'NIFTY')
+    assert list(df.columns) == FULL_COLUMNS
+    _assert_same_values(df, legacy_live_option_chain(payload, 'NIFTY'))
+
+
+def test_compact_mode_and_expiry_filter():
+    """Compact mode only returns the compact columns of the requested expiry"""
+    payload = option_chain_payload(expiries=3, strikes_per_expiry=40, missing_ratio=0.2)
+    df = parse_option_chain(payload, 'NIFTY', expiry_date='06-07-2023', oi_mode='compact')
+    assert list(df.columns) == COMPACT_COLUMNS
+    assert set(df['Expiry_Date']) == {'06-Jul-2023'}
+    legacy = legacy_live_option_chain(payload, 'NIFTY', expiry_date='06-07-2023', oi_mode='compact')
+    _assert_same_values(df, legacy[COMPACT_COLUMNS])
+
+
+def test_incomplete_quote_is_zeroed():
+    """A side missing any of its fields is reported as zeros, as before"""
+    payload = option_chain_payload(expiries=1, strikes_per_expiry=2, missing_ratio=0)
+    del payload['records']['data'][0]['CE']['bidQty']
+    df = parse_option_chain(payload, 'NIFTY')
+    assert (df.loc[0, [c for c in FULL_COLUMNS if c.startswith('CALLS_')]] == 0).all()
+    assert df.loc[1, 'CALLS_OI'] == payload['records']['data'][1]['CE']['openInterest']
+
+
+def test_structured_array_output():
+    """as_array returns a numpy structured array with the same columns and values"""
+    payload = option_chain_payload(expiries=2, strikes_per_expiry=10)
+    array = parse_option_chain(payload, 'NIFTY', as_array=True)
+    df = parse_option_chain(payload, 'NIFTY')
+    assert list(array.dtype.names) == FULL_COLUMNS
+    assert array['CALLS_OI'].dtype == np.int64
+    pd.testing.assert_frame_equal(pd.DataFrame(array).astype(df.dtypes.to_dict()), df)
+
+
+def test_recorder_replays_keyframes_and_deltas(tmp_path):
+    """chain_at and iter_snapshots rebuild every recorded chain from keyframes plus deltas"""
+    payload = option_chain_payload(expiries=2, strikes_per_expiry=20, missing_ratio=0)
+    log = OptionChainLog('NIFTY', tmp_path)
+    recorder = OptionChainRecorder('NIFTY', nse=object(), log=log, keyframe_every=3)
+    start = pd.Timestamp('2023-06-23 09:15:00')
+    recorded = {}
+    for step in range(7):
+        data = payload['records']['data']
+        data[step]['CE']['lastPrice'] += 1
+        if step == 4:
+            data.pop(10)
+        chain = parse_option_chain(payload, 'NIFTY')
+        snapshot_time = start + pd.Timedelta(seconds=5 * step)
+        recorder.snapshot(chain, snapshot_time)
+        recorded[snapshot_time] = chain
+    log.flush()
+
+    assert recorder.stats()['rows_written'] < recorder.stats()['rows_seen']
+    for snapshot_time, chain in recorded.items():
+        pd.testing.assert_frame_equal(log.chain_at(snapshot_time), chain, check_dtype=False)
+    replayed = dict(log.iter_snapshots(start + pd.Timedelta(seconds=10), start + pd.Timedelta(seconds=30)))
+    assert list(replayed) == [t for t in recorded if start + pd.Timedelta(seconds=10) <= t]
+    for snapshot_time, chain in replayed.items():
+        pd.testing.assert_frame_equal(chain, recorded[snapshot_time], check_dtype=False)
+
+
+def test_log_keeps_only_the_most_recently_read_segments(tmp_path):
+    payload = option_chain_payload(expiries=1, strikes_per_expiry=5, missing_ratio=0)
+    chain = parse_option_chain(payload, 'NIFTY')
+    log = OptionChainLog('NIFTY', tmp_path, cached_segments=2)
+    start = pd.Timestamp('2023-06-23 09:15:00')
+    for step in range(4):
+        log.append(start + pd.Timedelta(minutes=step), 'K', chain)
+    log.flush()
+
+    assert len(log.read(start, start + pd.Timedelta(minutes=3))) == 4 * len(chain)
+    assert len(log._segments) == 2
+    pd.testing.assert_frame_equal(log.chain_at(start + pd.Timedelta(minutes=1)), chain, check_dtype=False)
+    assert len(log._segments) == 2
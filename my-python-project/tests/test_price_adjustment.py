@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from price_adjustment import AdjustmentEngine
+
+ACTIONS = pd.DataFrame([
+    {'symbol': 'ABC', 'series': 'EQ', 'faceVal': '10', 'exDate': '05-Jan-2024',
+     'subject': 'Face Value Split (Sub-Division) - From Rs 10/- Per Share To Rs 2/- Per Share'},
+    {'symbol': 'ABC', 'series': 'EQ', 'faceVal': '2', 'exDate': '10-Jan-2024', 'subject': 'Bonus 1:1'},
+    {'symbol': 'XYZ', 'series': 'EQ', 'faceVal': '10', 'exDate': '04-Jan-2024',
+     'subject': 'Interim Dividend - Rs 5 Per Share'},
+    {'symbol': 'XYZ', 'series': 'EQ', 'faceVal': '10', 'exDate': '08-Jan-2024', 'subject': 'Dividend - 50%'},
+    {'symbol': 'XYZ', 'series': 'EQ', 'faceVal': '10', 'exDate': '09-Jan-2024', 'subject': 'Annual General Meeting'},
+])
+DATES = pd.bdate_range('2024-01-01', '2024-01-12')
+
+
+def _panel(symbols):
+    return pd.concat([pd.DataFrame({'Symbol': symbol, 'Date': DATES, 'Open': 100.0, 'High': 100.0, 'Low': 100.0,
+                                    'Close': 100.0, 'Volume': 1000}) for symbol in symbols], ignore_index=True)
+
+
+def test_events_parsed_from_subjects():
+    events = AdjustmentEngine(ACTIONS).events()
+    assert events['kind'].tolist() == ['split', 'bonus', 'dividend', 'dividend']
+    assert events['price_factor'].tolist()[:2] == [0.2, 0.5]
+    assert events['dividend'].tolist()[2:] == [5.0, 5.0]
+
+
+def test_universe_adjusted_in_one_pass():
+    engine = AdjustmentEngine(ACTIONS)
+    adjusted = engine.adjust(_panel(['ABC', 'XYZ', 'NONE']), date_column='Date')
+    close = adjusted.pivot(index='Date', columns='Symbol', values='Close')
+    volume = adjusted.pivot(index='Date', columns='Symbol', values='Volume')
+
+    # Split 10 -> 2 then bonus 1:1
+    assert close['ABC'].tolist() == [10.0] * 4 + [50.0] * 3 + [100.0] * 3
+    assert volume['ABC'].tolist() == [10000] * 4 + [2000] * 3 + [1000] * 3
+    # Two Rs 5 dividends on a close of 100, volumes untouched
+    np.testing.assert_allclose(close['XYZ'], [90.25] * 3 + [95.0] * 2 + [100.0] * 5)
+    assert (volume['XYZ'] == 1000).all() and (close['NONE'] == 100.0).all()
+    # The dividend factors resolved from the closes are cached
+    assert engine.events('XYZ')['price_factor'].tolist() == [0.95, 0.95]
+
+
+def test_single_symbol_history_indexed_by_date():
+    history = _panel(['ABC']).drop(columns='Symbol').set_index('Date')
+    adjusted = AdjustmentEngine(ACTIONS).adjust(history, symbol='abc')
+    assert adjusted['High'].iloc[0] == 10.0 and adjusted['High'].iloc[-1] == 100.0
+    assert history['High'].iloc[0] == 100.0
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from benchmarks.suite import symbol_master
+from NSEMasterData import NSEMasterData
+from symbol_index import SymbolIndex
+
+MASTER = pd.DataFrame({'ScripCode': ['1', '2', '3', '4', '5'],
+                       'Symbol': ['BANKNIFTY24JULFUT', 'NIFTY BANK', 'NIFTY', 'NIFTY 50', 'TCS'],
+                       'Name': ['', '', '', '', ''], 'Type': ['FUT', 'Index', 'Index', 'Index', 'EQ']})
+
+
+def test_search_matches_a_full_scan_and_ranks_exact_then_prefix():
+    master = symbol_master(3000)
+    index = SymbolIndex(master)
+    for query in ['a', 'CE', '24jul', 'SEP1', 'JUL1230PE', master['Symbol'].iloc[17][2:]]:
+        expected = np.flatnonzero(master['Symbol'].str.contains(query, case=False, regex=False))
+        assert sorted(index.search(query)) == expected.tolist(), query
+
+    index = SymbolIndex(MASTER)
+    assert index.search('nifty').tolist() == [2, 3, 1, 0]
+    assert index.search('nifty', limit=2).tolist() == [2, 3]
+    assert index.exact('tcs').tolist() == [4] and index.exact('TC').tolist() == []
+    assert index.first('BANK') == 0 and index.first('XYZ') is None
+
+
+def test_master_data_search_uses_the_index():
+    nse = NSEMasterData(master_cache=False)
+    nse.nse_data, nse.nfo_data = MASTER, MASTER.iloc[:0]
+    assert nse.search('Nifty', 'NSE')['Symbol'].tolist() == ['NIFTY', 'NIFTY 50', 'NIFTY BANK', 'BANKNIFTY24JULFUT']
+    assert nse.search('nifty', 'NSE', match=True)['ScripCode'].tolist() == ['3']
+    # The exact symbol wins over an earlier symbol containing it
+    assert nse.search_symbol('nifty', 'NSE')['ScripCode'] == '3'
+    assert nse.search_symbol('BANK', 'NSE')['ScripCode'] == '1'
+
+    nse.nse_data = MASTER.iloc[:2]
+    assert nse.search_symbol('nifty', 'NSE')['ScripCode'] == '1'
+    assert nse.search_symbol('TCS', 'NFO') is None
@@ -0,0 +1,65 @@
+import json
+from requests.adapters import BaseAdapter
+from NSEMasterData import NSEMasterData
+from nse_replay import build_response
+from symbol_master_cache import SymbolMasterCache
+
+MASTERS = {'/Charts/GetEQMasters': '1|TCS|TATA CONSULTANCY|EQ\n2|INFY|INFOSYS|EQ',
+           '/Charts/GetFOMasters': '50|TCS24JULFUT|TCS FUT|FUTSTK'}
+
+
+class MasterServer(BaseAdapter):
+    """Serves the symbol masters with an ETag and answers matching conditional requests with a 304"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        path = request.path_url
+        self.requests.append((path, request.headers.get('If-None-Match')))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return build_response(request, 304, {}, b'')
+        return build_response(request, 200, {'Content-Type': 'text/plain', 'ETag': '"v1"'}, MASTERS[path].encode())
+
+    def close(self):
+        pass
+
+
+def test_masters_load_lazily_from_the_cache_and_revalidate_with_etags(tmp_path):
+    cache = SymbolMasterCache(tmp_path)
+    server = MasterServer()
+    first = NSEMasterData(adapter=server, master_cache=cache)
+    assert not server.requests
+    # First use downloads the master it needs and caches it
+    assert first.search_symbol('tcs', 'NSE')['ScripCode'] == '1'
+    assert server.requests == [('/Charts/GetEQMasters', None)]
+
+    # A new client validated today reads the cache without any request
+    second = NSEMasterData(adapter=server, master_cache=cache)
+    assert second.nse_data.equals(first.nse_data) and len(server.requests) == 1
+    assert cache.stats()['hits'] == 1
+
+    # A stale cache is revalidated with a conditional request, the 304 keeps the cached master
+    meta_path = tmp_path / 'NSE.json'
+    meta_path.write_text(json.dumps(dict(json.loads(meta_path.read_text()), validated='2000-01-01')))
+    third = NSEMasterData(adapter=server, master_cache=cache)
+    third.download_symbol_master()
+    assert server.requests[1:] == [('/Charts/GetEQMasters', '"v1"'), ('/Charts/GetFOMasters', None)]
+    assert cache.is_fresh('NSE') and third.nfo_data['Symbol'].tolist() == ['TCS24JULFUT']
+    assert third.nse_data['Symbol'].tolist() == ['TCS', 'INFY']
+
+
+def test_stale_cache_is_served_while_refreshed_in_the_background(tmp_path):
+    cache = SymbolMasterCache(tmp_path)
+    server = MasterServer()
+    NSEMasterData(adapter=server, master_cache=cache).download_symbol_master()
+    for exchange in ('NSE', 'NFO'):
+        meta_path = tmp_path / f"{exchange}.json"
+        meta_path.write_text(json.dumps(dict(json.loads(meta_path.read_text()), validated='2000-01-01')))
+
+    client = NSEMasterData(adapter=server, master_cache=cache)
+    assert client.nse_data['Symbol'].tolist() == ['TCS', 'INFY']
+    client._refresh_thread.join(5)
+    assert cache.is_fresh('NSE') and cache.is_fresh('NFO')
+    assert server.requests[2:] == [('/Charts/GetEQMasters', '"v1"'), ('/Charts/GetFOMasters', '"v1"')]